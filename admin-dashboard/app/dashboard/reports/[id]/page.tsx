@@ -72,9 +72,17 @@ export default function ReportDetailPage({ params }: { params: Promise<{ id: str
                     label: response.data.label.join(", ")
                 });
 
-                // Use new Cloud URL
+                // Stream through the API so tenant isolation applies and seeking uses Range requests.
+                // <video> cannot send an Authorization header, so the URL carries a short-lived
+                // token scoped to this report's media, never the session token.
                 if (response.data.video_url) {
-                    setVideoUrl(response.data.video_url);
+                    const media = await axios.post<{ tokens: Record<number, string> }>(
+                        "/api/reports/media-tokens",
+                        { report_ids: [response.data.id] },
+                        { headers: { Authorization: `Bearer ${token}` } },
+                    );
+                    const mediaToken = media.data.tokens[response.data.id] ?? "";
+                    setVideoUrl(`/api/reports/${id}/video?token=${encodeURIComponent(mediaToken)}`);
                 }
 
             } catch (error: any) {
@@ -15,6 +15,8 @@ interface BugReport {
     status: string;
     synced_to_integration: boolean;
     external_ticket_id: string | null;
+    thumbnail_url: string | null;
+    preview_url: string | null;
     created_at: string;
 }
 
@@ -31,6 +33,16 @@ export default function ReportsPage() {
     const [total, setTotal] = useState(0);
     const [page, setPage] = useState(1);
     const [isLoading, setIsLoading] = useState(true);
+    const [hoveredId, setHoveredId] = useState<number | null>(null);
+    // Bumped by the live event feed to trigger a refetch instead of polling
+    const [refreshKey, setRefreshKey] = useState(0);
+
+    // Per report, a short-lived token scoped to its media: <img> cannot send headers
+    const [mediaTokens, setMediaTokens] = useState<Record<number, string>>({});
+
+    // Poster/preview images are a few KB each
+    const mediaSrc = (reportId: number, kind: "poster" | "preview") =>
+        `/api/reports/${reportId}/${kind}?token=${encodeURIComponent(mediaTokens[reportId] ?? "")}`;
 
     useEffect(() => {
         const fetchReports = async () => {
@@ -41,6 +53,16 @@ export default function ReportsPage() {
                 });
                 setReports(response.data.reports);
                 setTotal(response.data.total);
+
+                const withMedia = response.data.reports.filter(r => r.thumbnail_url).map(r => r.id);
+                if (withMedia.length) {
+                    const tokens = await axios.post<{ tokens: Record<number, string> }>(
+                        "/api/reports/media-tokens",
+                        { report_ids: withMedia },
+                        { headers: { Authorization: `Bearer ${token}` } },
+                    );
+                    setMediaTokens(tokens.data.tokens);
+                }
             } catch (error: any) {
                 console.error("Error fetching reports:", error);
                 if (error.response?.status === 401) {
@@ -57,7 +79,48 @@ export default function ReportsPage() {
         if (token) {
             fetchReports();
         }
-    }, [token, page]);
+    }, [token, page, refreshKey]);
+
+    useEffect(() => {
+        if (!token) return;
+        let source: EventSource | null = null;
+        let retry: ReturnType<typeof setTimeout> | undefined;
+        let closed = false;
+        const refresh = () => setRefreshKey(k => k + 1);
+
+        // EventSource cannot send an Authorization header, so the URL carries a short-lived
+        // token for the event stream only, never the session token
+        const connect = async () => {
+            try {
+                const response = await axios.post<{ token: string }>("/api/events/token", null, {
+                    headers: { Authorization: `Bearer ${token}` },
+                });
+                if (closed) return;
+                source = new EventSource(`/api/events/stream?token=${encodeURIComponent(response.data.token)}`);
+            } catch (error) {
+                console.error("Error opening event stream:", error);
+                retry = setTimeout(connect, 30000);
+                return;
+            }
+            ["report.created", "report.status_changed", "report.updated", "report.deleted", "report.processing_complete"]
+                .forEach(type => source!.addEventListener(type, refresh));
+            // After a slow-consumer eviction the browser reconnects on its own; refetch in case events were dropped
+            source.addEventListener("evicted", refresh);
+            // The browser gives up when a reconnect is refused, e.g. once the token has expired: mint a new one
+            source.onerror = () => {
+                if (source?.readyState === EventSource.CLOSED && !closed) {
+                    retry = setTimeout(connect, 3000);
+                }
+            };
+        };
+        connect();
+
+        return () => {
+            closed = true;
+            clearTimeout(retry);
+            source?.close();
+        };
+    }, [token]);
 
     const getStatusIcon = (status: string) => {
         switch (status) {
@@ -105,6 +168,9 @@ export default function ReportsPage() {
                     <table className="w-full">
                         <thead className="bg-gray-700/50 border-b border-gray-700">
                             <tr>
+                                <th className="px-6 py-3 text-left text-xs font-medium text-gray-300 uppercase tracking-wider">
+                                    Preview
+                                </th>
                                 <th className="px-6 py-3 text-left text-xs font-medium text-gray-300 uppercase tracking-wider">
                                     ID
                                 </th>
@@ -128,7 +194,7 @@ export default function ReportsPage() {
                         <tbody className="divide-y divide-gray-700">
                             {reports.length === 0 ? (
                                 <tr>
-                                    <td colSpan={6} className="px-6 py-8 text-center text-gray-400">
+                                    <td colSpan={7} className="px-6 py-8 text-center text-gray-400">
                                         No reports found
                                     </td>
                                 </tr>
@@ -138,7 +204,23 @@ export default function ReportsPage() {
                                         key={report.id}
                                         className="hover:bg-gray-700/30 transition-colors cursor-pointer"
                                         onClick={() => window.open(`/dashboard/reports/${report.id}`, '_blank')}
+                                        onMouseEnter={() => setHoveredId(report.id)}
+                                        onMouseLeave={() => setHoveredId(null)}
                                     >
+                                        <td className="px-6 py-2 whitespace-nowrap">
+                                            {report.thumbnail_url ? (
+                                                <img
+                                                    src={hoveredId === report.id && report.preview_url
+                                                        ? mediaSrc(report.id, "preview")
+                                                        : mediaSrc(report.id, "poster")}
+                                                    alt={`Report #${report.id} preview`}
+                                                    loading="lazy"
+                                                    className="w-24 h-14 object-cover rounded-md bg-black border border-gray-700"
+                                                />
+                                            ) : (
+                                                <div className="w-24 h-14 rounded-md bg-gray-900 border border-gray-700" />
+                                            )}
+                                        </td>
                                         <td className="px-6 py-4 whitespace-nowrap text-sm text-white font-medium">
                                             #{report.id}
                                         </td>
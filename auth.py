@@ -2,13 +2,14 @@ from datetime import datetime, timedelta
 from typing import Optional
 from jose import JWTError, jwt
 import bcrypt
-from fastapi import Depends, HTTPException, status
+from fastapi import Depends, HTTPException, Query, Request, status
 from fastapi.security import HTTPBearer, HTTPAuthorizationCredentials
 from sqlalchemy.orm import Session
 from db import get_db
 from models import User, UserRole
 import os
 import logging
+import time
 
 # Setup logging
 logging.basicConfig(level=logging.INFO)
@@ -18,9 +19,17 @@ logger = logging.getLogger(__name__)
 SECRET_KEY = os.getenv("SECRET_KEY", "your-secret-key-change-this-in-production")
 ALGORITHM = "HS256"
 ACCESS_TOKEN_EXPIRE_MINUTES = 60 * 24  # 24 hours
+# Lifetime of the scoped tokens put in media and event stream URLs
+SCOPED_TOKEN_EXPIRE_SECONDS = int(os.getenv("SCOPED_TOKEN_EXPIRE_SECONDS", "900"))
+
+# Scopes of tokens that may appear in a URL
+MEDIA_SCOPE = "media"
+EVENTS_SCOPE = "events"
 
 # HTTP Bearer token scheme
 security = HTTPBearer()
+# Same scheme without the automatic 403, for endpoints that also accept a scoped ?token=
+optional_security = HTTPBearer(auto_error=False)
 
 credentials_exception = HTTPException(
     status_code=status.HTTP_401_UNAUTHORIZED,
@@ -74,9 +83,62 @@ def get_current_user(
     Dependency to get the current authenticated user from the JWT token
     Usage: current_user: User = Depends(get_current_user)
     """
-    token = credentials.credentials
+    return get_user_from_token(credentials.credentials, db)
+
+def create_scoped_token(user_id: int, scope: str, resource: Optional[int] = None) -> tuple[str, int]:
+    """
+    Short-lived token that only grants one scope (and resource, e.g. a report id), for URLs
+    the browser loads itself and which therefore end up in logs. Expiry is rounded to the
+    lifetime so that mints within the same window give the same URL and the browser cache
+    keeps working; a token is valid for one to two lifetimes. Returns (token, seconds left).
+    """
+    now = int(time.time())
+    expire = (now // SCOPED_TOKEN_EXPIRE_SECONDS + 2) * SCOPED_TOKEN_EXPIRE_SECONDS
+    payload = {"sub": str(user_id), "scope": scope, "exp": expire}
+    if resource is not None:
+        payload["resource"] = str(resource)
+    return jwt.encode(payload, SECRET_KEY, algorithm=ALGORITHM), expire - now
+
+def require_user_or_scoped_token(scope: str, resource_param: Optional[str] = None):
+    """
+    Dependency factory for endpoints loaded by the browser itself (<video src>, EventSource),
+    which cannot set headers: accepts the Authorization header, or a ?token= from
+    create_scoped_token for this scope and, if resource_param is given, for the resource
+    in that path parameter. Session tokens are never accepted in the query string.
+    """
+    def dependency(
+        request: Request,
+        token: Optional[str] = Query(None),
+        credentials: Optional[HTTPAuthorizationCredentials] = Depends(optional_security),
+        db: Session = Depends(get_db)
+    ) -> User:
+        if credentials is not None:
+            return get_user_from_token(credentials.credentials, db)
+        if not token:
+            raise credentials_exception
+        resource = request.path_params.get(resource_param) if resource_param else None
+        return get_user_from_scoped_token(token, scope, db, resource)
+    return dependency
+
+def get_user_from_scoped_token(token: str, scope: str, db: Session, resource=None) -> User:
+    """Resolve the active user of a create_scoped_token token, which must match scope and resource"""
     payload = decode_access_token(token)
-    
+    if payload.get("scope") != scope or payload.get("resource") != (None if resource is None else str(resource)):
+        logger.warning(f"Token for scope {payload.get('scope')!r} used where {scope!r} is required")
+        raise credentials_exception
+    return _user_from_payload(payload, db)
+
+def get_user_from_token(token: str, db: Session) -> User:
+    """Resolve the active user a session JWT belongs to"""
+    payload = decode_access_token(token)
+    if "scope" in payload:
+        # Scoped tokens only open the URLs they were minted for
+        logger.warning(f"Scoped token ({payload['scope']}) used as a session token")
+        raise credentials_exception
+    return _user_from_payload(payload, db)
+
+def _user_from_payload(payload: dict, db: Session) -> User:
+    """Resolve the active user a decoded token belongs to"""
     user_id_raw = payload.get("sub")
     if user_id_raw is None:
         logger.warning("Token payload missing 'sub' (user ID).")
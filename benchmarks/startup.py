@@ -0,0 +1,165 @@
+"""
+Startup-time benchmark for the TrapAlert API.
+
+1. Import profile: runs `python -X importtime -c "import main"` in a fresh interpreter and
+   reports total import time plus the most expensive direct imports of main. Heavy SDKs that
+   must stay lazy (google-genai, supabase, pyarrow) fail the run if they show up.
+2. Time to ready: launches a server process and polls /readyz until it answers 200,
+   i.e. what an autoscaler waits for before routing traffic to a new replica.
+
+Exits with status 1 when the median time to ready exceeds --budget-ms or a lazy SDK is
+imported at startup.
+
+Examples:
+    python benchmarks/startup.py
+    python benchmarks/startup.py --runs 5 --budget-ms 800
+    python benchmarks/startup.py --server gunicorn --workers 2
+    PRELOAD_APP=1 python benchmarks/startup.py --server gunicorn --workers 4
+"""
+
+import argparse
+import os
+import re
+import socket
+import statistics
+import subprocess
+import sys
+import tempfile
+import time
+import urllib.error
+import urllib.request
+
+REPO_ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+# Imported on first use only; loading any of them at startup is a regression
+LAZY_MODULES = ("google.genai", "supabase", "pyarrow")
+
+IMPORTTIME_LINE = re.compile(r"import time:\s+(\d+) \|\s+(\d+) \|( *)(\S+)")
+
+
+def _env(database_url: str) -> dict:
+    env = dict(os.environ)
+    env["DATABASE_URL"] = database_url
+    env.setdefault("STORAGE_BACKEND", "local")
+    env.setdefault("LOCAL_STORAGE_DIR", tempfile.mkdtemp(prefix="trapalert-startup-media-"))
+    return env
+
+
+def import_profile(database_url: str) -> dict:
+    """Runs `import main` under -X importtime; returns timings in milliseconds"""
+    start = time.perf_counter()
+    proc = subprocess.run(
+        [sys.executable, "-X", "importtime", "-c", "import main"],
+        cwd=REPO_ROOT, env=_env(database_url), capture_output=True, text=True,
+    )
+    wall_ms = (time.perf_counter() - start) * 1000
+    if proc.returncode != 0:
+        raise RuntimeError(f"import main failed:\n{proc.stderr[-2000:]}")
+
+    modules = {}
+    direct, children = [], []
+    for line in proc.stderr.splitlines():
+        match = IMPORTTIME_LINE.match(line)
+        if not match:
+            continue
+        _, cumulative_us, indent, name = match.groups()
+        modules[name] = int(cumulative_us) / 1000
+        # Nested imports are indented two spaces per level and printed before their parent
+        if len(indent) == 3:
+            children.append((name, modules[name]))
+        elif len(indent) == 1:
+            if name == "main":
+                direct = children
+            children = []
+
+    return {
+        "wall_ms": wall_ms,
+        "main_ms": modules.get("main", 0.0),
+        "imported_by_main": sorted(direct, key=lambda item: item[1], reverse=True),
+        "lazy_violations": sorted({lazy for name in modules for lazy in LAZY_MODULES
+                                   if name == lazy or name.startswith(lazy + ".")}),
+    }
+
+
+def _free_port() -> int:
+    with socket.socket() as s:
+        s.bind(("127.0.0.1", 0))
+        return s.getsockname()[1]
+
+
+def time_to_ready(args, database_url: str) -> float:
+    """Spawns a server and returns milliseconds until /readyz first answers 200"""
+    port = _free_port()
+    if args.server == "gunicorn":
+        command = [sys.executable, "-m", "gunicorn", "-c", "gunicorn.conf.py",
+                   "--workers", str(args.workers), "--bind", f"127.0.0.1:{port}", "main:app"]
+    else:
+        command = [sys.executable, "-m", "uvicorn", "main:app", "--host", "127.0.0.1", "--port", str(port)]
+
+    url = f"http://127.0.0.1:{port}/readyz"
+    start = time.perf_counter()
+    proc = subprocess.Popen(command, cwd=REPO_ROOT, env=_env(database_url),
+                            stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL)
+    try:
+        deadline = start + args.timeout
+        while time.perf_counter() < deadline:
+            if proc.poll() is not None:
+                raise RuntimeError(f"server exited with status {proc.returncode} before becoming ready")
+            try:
+                with urllib.request.urlopen(url, timeout=1) as response:
+                    if response.status == 200:
+                        return (time.perf_counter() - start) * 1000
+            except (urllib.error.URLError, ConnectionError, OSError):
+                pass
+            time.sleep(0.01)
+        raise RuntimeError(f"server not ready after {args.timeout}s")
+    finally:
+        proc.terminate()
+        try:
+            proc.wait(timeout=30)
+        except subprocess.TimeoutExpired:
+            proc.kill()
+
+
+def main():
+    parser = argparse.ArgumentParser(description="TrapAlert API startup benchmark")
+    parser.add_argument("--database-url", default=None, help="Defaults to a fresh temporary SQLite file")
+    parser.add_argument("--runs", type=int, default=3, help="Server start-ups to measure")
+    parser.add_argument("--server", choices=("uvicorn", "gunicorn"), default="uvicorn")
+    parser.add_argument("--workers", type=int, default=1, help="gunicorn workers")
+    parser.add_argument("--top", type=int, default=15, help="Direct imports of main to list")
+    parser.add_argument("--budget-ms", type=float, default=1000, help="Allowed median time to ready")
+    parser.add_argument("--timeout", type=float, default=60, help="Seconds to wait for a server to get ready")
+    args = parser.parse_args()
+
+    if not args.database_url:
+        args.database_url = f"sqlite:///{tempfile.mkdtemp(prefix='trapalert-startup-')}/startup.db"
+    # The app no longer creates tables on startup; /readyz only needs a reachable database
+    subprocess.run([sys.executable, "manage.py", "migrate"], cwd=REPO_ROOT, env=_env(args.database_url),
+                   check=True, capture_output=True)
+
+    profile = import_profile(args.database_url)
+    print(f"import main: {profile['main_ms']:.0f} ms (interpreter wall time {profile['wall_ms']:.0f} ms)")
+    print(f"\n{'imported by main':40} {'cumulative ms':>14}")
+    for name, ms in profile["imported_by_main"][:args.top]:
+        print(f"{name:40} {ms:>14.1f}")
+
+    ready = [time_to_ready(args, args.database_url) for _ in range(args.runs)]
+    median = statistics.median(ready)
+    print(f"\ntime to ready ({args.server}, {args.runs} runs): median {median:.0f} ms, "
+          f"min {min(ready):.0f} ms, max {max(ready):.0f} ms")
+
+    failures = []
+    if profile["lazy_violations"]:
+        failures.append(f"lazy SDKs imported at startup: {', '.join(profile['lazy_violations'])}")
+    if median > args.budget_ms:
+        failures.append(f"median time to ready {median:.0f} ms exceeds budget {args.budget_ms:.0f} ms")
+    if failures:
+        for line in failures:
+            print(f"   ✗ {line}")
+        sys.exit(1)
+    print(f"\n✓ Within the {args.budget_ms:.0f} ms startup budget")
+
+
+if __name__ == "__main__":
+    main()
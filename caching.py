@@ -0,0 +1,123 @@
+import hashlib
+from datetime import datetime
+from email.utils import parsedate_to_datetime
+from typing import Optional
+
+from fastapi import Request, Response
+from sqlalchemy import func
+from sqlalchemy.orm import Session
+
+from models import TenantVersion, User, UserRole
+
+# Browsers may keep the body but must revalidate every time; the ETag makes that revalidation cheap.
+# Responses differ per user token, hence private + Vary.
+CACHE_CONTROL = "private, no-cache"
+
+
+def bump_tenant_version(db: Session, tenant_id: int) -> None:
+    """
+    Increment a tenant's change version inside the caller's transaction.
+    Call this whenever a report (or the tenant itself) is inserted, updated or deleted,
+    so cached list/stats/detail responses for that tenant stop validating.
+    """
+    dialect = db.get_bind().dialect.name
+    if dialect == "postgresql":
+        from sqlalchemy.dialects.postgresql import insert
+    else:
+        from sqlalchemy.dialects.sqlite import insert
+    stmt = insert(TenantVersion).values(tenant_id=tenant_id, version=1, updated_at=datetime.utcnow())
+    stmt = stmt.on_conflict_do_update(
+        index_elements=[TenantVersion.tenant_id],
+        set_={"version": TenantVersion.version + 1, "updated_at": datetime.utcnow()},
+    )
+    db.execute(stmt)
+
+
+def current_version(db: Session, current_user: User, tenant_id: Optional[int] = None) -> str:
+    """
+    Version token for the data visible to this user.
+    Reads only the small tenant_versions table, never bug_reports.
+    """
+    if current_user.role != UserRole.SUPER_ADMIN:
+        tenant_id = current_user.tenant_id
+
+    if tenant_id is not None:
+        version = db.query(TenantVersion.version).filter(TenantVersion.tenant_id == tenant_id).scalar()
+        return f"t{tenant_id}:{version or 0}"
+
+    # Versions only ever increase, so the sum changes whenever any tenant changes
+    total, count = db.query(func.coalesce(func.sum(TenantVersion.version), 0), func.count()).one()
+    return f"all:{total}:{count}"
+
+
+def route_fresh_reads(db: Session, current_user: User, tenant_id: Optional[int] = None) -> str:
+    """
+    current_version(), guaranteeing the session's next reads see at least that version.
+    When `db` reads from a replica (db.get_read_db) that has not replayed the primary's
+    version yet, e.g. right after this user's own update, its remaining reads move to the
+    primary. Works across workers, since the version lives in the database.
+    """
+    version = current_version(db, current_user, tenant_id)
+    if getattr(db, "reads_from_replica", False):
+        # Replica first: replay is monotonic, so once it has this version it keeps it
+        with db.on_primary():
+            primary_version = current_version(db, current_user, tenant_id)
+        if primary_version != version:
+            db.use_primary(reason="replica_behind")
+        version = primary_version
+    return version
+
+
+def make_etag(*parts) -> str:
+    digest = hashlib.sha1("|".join(str(p) for p in parts).encode()).hexdigest()[:20]
+    return f'W/"{digest}"'
+
+
+def is_not_modified(request_headers, response_headers) -> bool:
+    """Evaluate If-None-Match / If-Modified-Since against the response validators (RFC 9110 13.2.2)"""
+    if_none_match = request_headers.get("if-none-match")
+    if if_none_match is not None:
+        # Weak comparison: W/ prefixes are ignored on both sides
+        etag = response_headers["etag"].removeprefix("W/")
+        tags = [tag.strip().removeprefix("W/") for tag in if_none_match.split(",")]
+        return "*" in tags or etag in tags
+
+    if_modified_since = request_headers.get("if-modified-since")
+    if if_modified_since and "last-modified" in response_headers:
+        try:
+            return parsedate_to_datetime(response_headers["last-modified"]) <= parsedate_to_datetime(if_modified_since)
+        except (TypeError, ValueError):
+            return False
+    return False
+
+
+def conditional_get(
+    request: Request,
+    response: Response,
+    db: Session,
+    current_user: User,
+    tenant_id: Optional[int] = None,
+    extra: str = "",
+) -> Optional[Response]:
+    """
+    Set ETag/Cache-Control on `response` and return a 304 Response if the client's copy is current.
+    The ETag covers the tenant change version, the caller's visibility scope and the full URL.
+    Usage:
+        not_modified = conditional_get(request, response, db, current_user)
+        if not_modified:
+            return not_modified
+    """
+    etag = make_etag(
+        route_fresh_reads(db, current_user, tenant_id),
+        current_user.role.value,
+        current_user.tenant_id,
+        request.url.path,
+        sorted(request.query_params.multi_items()),
+        extra,
+    )
+    headers = {"ETag": etag, "Cache-Control": CACHE_CONTROL, "Vary": "Authorization"}
+    response.headers.update(headers)
+
+    if is_not_modified(request.headers, response.headers):
+        return Response(status_code=304, headers=headers)
+    return None
@@ -0,0 +1,86 @@
+"""
+Shared pytest fixtures: the app on a throwaway SQLite database, recreated for every test,
+with two tenants, a client admin in the first and a super admin.
+
+The environment is set before anything imports db.py, which reads DATABASE_URL at import.
+The TestClient is not entered, so the lifespan (schedulers, broker) does not run.
+Tests marked `postgres` run against TEST_POSTGRES_URL, and are skipped without it.
+"""
+
+import os
+import tempfile
+
+_TMP = tempfile.mkdtemp(prefix="trapalert-tests-")
+os.environ["DATABASE_URL"] = f"sqlite:///{_TMP}/test.db"
+os.environ["STORAGE_BACKEND"] = "local"
+os.environ["LOCAL_STORAGE_DIR"] = os.path.join(_TMP, "media")
+os.environ["UPLOAD_SPOOL_DIR"] = os.path.join(_TMP, "spool")
+os.environ["TRACE_EXPORTER"] = "memory"
+os.environ.pop("EVENT_BROKER_URL", None)
+
+import pytest
+from fastapi.testclient import TestClient
+
+import facets
+import main
+from auth import create_access_token, hash_password
+from db import Base, SessionLocal, engine
+from models import Tenant, User, UserRole
+
+
+def pytest_configure(config):
+    config.addinivalue_line("markers", "postgres: needs the Postgres server named by TEST_POSTGRES_URL")
+
+
+@pytest.fixture
+def db():
+    Base.metadata.drop_all(bind=engine)
+    Base.metadata.create_all(bind=engine)
+    facets.cache.clear()
+    session = SessionLocal()
+    try:
+        yield session
+    finally:
+        session.close()
+
+
+@pytest.fixture
+def tenant(db):
+    tenant = Tenant(name="Acme", api_key="acme-key")
+    db.add(tenant)
+    db.commit()
+    return tenant
+
+
+@pytest.fixture
+def other_tenant(db):
+    tenant = Tenant(name="Globex", api_key="globex-key")
+    db.add(tenant)
+    db.commit()
+    return tenant
+
+
+@pytest.fixture
+def admin(db, tenant):
+    user = User(email="admin@acme.example.com", password_hash=hash_password("password1"),
+                role=UserRole.CLIENT_ADMIN, tenant_id=tenant.id)
+    db.add(user)
+    db.commit()
+    return user
+
+
+@pytest.fixture
+def super_admin(db):
+    user = User(email="root@trapalert.example.com", password_hash=hash_password("password1"), role=UserRole.SUPER_ADMIN)
+    db.add(user)
+    db.commit()
+    return user
+
+
+def auth_headers(user: User) -> dict:
+    return {"Authorization": f"Bearer {create_access_token({'sub': user.id})}"}
+
+
+@pytest.fixture
+def client(db):
+    return TestClient(main.app)
@@ -1,7 +1,16 @@
+import itertools
+import logging
 import os
-from sqlalchemy import create_engine
+import time
+from contextlib import contextmanager
+from sqlalchemy import create_engine, event, text
 from sqlalchemy.ext.declarative import declarative_base
-from sqlalchemy.orm import sessionmaker
+from sqlalchemy.orm import Session, sessionmaker
+from sqlalchemy.sql import Select
+from metrics import TimedQueuePool, db_pool_checked_out, db_read_routing
+from tracing import instrument_engine
+
+logger = logging.getLogger(__name__)
 
 # Use DATABASE_URL from env if available (Supabase), else local SQLite
 DATABASE_URL = os.environ.get("DATABASE_URL", "sqlite:///./trap_alert.db")
@@ -10,21 +19,168 @@ DATABASE_URL = os.environ.get("DATABASE_URL", "sqlite:///./trap_alert.db")
 if DATABASE_URL.startswith("postgres://"):
     DATABASE_URL = DATABASE_URL.replace("postgres://", "postgresql://", 1)
 
-if "sqlite" in DATABASE_URL:
-    engine = create_engine(
-        DATABASE_URL, connect_args={"check_same_thread": False}
-    )
-else:
-    engine = create_engine(DATABASE_URL)
+# Optional read replicas (comma-separated URLs) for the dashboard's read-only endpoints
+DATABASE_REPLICA_URLS = [url.strip() for url in os.environ.get("DATABASE_REPLICA_URLS", "").split(",") if url.strip()]
+# Replicas further behind the primary than this are skipped until they catch up
+REPLICA_MAX_LAG_SECONDS = float(os.environ.get("REPLICA_MAX_LAG_SECONDS", "5"))
+REPLICA_CHECK_INTERVAL_SECONDS = float(os.environ.get("REPLICA_CHECK_INTERVAL_SECONDS", "5"))
+
+def _create_engine(url: str):
+    if url.startswith("postgres://"):
+        url = url.replace("postgres://", "postgresql://", 1)
+    if "sqlite" in url:
+        new_engine = create_engine(
+            url, connect_args={"check_same_thread": False},
+            # In-memory SQLite needs its default single-connection pool
+            **({} if ":memory:" in url else {"poolclass": TimedQueuePool})
+        )
+    else:
+        new_engine = create_engine(url, poolclass=TimedQueuePool)
+    instrument_engine(new_engine)
+    return new_engine
+
+# The primary: every write, and reads that must see the latest data
+engine = _create_engine(DATABASE_URL)
+db_pool_checked_out.set_function(engine.pool.checkedout)
+
+# Seconds of replay lag on a Postgres standby (0 when it has replayed everything it received)
+REPLICA_LAG_SQL = """
+SELECT CASE
+    WHEN NOT pg_is_in_recovery() OR pg_last_wal_receive_lsn() = pg_last_wal_replay_lsn() THEN 0
+    ELSE COALESCE(EXTRACT(EPOCH FROM now() - pg_last_xact_replay_timestamp()), 0)
+END
+"""
+
+class ReplicaSet:
+    """
+    Reader engines picked round-robin. Each replica's health and replication lag are
+    checked at most every REPLICA_CHECK_INTERVAL_SECONDS; failing or lagging replicas
+    are skipped, and when none is usable reads fall back to the primary.
+    """
+
+    def __init__(self, engines: list):
+        self.engines = engines
+        self._status = {}  # engine -> (usable, checked at)
+        self._turn = itertools.count()
+        for replica in engines:
+            event.listen(replica, "handle_error", self._on_error)
+
+    def _on_error(self, context) -> None:
+        # A lost connection takes the replica out of rotation until its next check
+        if context.is_disconnect and context.engine is not None:
+            self._status[context.engine] = (False, time.monotonic())
+
+    def _check(self, replica) -> bool:
+        try:
+            with replica.connect() as conn:
+                lag = conn.execute(text(REPLICA_LAG_SQL if replica.dialect.name == "postgresql" else "SELECT 0")).scalar()
+        except Exception as e:
+            logger.warning(f"Replica {replica.url.host or replica.url.database} unavailable: {e}")
+            return False
+        if float(lag or 0) > REPLICA_MAX_LAG_SECONDS:
+            logger.warning(f"Replica {replica.url.host or replica.url.database} is {float(lag):.1f}s behind, skipped")
+            return False
+        return True
+
+    def is_usable(self, replica) -> bool:
+        usable, checked_at = self._status.get(replica, (False, None))
+        if checked_at is None or time.monotonic() - checked_at >= REPLICA_CHECK_INTERVAL_SECONDS:
+            usable = self._check(replica)
+            self._status[replica] = (usable, time.monotonic())
+        return usable
+
+    def pick(self):
+        """A usable replica engine, or None"""
+        start = next(self._turn)
+        for i in range(len(self.engines)):
+            replica = self.engines[(start + i) % len(self.engines)]
+            if self.is_usable(replica):
+                return replica
+        return None
+
+    def dispose(self, close: bool = True) -> None:
+        for replica in self.engines:
+            replica.dispose(close=close)
+
+replicas = ReplicaSet([_create_engine(url) for url in DATABASE_REPLICA_URLS])
+
+class RoutingSession(Session):
+    """
+    Session that sends plain SELECTs to its reader engine, when it has one (see get_read_db).
+    Flushes, other statements and SELECT ... FOR UPDATE always go to the primary.
+    """
 
-SessionLocal = sessionmaker(autocommit=False, autoflush=False, bind=engine)
+    def get_bind(self, mapper=None, clause=None, **kw):
+        reader = self.info.get("reader")
+        if (reader is not None and not self._flushing and isinstance(clause, Select)
+                and clause._for_update_arg is None):
+            return reader
+        return super().get_bind(mapper, clause=clause, **kw)
+
+    @property
+    def reads_from_replica(self) -> bool:
+        return self.info.get("reader") is not None
+
+    def use_primary(self, reason: str) -> None:
+        """Send this session's remaining reads to the primary"""
+        if self.info.pop("reader", None) is not None:
+            db_read_routing.inc(target="primary", reason=reason)
+
+    @contextmanager
+    def on_primary(self):
+        """Run the enclosed reads on the primary, then resume reading from the replica"""
+        reader = self.info.pop("reader", None)
+        try:
+            yield self
+        finally:
+            if reader is not None:
+                self.info["reader"] = reader
+
+SessionLocal = sessionmaker(class_=RoutingSession, autocommit=False, autoflush=False, bind=engine)
 
 Base = declarative_base()
 
+def alembic_config():
+    from alembic.config import Config
+
+    config = Config(os.path.join(os.path.dirname(os.path.abspath(__file__)), "alembic.ini"))
+    # Callers configure logging themselves
+    config.attributes["configure_logger"] = False
+    return config
+
+def init_db(revision: str = "head"):
+    """
+    Apply Alembic migrations up to revision. Run as an explicit deploy step
+    (`python manage.py migrate`), not on app import.
+    """
+    from alembic import command
+
+    command.upgrade(alembic_config(), revision)
+
 # This is the "Cleaner" way to handle connections (Dependency Injection)
 def get_db():
     db = SessionLocal()
     try:
         yield db
     finally:
-        db.close()
\ No newline at end of file
+        db.close()
+
+def get_read_db():
+    """
+    Session for read-only endpoints: SELECTs go to a healthy replica when replicas are
+    configured, anything else to the primary. Callers showing tenant data should go
+    through caching.route_fresh_reads(), which falls back to the primary while the
+    replica has not replayed the tenant's latest writes (read-your-writes).
+    """
+    db = SessionLocal()
+    if replicas.engines:
+        reader = replicas.pick()
+        if reader is not None:
+            db.info["reader"] = reader
+            db_read_routing.inc(target="replica", reason="healthy")
+        else:
+            db_read_routing.inc(target="primary", reason="no_usable_replica")
+    try:
+        yield db
+    finally:
+        db.close()
@@ -0,0 +1,350 @@
+"""
+Deferred transcription and labelling.
+
+When Gemini fails for good during ingestion (retries exhausted, circuit open), the report is
+saved with TRANSCRIPT_PENDING or fallback labels and an EnrichmentJob is queued. Jobs are
+retried with exponential backoff (ENRICHMENT_BACKOFF_SECONDS, doubling up to
+ENRICHMENT_BACKOFF_MAX_SECONDS): the video is read back from storage, transcribed and
+labelled, the report updated and its similarity signature rebuilt. After
+ENRICHMENT_MAX_ATTEMPTS a job is parked (next_attempt_at NULL) rather than dropped;
+`python manage.py enrich-reports --retry-failed` requeues parked jobs.
+
+Runs every ENRICHMENT_INTERVAL_SECONDS in each worker (jobs are claimed with a
+compare-and-set, so workers never process the same job twice), or from cron with
+`python manage.py enrich-reports`. A run is skipped while the Gemini circuit is open.
+A new transcript is saved before labelling, so a failed label request is retried
+without transcribing again.
+
+Batch mode (ENRICHMENT_LABEL_MODE=batch): ingestion only transcribes, and labelling is
+queued for the next off-peak window (ENRICHMENT_OFFPEAK_HOURS, e.g. "1-6" in UTC; empty
+means any time). Label jobs, whatever queued them, are sent ENRICHMENT_LABEL_BATCH_SIZE
+reports per Gemini request, which spreads the instructions and request overhead over the
+whole batch; transcripts longer than ENRICHMENT_LABEL_BATCH_MAX_CHARS get a request of
+their own. Off-peak runs claim up to ENRICHMENT_OFFPEAK_BATCH_SIZE jobs.
+"""
+
+import asyncio
+import logging
+import mimetypes
+import os
+from datetime import datetime, timedelta
+from typing import Optional
+
+from sqlalchemy.orm import Session
+
+import labels
+import priority
+import resilience
+import similarity
+from caching import bump_tenant_version
+from db import SessionLocal
+from events import publish_event, REPORT_UPDATED
+from models import BugReport, EnrichmentJob, Tenant
+
+logger = logging.getLogger(__name__)
+
+ENRICHMENT_INTERVAL_SECONDS = int(os.environ.get("ENRICHMENT_INTERVAL_SECONDS", "60"))
+ENRICHMENT_BATCH_SIZE = int(os.environ.get("ENRICHMENT_BATCH_SIZE", "10"))
+ENRICHMENT_MAX_ATTEMPTS = int(os.environ.get("ENRICHMENT_MAX_ATTEMPTS", "8"))
+ENRICHMENT_BACKOFF_SECONDS = int(os.environ.get("ENRICHMENT_BACKOFF_SECONDS", "300"))
+ENRICHMENT_BACKOFF_MAX_SECONDS = int(os.environ.get("ENRICHMENT_BACKOFF_MAX_SECONDS", str(6 * 3600)))
+# How long a claimed job is hidden from other workers while it is processed
+ENRICHMENT_LEASE_SECONDS = int(os.environ.get("ENRICHMENT_LEASE_SECONDS", "900"))
+# "realtime" labels reports during ingestion, "batch" defers labelling to off-peak batches
+ENRICHMENT_LABEL_MODE = os.environ.get("ENRICHMENT_LABEL_MODE", "realtime")
+ENRICHMENT_OFFPEAK_HOURS = os.environ.get("ENRICHMENT_OFFPEAK_HOURS", "")
+ENRICHMENT_OFFPEAK_BATCH_SIZE = int(os.environ.get("ENRICHMENT_OFFPEAK_BATCH_SIZE", "500"))
+ENRICHMENT_LABEL_BATCH_SIZE = int(os.environ.get("ENRICHMENT_LABEL_BATCH_SIZE", "25"))
+ENRICHMENT_LABEL_BATCH_MAX_CHARS = int(os.environ.get("ENRICHMENT_LABEL_BATCH_MAX_CHARS", "4000"))
+
+TRANSCRIPT_PENDING = "Transcription pending."
+REASON_TRANSCRIPT = "transcript"
+REASON_LABELS = "labels"
+
+
+def _offpeak_hours() -> Optional[tuple[int, int]]:
+    if not ENRICHMENT_OFFPEAK_HOURS:
+        return None
+    start, end = ENRICHMENT_OFFPEAK_HOURS.split("-")
+    return int(start) % 24, int(end) % 24
+
+
+def is_offpeak(now: Optional[datetime] = None) -> bool:
+    hours = _offpeak_hours()
+    if hours is None:
+        return True
+    hour, (start, end) = (now or datetime.utcnow()).hour, hours
+    return start <= hour < end if start < end else hour >= start or hour < end
+
+
+def next_offpeak(now: Optional[datetime] = None) -> datetime:
+    """now, if inside the off-peak window, else when the next window starts (UTC)"""
+    now = now or datetime.utcnow()
+    if is_offpeak(now):
+        return now
+    start = now.replace(hour=_offpeak_hours()[0], minute=0, second=0, microsecond=0)
+    return start if start > now else start + timedelta(days=1)
+
+
+def batch_labels() -> bool:
+    return ENRICHMENT_LABEL_MODE == "batch"
+
+
+def enqueue(db: Session, report: BugReport, reason: str, error: Optional[str] = None,
+            not_before: Optional[datetime] = None) -> None:
+    """Queues a report for enrichment, in the caller's transaction (the report must have an id)"""
+    job = db.get(EnrichmentJob, report.id)
+    if job is None:
+        job = EnrichmentJob(report_id=report.id, tenant_id=report.tenant_id, reason=reason, attempts=0)
+        db.add(job)
+    elif reason == REASON_TRANSCRIPT:
+        job.reason = reason
+    job.next_attempt_at = not_before or datetime.utcnow()
+    job.last_error = error
+
+
+def forget_reports(db: Session, report_ids: list[int]) -> None:
+    """Removes deleted reports' jobs, inside the caller's transaction"""
+    if report_ids:
+        db.query(EnrichmentJob).filter(EnrichmentJob.report_id.in_(report_ids)).delete(synchronize_session=False)
+
+
+def _backoff(attempts: int) -> timedelta:
+    return timedelta(seconds=min(ENRICHMENT_BACKOFF_MAX_SECONDS, ENRICHMENT_BACKOFF_SECONDS * 2 ** (attempts - 1)))
+
+
+def _claim(db: Session, limit: int) -> list[int]:
+    """
+    Report ids of due jobs this worker now owns for ENRICHMENT_LEASE_SECONDS, in priority
+    order (priority.py): by class, with older reports aging ahead of newer ones
+    """
+    now = datetime.utcnow()
+    due = db.query(EnrichmentJob.report_id, EnrichmentJob.next_attempt_at,
+                   BugReport.struggle_score, BugReport.created_at, Tenant.tier) \
+        .outerjoin(BugReport, BugReport.id == EnrichmentJob.report_id) \
+        .join(Tenant, Tenant.id == EnrichmentJob.tenant_id) \
+        .filter(EnrichmentJob.next_attempt_at <= now) \
+        .order_by(EnrichmentJob.next_attempt_at).limit(limit * 4).all()
+    due.sort(key=lambda row: (row.created_at or now).timestamp()
+             - priority.head_start(priority.classify(row.struggle_score, row.tier)))
+    claimed = []
+    for report_id, next_attempt_at, *_ in due[:limit]:
+        updated = db.query(EnrichmentJob).filter(
+            EnrichmentJob.report_id == report_id, EnrichmentJob.next_attempt_at == next_attempt_at,
+        ).update({"next_attempt_at": now + timedelta(seconds=ENRICHMENT_LEASE_SECONDS)}, synchronize_session=False)
+        if updated:
+            claimed.append(report_id)
+    db.commit()
+    return claimed
+
+
+def _priority(db: Session, report: BugReport) -> str:
+    tenant = db.get(Tenant, report.tenant_id)
+    return priority.classify(report.struggle_score, tenant.tier if tenant else None)
+
+
+# The database steps below are synchronous: callers run them with asyncio.to_thread, each in
+# a short session of its own, so no pooled connection is held while Gemini answers.
+
+def _load(report_id: int) -> Optional[tuple[str, BugReport, str]]:
+    """(job reason, detached report, priority), or None after dropping the job of a deleted report"""
+    with SessionLocal() as db:
+        job = db.get(EnrichmentJob, report_id)
+        report = db.get(BugReport, report_id)
+        if job is None or report is None:
+            if job is not None:
+                db.delete(job)
+                db.commit()
+            return None
+        return job.reason, report, _priority(db, report)
+
+
+def _save_transcript(report_id: int, transcript: str) -> int:
+    """Stores the transcript and leaves the job to labelling; returns the tenant id"""
+    with SessionLocal() as db:
+        report = db.get(BugReport, report_id)
+        if report.description in (None, TRANSCRIPT_PENDING):
+            report.description = transcript
+        db.get(EnrichmentJob, report_id).reason = REASON_LABELS
+        bump_tenant_version(db, report.tenant_id)
+        db.commit()
+        return report.tenant_id
+
+
+def _store_labels(report_id: int, raw_labels: Optional[str]) -> Optional[int]:
+    """Stores the new labels and drops the job; returns the tenant id, None if the report is gone"""
+    with SessionLocal() as db:
+        report = db.get(BugReport, report_id)
+        job = db.get(EnrichmentJob, report_id)
+        if job is not None:
+            db.delete(job)
+        if report is None:
+            db.commit()
+            return None
+        if raw_labels:
+            labels.set_report_labels(db, report, raw_labels.split(","))
+        similarity.forget_reports(db, [report.id])
+        bump_tenant_version(db, report.tenant_id)
+        db.commit()
+        return report.tenant_id
+
+
+def _load_batch(report_ids: list[int]) -> tuple[dict[int, str], str]:
+    """{report id: text} of the reports still there, and the priority of the most urgent one"""
+    with SessionLocal() as db:
+        reports = db.query(BugReport).filter(BugReport.id.in_(report_ids)).all()
+        prio = min((_priority(db, r) for r in reports), key=priority.PRIORITIES.index, default=priority.LOW)
+        return {r.id: r.description for r in reports}, prio
+
+
+async def _enrich(report_id: int) -> None:
+    from transcriber import get_ai_engine, get_transcriber
+    from video_utils import read_video_bytes
+
+    loaded = await asyncio.to_thread(_load, report_id)
+    if loaded is None:
+        return
+    reason, report, prio = loaded
+    text = report.description
+    if reason == REASON_TRANSCRIPT:
+        video_bytes = await asyncio.to_thread(read_video_bytes, report.video_url) if report.video_url else None
+        if not video_bytes:
+            raise RuntimeError("video could not be read back from storage")
+        content_type = mimetypes.guess_type(report.video_url)[0] or "video/webm"
+        async with priority.ai.slot(prio):
+            transcript = await get_transcriber().transcribe_bytes(video_bytes, content_type, os.path.basename(report.video_url))
+        # Committed before labelling, so a label failure does not cost another transcription
+        tenant_id = await asyncio.to_thread(_save_transcript, report_id, transcript)
+        publish_event(REPORT_UPDATED, tenant_id, report_id)
+        text = transcript
+
+    raw_labels = None
+    if text:
+        async with priority.ai.slot(prio):
+            raw_labels = await get_ai_engine().generate_labels(text)
+    await _finish(report_id, raw_labels, text)
+
+
+async def _finish(report_id: int, raw_labels: Optional[str], text: Optional[str]) -> None:
+    """Stores the new labels, drops the job and rebuilds the report's similarity signature"""
+    tenant_id = await asyncio.to_thread(_store_labels, report_id, raw_labels)
+    if tenant_id is not None:
+        publish_event(REPORT_UPDATED, tenant_id, report_id)
+        await asyncio.to_thread(similarity.index_report, report_id, text)
+
+
+async def _enrich_label_batch(report_ids: list[int]) -> list[int]:
+    """Labels reports with one request; returns the ids the answer left out"""
+    from transcriber import get_ai_engine
+
+    texts, prio = await asyncio.to_thread(_load_batch, report_ids)
+    answers = {}
+    if texts:
+        # The batch waits for capacity at the priority of its most urgent report
+        async with priority.ai.slot(prio):
+            answers = await get_ai_engine().generate_labels_batch(texts)
+    missing = []
+    for report_id in report_ids:
+        if report_id not in texts:
+            await _finish(report_id, None, None)  # Deleted meanwhile: only drops the job
+        elif report_id in answers:
+            await _finish(report_id, answers[report_id], texts[report_id])
+        else:
+            missing.append(report_id)
+    return missing
+
+
+def _fail(report_id: int, e: Exception) -> None:
+    """Schedules a failed job's next attempt, or parks it after ENRICHMENT_MAX_ATTEMPTS"""
+    with SessionLocal() as db:
+        job = db.get(EnrichmentJob, report_id)
+        if job is None:
+            return
+        job.attempts += 1
+        job.last_error = f"{type(e).__name__}: {e}"[:500]
+        if job.attempts >= ENRICHMENT_MAX_ATTEMPTS:
+            job.next_attempt_at = None
+            logger.error(f"Enrichment of report {report_id} gave up after {job.attempts} attempts: {e}")
+        else:
+            job.next_attempt_at = datetime.utcnow() + _backoff(job.attempts)
+            logger.warning(f"Enrichment of report {report_id} failed (attempt {job.attempts}): {e}")
+        db.commit()
+
+
+def _split_batchable(db: Session, report_ids: list[int]) -> tuple[list[list[int]], list[int]]:
+    """Label-only jobs with short enough texts, in request-sized chunks, and the other jobs"""
+    rows = db.query(EnrichmentJob.report_id, EnrichmentJob.reason, BugReport.description) \
+        .outerjoin(BugReport, BugReport.id == EnrichmentJob.report_id) \
+        .filter(EnrichmentJob.report_id.in_(report_ids)).all()
+    batchable = {
+        report_id for report_id, reason, description in rows
+        if reason == REASON_LABELS and description and len(description) <= ENRICHMENT_LABEL_BATCH_MAX_CHARS
+    }
+    ordered = [i for i in report_ids if i in batchable]
+    chunks = [ordered[i:i + ENRICHMENT_LABEL_BATCH_SIZE] for i in range(0, len(ordered), ENRICHMENT_LABEL_BATCH_SIZE)]
+    return chunks, [i for i in report_ids if i not in batchable]
+
+
+def _claim_run(limit: int) -> tuple[list[list[int]], list[int]]:
+    with SessionLocal() as db:
+        return _split_batchable(db, _claim(db, limit))
+
+
+async def run_pending(limit: Optional[int] = None) -> dict:
+    """
+    Processes due jobs, label-only ones in batched requests; returns {"enriched": n, "failed": n}.
+    limit defaults to ENRICHMENT_OFFPEAK_BATCH_SIZE in the off-peak window, else ENRICHMENT_BATCH_SIZE.
+    """
+    results = {"enriched": 0, "failed": 0}
+    if resilience.gemini.breaker.is_open:
+        logger.info("Enrichment: Gemini circuit is open, skipping this run")
+        return results
+    if limit is None:
+        limit = ENRICHMENT_OFFPEAK_BATCH_SIZE if ENRICHMENT_OFFPEAK_HOURS and is_offpeak() else ENRICHMENT_BATCH_SIZE
+
+    chunks, singles = await asyncio.to_thread(_claim_run, limit)
+    for chunk in chunks:
+        try:
+            missing = await _enrich_label_batch(chunk)
+        except Exception as e:
+            for report_id in chunk:
+                await asyncio.to_thread(_fail, report_id, e)
+            results["failed"] += len(chunk)
+            if isinstance(e, resilience.CircuitOpenError):
+                return results
+            continue
+        for report_id in missing:
+            await asyncio.to_thread(_fail, report_id, RuntimeError("report left out of the batched answer"))
+        results["enriched"] += len(chunk) - len(missing)
+        results["failed"] += len(missing)
+
+    for report_id in singles:
+        try:
+            await _enrich(report_id)
+            results["enriched"] += 1
+        except Exception as e:
+            await asyncio.to_thread(_fail, report_id, e)
+            results["failed"] += 1
+            if isinstance(e, resilience.CircuitOpenError):
+                break
+    if results["enriched"]:
+        logger.info(f"Enrichment: enriched {results['enriched']} reports")
+    return results
+
+
+def retry_failed(db: Session) -> int:
+    """Requeues parked jobs now, with a fresh attempt count; returns how many"""
+    count = db.query(EnrichmentJob).filter(EnrichmentJob.next_attempt_at.is_(None)) \
+        .update({"next_attempt_at": datetime.utcnow(), "attempts": 0}, synchronize_session=False)
+    db.commit()
+    return count
+
+
+async def run_scheduler(interval: int = ENRICHMENT_INTERVAL_SECONDS) -> None:
+    """Background loop started by the app lifespan"""
+    while True:
+        await asyncio.sleep(interval)
+        try:
+            await run_pending()
+        except Exception as e:
+            logger.error(f"Enrichment run failed: {e}", exc_info=True)
@@ -0,0 +1,235 @@
+"""
+Per-tenant live event feed for the dashboard.
+
+Events are fanned out in-process to subscribers, each with a bounded buffer.
+A subscriber whose buffer fills up is evicted (its stream ends with an "evicted"
+event and the client reconnects and refetches) instead of slowing down publishers.
+
+With several worker processes set EVENT_BROKER_URL=redis://... so every worker
+publishes to, and fans out from, a shared Redis channel. Publishing only queues the event
+for a publisher thread, so a slow or unreachable Redis never stalls a request; if the queue
+fills up meanwhile, events are dropped (viewers refetch on reconnect anyway).
+"""
+
+import asyncio
+import json
+import logging
+import os
+import queue
+import threading
+import time
+from typing import Optional, Set
+
+logger = logging.getLogger(__name__)
+
+EVENT_BROKER_URL = os.environ.get("EVENT_BROKER_URL", "")
+EVENT_BUFFER_SIZE = int(os.environ.get("EVENT_BUFFER_SIZE", "100"))
+EVENT_CHANNEL = "trapalert:events"
+EVENT_BROKER_TIMEOUT_SECONDS = float(os.environ.get("EVENT_BROKER_TIMEOUT_SECONDS", "1"))
+EVENT_PUBLISH_QUEUE_SIZE = int(os.environ.get("EVENT_PUBLISH_QUEUE_SIZE", "1000"))
+
+# Event types
+REPORT_CREATED = "report.created"
+REPORT_STATUS_CHANGED = "report.status_changed"
+REPORT_UPDATED = "report.updated"
+REPORT_DELETED = "report.deleted"
+REPORT_PROCESSING_COMPLETE = "report.processing_complete"
+REPORTS_ARCHIVED = "reports.archived"
+REPORT_DUPLICATES_FOUND = "report.duplicates_found"
+EVICTED = "evicted"
+
+
+class Subscriber:
+    """One connected viewer. tenant_id None means all tenants (super admins)."""
+
+    def __init__(self, tenant_id: Optional[int], buffer_size: int = EVENT_BUFFER_SIZE):
+        self.tenant_id = tenant_id
+        self.queue: asyncio.Queue = asyncio.Queue(maxsize=buffer_size)
+        self.evicted = False
+
+    def wants(self, event: dict) -> bool:
+        return self.tenant_id is None or self.tenant_id == event.get("tenant_id")
+
+    def offer(self, event: dict) -> bool:
+        """Enqueue without waiting; returns False if the buffer is full"""
+        try:
+            self.queue.put_nowait(event)
+            return True
+        except asyncio.QueueFull:
+            return False
+
+    def evict(self) -> None:
+        # Drop the backlog so the eviction notice is the next thing the consumer sees
+        self.evicted = True
+        while not self.queue.empty():
+            self.queue.get_nowait()
+        self.queue.put_nowait({"type": EVICTED})
+
+
+class EventHub:
+    """In-process fan-out. All methods run on the event loop thread."""
+
+    def __init__(self):
+        self.subscribers: Set[Subscriber] = set()
+        self.loop: Optional[asyncio.AbstractEventLoop] = None
+
+    def subscribe(self, tenant_id: Optional[int]) -> Subscriber:
+        self.loop = asyncio.get_running_loop()
+        subscriber = Subscriber(tenant_id)
+        self.subscribers.add(subscriber)
+        return subscriber
+
+    def unsubscribe(self, subscriber: Subscriber) -> None:
+        self.subscribers.discard(subscriber)
+
+    def close_all(self) -> None:
+        """End every stream; clients reconnect (to another worker when this one is shutting down)"""
+        for subscriber in list(self.subscribers):
+            self.unsubscribe(subscriber)
+            subscriber.evict()
+
+    def dispatch(self, event: dict) -> None:
+        for subscriber in list(self.subscribers):
+            if subscriber.wants(event) and not subscriber.offer(event):
+                logger.warning(f"Evicting slow event subscriber (tenant {subscriber.tenant_id})")
+                self.unsubscribe(subscriber)
+                subscriber.evict()
+
+
+class InProcessBroker:
+    """Delivers events to subscribers of this process only (single worker deployments)"""
+
+    def __init__(self, hub: EventHub):
+        self.hub = hub
+
+    def publish(self, event: dict) -> None:
+        loop = self.hub.loop
+        if loop is None or loop.is_closed():
+            return  # Nobody has subscribed in this process yet
+        try:
+            running = asyncio.get_running_loop()
+        except RuntimeError:
+            running = None
+        if running is loop:
+            self.hub.dispatch(event)
+        else:
+            loop.call_soon_threadsafe(self.hub.dispatch, event)
+
+    def start(self) -> None:
+        pass
+
+    def stop(self) -> None:
+        pass
+
+
+class RedisBroker:
+    """
+    Publishes to a Redis channel and feeds every message received on it into the local hub,
+    so subscribers on any worker see events published by any other worker.
+    """
+
+    def __init__(self, hub: EventHub, url: str):
+        import redis
+
+        self.hub = hub
+        self.url = url
+        self.client = redis.Redis.from_url(url, socket_timeout=EVENT_BROKER_TIMEOUT_SECONDS,
+                                           socket_connect_timeout=EVENT_BROKER_TIMEOUT_SECONDS)
+        self._outbox: queue.Queue = queue.Queue(maxsize=EVENT_PUBLISH_QUEUE_SIZE)
+        self._publisher: Optional[threading.Thread] = None
+        self._listener: Optional[asyncio.Task] = None
+        self._lock = threading.Lock()
+
+    def publish(self, event: dict) -> None:
+        """Queue the event for the publisher thread; never waits on Redis"""
+        with self._lock:
+            if self._publisher is None or not self._publisher.is_alive():
+                self._publisher = threading.Thread(target=self._publish_loop, name="event-publisher", daemon=True)
+                self._publisher.start()
+        try:
+            self._outbox.put_nowait(json.dumps(event))
+        except queue.Full:
+            logger.error(f"Redis event publishing is behind, dropped a {event['type']} event")
+
+    def _publish_loop(self) -> None:
+        while True:
+            message = self._outbox.get()
+            if message is None:
+                return
+            try:
+                self.client.publish(EVENT_CHANNEL, message)
+            except Exception as e:
+                logger.error(f"Failed to publish event to Redis: {e}")
+
+    def start(self) -> None:
+        """Start the channel listener on the running loop (idempotent)"""
+        with self._lock:
+            if self._listener is None or self._listener.done():
+                self._listener = asyncio.get_running_loop().create_task(self._listen())
+
+    def stop(self) -> None:
+        with self._lock:
+            if self._listener is not None:
+                self._listener.cancel()
+                self._listener = None
+            publisher, self._publisher = self._publisher, None
+        if publisher is not None:
+            # Events queued before shutdown still go out, within the timeout
+            try:
+                self._outbox.put(None, timeout=EVENT_BROKER_TIMEOUT_SECONDS)
+            except queue.Full:
+                pass
+            publisher.join(timeout=EVENT_BROKER_TIMEOUT_SECONDS * 2)
+        self.client.close()
+
+    async def _listen(self) -> None:
+        import redis.asyncio as aioredis
+
+        while True:
+            try:
+                client = aioredis.Redis.from_url(self.url, socket_connect_timeout=EVENT_BROKER_TIMEOUT_SECONDS)
+                async with client.pubsub() as pubsub:
+                    await pubsub.subscribe(EVENT_CHANNEL)
+                    async for message in pubsub.listen():
+                        if message.get("type") == "message":
+                            self.hub.dispatch(json.loads(message["data"]))
+            except asyncio.CancelledError:
+                raise
+            except Exception as e:
+                logger.error(f"Redis event listener failed, reconnecting: {e}")
+                await asyncio.sleep(1)
+
+
+hub = EventHub()
+broker = RedisBroker(hub, EVENT_BROKER_URL) if EVENT_BROKER_URL else InProcessBroker(hub)
+
+
+def publish_event(event_type: str, tenant_id: int, report_id: Optional[int] = None, **data) -> None:
+    """
+    Publish a report event. Safe to call from request handlers, worker threads and background tasks;
+    it never blocks on slow subscribers.
+    """
+    event = {"type": event_type, "tenant_id": tenant_id, "report_id": report_id, "ts": time.time(), **data}
+    broker.publish(event)
+
+
+def subscribe(tenant_id: Optional[int]) -> Subscriber:
+    broker.start()
+    return hub.subscribe(tenant_id)
+
+
+def unsubscribe(subscriber: Subscriber) -> None:
+    hub.unsubscribe(subscriber)
+
+
+def close_all_subscribers() -> None:
+    """Evict every subscriber from any thread (used when the worker starts draining)"""
+    loop = hub.loop
+    if loop is None or loop.is_closed():
+        return
+    loop.call_soon_threadsafe(hub.close_all)
+
+
+def shutdown() -> None:
+    hub.close_all()
+    broker.stop()
@@ -0,0 +1,214 @@
+import csv
+import enum
+import importlib.util
+import io
+import json
+import logging
+from datetime import datetime
+from typing import Iterable, Iterator, List, Optional
+
+from models import BugReport
+
+logger = logging.getLogger(__name__)
+
+# Rows fetched per round trip from the server-side cursor
+EXPORT_BATCH_SIZE = 1000
+
+# Columns that can be selected for export, in output order.
+# dom_snapshot is deliberately last and only included on request (it is by far the largest field).
+EXPORT_COLUMNS = {
+    "id": BugReport.id,
+    "tenant_id": BugReport.tenant_id,
+    "description": BugReport.description,
+    "label": BugReport.label,
+    "struggle_score": BugReport.struggle_score,
+    "metadata_json": BugReport.metadata_json,
+    "status": BugReport.status,
+    "synced_to_integration": BugReport.synced_to_integration,
+    "external_ticket_id": BugReport.external_ticket_id,
+    "video_url": BugReport.video_url,
+    "thumbnail_url": BugReport.thumbnail_url,
+    "preview_url": BugReport.preview_url,
+    "created_at": BugReport.created_at,
+    "dom_snapshot": BugReport.dom_snapshot,
+}
+
+DEFAULT_EXPORT_COLUMNS = [name for name in EXPORT_COLUMNS if name != "dom_snapshot"]
+
+
+class ExportFormat(str, enum.Enum):
+    NDJSON = "ndjson"
+    CSV = "csv"
+    PARQUET = "parquet"
+
+
+EXPORT_MEDIA_TYPES = {
+    ExportFormat.NDJSON: "application/x-ndjson",
+    ExportFormat.CSV: "text/csv",
+    ExportFormat.PARQUET: "application/vnd.apache.parquet",
+}
+
+
+def resolve_export_columns(columns: Optional[str], include_dom: bool) -> List[str]:
+    """
+    Turns the comma-separated `columns` query value into an ordered list of column names.
+    Raises ValueError for unknown columns.
+    """
+    if columns:
+        selected = [c.strip() for c in columns.split(",") if c.strip()]
+        unknown = [c for c in selected if c not in EXPORT_COLUMNS]
+        if unknown:
+            raise ValueError(f"Unknown export columns: {', '.join(unknown)}")
+    else:
+        selected = list(DEFAULT_EXPORT_COLUMNS)
+
+    if include_dom and "dom_snapshot" not in selected:
+        selected.append("dom_snapshot")
+    # Keep a stable output order and drop duplicates
+    return [name for name in EXPORT_COLUMNS if name in selected]
+
+
+def stream_export_rows(query, columns: List[str]) -> Iterator[tuple]:
+    """
+    Streams plain column tuples for an already-filtered BugReport query.
+    Selecting columns instead of entities keeps rows out of the session identity map,
+    and yield_per uses a server-side cursor where the driver supports it,
+    so memory stays flat regardless of how many reports are exported.
+    """
+    projected = query.with_entities(*[EXPORT_COLUMNS[c] for c in columns]).order_by(BugReport.id)
+    yield from projected.yield_per(EXPORT_BATCH_SIZE)
+
+
+def ensure_format_supported(fmt: ExportFormat) -> None:
+    """Fails fast, before any bytes are streamed, if the format's optional dependency is missing"""
+    if fmt == ExportFormat.PARQUET and importlib.util.find_spec("pyarrow") is None:
+        raise RuntimeError("Parquet export requires the 'pyarrow' package")
+
+
+def _plain_value(value):
+    if isinstance(value, enum.Enum):
+        return value.value
+    if isinstance(value, datetime):
+        return value.isoformat()
+    return value
+
+
+def iter_ndjson(rows: Iterable[tuple], columns: List[str]) -> Iterator[bytes]:
+    """Encodes rows as newline-delimited JSON, one chunk per batch"""
+    buffer = []
+    for row in rows:
+        record = {name: _plain_value(value) for name, value in zip(columns, row)}
+        buffer.append(json.dumps(record, ensure_ascii=False))
+        if len(buffer) >= EXPORT_BATCH_SIZE:
+            yield ("\n".join(buffer) + "\n").encode("utf-8")
+            buffer = []
+    if buffer:
+        yield ("\n".join(buffer) + "\n").encode("utf-8")
+
+
+def iter_csv(rows: Iterable[tuple], columns: List[str]) -> Iterator[bytes]:
+    """Encodes rows as CSV with a header line; list columns are written as JSON"""
+    out = io.StringIO()
+    writer = csv.writer(out)
+    writer.writerow(columns)
+    count = 0
+    for row in rows:
+        writer.writerow([
+            json.dumps(value) if isinstance(value, (list, dict)) else _plain_value(value)
+            for value in row
+        ])
+        count += 1
+        if count % EXPORT_BATCH_SIZE == 0:
+            yield out.getvalue().encode("utf-8")
+            out.seek(0)
+            out.truncate(0)
+    if out.tell():
+        yield out.getvalue().encode("utf-8")
+
+
+class _ChunkSink(io.RawIOBase):
+    """Write-only file object that hands written bytes back to the generator"""
+
+    def __init__(self):
+        self.chunks = []
+
+    def writable(self):
+        return True
+
+    def write(self, data):
+        self.chunks.append(bytes(data))
+        return len(data)
+
+    def drain(self) -> bytes:
+        data = b"".join(self.chunks)
+        self.chunks = []
+        return data
+
+
+def _parquet_schema(pa, columns: List[str]):
+    types = {
+        "id": pa.int64(),
+        "tenant_id": pa.int64(),
+        "description": pa.string(),
+        "label": pa.list_(pa.string()),
+        "struggle_score": pa.float64(),
+        "metadata_json": pa.string(),
+        "status": pa.string(),
+        "synced_to_integration": pa.bool_(),
+        "external_ticket_id": pa.string(),
+        "video_url": pa.string(),
+        "thumbnail_url": pa.string(),
+        "preview_url": pa.string(),
+        "created_at": pa.timestamp("us"),
+        "dom_snapshot": pa.string(),
+    }
+    return pa.schema([(name, types[name]) for name in columns])
+
+
+def iter_parquet(rows: Iterable[tuple], columns: List[str]) -> Iterator[bytes]:
+    """
+    Encodes rows as Parquet, writing one row group per batch.
+    Requires pyarrow; raises RuntimeError if it is not installed.
+    """
+    try:
+        import pyarrow as pa
+        import pyarrow.parquet as pq
+    except ImportError:
+        raise RuntimeError("Parquet export requires the 'pyarrow' package")
+
+    schema = _parquet_schema(pa, columns)
+    sink = _ChunkSink()
+    writer = pq.ParquetWriter(sink, schema, compression="zstd")
+
+    def flush(batch):
+        arrays = [
+            [v.value if isinstance(v, enum.Enum) else v for v in values]
+            for values in zip(*batch)
+        ]
+        if "label" in columns:
+            # Legacy rows may hold the label list as a JSON-encoded string
+            idx = columns.index("label")
+            arrays[idx] = [json.loads(v) if isinstance(v, str) else v for v in arrays[idx]]
+        writer.write_table(pa.Table.from_arrays(
+            [pa.array(values, type=field.type) for values, field in zip(arrays, schema)],
+            schema=schema,
+        ))
+
+    batch = []
+    for row in rows:
+        batch.append(row)
+        if len(batch) >= EXPORT_BATCH_SIZE:
+            flush(batch)
+            batch = []
+            yield sink.drain()
+    if batch:
+        flush(batch)
+    writer.close()
+    yield sink.drain()
+
+
+EXPORT_ENCODERS = {
+    ExportFormat.NDJSON: iter_ndjson,
+    ExportFormat.CSV: iter_csv,
+    ExportFormat.PARQUET: iter_parquet,
+}
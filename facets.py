@@ -0,0 +1,133 @@
+"""
+Counts for the report list: the total behind pagination and the optional facets
+(per status, per label, per created_at date bucket) over the whole filtered set.
+
+Status and date facets come from a single GROUP BY (status, bucket) pass, which also gives
+the total, so asking for facets never costs an extra count(). Label facets are one grouped
+lookup on report_labels.
+
+Results are cached per worker, keyed on the tenant change version (caching.current_version),
+the caller's visibility scope and the filter. Any write to the tenant bumps its version, so
+stale entries are never served and simply age out of the LRU.
+"""
+
+import os
+import threading
+from collections import OrderedDict
+from datetime import date, datetime
+from typing import Callable, Optional
+
+from sqlalchemy import func
+from sqlalchemy.orm import Query, Session
+
+import labels
+from caching import current_version
+from metrics import facet_cache
+from models import BugReport, User
+from schemas import FacetInterval, ReportFacet
+
+FACET_CACHE_SIZE = int(os.environ.get("FACET_CACHE_SIZE", "2048"))
+
+
+class _LRUCache:
+    def __init__(self, max_size: int):
+        self.max_size = max_size
+        self._entries: OrderedDict = OrderedDict()
+        self._lock = threading.Lock()
+
+    def get_or_compute(self, key, compute: Callable[[], dict]) -> dict:
+        with self._lock:
+            if key in self._entries:
+                self._entries.move_to_end(key)
+                facet_cache.inc(result="hit")
+                return self._entries[key]
+        facet_cache.inc(result="miss")
+        value = compute()
+        with self._lock:
+            self._entries[key] = value
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.max_size:
+                self._entries.popitem(last=False)
+        return value
+
+    def clear(self) -> None:
+        with self._lock:
+            self._entries.clear()
+
+
+cache = _LRUCache(FACET_CACHE_SIZE)
+
+
+def _date_bucket(db: Session, interval: FacetInterval):
+    """First day of the created_at day/week (ISO, Monday)/month, in UTC"""
+    if db.get_bind().dialect.name == "postgresql":
+        return func.date_trunc(interval.value, BugReport.created_at)
+    if interval == FacetInterval.MONTH:
+        return func.strftime("%Y-%m-01", BugReport.created_at)
+    if interval == FacetInterval.WEEK:
+        return func.date(BugReport.created_at, "weekday 0", "-6 days")
+    return func.date(BugReport.created_at)
+
+
+def _bucket_key(value) -> Optional[str]:
+    if isinstance(value, datetime):
+        return value.date().isoformat()
+    if isinstance(value, date):
+        return value.isoformat()
+    return value
+
+
+def _compute(db: Session, query: Query, facets: set, interval: FacetInterval) -> dict:
+    query = query.order_by(None)
+    result = {"total": None, "facets": {}}
+
+    if ReportFacet.STATUS in facets or ReportFacet.DATE in facets:
+        columns = [BugReport.status]
+        if ReportFacet.DATE in facets:
+            columns.append(_date_bucket(db, interval).label("bucket"))
+        rows = query.with_entities(*columns, func.count()).group_by(*columns).all()
+
+        by_status, by_date = {}, {}
+        for row in rows:
+            status, count = row[0], row[-1]
+            key = status.value if status is not None else "NONE"
+            by_status[key] = by_status.get(key, 0) + count
+            if ReportFacet.DATE in facets:
+                bucket = _bucket_key(row[1])
+                by_date[bucket] = by_date.get(bucket, 0) + count
+        result["total"] = sum(by_status.values())
+        if ReportFacet.STATUS in facets:
+            result["facets"][ReportFacet.STATUS.value] = by_status
+        if ReportFacet.DATE in facets:
+            result["facets"][ReportFacet.DATE.value] = dict(sorted(by_date.items(), key=lambda item: item[0] or ""))
+
+    if ReportFacet.LABEL in facets:
+        result["facets"][ReportFacet.LABEL.value] = labels.label_counts(db, query.with_entities(BugReport.id).statement)
+
+    if result["total"] is None:
+        result["total"] = query.count()
+    return result
+
+
+def report_counts(
+    db: Session,
+    current_user: User,
+    query: Query,
+    filters: dict,
+    facets: list[ReportFacet],
+    interval: FacetInterval = FacetInterval.DAY,
+) -> dict:
+    """
+    {"total": n, "facets": {facet: {value: count}}} for a filtered report query.
+    `filters` must hold every parameter the query was built from: it is part of the cache key.
+    """
+    requested = set(facets)
+    key = (
+        current_version(db, current_user, filters.get("tenant_id")),
+        current_user.role.value,
+        current_user.tenant_id,
+        tuple(sorted((name, str(value)) for name, value in filters.items() if value not in (None, []))),
+        tuple(sorted(facet.value for facet in requested)),
+        interval.value if ReportFacet.DATE in requested else None,
+    )
+    return cache.get_or_compute(key, lambda: _compute(db, query, requested, interval))
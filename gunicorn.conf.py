@@ -0,0 +1,76 @@
+"""
+Production launch profile: gunicorn supervising uvicorn worker processes.
+
+    gunicorn -c gunicorn.conf.py main:app
+
+Every worker runs the FastAPI lifespan on its own (DB pool, storage and AI clients are
+created after the fork). On SIGTERM gunicorn forwards the signal to the workers, which
+stop accepting connections, drain in-flight uploads and exit within GRACEFUL_TIMEOUT.
+
+PRELOAD_APP=1 imports the app (and the heavy SDKs) once in the master and forks workers
+from it: faster worker (re)starts and shared memory pages, at the cost of needing a full
+restart instead of a HUP to pick up code changes.
+MIGRATE_ON_START=1 runs `manage.py migrate` once in the master before workers start.
+
+With more than one worker, set EVENT_BROKER_URL: the default in-process broker only
+delivers live events to viewers connected to the worker that published them.
+"""
+
+import multiprocessing
+import os
+
+
+def _default_workers() -> int:
+    # The API is mostly I/O bound (Gemini, storage, DB), so go a little above the core count
+    return multiprocessing.cpu_count() * 2 + 1
+
+
+bind = os.environ.get("BIND", f"0.0.0.0:{os.environ.get('PORT', '8000')}")
+workers = int(os.environ.get("WEB_CONCURRENCY", _default_workers()))
+worker_class = "uvicorn.workers.UvicornWorker"
+
+# Uploads and transcription can legitimately take a while
+timeout = int(os.environ.get("WORKER_TIMEOUT", "120"))
+# Must exceed SHUTDOWN_DRAIN_SECONDS so the lifespan can finish draining before SIGKILL
+graceful_timeout = int(os.environ.get("GRACEFUL_TIMEOUT", "30"))
+keepalive = int(os.environ.get("KEEPALIVE", "5"))
+
+# Recycle workers periodically to bound memory growth; jitter avoids restarting them all at once
+max_requests = int(os.environ.get("MAX_REQUESTS", "2000"))
+max_requests_jitter = int(os.environ.get("MAX_REQUESTS_JITTER", "200"))
+
+# Heartbeat files on tmpfs, so a slow disk can't make workers look hung
+worker_tmp_dir = "/dev/shm" if os.path.isdir("/dev/shm") else None
+
+accesslog = os.environ.get("ACCESS_LOG", "-")
+forwarded_allow_ips = os.environ.get("FORWARDED_ALLOW_IPS", "127.0.0.1")
+
+preload_app = os.environ.get("PRELOAD_APP", "0") == "1"
+MIGRATE_ON_START = os.environ.get("MIGRATE_ON_START", "0") == "1"
+
+
+def on_starting(server):
+    if workers > 1 and not os.environ.get("EVENT_BROKER_URL"):
+        server.log.error(f"{workers} workers but EVENT_BROKER_URL is not set: live report events "
+                         "(dashboard SSE and WebSocket feeds) will only reach viewers connected to the "
+                         "publishing worker. Set EVENT_BROKER_URL=redis://... or WEB_CONCURRENCY=1.")
+    if MIGRATE_ON_START:
+        from db import init_db
+
+        init_db()
+
+
+def when_ready(server):
+    if preload_app:
+        # Import (but don't instantiate) the SDKs the app loads lazily, so forked workers inherit them
+        import google.genai.types  # noqa: F401
+        import supabase  # noqa: F401
+
+
+def post_fork(server, worker):
+    if preload_app or MIGRATE_ON_START:
+        # Never share pooled connections opened in the master with the children
+        from db import engine, replicas
+
+        engine.dispose(close=False)
+        replicas.dispose(close=False)
@@ -0,0 +1,296 @@
+"""
+HTTP compression, both ways.
+
+Responses: CompressionMiddleware negotiates Accept-Encoding (zstd, br, gzip; zstd and br
+only when the zstandard / brotli packages are installed) and compresses text-like bodies.
+A complete body smaller than COMPRESSION_MIN_BYTES is sent as is. Streaming bodies (exports)
+go through an incremental compressor chunk by chunk, so they are never held in memory.
+Already-encoded, binary (video, images, Parquet) and event-stream responses are untouched.
+
+Requests: on COMPRESSED_REQUEST_PATHS (the SDK's /feedback) a body sent with
+Content-Encoding is decompressed while it is received, before form parsing, and refused
+with 413 beyond DECOMPRESSED_REQUEST_MAX_BYTES. Decoders are told how much output is still
+allowed and stop there (zlib max_length, brotli output_buffer_limit, zstd output slices of
+DECOMPRESS_SLICE_BYTES), so a small bomb never expands past the limit in memory.
+"""
+
+import logging
+import os
+import zlib
+
+from fastapi import HTTPException
+from starlette.datastructures import Headers, MutableHeaders
+from starlette.responses import PlainTextResponse
+
+try:
+    import brotli
+except ImportError:
+    brotli = None
+try:
+    import zstandard
+except ImportError:
+    zstandard = None
+
+logger = logging.getLogger(__name__)
+
+COMPRESSION_MIN_BYTES = int(os.environ.get("COMPRESSION_MIN_BYTES", "1024"))
+DECOMPRESSED_REQUEST_MAX_BYTES = int(os.environ.get("DECOMPRESSED_REQUEST_MAX_BYTES", str(256 * 1024 * 1024)))
+COMPRESSED_REQUEST_PATHS = {"/feedback"}
+DECOMPRESS_SLICE_BYTES = 64 * 1024
+
+# Fast settings: these bodies are compressed once per request, not once per deploy
+GZIP_LEVEL = 5
+BROTLI_QUALITY = 4
+ZSTD_LEVEL = 3
+
+COMPRESSIBLE_TYPES = {"application/json", "application/x-ndjson", "application/javascript", "image/svg+xml"}
+
+
+class _Gzip:
+    def __init__(self):
+        self._obj = zlib.compressobj(GZIP_LEVEL, zlib.DEFLATED, 16 + zlib.MAX_WBITS)
+
+    def compress(self, data: bytes) -> bytes:
+        return self._obj.compress(data)
+
+    def finish(self) -> bytes:
+        return self._obj.flush()
+
+
+class DecompressedTooLarge(Exception):
+    pass
+
+
+class _GunzipDecoder:
+    def __init__(self):
+        self._obj = zlib.decompressobj(16 + zlib.MAX_WBITS)
+
+    def decompress(self, data: bytes, max_length: int) -> bytes:
+        """All the output of data, or DecompressedTooLarge past max_length bytes"""
+        body = self._obj.decompress(data, max_length + 1)
+        if len(body) > max_length or self._obj.unconsumed_tail:
+            raise DecompressedTooLarge()
+        return body
+
+    def finish(self) -> bytes:
+        if not self._obj.eof:
+            raise ValueError("truncated gzip stream")
+        return self._obj.flush()
+
+
+class _Brotli:
+    def __init__(self):
+        self._obj = brotli.Compressor(quality=BROTLI_QUALITY)
+
+    def compress(self, data: bytes) -> bytes:
+        return self._obj.process(data)
+
+    def finish(self) -> bytes:
+        return self._obj.finish()
+
+
+class _BrotliDecoder:
+    def __init__(self):
+        self._obj = brotli.Decompressor()
+
+    def decompress(self, data: bytes, max_length: int) -> bytes:
+        body = self._obj.process(data, output_buffer_limit=max_length + 1)
+        # Input left over once the output buffer was full means more output was coming
+        if len(body) > max_length or not self._obj.can_accept_more_data():
+            raise DecompressedTooLarge()
+        return body
+
+    def finish(self) -> bytes:
+        if not self._obj.is_finished():
+            raise ValueError("truncated brotli stream")
+        return b""
+
+
+class _Zstd:
+    def __init__(self):
+        self._obj = zstandard.ZstdCompressor(level=ZSTD_LEVEL).compressobj()
+
+    def compress(self, data: bytes) -> bytes:
+        return self._obj.compress(data)
+
+    def finish(self) -> bytes:
+        return self._obj.flush()
+
+
+class _ZstdDecoder:
+    """
+    zstandard's decompressobj has no output limit, so output goes through a stream_writer in
+    DECOMPRESS_SLICE_BYTES slices, each checked against the limit. A truncated stream is not
+    detected here; the multipart parser then fails on the missing closing boundary.
+    """
+
+    def __init__(self):
+        self._slices: list[bytes] = []
+        self._size = 0
+        self._max_length = 0
+        self._obj = zstandard.ZstdDecompressor().stream_writer(
+            self, write_size=DECOMPRESS_SLICE_BYTES, closefd=False)
+
+    def write(self, data: bytes) -> int:
+        """Receives the output slices of stream_writer"""
+        self._size += len(data)
+        if self._size > self._max_length:
+            raise DecompressedTooLarge()
+        self._slices.append(bytes(data))
+        return len(data)
+
+    def decompress(self, data: bytes, max_length: int) -> bytes:
+        self._slices, self._size, self._max_length = [], 0, max_length
+        self._obj.write(data)
+        return b"".join(self._slices)
+
+    def finish(self) -> bytes:
+        return b""
+
+
+# Server preference order, used to break ties between equal q-values
+ENCODERS = {"gzip": _Gzip}
+DECODERS = {"gzip": _GunzipDecoder, "x-gzip": _GunzipDecoder}
+if brotli is not None:
+    ENCODERS = {"br": _Brotli, **ENCODERS}
+    DECODERS["br"] = _BrotliDecoder
+if zstandard is not None:
+    ENCODERS = {"zstd": _Zstd, **ENCODERS}
+    DECODERS["zstd"] = _ZstdDecoder
+
+
+def negotiate(accept_encoding: str):
+    """The encoding to use for an Accept-Encoding header, or None for identity"""
+    weights = {}
+    for part in accept_encoding.split(","):
+        name, _, params = part.strip().partition(";")
+        q = 1.0
+        params = params.strip()
+        if params.startswith("q="):
+            try:
+                q = float(params[2:])
+            except ValueError:
+                q = 0.0
+        weights[name.strip().lower()] = q
+
+    best, best_q = None, 0.0
+    for name in ENCODERS:
+        q = weights.get(name, weights.get("*", 0.0))
+        if q > best_q:
+            best, best_q = name, q
+    return best
+
+
+def _compressible(headers: Headers) -> bool:
+    if "content-encoding" in headers or "content-range" in headers:
+        return False
+    content_type = headers.get("content-type", "").partition(";")[0].strip().lower()
+    if content_type == "text/event-stream":
+        return False
+    return content_type.startswith("text/") or content_type.endswith("+json") or content_type in COMPRESSIBLE_TYPES
+
+
+class _CompressingSend:
+    """Wraps `send`: holds the response start until the first body chunk shows whether to compress"""
+
+    def __init__(self, send, encoding: str, minimum_size: int):
+        self._send = send
+        self.encoding = encoding
+        self.minimum_size = minimum_size
+        self.start = None
+        self.compressor = None
+        self.passthrough = False
+
+    async def __call__(self, message):
+        if self.passthrough:
+            return await self._send(message)
+
+        if message["type"] == "http.response.start":
+            headers = Headers(raw=message["headers"])
+            if message["status"] in (204, 206, 304) or not _compressible(headers):
+                self.passthrough = True
+                return await self._send(message)
+            self.start = message
+            return
+
+        if message["type"] != "http.response.body":
+            return await self._send(message)
+
+        body, more_body = message.get("body", b""), message.get("more_body", False)
+        if self.compressor is None:
+            headers = MutableHeaders(raw=self.start["headers"])
+            headers.add_vary_header("Accept-Encoding")
+            if not more_body and len(body) < self.minimum_size:
+                self.passthrough = True
+                await self._send(self.start)
+                return await self._send(message)
+
+            self.compressor = ENCODERS[self.encoding]()
+            headers["Content-Encoding"] = self.encoding
+            if more_body:
+                del headers["Content-Length"]
+            else:
+                body = self.compressor.compress(body) + self.compressor.finish()
+                headers["Content-Length"] = str(len(body))
+                await self._send(self.start)
+                return await self._send({"type": "http.response.body", "body": body})
+            await self._send(self.start)
+
+        data = self.compressor.compress(body)
+        if not more_body:
+            data += self.compressor.finish()
+        elif not data:
+            return
+        await self._send({"type": "http.response.body", "body": data, "more_body": more_body})
+
+
+def _decompressing_receive(receive, decoder):
+    received = 0
+
+    async def wrapper():
+        nonlocal received
+        message = await receive()
+        if message["type"] != "http.request":
+            return message
+        try:
+            body = decoder.decompress(message.get("body", b""), DECOMPRESSED_REQUEST_MAX_BYTES - received)
+            if not message.get("more_body", False):
+                body += decoder.finish()
+        except DecompressedTooLarge:
+            raise HTTPException(status_code=413, detail="Request body too large once decompressed")
+        except Exception as e:
+            logger.warning(f"Undecodable compressed request body: {e}")
+            raise HTTPException(status_code=400, detail="Invalid compressed request body")
+        received += len(body)
+        return {**message, "body": body}
+
+    return wrapper
+
+
+class CompressionMiddleware:
+    """ASGI middleware for compressed responses and, on COMPRESSED_REQUEST_PATHS, compressed request bodies"""
+
+    def __init__(self, app, minimum_size: int = COMPRESSION_MIN_BYTES):
+        self.app = app
+        self.minimum_size = minimum_size
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http":
+            return await self.app(scope, receive, send)
+
+        headers = Headers(scope=scope)
+        content_encoding = headers.get("content-encoding", "").strip().lower()
+        if content_encoding and content_encoding != "identity" and scope["path"] in COMPRESSED_REQUEST_PATHS:
+            if content_encoding not in DECODERS:
+                response = PlainTextResponse(f"Unsupported Content-Encoding: {content_encoding}", status_code=415,
+                                             headers={"Accept-Encoding": ", ".join(DECODERS)})
+                return await response(scope, receive, send)
+            receive = _decompressing_receive(receive, DECODERS[content_encoding]())
+            scope = dict(scope)
+            scope["headers"] = [(name, value) for name, value in scope["headers"]
+                                if name not in (b"content-encoding", b"content-length")]
+
+        encoding = negotiate(headers.get("accept-encoding", ""))
+        if encoding is None:
+            return await self.app(scope, receive, send)
+        await self.app(scope, receive, _CompressingSend(send, encoding, self.minimum_size))
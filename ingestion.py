@@ -0,0 +1,127 @@
+"""
+Turning an uploaded SDK recording into a bug report.
+
+Shared by POST /feedback (the whole video in one multipart request) and resumable uploads
+(routers/uploads.py, finalised from the spooled file).
+"""
+
+import asyncio
+import logging
+from typing import Callable, Optional
+
+from fastapi import BackgroundTasks
+from sqlalchemy.orm import Session
+
+import enrichment
+import priority
+import resilience
+from caching import bump_tenant_version
+from events import publish_event, REPORT_CREATED
+from labels import set_report_labels
+from metrics import stage_timer
+from models import BugReport, Tenant
+from transcriber import get_ai_engine, get_transcriber
+
+logger = logging.getLogger(__name__)
+
+
+class ReportDiscarded(Exception):
+    """before_commit refused the report: nothing was saved and its video was deleted"""
+
+
+async def ingest_report(
+    db: Session,
+    background_tasks: BackgroundTasks,
+    tenant: Tenant,
+    video_bytes: bytes,
+    content_type: Optional[str],
+    filename: Optional[str],
+    dom: str,
+    metadata: str,
+    description: Optional[str] = None,
+    struggle_score: Optional[float] = None,
+    before_commit: Optional[Callable[[BugReport], bool]] = None,
+) -> BugReport:
+    """
+    Stores the video, transcribes and labels it, and saves the report. Under load, the upload
+    and AI steps wait for capacity by the report's priority (priority.py).
+    before_commit runs in the report's transaction once it has an id; if it returns False the
+    report is rolled back and ReportDiscarded raised.
+    """
+    content_type = content_type or "video/webm"
+    prio = priority.classify(struggle_score, tenant.tier)
+
+    # 1. Upload to the configured storage backend (retries back off with sleeps, so not on the event loop)
+    from video_utils import upload_video
+    with stage_timer("upload", priority=prio):
+        async with priority.storage.slot(prio):
+            video_url = await asyncio.to_thread(upload_video, video_bytes, content_type)
+
+    # 2. Transcribe video (pass bytes and metadata); one attempt under a short deadline, since the SDK
+    #    is waiting: on failure the report is saved now and enriched later, with retries
+    transcript, pending, error = None, None, None
+    with stage_timer("transcribe", priority=prio):
+        try:
+            async with priority.ai.slot(prio):
+                transcript = await get_transcriber().transcribe_bytes(
+                    video_bytes, content_type, filename, deadline=resilience.GEMINI_REQUEST_DEADLINE_SECONDS)
+        except Exception as e:
+            logger.error(f"Transcription failed, report queued for enrichment: {e}")
+            pending, error = enrichment.REASON_TRANSCRIPT, f"{type(e).__name__}: {e}"
+
+    # 3. Generate labels, or in batch mode leave them to the next off-peak batch (enrichment.py)
+    raw_labels, not_before = None, None
+    if transcript and enrichment.batch_labels():
+        pending, not_before = enrichment.REASON_LABELS, enrichment.next_offpeak()
+    elif transcript:
+        with stage_timer("labels", priority=prio):
+            try:
+                async with priority.ai.slot(prio):
+                    raw_labels = await get_ai_engine().generate_labels(
+                        transcript, deadline=resilience.GEMINI_REQUEST_DEADLINE_SECONDS)
+            except Exception as e:
+                logger.error(f"Label generation failed, report queued for enrichment: {e}")
+                pending, error = enrichment.REASON_LABELS, f"{type(e).__name__}: {e}"
+    if not raw_labels:
+        raw_labels = "bug, issue"
+    label_list = raw_labels.split(",")
+
+    # 4. Create the bug report
+    new_report = BugReport(
+        tenant_id=tenant.id,
+        description=description or transcript or (enrichment.TRANSCRIPT_PENDING if pending else None),
+        struggle_score=struggle_score,
+        metadata_json=metadata, # Stored as String
+        dom_snapshot=dom,
+        video_url=video_url,
+    )
+
+    # 5. Save to DB, with labels canonicalised against the tenant's dictionary
+    with stage_timer("commit", priority=prio):
+        db.add(new_report)
+        set_report_labels(db, new_report, label_list)
+        if pending:
+            enrichment.enqueue(db, new_report, pending, error, not_before=not_before)
+        bump_tenant_version(db, tenant.id)
+        if before_commit and not before_commit(new_report):
+            db.rollback()
+            from video_utils import delete_stored_media
+            await asyncio.to_thread(delete_stored_media, [video_url])
+            raise ReportDiscarded()
+        db.commit()
+        db.refresh(new_report)
+    publish_event(REPORT_CREATED, tenant.id, new_report.id, status=new_report.status.value)
+
+    # 6. Poster frame and preview strip are generated off the request path
+    if video_url:
+        from previews import generate_report_previews
+        background_tasks.add_task(generate_report_previews, new_report.id, video_url, video_bytes, prio)
+
+    # 7. Link likely duplicates (similarity.py), also off the request path; without a
+    #    transcript this waits for enrichment
+    if pending != enrichment.REASON_TRANSCRIPT:
+        from similarity import index_report
+        background_tasks.add_task(index_report, new_report.id, transcript)
+
+    logger.info(f"Feedback received and saved: Report ID {new_report.id} for Tenant {tenant.name}")
+    return new_report
@@ -0,0 +1,115 @@
+"""
+Normalised report labels.
+
+Gemini (and dashboard users) produce free-form labels: "UI", "ui " and "user interface"
+should all be the same label. Labels are canonicalised by normalize_label(), stored once
+per tenant in `labels`, and linked to reports through `report_labels`, so filtering and
+counting by label are index lookups instead of scans of the bug_reports.label JSON.
+bug_reports.label keeps the canonical names for responses and exports.
+"""
+
+import re
+import unicodedata
+from typing import Iterable, Optional
+
+from sqlalchemy import func, select
+from sqlalchemy.orm import Session
+
+from models import BugReport, Label, ReportLabel
+
+MAX_LABEL_LENGTH = 50
+
+# Spellings that mean the same thing, after normalisation
+SYNONYMS = {
+    "user interface": "ui",
+    "gui": "ui",
+    "log in": "login",
+    "sign in": "login",
+    "signin": "login",
+    "a11y": "accessibility",
+    "perf": "performance",
+    "btn": "button",
+    "buttons": "button",
+    "errors": "error",
+    "crashes": "crash",
+    "forms": "form",
+}
+
+_SEPARATORS = re.compile(r"[\s_\-/.]+")
+_STRIP = re.compile(r"[^\w +#]")
+
+
+def normalize_label(raw: Optional[str]) -> Optional[str]:
+    """Canonical form of a label, or None if nothing meaningful is left"""
+    if not raw:
+        return None
+    name = unicodedata.normalize("NFKC", raw).casefold()
+    name = _STRIP.sub("", _SEPARATORS.sub(" ", name)).strip()[:MAX_LABEL_LENGTH].strip()
+    if not name:
+        return None
+    return SYNONYMS.get(name, name)
+
+
+def normalize_labels(raw_labels: Iterable[Optional[str]]) -> list[str]:
+    """Canonical names, deduplicated, in first-seen order"""
+    names = []
+    for raw in raw_labels:
+        name = normalize_label(raw)
+        if name and name not in names:
+            names.append(name)
+    return names
+
+
+def _label_ids(db: Session, tenant_id: int, names: list[str]) -> dict[str, int]:
+    """Ids of the tenant's labels, creating missing ones (safe against concurrent ingestion)"""
+    existing = dict(db.query(Label.name, Label.id).filter(Label.tenant_id == tenant_id, Label.name.in_(names)))
+    missing = [name for name in names if name not in existing]
+    if missing:
+        if db.get_bind().dialect.name == "postgresql":
+            from sqlalchemy.dialects.postgresql import insert
+        else:
+            from sqlalchemy.dialects.sqlite import insert
+        db.execute(insert(Label).values([{"tenant_id": tenant_id, "name": name} for name in missing])
+                   .on_conflict_do_nothing(index_elements=[Label.tenant_id, Label.name]))
+        existing.update(db.query(Label.name, Label.id).filter(Label.tenant_id == tenant_id, Label.name.in_(missing)))
+    return existing
+
+
+def set_report_labels(db: Session, report: BugReport, raw_labels: Iterable[Optional[str]]) -> list[str]:
+    """
+    Canonicalise and store a report's labels, in the caller's transaction.
+    The report must belong to a tenant; it is flushed first if it has no id yet.
+    """
+    names = normalize_labels(raw_labels)
+    if report.id is None:
+        db.flush()
+    db.query(ReportLabel).filter(ReportLabel.report_id == report.id).delete(synchronize_session=False)
+    if names:
+        ids = _label_ids(db, report.tenant_id, names)
+        db.add_all(ReportLabel(report_id=report.id, label_id=ids[name], tenant_id=report.tenant_id) for name in names)
+    report.label = names
+    return names
+
+
+def reports_with_label(name: str, tenant_id: Optional[int] = None):
+    """Subquery of the ids of reports carrying a label, for BugReport.id.in_(...)"""
+    query = select(ReportLabel.report_id).join(Label, Label.id == ReportLabel.label_id) \
+        .where(Label.name == normalize_label(name))
+    if tenant_id is not None:
+        query = query.where(Label.tenant_id == tenant_id)
+    return query
+
+
+def label_counts(db: Session, report_ids) -> dict[str, int]:
+    """{label: number of reports} over a subquery of report ids, most used first"""
+    count = func.count(ReportLabel.report_id)
+    rows = db.query(Label.name, count).join(ReportLabel, ReportLabel.label_id == Label.id) \
+        .filter(ReportLabel.report_id.in_(report_ids)) \
+        .group_by(Label.name).order_by(count.desc(), Label.name).all()
+    return dict(rows)
+
+
+def forget_reports(db: Session, report_ids: list[int]) -> None:
+    """Removes deleted reports' label links, inside the caller's transaction"""
+    if report_ids:
+        db.query(ReportLabel).filter(ReportLabel.report_id.in_(report_ids)).delete(synchronize_session=False)
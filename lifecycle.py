@@ -0,0 +1,97 @@
+"""
+Process lifecycle state shared by the FastAPI lifespan, health endpoints and /feedback.
+
+On SIGTERM the worker flips to draining right away (/readyz turns 503 and live event
+streams are closed so clients reconnect elsewhere), the server stops accepting connections
+and lets in-flight requests finish, then the lifespan shutdown waits up to
+SHUTDOWN_DRAIN_SECONDS for uploads and preview jobs still in progress before closing
+pools and clients.
+"""
+
+import asyncio
+import logging
+import os
+import signal
+import threading
+import time
+from contextlib import contextmanager
+
+from fastapi import HTTPException
+
+logger = logging.getLogger(__name__)
+
+SHUTDOWN_DRAIN_SECONDS = float(os.environ.get("SHUTDOWN_DRAIN_SECONDS", "25"))
+
+
+class LifecycleState:
+    def __init__(self):
+        self.ready = False
+        self.draining = False
+        self.started_at = time.time()
+        self.inflight_uploads = 0
+
+    @contextmanager
+    def track_upload(self):
+        """Count an upload (/feedback, resumable upload chunk) as in flight until it has been fully processed"""
+        self.inflight_uploads += 1
+        try:
+            yield
+        finally:
+            self.inflight_uploads -= 1
+
+    def begin_drain(self) -> None:
+        """Stop reporting ready and end live event streams; safe to call more than once"""
+        if self.draining:
+            return
+        self.ready = False
+        self.draining = True
+        logger.info(f"Draining: {self.inflight_uploads} uploads in flight")
+        import events
+        events.close_all_subscribers()
+
+    async def drain(self, pending_jobs=lambda: 0, timeout: float = SHUTDOWN_DRAIN_SECONDS) -> bool:
+        """
+        Wait for in-flight uploads and background jobs to finish.
+        Returns False if the timeout expired first.
+        """
+        self.begin_drain()
+        deadline = time.monotonic() + timeout
+        while self.inflight_uploads or pending_jobs():
+            if time.monotonic() > deadline:
+                logger.warning(f"Drain timeout: {self.inflight_uploads} uploads and "
+                               f"{pending_jobs()} background jobs still running")
+                return False
+            await asyncio.sleep(0.1)
+        return True
+
+
+state = LifecycleState()
+
+
+def upload_slot():
+    """Dependency counting an upload request as in flight so shutdown waits for it; refuses new ones while draining"""
+    if state.draining:
+        raise HTTPException(status_code=503, detail="Server is shutting down", headers={"Retry-After": "5"})
+    with state.track_upload():
+        yield
+
+
+def install_drain_signal_handlers() -> None:
+    """
+    Chain SIGTERM/SIGINT so draining starts as soon as the signal arrives, before the server
+    closes its sockets and waits for open connections (long-lived event streams included).
+    Must run after the server installed its own handlers, i.e. from the lifespan startup.
+    """
+    if threading.current_thread() is not threading.main_thread():
+        return  # Only the main thread may set handlers (e.g. TestClient runs the app in a thread)
+
+    for sig in (signal.SIGTERM, signal.SIGINT):
+        previous = signal.getsignal(sig)
+        if not callable(previous):
+            continue
+
+        def handler(signum, frame, previous=previous):
+            state.begin_drain()
+            previous(signum, frame)
+
+        signal.signal(sig, handler)
@@ -0,0 +1,171 @@
+"""
+Offline speech-to-text with faster-whisper (TRANSCRIBER_BACKEND=local).
+
+The audio track is decoded with ffmpeg to 16 kHz mono PCM and cut into chunks of about
+LOCAL_TRANSCRIBE_CHUNK_SECONDS, each at the quietest moment shortly before the nominal
+boundary so words are rarely split. Chunks are transcribed in parallel in a process pool
+whose processes each load the model once, int8-quantised, with a single CPU thread: the
+pool (LOCAL_TRANSCRIBE_WORKERS, one per core by default) provides the parallelism. Every
+gunicorn worker has its own pool, so with several web workers size it to cores / workers.
+
+faster-whisper is optional (`pip install faster-whisper`). LOCAL_WHISPER_MODEL is a model
+size downloaded on first use, or a local model directory for hosts without network access.
+"""
+
+import asyncio
+import importlib.util
+import logging
+import os
+import subprocess
+import tempfile
+from array import array
+from concurrent.futures import ProcessPoolExecutor
+from concurrent.futures.process import BrokenProcessPool
+
+from metrics import ai_reports, queue_depth
+from tracing import traced
+
+logger = logging.getLogger(__name__)
+
+LOCAL_WHISPER_MODEL = os.environ.get("LOCAL_WHISPER_MODEL", "small")
+LOCAL_WHISPER_COMPUTE_TYPE = os.environ.get("LOCAL_WHISPER_COMPUTE_TYPE", "int8")
+LOCAL_WHISPER_LANGUAGE = os.environ.get("LOCAL_WHISPER_LANGUAGE") or None  # None: detected per chunk
+LOCAL_WHISPER_BEAM_SIZE = int(os.environ.get("LOCAL_WHISPER_BEAM_SIZE", "1"))
+LOCAL_TRANSCRIBE_WORKERS = int(os.environ.get("LOCAL_TRANSCRIBE_WORKERS", str(os.cpu_count() or 1)))
+LOCAL_TRANSCRIBE_CHUNK_SECONDS = int(os.environ.get("LOCAL_TRANSCRIBE_CHUNK_SECONDS", "30"))
+LOCAL_TRANSCRIBE_TIMEOUT_SECONDS = float(os.environ.get("LOCAL_TRANSCRIBE_TIMEOUT_SECONDS", "600"))
+FFMPEG_TIMEOUT_SECONDS = 120
+
+SAMPLE_RATE = 16000
+SAMPLE_BYTES = 2  # s16le
+# A chunk ends at the quietest FRAME_SECONDS window within SPLIT_SEARCH_SECONDS before its nominal end
+SPLIT_SEARCH_SECONDS = 2.0
+FRAME_SECONDS = 0.1
+
+_pool: ProcessPoolExecutor | None = None
+# Chunks submitted to the pool and not finished yet, exported as trapalert_queue_depth{queue="transcription"}
+_pending_chunks = 0
+queue_depth.set_function(lambda: _pending_chunks, queue="transcription")
+
+# The model of a pool process, loaded by the pool initializer
+_model = None
+
+
+def _load_model() -> None:
+    global _model
+    from faster_whisper import WhisperModel
+
+    _model = WhisperModel(LOCAL_WHISPER_MODEL, device="cpu",
+                          compute_type=LOCAL_WHISPER_COMPUTE_TYPE, cpu_threads=1)
+
+
+def get_transcription_pool() -> ProcessPoolExecutor:
+    """Process pool shared by all local transcriptions, created on first use"""
+    global _pool
+    if _pool is None:
+        _pool = ProcessPoolExecutor(max_workers=LOCAL_TRANSCRIBE_WORKERS, initializer=_load_model)
+    return _pool
+
+
+def shutdown_transcription_pool(wait: bool = True) -> None:
+    global _pool
+    if _pool is not None:
+        _pool.shutdown(wait=wait)
+        _pool = None
+
+
+def _has_audio(path: str) -> bool:
+    out = subprocess.run(
+        ["ffprobe", "-v", "error", "-select_streams", "a", "-show_entries", "stream=index",
+         "-of", "csv=p=0", path],
+        capture_output=True, text=True, timeout=FFMPEG_TIMEOUT_SECONDS, check=True,
+    ).stdout.strip()
+    return bool(out)
+
+
+def decode_audio(video_bytes: bytes) -> bytes:
+    """The recording's audio as 16 kHz mono s16le PCM; empty if it has no audio track"""
+    with tempfile.TemporaryDirectory() as tmp:
+        src = os.path.join(tmp, "input")
+        with open(src, "wb") as f:
+            f.write(video_bytes)
+        if not _has_audio(src):
+            return b""
+        return subprocess.run(
+            ["ffmpeg", "-v", "error", "-i", src, "-vn", "-ac", "1", "-ar", str(SAMPLE_RATE),
+             "-f", "s16le", "pipe:1"],
+            capture_output=True, timeout=FFMPEG_TIMEOUT_SECONDS, check=True,
+        ).stdout
+
+
+def _quietest_point(samples: array, start: int, end: int) -> int:
+    """Start of the lowest-energy frame in samples[start:end]"""
+    frame = int(SAMPLE_RATE * FRAME_SECONDS)
+    best, best_energy = end, None
+    for i in range(start, end - frame + 1, frame):
+        energy = sum(abs(s) for s in samples[i:i + frame])
+        if best_energy is None or energy < best_energy:
+            best, best_energy = i, energy
+    return best
+
+
+def split_chunks(pcm: bytes, chunk_seconds: int = LOCAL_TRANSCRIBE_CHUNK_SECONDS) -> list[bytes]:
+    """Cuts PCM into chunks of at most chunk_seconds, each ending at a quiet moment"""
+    samples = array("h")
+    samples.frombytes(pcm[:len(pcm) - len(pcm) % SAMPLE_BYTES])
+    chunk = SAMPLE_RATE * chunk_seconds
+    search = min(int(SAMPLE_RATE * SPLIT_SEARCH_SECONDS), chunk // 2)
+    chunks, start = [], 0
+    while len(samples) - start > chunk:
+        cut = _quietest_point(samples, start + chunk - search, start + chunk)
+        chunks.append(samples[start:cut].tobytes())
+        start = cut
+    if start < len(samples):
+        chunks.append(samples[start:].tobytes())
+    return chunks
+
+
+def transcribe_chunk(pcm: bytes) -> str:
+    """Runs in a pool process"""
+    import numpy as np
+
+    audio = np.frombuffer(pcm, dtype=np.int16).astype(np.float32) / 32768.0
+    segments, _ = _model.transcribe(audio, language=LOCAL_WHISPER_LANGUAGE,
+                                    beam_size=LOCAL_WHISPER_BEAM_SIZE, vad_filter=True)
+    return " ".join(segment.text.strip() for segment in segments)
+
+
+class LocalTranscriber:
+    """Same interface as AiEngine.transcribe_bytes (transcriber.Transcriber)"""
+
+    @traced("LocalTranscriber.transcribe_bytes")
+    async def transcribe_bytes(self, video_bytes: bytes, content_type: str, filename: str,
+                               deadline: float | None = None) -> str:
+        global _pending_chunks
+        loop = asyncio.get_running_loop()
+        chunks = await asyncio.to_thread(lambda: split_chunks(decode_audio(video_bytes)))
+        _pending_chunks += len(chunks)
+        try:
+            futures = [loop.run_in_executor(get_transcription_pool(), transcribe_chunk, c) for c in chunks]
+            timeout = min(deadline, LOCAL_TRANSCRIBE_TIMEOUT_SECONDS) if deadline else LOCAL_TRANSCRIBE_TIMEOUT_SECONDS
+            texts = await asyncio.wait_for(asyncio.gather(*futures), timeout)
+        except BrokenProcessPool:
+            # A pool process died (or the model failed to load); start a fresh pool next time
+            shutdown_transcription_pool(wait=False)
+            raise
+        finally:
+            _pending_chunks -= len(chunks)
+        ai_reports.inc(operation="transcribe", model=f"whisper-{os.path.basename(LOCAL_WHISPER_MODEL)}", batched="false")
+        logger.info(f"Local transcription of {filename} complete ({len(chunks)} chunks)")
+        return " ".join(t for t in texts if t)
+
+
+_transcriber: LocalTranscriber | None = None
+
+def get_local_transcriber() -> LocalTranscriber:
+    global _transcriber
+    if _transcriber is None:
+        if importlib.util.find_spec("faster_whisper") is None:
+            logger.error("TRANSCRIBER_BACKEND=local but faster-whisper is not installed")
+        _transcriber = LocalTranscriber()
+    return _transcriber
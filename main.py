@@ -1,11 +1,21 @@
+import asyncio
 import json
+from contextlib import asynccontextmanager
 
-from fastapi import FastAPI, Depends, UploadFile, File, Form, HTTPException
+from dotenv import load_dotenv
+from fastapi import FastAPI, Depends, UploadFile, File, Form, HTTPException, BackgroundTasks
+from sqlalchemy import text
 from sqlalchemy.orm import Session
 from starlette.middleware.cors import CORSMiddleware
+from starlette.responses import Response, JSONResponse
 
-from db import engine, Base, get_db
-from models import BugReport, Tenant
+from db import engine, get_db, SessionLocal, replicas
+from models import Tenant
+from serialization import FastJSONResponse
+from tracing import TracingMiddleware
+from http_compression import CompressionMiddleware
+from metrics import REGISTRY, CONTENT_TYPE as METRICS_CONTENT_TYPE, MetricsMiddleware, stage_timer, upload_bytes
+from lifecycle import state as lifecycle_state, install_drain_signal_handlers, upload_slot
 import uuid
 import logging
 
@@ -13,23 +23,74 @@ import logging
 logging.basicConfig(level=logging.INFO)
 logger = logging.getLogger(__name__)
 
-from transcriber import AiEngine
+# Load .env before the routers read their configuration
+load_dotenv()
+
+from transcriber import close_ai_engine
+from ingestion import ingest_report
+import video_utils
+import events
+import previews
+import local_transcriber
+from retention import RETENTION_INTERVAL_SECONDS, run_scheduler
+from uploads import UPLOAD_GC_INTERVAL_SECONDS, run_gc as run_upload_gc
+from enrichment import ENRICHMENT_INTERVAL_SECONDS, run_scheduler as run_enrichment
 
 # Import routers
-from routers import auth, reports, tenants, users, integrations
+from routers import auth, reports, tenants, users, integrations, uploads, events as events_router
+
+@asynccontextmanager
+async def lifespan(app: FastAPI):
+    """
+    Owns per-worker resources: DB pool, storage and AI clients.
+    Runs once in every worker process, after the fork. Startup stays cheap: the schema is
+    managed by `python manage.py migrate`, and SDK clients are created on first use.
+    """
+    video_utils.init_storage()
+    install_drain_signal_handlers()
+    retention_task = None
+    if RETENTION_INTERVAL_SECONDS > 0:
+        retention_task = asyncio.create_task(run_scheduler(RETENTION_INTERVAL_SECONDS))
+    upload_gc_task = None
+    if UPLOAD_GC_INTERVAL_SECONDS > 0:
+        upload_gc_task = asyncio.create_task(run_upload_gc(UPLOAD_GC_INTERVAL_SECONDS))
+    enrichment_task = None
+    if ENRICHMENT_INTERVAL_SECONDS > 0:
+        enrichment_task = asyncio.create_task(run_enrichment(ENRICHMENT_INTERVAL_SECONDS))
+    lifecycle_state.ready = True
+    logger.info("Worker ready")
 
-# Create the tables if they don't exist
-Base.metadata.create_all(bind=engine)
+    yield
 
-app = FastAPI(title="TrapAlert API", version="1.0.0")
+    if retention_task:
+        retention_task.cancel()
+    if upload_gc_task:
+        upload_gc_task.cancel()
+    if enrichment_task:
+        enrichment_task.cancel()
+    drained = await lifecycle_state.drain(previews.pending_jobs)
+    logger.info(f"Shutting down worker (drained cleanly: {drained})")
+    events.shutdown()
+    previews.shutdown_preview_pool(wait=drained)
+    local_transcriber.shutdown_transcription_pool(wait=drained)
+    close_ai_engine()
+    video_utils.close_storage()
+    engine.dispose()
+    replicas.dispose()
 
+app = FastAPI(title="TrapAlert API", version="1.0.0", lifespan=lifespan, default_response_class=FastJSONResponse)
+
+app.add_middleware(CompressionMiddleware)
 app.add_middleware(
     CORSMiddleware,
     allow_origins=["*"],  # In production, replace with specific origins
     allow_credentials=True,
     allow_methods=["*"],
     allow_headers=["*"],
+    expose_headers=["Location", "Upload-Offset", "Upload-Length", "Upload-Expires"],  # Resumable uploads
 )
+app.add_middleware(MetricsMiddleware)
+app.add_middleware(TracingMiddleware)
 
 # Include all routers
 app.include_router(auth.router)
@@ -37,13 +98,39 @@ app.include_router(reports.router)
 app.include_router(tenants.router)
 app.include_router(users.router)
 app.include_router(integrations.router)
+app.include_router(events_router.router)
+app.include_router(uploads.router)
 
 @app.get("/")
 async def root():
     return {"message": "TrapAlert API", "version": "1.0.0"}
 
-@app.post("/feedback")
+@app.get("/healthz", include_in_schema=False)
+async def healthz():
+    """Liveness: the worker's event loop is responsive"""
+    return {"status": "ok"}
+
+@app.get("/readyz", include_in_schema=False)
+def readyz():
+    """Readiness: started, not draining, and the database answers"""
+    if not lifecycle_state.ready or lifecycle_state.draining:
+        return JSONResponse({"status": "draining" if lifecycle_state.draining else "starting"}, status_code=503)
+    try:
+        with SessionLocal() as db:
+            db.execute(text("SELECT 1"))
+    except Exception as e:
+        logger.error(f"Readiness check failed: {e}")
+        return JSONResponse({"status": "database unavailable"}, status_code=503)
+    return {"status": "ready", "inflight_uploads": lifecycle_state.inflight_uploads}
+
+@app.get("/metrics", include_in_schema=False)
+async def metrics():
+    """Prometheus scrape endpoint"""
+    return Response(REGISTRY.render(), media_type=METRICS_CONTENT_TYPE)
+
+@app.post("/feedback", dependencies=[Depends(upload_slot)])
 async def receive_feedback(
+    background_tasks: BackgroundTasks,
     video: UploadFile = File(...),
     dom: str = Form(...),
     metadata: str = Form(...),
@@ -58,46 +145,23 @@ async def receive_feedback(
     """
     try:
         # Verify tenant API key
-        tenant = db.query(Tenant).filter(Tenant.api_key == tenantId, Tenant.is_active == True).first()
+        with stage_timer("tenant_lookup"):
+            tenant = db.query(Tenant).filter(Tenant.api_key == tenantId, Tenant.is_active == True).first()
         if not tenant:
             logger.warning(f"Invalid tenant API key attempt: {tenantId}")
             raise HTTPException(status_code=401, detail="Invalid tenant API key")
         
         # 1. Read video bytes once
-        video_bytes = await video.read()
+        with stage_timer("read"):
+            video_bytes = await video.read()
+        upload_bytes.inc(len(video_bytes))
         logger.info(f"Received video: {len(video_bytes)} bytes, type: {video.content_type}")
-        
-        # 2. Upload to Supabase
-        from video_utils import upload_video_to_supabase
-        video_url = upload_video_to_supabase(video_bytes, video.content_type or "video/webm")
-        
-        # 3. Transcribe video (pass bytes and metadata)
-        eng = AiEngine()
-        transcript = await eng.transcribe_bytes(video_bytes, video.content_type or "video/webm", video.filename) 
-        
-        # 4. Generate labels
-        raw_labels = eng.generate_labels(transcript)
-        if not raw_labels:
-            raw_labels = "bug, issue"
-        label_list = [item.strip() for item in raw_labels.split(",") if item.strip()]
-
-        # 5. Create the bug report
-        new_report = BugReport(
-            tenant_id=tenant.id,
-            description=description or transcript,
-            struggle_score=struggleScore,
-            metadata_json=metadata, # Stored as String
-            dom_snapshot=dom,
-            label=label_list,
-            video_url=video_url,
+
+        # 2. Store, transcribe, label and save (ingestion.py)
+        new_report = await ingest_report(
+            db, background_tasks, tenant, video_bytes, video.content_type, video.filename,
+            dom=dom, metadata=metadata, description=description, struggle_score=struggleScore,
         )
-        
-        # 6. Save to DB
-        db.add(new_report)
-        db.commit()
-        db.refresh(new_report)
-        
-        logger.info(f"Feedback received and saved: Report ID {new_report.id} for Tenant {tenant.name}")
         return {"status": "success", "id": new_report.id}
 
     except HTTPException as he:
@@ -0,0 +1,195 @@
+"""
+Operational commands, run as explicit deploy steps rather than on app startup.
+
+    python manage.py migrate [--revision REV]
+    python manage.py downgrade REV
+    python manage.py create-superadmin --email admin@example.com
+    python manage.py apply-retention [--tenant ID] [--dry-run]
+    python manage.py backfill-previews [--limit N]
+    python manage.py partition-reports [--tenant-buckets N]
+    python manage.py maintain-partitions [--detach-after-months N] [--drop]
+    python manage.py index-similarity [--tenant ID] [--rebuild]
+    python manage.py gc-uploads
+    python manage.py enrich-reports [--limit N] [--retry-failed]
+"""
+
+import argparse
+import getpass
+import logging
+import os
+import sys
+
+logger = logging.getLogger(__name__)
+
+
+def migrate(args) -> None:
+    from alembic import command
+    from db import alembic_config
+
+    command.upgrade(alembic_config(), args.revision)
+    logger.info(f"Database migrated to {args.revision}")
+
+
+def downgrade(args) -> None:
+    from alembic import command
+    from db import alembic_config
+
+    command.downgrade(alembic_config(), args.revision)
+
+
+def create_superadmin(args) -> None:
+    from db import SessionLocal
+    from models import User, UserRole
+    from auth import hash_password
+
+    password = args.password or os.environ.get("SUPERADMIN_PASSWORD") or getpass.getpass("Password: ")
+    if len(password) < 8:
+        sys.exit("Password must be at least 8 characters")
+
+    db = SessionLocal()
+    try:
+        if db.query(User).filter(User.email == args.email).first():
+            logger.info(f"User {args.email} already exists, nothing to do")
+            return
+        db.add(User(
+            email=args.email,
+            password_hash=hash_password(password),
+            role=UserRole.SUPER_ADMIN,
+            tenant_id=None,  # Super admins are not tied to a tenant
+            is_active=True,
+        ))
+        db.commit()
+        logger.info(f"Created super admin {args.email}")
+    finally:
+        db.close()
+
+
+def apply_retention(args) -> None:
+    import retention
+
+    results = retention.run_once(tenant_id=args.tenant, dry_run=args.dry_run, batch_size=args.batch_size)
+    if results is None:
+        sys.exit("Retention is already running in another process")
+    verb = "would archive" if args.dry_run else "archived"
+    for tenant_id, count in results.items():
+        logger.info(f"Tenant {tenant_id}: {verb} {count} reports")
+
+
+def backfill_previews(args) -> None:
+    import previews
+
+    count = previews.backfill_previews(limit=args.limit, batch_size=args.batch_size)
+    logger.info(f"Generated previews for {count} reports")
+
+
+def partition_reports(args) -> None:
+    import partitions
+
+    if not partitions.is_supported():
+        sys.exit("Partitioning bug_reports requires Postgres")
+    options = {"tenant_buckets": args.tenant_buckets, "batch_size": args.batch_size}
+    partitions.convert_to_partitioned(**{name: value for name, value in options.items() if value is not None})
+
+
+def maintain_partitions(args) -> None:
+    import partitions
+    import retention
+
+    with retention.exclusive_run() as acquired:
+        if not acquired:
+            sys.exit("Retention or partition maintenance is already running in another process")
+        options = {"months_ahead": args.months_ahead, "detach_after_months": args.detach_after_months}
+        result = partitions.maintain(drop=args.drop,
+                                     **{name: value for name, value in options.items() if value is not None})
+    logger.info(f"Partitions created: {result['created'] or 'none'}, detached: {result['detached'] or 'none'}, "
+                f"dropped: {result['dropped'] or 'none'}")
+
+
+def index_similarity(args) -> None:
+    import similarity
+
+    indexed = similarity.index_existing(tenant_id=args.tenant, batch_size=args.batch_size, rebuild=args.rebuild)
+    logger.info(f"Indexed {indexed} reports for duplicate detection")
+
+
+def gc_uploads(args) -> None:
+    import uploads
+
+    uploads.collect_expired()
+
+
+def enrich_reports(args) -> None:
+    import asyncio
+    import enrichment
+    from db import SessionLocal
+
+    if args.retry_failed:
+        with SessionLocal() as db:
+            logger.info(f"Requeued {enrichment.retry_failed(db)} parked enrichment jobs")
+    result = asyncio.run(enrichment.run_pending(limit=args.limit))
+    logger.info(f"Enriched {result['enriched']} reports, {result['failed']} failed")
+
+
+def main() -> None:
+    logging.basicConfig(level=logging.INFO)
+
+    parser = argparse.ArgumentParser(description="TrapAlert management commands")
+    commands = parser.add_subparsers(dest="command", required=True)
+
+    command = commands.add_parser("migrate", help="Apply database migrations")
+    command.add_argument("--revision", default="head")
+    command.set_defaults(func=migrate)
+
+    command = commands.add_parser("downgrade", help="Revert migrations down to a revision")
+    command.add_argument("revision")
+    command.set_defaults(func=downgrade)
+
+    command = commands.add_parser("create-superadmin", help="Create a SUPER_ADMIN user")
+    command.add_argument("--email", required=True)
+    command.add_argument("--password", help="Defaults to $SUPERADMIN_PASSWORD, else prompts")
+    command.set_defaults(func=create_superadmin)
+
+    command = commands.add_parser("apply-retention", help="Archive reports past their tenant's retention window")
+    command.add_argument("--tenant", type=int, default=None, help="Only this tenant")
+    command.add_argument("--dry-run", action="store_true", help="Only count the reports that would be archived")
+    command.add_argument("--batch-size", type=int, default=500)
+    command.set_defaults(func=apply_retention)
+
+    command = commands.add_parser("backfill-previews", help="Generate poster frames and previews for existing reports")
+    command.add_argument("--limit", type=int, default=None, help="Stop after this many reports")
+    command.add_argument("--batch-size", type=int, default=50)
+    command.set_defaults(func=backfill_previews)
+
+    command = commands.add_parser("partition-reports", help="Convert bug_reports to monthly partitions (Postgres)")
+    command.add_argument("--tenant-buckets", type=int, default=None,
+                         help="Sub-partition each month by tenant hash (default $PARTITION_TENANT_BUCKETS)")
+    command.add_argument("--batch-size", type=int, default=None)
+    command.set_defaults(func=partition_reports)
+
+    command = commands.add_parser("maintain-partitions", help="Create upcoming partitions, detach expired ones")
+    command.add_argument("--months-ahead", type=int, default=None)
+    command.add_argument("--detach-after-months", type=int, default=None,
+                         help="Default $PARTITION_DETACH_AFTER_MONTHS; 0 keeps every month")
+    command.add_argument("--drop", action="store_true", help="Also drop detached months that still hold reports")
+    command.set_defaults(func=maintain_partitions)
+
+    command = commands.add_parser("index-similarity", help="Index existing reports for duplicate detection")
+    command.add_argument("--tenant", type=int, default=None, help="Only this tenant")
+    command.add_argument("--rebuild", action="store_true", help="Drop existing signatures and links first")
+    command.add_argument("--batch-size", type=int, default=200)
+    command.set_defaults(func=index_similarity)
+
+    command = commands.add_parser("gc-uploads", help="Delete expired resumable upload sessions and their spooled bytes")
+    command.set_defaults(func=gc_uploads)
+
+    command = commands.add_parser("enrich-reports", help="Transcribe and label reports queued for enrichment (Gemini failures, batched labels)")
+    command.add_argument("--limit", type=int, default=100, help="Jobs to process in this run")
+    command.add_argument("--retry-failed", action="store_true", help="First requeue jobs that exhausted their attempts")
+    command.set_defaults(func=enrich_reports)
+
+    args = parser.parse_args()
+    args.func(args)
+
+
+if __name__ == "__main__":
+    main()
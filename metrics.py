@@ -0,0 +1,288 @@
+"""
+Process-local metrics in the Prometheus text exposition format, served on GET /metrics.
+
+Counters and histograms are sharded per thread: the hot path only touches a dict
+owned by the current thread, without taking a lock, and shards are summed at scrape
+time. Gauges are callbacks evaluated at scrape time (queue depth, pool usage...).
+
+With several worker processes each worker exposes its own values; scrape them
+individually or aggregate in Prometheus.
+"""
+
+import bisect
+import threading
+import time
+from contextlib import contextmanager
+from typing import Callable, Dict, List, Tuple
+
+from sqlalchemy.pool import QueuePool
+
+CONTENT_TYPE = "text/plain; version=0.0.4; charset=utf-8"
+
+DEFAULT_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10, 30, 60)
+
+
+def _label_key(labels: dict) -> Tuple:
+    return tuple(sorted(labels.items()))
+
+
+def _format_labels(key: Tuple, extra: str = "") -> str:
+    parts = [f'{k}="{str(v)}"'.replace("\n", " ") for k, v in key]
+    if extra:
+        parts.append(extra)
+    return "{" + ",".join(parts) + "}" if parts else ""
+
+
+class _Sharded:
+    """Keeps one shard per thread; shards are registered once and summed on read"""
+
+    def __init__(self):
+        self._local = threading.local()
+        self._shards: List[dict] = []
+        self._lock = threading.Lock()
+
+    def _shard(self) -> dict:
+        shard = getattr(self._local, "shard", None)
+        if shard is None:
+            shard = {}
+            self._local.shard = shard
+            with self._lock:
+                self._shards.append(shard)
+        return shard
+
+    def _snapshots(self) -> List[dict]:
+        with self._lock:
+            shards = list(self._shards)
+        # dict() copies atomically under the GIL, so concurrent writers are safe
+        return [dict(shard) for shard in shards]
+
+
+class Counter(_Sharded):
+    def __init__(self, name: str, documentation: str):
+        super().__init__()
+        self.name = name
+        self.documentation = documentation
+
+    def inc(self, amount: float = 1, **labels) -> None:
+        shard = self._shard()
+        key = _label_key(labels)
+        shard[key] = shard.get(key, 0) + amount
+
+    def collect(self) -> Dict[Tuple, float]:
+        totals: Dict[Tuple, float] = {}
+        for shard in self._snapshots():
+            for key, value in shard.items():
+                totals[key] = totals.get(key, 0) + value
+        return totals
+
+    def render(self) -> List[str]:
+        lines = [f"# HELP {self.name} {self.documentation}", f"# TYPE {self.name} counter"]
+        for key, value in sorted(self.collect().items()):
+            lines.append(f"{self.name}{_format_labels(key)} {value}")
+        return lines
+
+
+class Histogram(_Sharded):
+    def __init__(self, name: str, documentation: str, buckets=DEFAULT_BUCKETS):
+        super().__init__()
+        self.name = name
+        self.documentation = documentation
+        self.buckets = tuple(buckets)
+
+    def observe(self, value: float, **labels) -> None:
+        shard = self._shard()
+        key = _label_key(labels)
+        state = shard.get(key)
+        if state is None:
+            # [per-bucket counts..., +Inf count, sum]
+            state = [0] * (len(self.buckets) + 1) + [0.0]
+            shard[key] = state
+        state[bisect.bisect_left(self.buckets, value)] += 1
+        state[-1] += value
+
+    @contextmanager
+    def time(self, **labels):
+        start = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.observe(time.perf_counter() - start, **labels)
+
+    def collect(self) -> Dict[Tuple, list]:
+        totals: Dict[Tuple, list] = {}
+        for shard in self._snapshots():
+            for key, state in shard.items():
+                state = list(state)
+                if key in totals:
+                    totals[key] = [a + b for a, b in zip(totals[key], state)]
+                else:
+                    totals[key] = state
+        return totals
+
+    def render(self) -> List[str]:
+        lines = [f"# HELP {self.name} {self.documentation}", f"# TYPE {self.name} histogram"]
+        for key, state in sorted(self.collect().items()):
+            cumulative = 0
+            for bound, count in zip(self.buckets, state):
+                cumulative += count
+                le = f'le="{bound}"'
+                lines.append(f"{self.name}_bucket{_format_labels(key, le)} {cumulative}")
+            cumulative += state[len(self.buckets)]
+            le = 'le="+Inf"'
+            lines.append(f"{self.name}_bucket{_format_labels(key, le)} {cumulative}")
+            lines.append(f"{self.name}_sum{_format_labels(key)} {state[-1]}")
+            lines.append(f"{self.name}_count{_format_labels(key)} {cumulative}")
+        return lines
+
+
+class Gauge:
+    """Value read from a callback at scrape time, one callback per label set"""
+
+    def __init__(self, name: str, documentation: str):
+        self.name = name
+        self.documentation = documentation
+        self._callbacks: List[Tuple[dict, Callable[[], float]]] = []
+
+    def set_function(self, fn: Callable[[], float], **labels) -> None:
+        self._callbacks.append((labels, fn))
+
+    def render(self) -> List[str]:
+        lines = [f"# HELP {self.name} {self.documentation}", f"# TYPE {self.name} gauge"]
+        for labels, fn in self._callbacks:
+            try:
+                value = fn()
+            except Exception:
+                continue
+            lines.append(f"{self.name}{_format_labels(_label_key(labels))} {value}")
+        return lines
+
+
+class Registry:
+    def __init__(self):
+        self.metrics = []
+
+    def register(self, metric):
+        self.metrics.append(metric)
+        return metric
+
+    def render(self) -> str:
+        lines = []
+        for metric in self.metrics:
+            lines.extend(metric.render())
+        return "\n".join(lines) + "\n"
+
+
+REGISTRY = Registry()
+
+http_request_duration = REGISTRY.register(Histogram(
+    "trapalert_http_request_duration_seconds", "HTTP request latency by route template"))
+http_stream_open_duration = REGISTRY.register(Histogram(
+    "trapalert_http_stream_open_seconds", "Time to open event streams (until their headers are sent), by route template"))
+feedback_stage_duration = REGISTRY.register(Histogram(
+    "trapalert_feedback_stage_seconds", "Time spent in each /feedback ingestion stage"))
+upload_bytes = REGISTRY.register(Counter(
+    "trapalert_upload_bytes_total", "Video bytes received from SDK uploads"))
+external_call_duration = REGISTRY.register(Histogram(
+    "trapalert_external_call_seconds", "Latency of calls to external services (Gemini, storage)"))
+external_calls = REGISTRY.register(Counter(
+    "trapalert_external_calls_total", "External service calls by outcome"))
+external_call_retries = REGISTRY.register(Counter(
+    "trapalert_external_call_retries_total", "Retries, hedges and calls refused by budgets or open circuits"))
+circuit_state = REGISTRY.register(Gauge(
+    "trapalert_circuit_state", "Circuit breaker state per external service: 0 closed, 1 half-open, 2 open"))
+ai_reports = REGISTRY.register(Counter(
+    "trapalert_ai_reports_total", "Reports sent to AI models (Gemini, local whisper) by operation and model, and whether batched"))
+priority_wait = REGISTRY.register(Histogram(
+    "trapalert_priority_wait_seconds", "Time post-ingestion work waited for capacity, by queue and priority class"))
+db_pool_wait = REGISTRY.register(Histogram(
+    "trapalert_db_pool_checkout_wait_seconds", "Time spent waiting for a pooled DB connection",
+    buckets=(0.0005, 0.001, 0.005, 0.01, 0.05, 0.1, 0.5, 1, 5, 30)))
+queue_depth = REGISTRY.register(Gauge(
+    "trapalert_queue_depth", "Jobs waiting or running in background queues"))
+db_pool_checked_out = REGISTRY.register(Gauge(
+    "trapalert_db_pool_checked_out", "DB connections currently checked out of the pool"))
+db_read_routing = REGISTRY.register(Counter(
+    "trapalert_db_read_routing_total", "Read-only request sessions by the database serving them, and why"))
+facet_cache = REGISTRY.register(Counter(
+    "trapalert_facet_cache_total", "Report list count/facet lookups served from the per-worker cache, or computed"))
+retention_reports = REGISTRY.register(Counter(
+    "trapalert_retention_reports_total", "Reports handled by the retention job, by action"))
+
+
+@contextmanager
+def stage_timer(stage: str, **labels):
+    """Time one /feedback pipeline stage"""
+    with feedback_stage_duration.time(stage=stage, **labels):
+        yield
+
+
+@contextmanager
+def track_external_call(service: str, operation: str):
+    """
+    Record latency and outcome of an external call. Exceptions propagate unchanged;
+    callers that swallow errors should raise inside this block and catch outside it.
+    """
+    start = time.perf_counter()
+    outcome = "error"
+    try:
+        yield
+        outcome = "success"
+    finally:
+        external_call_duration.observe(time.perf_counter() - start, service=service, operation=operation)
+        external_calls.inc(service=service, operation=operation, outcome=outcome)
+
+
+class TimedQueuePool(QueuePool):
+    """QueuePool that records how long each checkout waited for a free connection"""
+
+    def _do_get(self):
+        start = time.perf_counter()
+        try:
+            return super()._do_get()
+        finally:
+            db_pool_wait.observe(time.perf_counter() - start)
+
+
+class MetricsMiddleware:
+    """
+    ASGI middleware recording per-route latency, labelled by route template to keep cardinality low.
+    A request ends when the last body chunk is sent, so background tasks that run afterwards
+    are not counted. Event streams last as long as the viewer stays, so they are timed until
+    their headers are sent, in their own histogram.
+    """
+
+    def __init__(self, app):
+        self.app = app
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http":
+            return await self.app(scope, receive, send)
+
+        start = time.perf_counter()
+        state = {"code": 500, "recorded": False}
+
+        def record(histogram):
+            state["recorded"] = True
+            route = scope.get("route")
+            histogram.observe(
+                time.perf_counter() - start,
+                method=scope["method"],
+                route=getattr(route, "path", "unmatched"),
+                status=state["code"],
+            )
+
+        async def send_wrapper(message):
+            if message["type"] == "http.response.start":
+                state["code"] = message["status"]
+                if any(k == b"content-type" and v.startswith(b"text/event-stream") for k, v in message.get("headers", ())):
+                    record(http_stream_open_duration)
+            elif message["type"] == "http.response.body" and not message.get("more_body") and not state["recorded"]:
+                record(http_request_duration)
+            await send(message)
+
+        try:
+            await self.app(scope, receive, send_wrapper)
+        finally:
+            # The response was never completed (an error, or the client went away)
+            if not state["recorded"]:
+                record(http_request_duration)
@@ -0,0 +1,63 @@
+"""
+Alembic environment. The same revision chain runs on SQLite and Postgres:
+
+- Each revision runs in its own transaction, so a revision can step out of it
+  (online_ops.autocommit_block) for CREATE INDEX CONCURRENTLY and batched backfills.
+- On Postgres DDL waits at most MIGRATION_LOCK_TIMEOUT for its lock instead of
+  queueing behind a long transaction and blocking ingestion behind it.
+- On Postgres concurrent runs (replicas migrating on start) wait for each other.
+- On SQLite ALTERs that SQLite cannot do in place go through batch mode (table copy).
+"""
+
+import os
+from logging.config import fileConfig
+
+from alembic import context
+from sqlalchemy import pool, create_engine, text
+
+from db import Base, DATABASE_URL
+import models  # noqa: F401 - registers the tables on Base.metadata
+
+config = context.config
+
+# Skip when called from manage.py / the app, which configure logging themselves
+if config.config_file_name is not None and config.attributes.get("configure_logger", True):
+    fileConfig(config.config_file_name, disable_existing_loggers=False)
+
+target_metadata = Base.metadata
+
+MIGRATION_LOCK_TIMEOUT = os.environ.get("MIGRATION_LOCK_TIMEOUT", "5s")
+# Session-level advisory lock serialising concurrent `upgrade` runs (arbitrary constant)
+MIGRATION_ADVISORY_LOCK_ID = 7_365_418_201
+
+
+def run_migrations_offline() -> None:
+    raise RuntimeError("Revisions inspect the live schema to stay idempotent; offline (--sql) mode is not supported")
+
+
+def run_migrations_online() -> None:
+    connectable = create_engine(DATABASE_URL, poolclass=pool.NullPool)
+
+    with connectable.connect() as connection:
+        if connection.dialect.name == "postgresql":
+            # Replicas migrating on start take turns; the later ones then find nothing to do
+            connection.execute(text(f"SELECT pg_advisory_lock({MIGRATION_ADVISORY_LOCK_ID})"))
+            connection.execute(text(f"SET lock_timeout = '{MIGRATION_LOCK_TIMEOUT}'"))
+            connection.commit()
+
+        context.configure(
+            connection=connection,
+            target_metadata=target_metadata,
+            render_as_batch=connection.dialect.name == "sqlite",
+            transaction_per_migration=True,
+            compare_type=True,
+        )
+
+        with context.begin_transaction():
+            context.run_migrations()
+
+
+if context.is_offline_mode():
+    run_migrations_offline()
+else:
+    run_migrations_online()
@@ -0,0 +1,126 @@
+"""
+Helpers for schema changes that must not lock ingestion on a large bug_reports table.
+
+- Columns are only ever added nullable and without a default (metadata-only on both backends).
+- Indexes are built with CREATE INDEX CONCURRENTLY on Postgres, outside the revision's transaction.
+- Backfills run in primary-key ranges, each range committed on its own, with a pause between
+  batches so replication and ingestion keep up. Tune with MIGRATION_BATCH_SIZE / MIGRATION_BATCH_SLEEP.
+- NOT NULL is enforced on Postgres through a NOT VALID check constraint validated afterwards,
+  which does not block writes while the table is scanned.
+
+Every helper is idempotent, so a revision interrupted halfway can simply be re-run.
+"""
+
+import logging
+import os
+import time
+
+import sqlalchemy as sa
+from alembic import op
+
+# Under the alembic logger so progress shows with the alembic.ini logging config too
+logger = logging.getLogger("alembic.online_ops")
+
+MIGRATION_BATCH_SIZE = int(os.environ.get("MIGRATION_BATCH_SIZE", "5000"))
+MIGRATION_BATCH_SLEEP = float(os.environ.get("MIGRATION_BATCH_SLEEP", "0.05"))
+
+
+def is_postgres() -> bool:
+    return op.get_bind().dialect.name == "postgresql"
+
+
+def has_table(table: str) -> bool:
+    return sa.inspect(op.get_bind()).has_table(table)
+
+
+def has_column(table: str, column: str) -> bool:
+    return any(c["name"] == column for c in sa.inspect(op.get_bind()).get_columns(table))
+
+
+def has_index(table: str, name: str) -> bool:
+    return any(i["name"] == name for i in sa.inspect(op.get_bind()).get_indexes(table))
+
+
+def add_column_if_missing(table: str, column: sa.Column) -> None:
+    """Adds a nullable column without default: no table rewrite on Postgres or SQLite"""
+    if not column.nullable or column.server_default is not None:
+        raise ValueError(f"{table}.{column.name}: add it nullable without default, then backfill")
+    if not has_column(table, column.name):
+        op.add_column(table, column)
+
+
+def _drop_invalid_index(name: str) -> None:
+    """A failed CREATE INDEX CONCURRENTLY leaves an INVALID index behind; drop it before retrying"""
+    invalid = op.get_bind().execute(sa.text(
+        "SELECT 1 FROM pg_index i JOIN pg_class c ON c.oid = i.indexrelid "
+        "WHERE c.relname = :name AND NOT i.indisvalid"
+    ), {"name": name}).scalar()
+    if invalid:
+        logger.warning(f"Dropping invalid index {name} left by an interrupted build")
+        op.execute(sa.text(f"DROP INDEX CONCURRENTLY IF EXISTS {name}"))
+
+
+def create_index_online(name: str, table: str, columns: list, unique: bool = False, **kw) -> None:
+    """CREATE INDEX CONCURRENTLY on Postgres (reads and writes continue during the build)"""
+    if is_postgres():
+        with op.get_context().autocommit_block():
+            _drop_invalid_index(name)
+            op.create_index(name, table, columns, unique=unique, postgresql_concurrently=True,
+                            if_not_exists=True, **kw)
+    elif not has_index(table, name):
+        op.create_index(name, table, columns, unique=unique, **kw)
+
+
+def drop_index_online(name: str, table: str) -> None:
+    if is_postgres():
+        with op.get_context().autocommit_block():
+            op.drop_index(name, table_name=table, postgresql_concurrently=True, if_exists=True)
+    elif has_index(table, name):
+        op.drop_index(name, table_name=table)
+
+
+def batched_backfill(table: str, set_clause: str, where: str = "1 = 1", params: dict | None = None,
+                     batch_size: int = MIGRATION_BATCH_SIZE, sleep: float = MIGRATION_BATCH_SLEEP,
+                     key: str = "id") -> int:
+    """
+    UPDATE table SET <set_clause> WHERE <where>, one primary-key range at a time.
+    Each range commits on its own so row locks are held for one batch only.
+    Returns the number of rows updated.
+    """
+    bind = op.get_bind()
+    low, high = bind.execute(sa.text(f"SELECT MIN({key}), MAX({key}) FROM {table}")).one()
+    if low is None:
+        return 0
+
+    statement = sa.text(
+        f"UPDATE {table} SET {set_clause} WHERE {key} >= :_low AND {key} < :_high AND ({where})"
+    )
+    total = 0
+    started = time.monotonic()
+    with op.get_context().autocommit_block():
+        for start in range(low, high + 1, batch_size):
+            result = bind.execute(statement, {**(params or {}), "_low": start, "_high": start + batch_size})
+            total += max(result.rowcount, 0)
+            done = min(start + batch_size - low, high - low + 1)
+            logger.info(f"Backfill {table}: {done / (high - low + 1):.0%} of id range, "
+                        f"{total} rows updated, {time.monotonic() - started:.1f}s")
+            if sleep:
+                time.sleep(sleep)
+    return total
+
+
+def set_not_null_online(table: str, column: str) -> None:
+    """
+    Postgres: NOT VALID check + VALIDATE (no write lock during the scan), then SET NOT NULL,
+    which reuses the validated constraint instead of scanning again (PG 12+).
+    SQLite cannot change nullability without copying the table, so it is left to the ORM there.
+    """
+    if not is_postgres():
+        return
+    constraint = f"{table}_{column}_not_null"
+    op.execute(sa.text(f"ALTER TABLE {table} DROP CONSTRAINT IF EXISTS {constraint}"))
+    op.execute(sa.text(f"ALTER TABLE {table} ADD CONSTRAINT {constraint} CHECK ({column} IS NOT NULL) NOT VALID"))
+    with op.get_context().autocommit_block():
+        op.execute(sa.text(f"ALTER TABLE {table} VALIDATE CONSTRAINT {constraint}"))
+    op.alter_column(table, column, nullable=False)
+    op.execute(sa.text(f"ALTER TABLE {table} DROP CONSTRAINT {constraint}"))
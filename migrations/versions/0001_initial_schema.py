@@ -0,0 +1,99 @@
+"""initial schema
+
+Tables as they were before migrations were managed by Alembic. Databases created earlier
+by Base.metadata.create_all already have them, so existing tables are left alone.
+
+Revision ID: 0001
+Revises:
+Create Date: 2026-10-19 00:00:00
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+from migrations.online_ops import has_table
+
+# revision identifiers, used by Alembic.
+revision: str = "0001"
+down_revision: Union[str, Sequence[str], None] = None
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    """Upgrade schema."""
+    if not has_table("tenants"):
+        op.create_table(
+            "tenants",
+            sa.Column("id", sa.Integer(), nullable=False),
+            sa.Column("name", sa.String(), nullable=False),
+            sa.Column("company_name", sa.String(), nullable=True),
+            sa.Column("api_key", sa.String(), nullable=False),
+            sa.Column("is_active", sa.Boolean(), nullable=True),
+            sa.Column("created_at", sa.DateTime(), nullable=True),
+            sa.PrimaryKeyConstraint("id"),
+            sa.UniqueConstraint("api_key"),
+        )
+        op.create_index("ix_tenants_id", "tenants", ["id"])
+
+    if not has_table("users"):
+        op.create_table(
+            "users",
+            sa.Column("id", sa.Integer(), nullable=False),
+            sa.Column("email", sa.String(), nullable=False),
+            sa.Column("password_hash", sa.String(), nullable=False),
+            sa.Column("role", sa.Enum("SUPER_ADMIN", "CLIENT_ADMIN", "CLIENT_USER", name="userrole"), nullable=False),
+            sa.Column("tenant_id", sa.Integer(), nullable=True),
+            sa.Column("is_active", sa.Boolean(), nullable=True),
+            sa.Column("created_at", sa.DateTime(), nullable=True),
+            sa.ForeignKeyConstraint(["tenant_id"], ["tenants.id"]),
+            sa.PrimaryKeyConstraint("id"),
+        )
+        op.create_index("ix_users_email", "users", ["email"], unique=True)
+        op.create_index("ix_users_id", "users", ["id"])
+
+    if not has_table("integrations"):
+        op.create_table(
+            "integrations",
+            sa.Column("id", sa.Integer(), nullable=False),
+            sa.Column("tenant_id", sa.Integer(), nullable=False),
+            sa.Column("integration_type", sa.Enum("JIRA", "CLICKUP", "LINEAR", name="integrationtype"), nullable=False),
+            sa.Column("config_json", sa.JSON(), nullable=True),
+            sa.Column("enabled", sa.Boolean(), nullable=True),
+            sa.Column("created_at", sa.DateTime(), nullable=True),
+            sa.ForeignKeyConstraint(["tenant_id"], ["tenants.id"]),
+            sa.PrimaryKeyConstraint("id"),
+        )
+        op.create_index("ix_integrations_id", "integrations", ["id"])
+
+    if not has_table("bug_reports"):
+        op.create_table(
+            "bug_reports",
+            sa.Column("id", sa.Integer(), nullable=False),
+            sa.Column("tenant_id", sa.Integer(), nullable=False),
+            sa.Column("description", sa.String(), nullable=True),
+            sa.Column("label", sa.JSON(), nullable=True),
+            sa.Column("struggle_score", sa.Float(), nullable=True),
+            sa.Column("metadata_json", sa.String(), nullable=True),
+            sa.Column("dom_snapshot", sa.String(), nullable=True),
+            sa.Column("status", sa.Enum("NEW", "IN_PROGRESS", "RESOLVED", "CLOSED", name="reportstatus"), nullable=True),
+            sa.Column("synced_to_integration", sa.Boolean(), nullable=True),
+            sa.Column("external_ticket_id", sa.String(), nullable=True),
+            sa.Column("created_at", sa.DateTime(), nullable=True),
+            sa.ForeignKeyConstraint(["tenant_id"], ["tenants.id"]),
+            sa.PrimaryKeyConstraint("id"),
+        )
+        op.create_index("ix_bug_reports_id", "bug_reports", ["id"])
+
+
+def downgrade() -> None:
+    """Downgrade schema."""
+    op.drop_table("bug_reports")
+    op.drop_table("integrations")
+    op.drop_table("users")
+    op.drop_table("tenants")
+    if op.get_bind().dialect.name == "postgresql":
+        for enum_name in ("reportstatus", "integrationtype", "userrole"):
+            op.execute(sa.text(f"DROP TYPE IF EXISTS {enum_name}"))
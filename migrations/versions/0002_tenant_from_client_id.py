@@ -0,0 +1,74 @@
+"""tenant_id from legacy client_id
+
+Replaces migration.py / fix_migration.py. Reports from before multi-tenancy carry the SDK
+key in bug_reports.client_id: create a tenant per distinct key (the key becomes its API key)
+plus a "Legacy" tenant, then fill tenant_id in batches instead of rebuilding the table.
+The triage columns added at the same time are created nullable and backfilled the same way.
+No-op on databases that never had client_id.
+
+Revision ID: 0002
+Revises: 0001
+Create Date: 2026-10-19 00:00:00
+
+"""
+import secrets
+from datetime import datetime
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+from migrations.online_ops import add_column_if_missing, batched_backfill, has_column, set_not_null_online
+
+# revision identifiers, used by Alembic.
+revision: str = "0002"
+down_revision: Union[str, Sequence[str], None] = "0001"
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    """Upgrade schema."""
+    if not has_column("bug_reports", "client_id"):
+        return
+
+    report_status = sa.Enum("NEW", "IN_PROGRESS", "RESOLVED", "CLOSED", name="reportstatus")
+    report_status.create(op.get_bind(), checkfirst=True)
+    add_column_if_missing("bug_reports", sa.Column("tenant_id", sa.Integer(), nullable=True))
+    add_column_if_missing("bug_reports", sa.Column("status", report_status, nullable=True))
+    add_column_if_missing("bug_reports", sa.Column("synced_to_integration", sa.Boolean(), nullable=True))
+    add_column_if_missing("bug_reports", sa.Column("external_ticket_id", sa.String(), nullable=True))
+
+    bind = op.get_bind()
+    tenants = sa.table("tenants", sa.column("name"), sa.column("company_name"), sa.column("api_key"),
+                       sa.column("is_active"), sa.column("created_at"))
+    existing = {row[0] for row in bind.execute(sa.text("SELECT api_key FROM tenants"))}
+    client_ids = [row[0] for row in bind.execute(sa.text(
+        "SELECT DISTINCT client_id FROM bug_reports WHERE client_id IS NOT NULL AND tenant_id IS NULL"
+    ))]
+    new_tenants = [
+        {"name": f"Migrated: {client_id[:20]}", "company_name": f"Auto-migrated from client_id: {client_id}",
+         "api_key": client_id, "is_active": True, "created_at": datetime.utcnow()}
+        for client_id in client_ids if client_id not in existing
+    ]
+    if bind.execute(sa.text("SELECT 1 FROM tenants WHERE name = 'Legacy'")).first() is None:
+        new_tenants.append({"name": "Legacy", "company_name": "Legacy Reports", "api_key": secrets.token_urlsafe(32),
+                            "is_active": True, "created_at": datetime.utcnow()})
+    if new_tenants:
+        op.bulk_insert(tenants, new_tenants)
+
+    batched_backfill(
+        "bug_reports",
+        "tenant_id = COALESCE((SELECT t.id FROM tenants t WHERE t.api_key = bug_reports.client_id), "
+        "(SELECT t.id FROM tenants t WHERE t.name = 'Legacy' ORDER BY t.id LIMIT 1))",
+        where="tenant_id IS NULL",
+    )
+    batched_backfill("bug_reports", "status = 'NEW', synced_to_integration = :synced",
+                     where="status IS NULL", params={"synced": False})
+    set_not_null_online("bug_reports", "tenant_id")
+
+
+def downgrade() -> None:
+    """Downgrade schema."""
+    # Data migration: tenants and tenant_id values are kept
+    pass
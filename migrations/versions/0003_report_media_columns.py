@@ -0,0 +1,33 @@
+"""report media columns
+
+Revision ID: 0003
+Revises: 0002
+Create Date: 2026-10-19 00:00:00
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+from migrations.online_ops import add_column_if_missing
+
+# revision identifiers, used by Alembic.
+revision: str = "0003"
+down_revision: Union[str, Sequence[str], None] = "0002"
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    """Upgrade schema."""
+    for name in ("video_url", "thumbnail_url", "preview_url"):
+        add_column_if_missing("bug_reports", sa.Column(name, sa.String(), nullable=True))
+
+
+def downgrade() -> None:
+    """Downgrade schema."""
+    with op.batch_alter_table("bug_reports") as batch_op:
+        batch_op.drop_column("preview_url")
+        batch_op.drop_column("thumbnail_url")
+        batch_op.drop_column("video_url")
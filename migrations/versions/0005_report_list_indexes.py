@@ -0,0 +1,31 @@
+"""report list indexes
+
+Every dashboard query filters bug_reports by tenant and sorts by created_at, optionally
+filtering by status. Built concurrently on Postgres so ingestion keeps writing.
+
+Revision ID: 0005
+Revises: 0004
+Create Date: 2026-10-19 00:00:00
+
+"""
+from typing import Sequence, Union
+
+from migrations.online_ops import create_index_online, drop_index_online
+
+# revision identifiers, used by Alembic.
+revision: str = "0005"
+down_revision: Union[str, Sequence[str], None] = "0004"
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    """Upgrade schema."""
+    create_index_online("ix_bug_reports_tenant_id_created_at", "bug_reports", ["tenant_id", "created_at"])
+    create_index_online("ix_bug_reports_tenant_id_status", "bug_reports", ["tenant_id", "status"])
+
+
+def downgrade() -> None:
+    """Downgrade schema."""
+    drop_index_online("ix_bug_reports_tenant_id_status", "bug_reports")
+    drop_index_online("ix_bug_reports_tenant_id_created_at", "bug_reports")
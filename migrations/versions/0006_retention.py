@@ -0,0 +1,59 @@
+"""retention policies and report archives
+
+Revision ID: 0006
+Revises: 0005
+Create Date: 2026-10-19 00:00:00
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+from migrations.online_ops import has_table
+
+# revision identifiers, used by Alembic.
+revision: str = "0006"
+down_revision: Union[str, Sequence[str], None] = "0005"
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    """Upgrade schema."""
+    if not has_table("retention_policies"):
+        op.create_table(
+            "retention_policies",
+            sa.Column("tenant_id", sa.Integer(), nullable=False),
+            sa.Column("retain_days", sa.Integer(), nullable=False),
+            sa.Column("video_action", sa.Enum("DELETE", "COLD_STORAGE", "KEEP", name="videoretention"), nullable=False),
+            sa.Column("updated_at", sa.DateTime(), nullable=True),
+            sa.ForeignKeyConstraint(["tenant_id"], ["tenants.id"]),
+            sa.PrimaryKeyConstraint("tenant_id"),
+        )
+    if not has_table("report_archives"):
+        op.create_table(
+            "report_archives",
+            sa.Column("id", sa.Integer(), nullable=False),
+            sa.Column("tenant_id", sa.Integer(), nullable=False),
+            sa.Column("location", sa.String(), nullable=False),
+            sa.Column("format", sa.String(), nullable=False),
+            sa.Column("report_count", sa.Integer(), nullable=False),
+            sa.Column("first_report_id", sa.Integer(), nullable=False),
+            sa.Column("last_report_id", sa.Integer(), nullable=False),
+            sa.Column("oldest_created_at", sa.DateTime(), nullable=True),
+            sa.Column("newest_created_at", sa.DateTime(), nullable=True),
+            sa.Column("created_at", sa.DateTime(), nullable=True),
+            sa.ForeignKeyConstraint(["tenant_id"], ["tenants.id"]),
+            sa.PrimaryKeyConstraint("id"),
+        )
+        op.create_index("ix_report_archives_id", "report_archives", ["id"])
+        op.create_index("ix_report_archives_tenant_id", "report_archives", ["tenant_id"])
+
+
+def downgrade() -> None:
+    """Downgrade schema."""
+    op.drop_table("report_archives")
+    op.drop_table("retention_policies")
+    if op.get_bind().dialect.name == "postgresql":
+        op.execute(sa.text("DROP TYPE IF EXISTS videoretention"))
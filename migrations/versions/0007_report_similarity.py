@@ -0,0 +1,64 @@
+"""report similarity signatures, LSH buckets and duplicate links
+
+Revision ID: 0007
+Revises: 0006
+Create Date: 2026-10-19 00:00:00
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+from migrations.online_ops import has_table
+
+# revision identifiers, used by Alembic.
+revision: str = "0007"
+down_revision: Union[str, Sequence[str], None] = "0006"
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    """Upgrade schema."""
+    if not has_table("report_signatures"):
+        op.create_table(
+            "report_signatures",
+            sa.Column("report_id", sa.Integer(), nullable=False),
+            sa.Column("tenant_id", sa.Integer(), nullable=False),
+            sa.Column("minhash", sa.LargeBinary(), nullable=True),
+            sa.Column("dom_hash", sa.BigInteger(), nullable=True),
+            sa.Column("created_at", sa.DateTime(), nullable=True),
+            sa.ForeignKeyConstraint(["tenant_id"], ["tenants.id"]),
+            sa.PrimaryKeyConstraint("report_id"),
+        )
+    if not has_table("report_lsh_buckets"):
+        op.create_table(
+            "report_lsh_buckets",
+            sa.Column("tenant_id", sa.Integer(), nullable=False),
+            sa.Column("band", sa.SmallInteger(), nullable=False),
+            sa.Column("bucket", sa.BigInteger(), nullable=False),
+            sa.Column("report_id", sa.Integer(), nullable=False),
+            sa.ForeignKeyConstraint(["tenant_id"], ["tenants.id"]),
+            sa.PrimaryKeyConstraint("tenant_id", "band", "bucket", "report_id"),
+        )
+        op.create_index("ix_report_lsh_buckets_report_id", "report_lsh_buckets", ["report_id"])
+    if not has_table("report_links"):
+        op.create_table(
+            "report_links",
+            sa.Column("report_id", sa.Integer(), nullable=False),
+            sa.Column("similar_report_id", sa.Integer(), nullable=False),
+            sa.Column("tenant_id", sa.Integer(), nullable=False),
+            sa.Column("score", sa.Float(), nullable=False),
+            sa.Column("created_at", sa.DateTime(), nullable=True),
+            sa.ForeignKeyConstraint(["tenant_id"], ["tenants.id"]),
+            sa.PrimaryKeyConstraint("report_id", "similar_report_id"),
+        )
+        op.create_index("ix_report_links_similar_report_id", "report_links", ["similar_report_id"])
+
+
+def downgrade() -> None:
+    """Downgrade schema."""
+    op.drop_table("report_links")
+    op.drop_table("report_lsh_buckets")
+    op.drop_table("report_signatures")
@@ -0,0 +1,138 @@
+"""label dictionary and report_labels
+
+Creates the per-tenant label dictionary and the report <-> label join table, then
+canonicalises the labels of existing reports and fills report_labels in id batches.
+bug_reports.label is rewritten only where canonicalisation changed it.
+
+Revision ID: 0008
+Revises: 0007
+Create Date: 2026-10-19 00:00:00
+
+"""
+import json
+import re
+import time
+import unicodedata
+from datetime import datetime
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+from migrations.online_ops import MIGRATION_BATCH_SIZE, MIGRATION_BATCH_SLEEP, has_table, logger
+
+# revision identifiers, used by Alembic.
+revision: str = "0008"
+down_revision: Union[str, Sequence[str], None] = "0007"
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+# Frozen copy of labels.normalize_label as of this revision
+SYNONYMS = {
+    "user interface": "ui", "gui": "ui", "log in": "login", "sign in": "login", "signin": "login",
+    "a11y": "accessibility", "perf": "performance", "btn": "button", "buttons": "button",
+    "errors": "error", "crashes": "crash", "forms": "form",
+}
+
+
+def _normalize(raw):
+    if not raw or not isinstance(raw, str):
+        return None
+    name = unicodedata.normalize("NFKC", raw).casefold()
+    name = re.sub(r"[^\w +#]", "", re.sub(r"[\s_\-/.]+", " ", name)).strip()[:50].strip()
+    return SYNONYMS.get(name, name) if name else None
+
+
+def _parse(value):
+    # Legacy rows may hold the label list as a JSON-encoded string
+    for _ in range(2):
+        if isinstance(value, str):
+            try:
+                value = json.loads(value)
+            except ValueError:
+                return [value]
+    return value if isinstance(value, list) else []
+
+
+def upgrade() -> None:
+    """Upgrade schema."""
+    if not has_table("labels"):
+        op.create_table(
+            "labels",
+            sa.Column("id", sa.Integer(), nullable=False),
+            sa.Column("tenant_id", sa.Integer(), nullable=False),
+            sa.Column("name", sa.String(), nullable=False),
+            sa.Column("created_at", sa.DateTime(), nullable=True),
+            sa.ForeignKeyConstraint(["tenant_id"], ["tenants.id"]),
+            sa.PrimaryKeyConstraint("id"),
+            sa.UniqueConstraint("tenant_id", "name", name="uq_labels_tenant_id_name"),
+        )
+        op.create_index("ix_labels_id", "labels", ["id"])
+    if not has_table("report_labels"):
+        op.create_table(
+            "report_labels",
+            sa.Column("report_id", sa.Integer(), nullable=False),
+            sa.Column("label_id", sa.Integer(), nullable=False),
+            sa.Column("tenant_id", sa.Integer(), nullable=False),
+            sa.ForeignKeyConstraint(["label_id"], ["labels.id"]),
+            sa.ForeignKeyConstraint(["tenant_id"], ["tenants.id"]),
+            sa.PrimaryKeyConstraint("report_id", "label_id"),
+        )
+        op.create_index("ix_report_labels_label_id_report_id", "report_labels", ["label_id", "report_id"])
+
+    bind = op.get_bind()
+    low, high = bind.execute(sa.text("SELECT MIN(id), MAX(id) FROM bug_reports")).one()
+    if low is None:
+        return
+    labels = sa.table("labels", sa.column("id"), sa.column("tenant_id"), sa.column("name"), sa.column("created_at"))
+    label_ids = {(tenant_id, name): label_id
+                 for label_id, tenant_id, name in bind.execute(sa.text("SELECT id, tenant_id, name FROM labels"))}
+    report_labels = sa.table("report_labels", sa.column("report_id"), sa.column("label_id"), sa.column("tenant_id"))
+    rewrite = sa.text("UPDATE bug_reports SET label = :label WHERE id IN :ids").bindparams(
+        sa.bindparam("label", type_=sa.JSON()), sa.bindparam("ids", expanding=True))
+
+    started = time.monotonic()
+    with op.get_context().autocommit_block():
+        for start in range(low, high + 1, MIGRATION_BATCH_SIZE):
+            rows = bind.execute(sa.text(
+                "SELECT r.id, r.tenant_id, r.label FROM bug_reports r WHERE r.id >= :low AND r.id < :high "
+                "AND r.tenant_id IS NOT NULL AND NOT EXISTS (SELECT 1 FROM report_labels l WHERE l.report_id = r.id)"
+            ), {"low": start, "high": start + MIGRATION_BATCH_SIZE}).all()
+
+            links, rewrites = [], {}
+            for report_id, tenant_id, raw in rows:
+                raw_names = _parse(raw)
+                names = []
+                for raw_name in raw_names:
+                    name = _normalize(raw_name)
+                    if name and name not in names:
+                        names.append(name)
+                new = [name for name in names if (tenant_id, name) not in label_ids]
+                if new:
+                    bind.execute(labels.insert(), [{"tenant_id": tenant_id, "name": name, "created_at": datetime.utcnow()}
+                                                   for name in new])
+                    label_ids.update({(tenant_id, name): label_id for label_id, name in bind.execute(
+                        sa.text("SELECT id, name FROM labels WHERE tenant_id = :tenant"), {"tenant": tenant_id})})
+                links.extend({"report_id": report_id, "label_id": label_ids[(tenant_id, name)], "tenant_id": tenant_id}
+                             for name in names)
+                if names != raw_names:
+                    rewrites.setdefault(tuple(names), []).append(report_id)
+
+            # Multi-row INSERTs: each statement commits on its own inside the autocommit block
+            for i in range(0, len(links), 1000):
+                bind.execute(report_labels.insert().values(links[i:i + 1000]))
+            # One UPDATE per distinct label list: batches mostly repeat the same few
+            for names, ids in rewrites.items():
+                bind.execute(rewrite, {"label": list(names), "ids": ids})
+            done = min(start + MIGRATION_BATCH_SIZE - low, high - low + 1)
+            logger.info(f"Labels: {done / (high - low + 1):.0%} of id range, {len(links)} links in batch, "
+                        f"{time.monotonic() - started:.1f}s")
+            if MIGRATION_BATCH_SLEEP:
+                time.sleep(MIGRATION_BATCH_SLEEP)
+
+
+def downgrade() -> None:
+    """Downgrade schema."""
+    # Canonicalised bug_reports.label values are kept
+    op.drop_table("report_labels")
+    op.drop_table("labels")
@@ -0,0 +1,47 @@
+"""resumable upload sessions
+
+Revision ID: 0009
+Revises: 0008
+Create Date: 2026-10-19 00:00:00
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+from migrations.online_ops import has_table
+
+# revision identifiers, used by Alembic.
+revision: str = "0009"
+down_revision: Union[str, Sequence[str], None] = "0008"
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    """Upgrade schema."""
+    if not has_table("upload_sessions"):
+        op.create_table(
+            "upload_sessions",
+            sa.Column("id", sa.String(), nullable=False),
+            sa.Column("tenant_id", sa.Integer(), nullable=False),
+            sa.Column("length", sa.BigInteger(), nullable=False),
+            sa.Column("received", sa.BigInteger(), nullable=False),
+            sa.Column("content_type", sa.String(), nullable=True),
+            sa.Column("filename", sa.String(), nullable=True),
+            sa.Column("status", sa.Enum("UPLOADING", "FINALIZING", "COMPLETED", name="uploadstatus"), nullable=False),
+            sa.Column("report_id", sa.Integer(), nullable=True),
+            sa.Column("created_at", sa.DateTime(), nullable=True),
+            sa.Column("expires_at", sa.DateTime(), nullable=False),
+            sa.ForeignKeyConstraint(["tenant_id"], ["tenants.id"]),
+            sa.PrimaryKeyConstraint("id"),
+        )
+        op.create_index("ix_upload_sessions_expires_at", "upload_sessions", ["expires_at"])
+
+
+def downgrade() -> None:
+    """Downgrade schema."""
+    op.drop_table("upload_sessions")
+    if op.get_bind().dialect.name == "postgresql":
+        op.execute(sa.text("DROP TYPE IF EXISTS uploadstatus"))
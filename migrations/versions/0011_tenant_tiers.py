@@ -0,0 +1,34 @@
+"""tenant plan tiers, for processing priority
+
+Revision ID: 0011
+Revises: 0010
+Create Date: 2026-10-19 00:00:00
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+from migrations.online_ops import add_column_if_missing, batched_backfill
+
+# revision identifiers, used by Alembic.
+revision: str = "0011"
+down_revision: Union[str, Sequence[str], None] = "0010"
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+tenant_tier = sa.Enum("FREE", "PRO", "ENTERPRISE", name="tenanttier")
+
+
+def upgrade() -> None:
+    """Upgrade schema."""
+    tenant_tier.create(op.get_bind(), checkfirst=True)
+    add_column_if_missing("tenants", sa.Column("tier", tenant_tier, nullable=True))
+    batched_backfill("tenants", "tier = 'FREE'", where="tier IS NULL")
+
+
+def downgrade() -> None:
+    """Downgrade schema."""
+    op.drop_column("tenants", "tier")
+    tenant_tier.drop(op.get_bind(), checkfirst=True)
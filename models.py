@@ -1,4 +1,4 @@
-from sqlalchemy import Column, Integer, String, Float, DateTime, JSON, ForeignKey, Boolean, Enum as SQLEnum, LargeBinary
+from sqlalchemy import Column, Integer, BigInteger, SmallInteger, String, Float, DateTime, JSON, ForeignKey, Boolean, Enum as SQLEnum, LargeBinary, Index, UniqueConstraint
 from sqlalchemy.orm import relationship
 from db import Base
 from datetime import datetime
@@ -16,6 +16,21 @@ class ReportStatus(str, enum.Enum):
     RESOLVED = "RESOLVED"
     CLOSED = "CLOSED"
 
+class VideoRetention(str, enum.Enum):
+    DELETE = "DELETE"
+    COLD_STORAGE = "COLD_STORAGE"
+    KEEP = "KEEP"
+
+class UploadStatus(str, enum.Enum):
+    UPLOADING = "UPLOADING"
+    FINALIZING = "FINALIZING"
+    COMPLETED = "COMPLETED"
+
+class TenantTier(str, enum.Enum):
+    FREE = "FREE"
+    PRO = "PRO"
+    ENTERPRISE = "ENTERPRISE"
+
 class IntegrationType(str, enum.Enum):
     JIRA = "JIRA"
     CLICKUP = "CLICKUP"
@@ -29,6 +44,8 @@ class Tenant(Base):
     company_name = Column(String, nullable=True)
     api_key = Column(String, unique=True, nullable=False, default=lambda: secrets.token_urlsafe(32))
     is_active = Column(Boolean, default=True)
+    # Plan tier; weighs into the processing priority of the tenant's reports (priority.py)
+    tier = Column(SQLEnum(TenantTier), default=TenantTier.FREE)
     created_at = Column(DateTime, default=datetime.utcnow)
 
     # Relationships
@@ -77,7 +94,134 @@ class BugReport(Base):
     synced_to_integration = Column(Boolean, default=False)
     external_ticket_id = Column(String, nullable=True)
     video_url = Column(String, nullable=True)
+    thumbnail_url = Column(String, nullable=True)  # Poster frame (JPEG), stored next to the video
+    preview_url = Column(String, nullable=True)  # Small animated preview strip (WebP)
     created_at = Column(DateTime, default=datetime.utcnow)
 
     # Relationships
     tenant = relationship("Tenant", back_populates="bug_reports")
+
+    # Dashboard list/stats queries filter by tenant and sort by date or filter by status
+    __table_args__ = (
+        Index("ix_bug_reports_tenant_id_created_at", "tenant_id", "created_at"),
+        Index("ix_bug_reports_tenant_id_status", "tenant_id", "status"),
+    )
+
+class TenantVersion(Base):
+    """Per-tenant change counter, bumped on every report write; drives the ETags of cached read endpoints"""
+    __tablename__ = "tenant_versions"
+
+    tenant_id = Column(Integer, ForeignKey("tenants.id"), primary_key=True)
+    version = Column(Integer, nullable=False, default=0)
+    updated_at = Column(DateTime, default=datetime.utcnow)
+
+class RetentionPolicy(Base):
+    """How long a tenant's reports stay in bug_reports before being archived"""
+    __tablename__ = "retention_policies"
+
+    tenant_id = Column(Integer, ForeignKey("tenants.id"), primary_key=True)
+    retain_days = Column(Integer, nullable=False)
+    video_action = Column(SQLEnum(VideoRetention), nullable=False, default=VideoRetention.DELETE)
+    updated_at = Column(DateTime, default=datetime.utcnow)
+
+class ReportArchive(Base):
+    """One archive file of reports removed from bug_reports by the retention job"""
+    __tablename__ = "report_archives"
+
+    id = Column(Integer, primary_key=True, index=True)
+    tenant_id = Column(Integer, ForeignKey("tenants.id"), nullable=False, index=True)
+    location = Column(String, nullable=False)  # local://archive/... or supabase://archive/...
+    format = Column(String, nullable=False)
+    report_count = Column(Integer, nullable=False)
+    first_report_id = Column(Integer, nullable=False)
+    last_report_id = Column(Integer, nullable=False)
+    oldest_created_at = Column(DateTime, nullable=True)
+    newest_created_at = Column(DateTime, nullable=True)
+    created_at = Column(DateTime, default=datetime.utcnow)
+
+# report_id columns below have no foreign key: a partitioned bug_reports (partitions.py) has no
+# unique key on id alone. Rows are removed with their report by similarity.forget_reports(),
+# labels.forget_reports() and enrichment.forget_reports().
+
+class ReportSignature(Base):
+    """Compact similarity signature of a report (similarity.py)"""
+    __tablename__ = "report_signatures"
+
+    report_id = Column(Integer, primary_key=True)
+    tenant_id = Column(Integer, ForeignKey("tenants.id"), nullable=False)
+    minhash = Column(LargeBinary, nullable=True)  # MinHash of transcript/description and labels
+    dom_hash = Column(BigInteger, nullable=True)  # SimHash of the DOM snapshot's tag structure
+    created_at = Column(DateTime, default=datetime.utcnow)
+
+class ReportLshBucket(Base):
+    """Per-tenant LSH index: one row per (band, bucket) a report's signature falls in"""
+    __tablename__ = "report_lsh_buckets"
+
+    tenant_id = Column(Integer, ForeignKey("tenants.id"), primary_key=True)
+    band = Column(SmallInteger, primary_key=True)
+    bucket = Column(BigInteger, primary_key=True)
+    report_id = Column(Integer, primary_key=True, index=True)
+
+class ReportLink(Base):
+    """A likely duplicate found at ingestion: report_id is the newer report, similar_report_id the older one"""
+    __tablename__ = "report_links"
+
+    report_id = Column(Integer, primary_key=True)
+    similar_report_id = Column(Integer, primary_key=True, index=True)
+    tenant_id = Column(Integer, ForeignKey("tenants.id"), nullable=False)
+    score = Column(Float, nullable=False)
+    created_at = Column(DateTime, default=datetime.utcnow)
+
+class Label(Base):
+    """Per-tenant dictionary of canonical label names (labels.py)"""
+    __tablename__ = "labels"
+
+    id = Column(Integer, primary_key=True, index=True)
+    tenant_id = Column(Integer, ForeignKey("tenants.id"), nullable=False)
+    name = Column(String, nullable=False)
+    created_at = Column(DateTime, default=datetime.utcnow)
+
+    __table_args__ = (
+        UniqueConstraint("tenant_id", "name", name="uq_labels_tenant_id_name"),
+    )
+
+class ReportLabel(Base):
+    """Report <-> label links; labels are per tenant, so label_id alone scopes a filter to one tenant"""
+    __tablename__ = "report_labels"
+
+    report_id = Column(Integer, primary_key=True)
+    label_id = Column(Integer, ForeignKey("labels.id"), primary_key=True)
+    tenant_id = Column(Integer, ForeignKey("tenants.id"), nullable=False)
+
+    # Label filters look up report ids by label
+    __table_args__ = (
+        Index("ix_report_labels_label_id_report_id", "label_id", "report_id"),
+    )
+
+
+class UploadSession(Base):
+    """A resumable SDK video upload (routers/uploads.py); the bytes are spooled by uploads.py until finalised"""
+    __tablename__ = "upload_sessions"
+
+    id = Column(String, primary_key=True)  # Unguessable token, part of the upload URL
+    tenant_id = Column(Integer, ForeignKey("tenants.id"), nullable=False)
+    length = Column(BigInteger, nullable=False)  # Total size announced by the SDK
+    received = Column(BigInteger, nullable=False, default=0)  # Bytes stored so far: the next chunk's offset
+    content_type = Column(String, nullable=True)
+    filename = Column(String, nullable=True)
+    status = Column(SQLEnum(UploadStatus), nullable=False, default=UploadStatus.UPLOADING)
+    report_id = Column(Integer, nullable=True)  # Set once finalised, so retried finalisations are answered
+    created_at = Column(DateTime, default=datetime.utcnow)
+    expires_at = Column(DateTime, nullable=False, index=True)
+
+class EnrichmentJob(Base):
+    """A report whose transcript or labels could not be generated at ingestion, retried by enrichment.py"""
+    __tablename__ = "enrichment_jobs"
+
+    report_id = Column(Integer, primary_key=True)
+    tenant_id = Column(Integer, ForeignKey("tenants.id"), nullable=False)
+    reason = Column(String, nullable=False)  # "transcript" (transcribe, then label) or "labels"
+    attempts = Column(Integer, nullable=False, default=0)
+    next_attempt_at = Column(DateTime, nullable=True, index=True)  # NULL: gave up, see manage.py enrich-reports
+    last_error = Column(String, nullable=True)
+    created_at = Column(DateTime, default=datetime.utcnow)
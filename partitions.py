@@ -0,0 +1,314 @@
+"""
+Optional monthly partitioning of bug_reports on Postgres.
+
+`python manage.py partition-reports` converts bug_reports, online and once, into a table
+partitioned by RANGE (created_at) with one partition per month, each optionally
+sub-partitioned by HASH (tenant_id) into PARTITION_TENANT_BUCKETS buckets. Afterwards
+`python manage.py maintain-partitions` (cron, or the in-app retention scheduler):
+
+- creates the partitions for the next PARTITION_MONTHS_AHEAD months. There is no default
+  partition, so an insert past the last existing month would fail;
+- detaches months older than PARTITION_DETACH_AFTER_MONTHS (0 keeps them all) and drops
+  them once empty, which is what retention leaves behind. A detached month that still holds
+  reports is kept as a standalone table unless dropping is forced.
+
+Pruning: queries filtering on created_at (the report list's date range, retention) only read
+the matching months, and with tenant buckets queries filtering on tenant_id only read that
+tenant's bucket of each month. Lookups by id carry no created_at, so they probe the id index
+of every month (of the tenant's bucket, for tenant-scoped lookups); keep
+PARTITION_DETACH_AFTER_MONTHS set so that number stays small. With tenant buckets the
+primary key is (id, created_at, tenant_id), since Postgres requires it to include the
+partition key of every level; buckets can only be chosen when converting the table.
+SQLite keeps a single table and everything here is a no-op there.
+"""
+
+import logging
+import os
+import re
+import time
+from contextlib import contextmanager
+from datetime import date, datetime
+from typing import Optional
+
+from sqlalchemy import text
+
+from db import engine
+
+logger = logging.getLogger(__name__)
+
+PARTITION_MONTHS_AHEAD = int(os.environ.get("PARTITION_MONTHS_AHEAD", "3"))
+PARTITION_TENANT_BUCKETS = int(os.environ.get("PARTITION_TENANT_BUCKETS", "0"))
+PARTITION_DETACH_AFTER_MONTHS = int(os.environ.get("PARTITION_DETACH_AFTER_MONTHS", "0"))
+# DDL here waits at most this long for its lock instead of queueing ingestion behind it
+PARTITION_LOCK_TIMEOUT = os.environ.get("PARTITION_LOCK_TIMEOUT", "5s")
+PARTITION_COPY_BATCH_SIZE = int(os.environ.get("PARTITION_COPY_BATCH_SIZE", "5000"))
+PARTITION_COPY_BATCH_SLEEP = float(os.environ.get("PARTITION_COPY_BATCH_SLEEP", "0.05"))
+
+TABLE = "bug_reports"
+STAGING_TABLE = "bug_reports_partitioned"
+# The original heap is kept under this name after the swap, until dropped by hand
+OLD_TABLE = "bug_reports_unpartitioned"
+_SYNC_TRIGGER = "bug_reports_partitioned_sync"
+_PARTITION_NAME = re.compile(r"^bug_reports_p(\d{4})_(\d{2})$")
+
+
+def is_supported() -> bool:
+    return engine.dialect.name == "postgresql"
+
+
+def _add_months(month: date, months: int) -> date:
+    years, index = divmod(month.month - 1 + months, 12)
+    return date(month.year + years, index + 1, 1)
+
+
+def partition_name(month: date) -> str:
+    return f"bug_reports_p{month:%Y_%m}"
+
+
+@contextmanager
+def _ddl_connection():
+    """Autocommit connection (DETACH CONCURRENTLY refuses transactions) with a lock timeout"""
+    with engine.connect() as conn:
+        conn.execution_options(isolation_level="AUTOCOMMIT")
+        conn.execute(text(f"SET lock_timeout = '{PARTITION_LOCK_TIMEOUT}'"))
+        try:
+            yield conn
+        finally:
+            conn.execute(text("RESET lock_timeout"))
+
+
+def is_partitioned(conn) -> bool:
+    return bool(conn.execute(text(
+        "SELECT EXISTS (SELECT 1 FROM pg_partitioned_table WHERE partrelid = to_regclass(:table))"
+    ), {"table": TABLE}).scalar())
+
+
+def _primary_key_has_tenant(conn, table: str) -> bool:
+    return bool(conn.execute(text(
+        "SELECT EXISTS (SELECT 1 FROM pg_index i JOIN pg_attribute a "
+        "ON a.attrelid = i.indrelid AND a.attnum = ANY(i.indkey) "
+        "WHERE i.indrelid = to_regclass(:table) AND i.indisprimary AND a.attname = 'tenant_id')"
+    ), {"table": table}).scalar())
+
+
+def _create_month(conn, parent: str, month: date, tenant_buckets: int) -> bool:
+    """Creates the partition for month (and its tenant buckets); False if it already exists"""
+    name = partition_name(month)
+    if conn.execute(text("SELECT to_regclass(:name)"), {"name": name}).scalar():
+        return False
+    subpartitioned = " PARTITION BY HASH (tenant_id)" if tenant_buckets else ""
+    conn.execute(text(
+        f"CREATE TABLE {name} PARTITION OF {parent} "
+        f"FOR VALUES FROM ('{month}') TO ('{_add_months(month, 1)}'){subpartitioned}"
+    ))
+    for remainder in range(tenant_buckets):
+        conn.execute(text(
+            f"CREATE TABLE {name}_h{remainder} PARTITION OF {name} "
+            f"FOR VALUES WITH (MODULUS {tenant_buckets}, REMAINDER {remainder})"
+        ))
+    return True
+
+
+def ensure_future_partitions(months_ahead: int = PARTITION_MONTHS_AHEAD, today: Optional[date] = None,
+                             tenant_buckets: int = PARTITION_TENANT_BUCKETS) -> list[str]:
+    """Creates any missing partition from this month to months_ahead; returns the new ones"""
+    if not is_supported():
+        return []
+    this_month = (today or datetime.utcnow().date()).replace(day=1)
+    created = []
+    with _ddl_connection() as conn:
+        if not is_partitioned(conn):
+            return []
+        if tenant_buckets and not _primary_key_has_tenant(conn, TABLE):
+            logger.error("Partitions: PARTITION_TENANT_BUCKETS is set but bug_reports was partitioned "
+                         "without tenant buckets (its primary key lacks tenant_id); creating plain months")
+            tenant_buckets = 0
+        for offset in range(months_ahead + 1):
+            month = _add_months(this_month, offset)
+            if _create_month(conn, TABLE, month, tenant_buckets):
+                created.append(partition_name(month))
+    for name in created:
+        logger.info(f"Partitions: created {name}")
+    return created
+
+
+def _month_partitions(conn) -> list[tuple[str, date, bool]]:
+    """(name, month, detach pending) for each monthly partition of bug_reports"""
+    # A DETACH CONCURRENTLY that was interrupted leaves the partition pending (PG 14+)
+    pending = "i.inhdetachpending" if conn.dialect.server_version_info >= (14,) else "false"
+    rows = conn.execute(text(
+        f"SELECT c.relname, {pending} FROM pg_inherits i JOIN pg_class c ON c.oid = i.inhrelid "
+        "WHERE i.inhparent = to_regclass(:table) ORDER BY c.relname"
+    ), {"table": TABLE}).all()
+    partitions = []
+    for name, detach_pending in rows:
+        match = _PARTITION_NAME.match(name)
+        if match:
+            partitions.append((name, date(int(match.group(1)), int(match.group(2)), 1), detach_pending))
+    return partitions
+
+
+def expire_partitions(older_than_months: int = PARTITION_DETACH_AFTER_MONTHS, drop: bool = False,
+                      today: Optional[date] = None) -> dict:
+    """
+    Detaches every month ending more than older_than_months months ago, then drops it if it
+    is empty or drop is set. Returns {"detached": [...], "dropped": [...]}.
+    """
+    result = {"detached": [], "dropped": []}
+    if not is_supported() or older_than_months <= 0:
+        return result
+    cutoff = _add_months((today or datetime.utcnow().date()).replace(day=1), -older_than_months)
+
+    with _ddl_connection() as conn:
+        if not is_partitioned(conn):
+            return result
+        # CONCURRENTLY only blocks queries on the detached month, not on bug_reports (PG 14+)
+        concurrently = " CONCURRENTLY" if conn.dialect.server_version_info >= (14,) else ""
+        for name, month, detach_pending in _month_partitions(conn):
+            if _add_months(month, 1) > cutoff:
+                continue
+            mode = " FINALIZE" if detach_pending else concurrently
+            conn.execute(text(f"ALTER TABLE {TABLE} DETACH PARTITION {name}{mode}"))
+            result["detached"].append(name)
+            logger.info(f"Partitions: detached {name}")
+
+            if not drop and conn.execute(text(f"SELECT EXISTS (SELECT 1 FROM {name})")).scalar():
+                logger.warning(f"Partitions: {name} still holds reports not archived by retention, "
+                               f"kept as a standalone table")
+                continue
+            conn.execute(text(f"DROP TABLE {name}"))
+            result["dropped"].append(name)
+            logger.info(f"Partitions: dropped {name}")
+    return result
+
+
+def maintain(months_ahead: int = PARTITION_MONTHS_AHEAD, detach_after_months: int = PARTITION_DETACH_AFTER_MONTHS,
+             drop: bool = False) -> dict:
+    """Periodic upkeep of a partitioned bug_reports; does nothing when it is not partitioned"""
+    return {
+        "created": ensure_future_partitions(months_ahead),
+        **expire_partitions(detach_after_months, drop=drop),
+    }
+
+
+def _copy_in_batches(conn, statement: str, batch_size: int, sleep: float) -> int:
+    """Runs statement over bug_reports id ranges [:low, :high), each range committed on its own"""
+    low, high = conn.execute(text(f"SELECT MIN(id), MAX(id) FROM {TABLE}")).one()
+    if low is None:
+        return 0
+    total = 0
+    started = time.monotonic()
+    for start in range(low, high + 1, batch_size):
+        total += max(conn.execute(text(statement), {"low": start, "high": start + batch_size}).rowcount, 0)
+        done = min(start + batch_size - low, high - low + 1)
+        logger.info(f"Partitions: {done / (high - low + 1):.0%} of id range, {total} rows, "
+                    f"{time.monotonic() - started:.1f}s")
+        if sleep:
+            time.sleep(sleep)
+    return total
+
+
+def convert_to_partitioned(tenant_buckets: int = PARTITION_TENANT_BUCKETS, months_ahead: int = PARTITION_MONTHS_AHEAD,
+                           batch_size: int = PARTITION_COPY_BATCH_SIZE,
+                           sleep: float = PARTITION_COPY_BATCH_SLEEP) -> bool:
+    """
+    Rebuilds bug_reports as a partitioned table while ingestion continues:
+
+    1. a partitioned copy is created with every month from the oldest report to months_ahead,
+       and the same indexes; the primary key becomes (id, created_at), plus tenant_id with
+       tenant buckets, as Postgres requires the partition keys of every level in it;
+    2. a trigger mirrors every write on bug_reports into the copy;
+    3. existing rows are copied in id batches (FOR SHARE, so a concurrent update waits for
+       its batch and is then mirrored over the copied row);
+    4. one short ACCESS EXCLUSIVE transaction swaps the names.
+
+    Re-running after an interruption starts over from a fresh copy. Returns False if
+    bug_reports is already partitioned.
+    """
+    if not is_supported():
+        raise RuntimeError("Partitioning bug_reports requires Postgres")
+
+    with _ddl_connection() as conn:
+        if is_partitioned(conn):
+            logger.info(f"Partitions: {TABLE} is already partitioned")
+            return False
+
+        conn.execute(text(f"DROP TRIGGER IF EXISTS {_SYNC_TRIGGER} ON {TABLE}"))
+        conn.execute(text(f"DROP TABLE IF EXISTS {STAGING_TABLE} CASCADE"))
+
+        # created_at becomes part of the primary key: give it a default, then fill the gaps
+        conn.execute(text(f"ALTER TABLE {TABLE} ALTER COLUMN created_at SET DEFAULT (now() AT TIME ZONE 'utc')"))
+        _copy_in_batches(conn, f"UPDATE {TABLE} SET created_at = now() AT TIME ZONE 'utc' "
+                               "WHERE id >= :low AND id < :high AND created_at IS NULL", batch_size, sleep)
+
+        conn.execute(text(
+            f"CREATE TABLE {STAGING_TABLE} (LIKE {TABLE} INCLUDING DEFAULTS INCLUDING CONSTRAINTS) "
+            "PARTITION BY RANGE (created_at)"
+        ))
+        conn.execute(text(f"ALTER TABLE {STAGING_TABLE} ALTER COLUMN created_at SET NOT NULL"))
+        primary_key = "id, created_at, tenant_id" if tenant_buckets else "id, created_at"
+        conn.execute(text(f"ALTER TABLE {STAGING_TABLE} ADD CONSTRAINT {STAGING_TABLE}_pkey "
+                          f"PRIMARY KEY ({primary_key})"))
+        conn.execute(text(f"ALTER TABLE {STAGING_TABLE} ADD CONSTRAINT {STAGING_TABLE}_tenant_id_fkey "
+                          "FOREIGN KEY (tenant_id) REFERENCES tenants (id)"))
+
+        oldest = conn.execute(text(f"SELECT MIN(created_at) FROM {TABLE}")).scalar()
+        this_month = datetime.utcnow().date().replace(day=1)
+        month = (oldest.date() if oldest else this_month).replace(day=1)
+        while month <= _add_months(this_month, months_ahead):
+            _create_month(conn, STAGING_TABLE, month, tenant_buckets)
+            month = _add_months(month, 1)
+
+        # Same secondary indexes, under temporary names until the swap
+        indexes = conn.execute(text(
+            "SELECT indexname, indexdef FROM pg_indexes WHERE tablename = :table AND indexname <> :pkey"
+        ), {"table": TABLE, "pkey": f"{TABLE}_pkey"}).all()
+        for name, definition in indexes:
+            definition = re.sub(rf"INDEX {name} ON (\S+\.)?{TABLE} ", f"INDEX {name}_new ON {STAGING_TABLE} ",
+                                definition)
+            conn.execute(text(definition))
+
+        conn.execute(text(f"""
+            CREATE OR REPLACE FUNCTION {_SYNC_TRIGGER}() RETURNS trigger LANGUAGE plpgsql AS $$
+            BEGIN
+                IF TG_OP <> 'INSERT' THEN
+                    DELETE FROM {STAGING_TABLE} WHERE id = OLD.id;
+                END IF;
+                IF TG_OP <> 'DELETE' THEN
+                    INSERT INTO {STAGING_TABLE} VALUES (NEW.*) ON CONFLICT DO NOTHING;
+                END IF;
+                RETURN NULL;
+            END $$
+        """))
+        conn.execute(text(f"CREATE TRIGGER {_SYNC_TRIGGER} AFTER INSERT OR UPDATE OR DELETE ON {TABLE} "
+                          f"FOR EACH ROW EXECUTE FUNCTION {_SYNC_TRIGGER}()"))
+
+        copied = _copy_in_batches(conn, f"INSERT INTO {STAGING_TABLE} SELECT * FROM {TABLE} "
+                                        "WHERE id >= :low AND id < :high FOR SHARE ON CONFLICT DO NOTHING",
+                                  batch_size, sleep)
+        logger.info(f"Partitions: copied {copied} reports, swapping tables")
+
+    with engine.begin() as conn:
+        conn.execute(text(f"SET LOCAL lock_timeout = '{PARTITION_LOCK_TIMEOUT}'"))
+        conn.execute(text(f"LOCK TABLE {TABLE} IN ACCESS EXCLUSIVE MODE"))
+        sequence = conn.execute(text("SELECT pg_get_serial_sequence(:table, 'id')"), {"table": TABLE}).scalar()
+        conn.execute(text(f"DROP TRIGGER {_SYNC_TRIGGER} ON {TABLE}"))
+        conn.execute(text(f"DROP FUNCTION {_SYNC_TRIGGER}()"))
+
+        conn.execute(text(f"ALTER TABLE {TABLE} RENAME TO {OLD_TABLE}"))
+        # Index names are schema-wide, constraint names only per table
+        conn.execute(text(f"ALTER TABLE {OLD_TABLE} RENAME CONSTRAINT {TABLE}_pkey TO {OLD_TABLE}_pkey"))
+        for name, _ in indexes:
+            conn.execute(text(f"ALTER INDEX {name} RENAME TO {name}_old"))
+
+        conn.execute(text(f"ALTER TABLE {STAGING_TABLE} RENAME TO {TABLE}"))
+        for suffix in ("pkey", "tenant_id_fkey"):
+            conn.execute(text(f"ALTER TABLE {TABLE} RENAME CONSTRAINT {STAGING_TABLE}_{suffix} TO {TABLE}_{suffix}"))
+        for name, _ in indexes:
+            conn.execute(text(f"ALTER INDEX {name}_new RENAME TO {name}"))
+        if sequence:
+            conn.execute(text(f"ALTER SEQUENCE {sequence} OWNED BY {TABLE}.id"))
+
+    logger.info(f"Partitions: {TABLE} is now partitioned by month; the previous table is kept as "
+                f"{OLD_TABLE} (no longer written to), drop it once verified")
+    return True
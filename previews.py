@@ -0,0 +1,208 @@
+"""
+Poster frame and animated preview generation for report list views.
+
+Both images are extracted by ffmpeg subprocesses driven from a thread pool, so the event
+loop never blocks on encoding and the video is written to a temp file once, in this process,
+instead of being pickled to a worker. They are stored next to the video (same bucket, same
+file stem) and their URLs are saved on the report.
+
+Backfill existing reports with:
+    python manage.py backfill-previews [--limit N]
+"""
+
+import asyncio
+import logging
+import os
+import subprocess
+import tempfile
+from concurrent.futures import ThreadPoolExecutor
+
+import priority
+from caching import bump_tenant_version
+from db import SessionLocal
+from events import publish_event, REPORT_PROCESSING_COMPLETE
+from metrics import queue_depth
+from tracing import start_span, bind_context
+from models import BugReport
+from video_utils import upload_video, read_video_bytes, video_object_key
+
+logger = logging.getLogger(__name__)
+
+PREVIEW_WORKERS = int(os.environ.get("PREVIEW_WORKERS", str(min(2, os.cpu_count() or 1))))
+POSTER_WIDTH = 320
+PREVIEW_WIDTH = 240
+PREVIEW_FRAMES = 8
+FFMPEG_TIMEOUT_SECONDS = 60
+
+_pool: ThreadPoolExecutor | None = None
+# Jobs submitted to the pool and not finished yet, exported as trapalert_queue_depth{queue="previews"}
+_pending_jobs = 0
+queue_depth.set_function(lambda: _pending_jobs, queue="previews")
+# Jobs beyond the pool's size wait here by report priority rather than FIFO in the pool
+_gate = priority.PriorityGate("preview_slots", PREVIEW_WORKERS)
+
+
+def get_preview_pool() -> ThreadPoolExecutor:
+    """Thread pool shared by all preview jobs, created on first use; the encoding itself runs in ffmpeg"""
+    global _pool
+    if _pool is None:
+        _pool = ThreadPoolExecutor(max_workers=PREVIEW_WORKERS, thread_name_prefix="previews")
+    return _pool
+
+
+def pending_jobs() -> int:
+    return _pending_jobs
+
+
+def shutdown_preview_pool(wait: bool = True) -> None:
+    global _pool
+    if _pool is not None:
+        _pool.shutdown(wait=wait)
+        _pool = None
+
+
+def _probe_duration(path: str) -> float | None:
+    """Video duration in seconds, or None if the container doesn't record one (common for MediaRecorder webm)"""
+    try:
+        out = subprocess.run(
+            ["ffprobe", "-v", "error", "-show_entries", "format=duration",
+             "-of", "default=noprint_wrappers=1:nokey=1", path],
+            capture_output=True, text=True, timeout=FFMPEG_TIMEOUT_SECONDS, check=True,
+        ).stdout.strip()
+        return float(out)
+    except (subprocess.SubprocessError, ValueError):
+        return None
+
+
+def extract_preview_media(video_bytes: bytes) -> tuple[bytes, bytes]:
+    """
+    Runs in a pool thread. Returns (poster_jpeg, preview_webp).
+    The poster is a representative frame; the preview is an animated WebP of
+    PREVIEW_FRAMES frames spread across the recording.
+    """
+    with tempfile.TemporaryDirectory() as tmp:
+        src = os.path.join(tmp, "input.webm")
+        poster = os.path.join(tmp, "poster.jpg")
+        preview = os.path.join(tmp, "preview.webp")
+        with open(src, "wb") as f:
+            f.write(video_bytes)
+
+        subprocess.run(
+            ["ffmpeg", "-v", "error", "-y", "-i", src,
+             "-vf", f"thumbnail,scale={POSTER_WIDTH}:-2", "-frames:v", "1", "-q:v", "5", poster],
+            capture_output=True, timeout=FFMPEG_TIMEOUT_SECONDS, check=True,
+        )
+
+        duration = _probe_duration(src)
+        fps = PREVIEW_FRAMES / duration if duration else 1
+        subprocess.run(
+            ["ffmpeg", "-v", "error", "-y", "-i", src,
+             "-vf", f"fps={fps:.4f},scale={PREVIEW_WIDTH}:-2", "-frames:v", str(PREVIEW_FRAMES),
+             "-an", "-c:v", "libwebp", "-quality", "50", "-loop", "0", preview],
+            capture_output=True, timeout=FFMPEG_TIMEOUT_SECONDS, check=True,
+        )
+
+        with open(poster, "rb") as f:
+            poster_bytes = f.read()
+        with open(preview, "rb") as f:
+            preview_bytes = f.read()
+    return poster_bytes, preview_bytes
+
+
+def store_previews(video_url: str, poster_bytes: bytes, preview_bytes: bytes) -> tuple[str | None, str | None]:
+    """Stores both images alongside the video, named after the video's file stem"""
+    stem = os.path.splitext(video_object_key(video_url) or "")[0]
+    if not stem:
+        return None, None
+    thumbnail_url = upload_video(poster_bytes, "image/jpeg", f"{stem}.jpg")
+    preview_url = upload_video(preview_bytes, "image/webp", f"{stem}.preview.webp")
+    return thumbnail_url, preview_url
+
+
+def _save_preview_urls(report_id: int, thumbnail_url: str | None, preview_url: str | None) -> None:
+    db = SessionLocal()
+    try:
+        report = db.query(BugReport).filter(BugReport.id == report_id).first()
+        if report is None:
+            return
+        report.thumbnail_url = thumbnail_url
+        report.preview_url = preview_url
+        bump_tenant_version(db, report.tenant_id)
+        db.commit()
+        publish_event(REPORT_PROCESSING_COMPLETE, report.tenant_id, report.id, stage="previews")
+    finally:
+        db.close()
+
+
+async def generate_report_previews(report_id: int, video_url: str, video_bytes: bytes,
+                                   prio: str = priority.NORMAL) -> None:
+    """
+    Background task run after a report is saved.
+    Failures are logged and leave the report without previews; the backfill can retry them.
+    """
+    global _pending_jobs
+    loop = asyncio.get_running_loop()
+    _pending_jobs += 1
+    try:
+        with start_span("previews.generate", report_id=report_id):
+            async with _gate.slot(prio):
+                poster_bytes, preview_bytes = await loop.run_in_executor(
+                    get_preview_pool(), bind_context(extract_preview_media, video_bytes)
+                )
+            thumbnail_url, preview_url = await loop.run_in_executor(
+                None, bind_context(store_previews, video_url, poster_bytes, preview_bytes)
+            )
+            await loop.run_in_executor(
+                None, bind_context(_save_preview_urls, report_id, thumbnail_url, preview_url)
+            )
+        logger.info(f"Previews generated for report {report_id}")
+    except Exception as e:
+        logger.error(f"Preview generation failed for report {report_id}: {e}", exc_info=True)
+    finally:
+        _pending_jobs -= 1
+
+
+def backfill_previews(limit: int | None = None, batch_size: int = 50) -> int:
+    """Generates previews for existing reports that have a video but no thumbnail yet"""
+    db = SessionLocal()
+    done = 0
+    last_id = 0
+    pool = get_preview_pool()
+    try:
+        while limit is None or done < limit:
+            batch = (
+                db.query(BugReport.id, BugReport.video_url)
+                .filter(
+                    BugReport.id > last_id,
+                    BugReport.video_url.isnot(None),
+                    BugReport.thumbnail_url.is_(None),
+                )
+                .order_by(BugReport.id)
+                .limit(batch_size)
+                .all()
+            )
+            if not batch:
+                break
+            last_id = batch[-1].id
+
+            # Download sequentially, encode in parallel across the pool
+            jobs = []
+            for report_id, video_url in batch:
+                video_bytes = read_video_bytes(video_url)
+                if video_bytes:
+                    jobs.append((report_id, video_url, pool.submit(extract_preview_media, video_bytes)))
+
+            for report_id, video_url, future in jobs:
+                try:
+                    thumbnail_url, preview_url = store_previews(video_url, *future.result())
+                    _save_preview_urls(report_id, thumbnail_url, preview_url)
+                    done += 1
+                    logger.info(f"Previews generated for report {report_id}")
+                except Exception as e:
+                    logger.error(f"Preview generation failed for report {report_id}: {e}")
+                if limit is not None and done >= limit:
+                    break
+    finally:
+        db.close()
+        shutdown_preview_pool()
+    return done
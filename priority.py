@@ -0,0 +1,98 @@
+"""
+Priority scheduling of post-ingestion work: upload, transcription and labels, previews,
+enrichment.
+
+A report's priority class comes from its struggle score (the dashboard's >40 moderate and
+>75 severe bands) and its tenant's tier. When a resource is saturated, work waits in that
+resource's PriorityGate and is admitted by class, oldest first within a class. Waiting
+ages work: every PRIORITY_AGING_SECONDS a waiter gains a class, so low-priority reports are
+delayed by at most three aging periods behind a stream of critical ones, never starved.
+All waiters age at the same rate, so their relative order is fixed on arrival and the gate
+is a heap keyed on arrival time minus a head start per class.
+
+Gates are per worker process (previews.py has its own, sized to its thread pool), and
+deferred enrichment jobs are claimed in priority order, older reports first within a class.
+Wait time is exported by queue and priority as trapalert_priority_wait_seconds; /feedback
+stage timings carry the priority too.
+"""
+
+import asyncio
+import heapq
+import itertools
+import os
+import time
+from contextlib import asynccontextmanager
+from typing import Optional
+
+from metrics import priority_wait, queue_depth
+from models import TenantTier
+
+PRIORITY_AGING_SECONDS = float(os.environ.get("PRIORITY_AGING_SECONDS", "30"))
+
+CRITICAL, HIGH, NORMAL, LOW = "critical", "high", "normal", "low"
+PRIORITIES = (CRITICAL, HIGH, NORMAL, LOW)
+
+_TIER_POINTS = {TenantTier.ENTERPRISE: 2, TenantTier.PRO: 1, TenantTier.FREE: 0}
+
+
+def classify(struggle_score: Optional[float], tier: Optional[TenantTier]) -> str:
+    """Priority class of a report: struggle (0-2 points) plus tier (0-2 points)"""
+    score = struggle_score or 0
+    points = (2 if score > 75 else 1 if score > 40 else 0) + _TIER_POINTS.get(tier, 0)
+    return CRITICAL if points >= 3 else HIGH if points == 2 else NORMAL if points == 1 else LOW
+
+
+def head_start(priority: str) -> float:
+    """Seconds of waiting a class is worth: a low waiter overtakes a critical one after three aging periods"""
+    return (len(PRIORITIES) - 1 - PRIORITIES.index(priority)) * PRIORITY_AGING_SECONDS
+
+
+class PriorityGate:
+    """At most `capacity` holders at once; waiters are admitted by aged priority"""
+
+    def __init__(self, name: str, capacity: int):
+        self.name = name
+        self.capacity = capacity
+        self.active = 0
+        self._waiters: list[tuple[float, int, asyncio.Future]] = []
+        self._seq = itertools.count()
+        queue_depth.set_function(lambda: self.active + self.waiting, queue=name)
+
+    @property
+    def waiting(self) -> int:
+        return sum(1 for _, _, future in self._waiters if not future.done())
+
+    def _release(self) -> None:
+        while self._waiters:
+            _, _, future = heapq.heappop(self._waiters)
+            if not future.done():
+                future.set_result(None)  # The slot passes to the waiter; active is unchanged
+                return
+        self.active -= 1
+
+    @asynccontextmanager
+    async def slot(self, priority: str):
+        """Holds one unit of capacity for the duration of the block"""
+        started = time.perf_counter()
+        if self.active < self.capacity and not self.waiting:
+            self.active += 1
+        else:
+            future = asyncio.get_running_loop().create_future()
+            heapq.heappush(self._waiters, (time.monotonic() - head_start(priority), next(self._seq), future))
+            try:
+                await future
+            except asyncio.CancelledError:
+                if future.done() and not future.cancelled():
+                    self._release()  # Handed the slot just as the waiter was cancelled
+                raise
+        priority_wait.observe(time.perf_counter() - started, queue=self.name, priority=priority)
+        try:
+            yield
+        finally:
+            self._release()
+
+
+# Gemini or local transcription and label calls
+ai = PriorityGate("ai", int(os.environ.get("PRIORITY_AI_CONCURRENCY", "8")))
+# Video uploads to the storage backend
+storage = PriorityGate("storage", int(os.environ.get("PRIORITY_STORAGE_CONCURRENCY", "16")))
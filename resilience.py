@@ -0,0 +1,274 @@
+"""
+Resilience for calls to external services (Gemini, Supabase storage).
+
+Each service has one ServicePolicy per worker:
+- a timeout per attempt (async calls; sync calls rely on the client's own timeout);
+- retries of transient failures (timeouts, connection errors, 408/429/5xx) with full-jitter
+  exponential backoff, limited by a retry budget: every call earns RETRY_BUDGET_RATIO of a
+  retry, so during an outage retries add at most that fraction of extra load;
+- a circuit breaker: after CIRCUIT_FAILURE_THRESHOLD consecutive transient failures calls
+  fail fast with CircuitOpenError for CIRCUIT_RESET_SECONDS, then one probe call decides
+  whether to close it again;
+- on request paths, a single attempt bounded by a short deadline (GEMINI_REQUEST_DEADLINE_SECONDS
+  for /feedback), after which the caller defers the work (enrichment.py) instead of retrying;
+- optional hedging (async calls): if the first attempt has not answered after
+  `hedge_after` seconds a second one is started, and the first answer wins. Hedges are paid
+  from the retry budget too.
+"""
+
+import asyncio
+import logging
+import os
+import random
+import threading
+import time
+from typing import Callable, Optional
+
+from metrics import circuit_state, external_call_retries, track_external_call
+
+logger = logging.getLogger(__name__)
+
+CIRCUIT_FAILURE_THRESHOLD = int(os.environ.get("CIRCUIT_FAILURE_THRESHOLD", "5"))
+CIRCUIT_RESET_SECONDS = float(os.environ.get("CIRCUIT_RESET_SECONDS", "30"))
+RETRY_BUDGET_RATIO = float(os.environ.get("RETRY_BUDGET_RATIO", "0.2"))
+# Bound on a Gemini call made while an SDK client waits on /feedback; background work uses the full timeout
+GEMINI_REQUEST_DEADLINE_SECONDS = float(os.environ.get("GEMINI_REQUEST_DEADLINE_SECONDS", "30"))
+
+TRANSIENT_STATUS_CODES = {408, 429, 500, 502, 503, 504}
+
+
+class CircuitOpenError(Exception):
+    """The service failed repeatedly; calls are refused until the breaker lets a probe through"""
+
+
+def is_transient(exc: BaseException) -> bool:
+    """Whether a failure is worth retrying (and counts against the service's health)"""
+    if isinstance(exc, (asyncio.TimeoutError, TimeoutError, ConnectionError)):
+        return True
+    status = getattr(exc, "code", None) or getattr(exc, "status_code", None) or getattr(exc, "status", None)
+    if isinstance(status, str) and status.isdigit():
+        status = int(status)
+    if status in TRANSIENT_STATUS_CODES:
+        return True
+    # httpx (used by both SDKs) transport errors: connect/read failures, timeouts
+    return any(cls.__name__ in ("TransportError", "TimeoutException") for cls in type(exc).__mro__)
+
+
+class CircuitBreaker:
+    CLOSED, HALF_OPEN, OPEN = 0, 1, 2
+
+    def __init__(self, name: str, failure_threshold: int = CIRCUIT_FAILURE_THRESHOLD,
+                 reset_timeout: float = CIRCUIT_RESET_SECONDS):
+        self.name = name
+        self.failure_threshold = failure_threshold
+        self.reset_timeout = reset_timeout
+        self.state = self.CLOSED
+        self.failures = 0
+        self.opened_at = 0.0
+        self._probing = False
+        self._lock = threading.Lock()
+
+    def before_call(self) -> bool:
+        """Raises CircuitOpenError if the call may not go ahead; True if it is the half-open probe"""
+        with self._lock:
+            if self.state == self.CLOSED:
+                return False
+            if self.state == self.OPEN and time.monotonic() - self.opened_at >= self.reset_timeout:
+                self.state = self.HALF_OPEN
+                self._probing = False
+            if self.state == self.HALF_OPEN and not self._probing:
+                self._probing = True
+                return True
+        external_call_retries.inc(service=self.name, kind="circuit_open")
+        raise CircuitOpenError(f"{self.name} circuit is open")
+
+    def release_probe(self) -> None:
+        """Lets another probe through if this one ended without a verdict"""
+        with self._lock:
+            self._probing = False
+
+    def record_success(self) -> None:
+        with self._lock:
+            if self.state != self.CLOSED:
+                logger.info(f"{self.name} circuit closed")
+            self.state, self.failures, self._probing = self.CLOSED, 0, False
+
+    def record_failure(self) -> None:
+        with self._lock:
+            self.failures += 1
+            if self.state == self.HALF_OPEN or self.failures >= self.failure_threshold:
+                if self.state != self.OPEN:
+                    logger.warning(f"{self.name} circuit opened after {self.failures} failures")
+                self.state, self.opened_at, self._probing = self.OPEN, time.monotonic(), False
+
+    @property
+    def is_open(self) -> bool:
+        return self.state == self.OPEN and time.monotonic() - self.opened_at < self.reset_timeout
+
+
+class _Verdict:
+    """Whether one attempt's outcome was already given to the breaker: by the attempt itself, or by its timeout"""
+
+    def __init__(self):
+        self._given = False
+        self._lock = threading.Lock()
+
+    def claim(self) -> bool:
+        """True for the first caller only"""
+        with self._lock:
+            given, self._given = self._given, True
+        return not given
+
+
+class RetryBudget:
+    """Token bucket: each call deposits `ratio` tokens, each retry or hedge spends one"""
+
+    def __init__(self, ratio: float = RETRY_BUDGET_RATIO, max_tokens: float = 10.0):
+        self.ratio = ratio
+        self.max_tokens = max_tokens
+        self.tokens = max_tokens
+        self._lock = threading.Lock()
+
+    def deposit(self) -> None:
+        with self._lock:
+            self.tokens = min(self.max_tokens, self.tokens + self.ratio)
+
+    def withdraw(self) -> bool:
+        with self._lock:
+            if self.tokens < 1:
+                return False
+            self.tokens -= 1
+            return True
+
+
+class ServicePolicy:
+    def __init__(self, name: str, timeout: float, max_attempts: int = 3,
+                 backoff_base: float = 0.2, backoff_max: float = 5.0):
+        self.name = name
+        self.timeout = timeout
+        self.max_attempts = max_attempts
+        self.backoff_base = backoff_base
+        self.backoff_max = backoff_max
+        self.breaker = CircuitBreaker(name)
+        self.budget = RetryBudget()
+        circuit_state.set_function(lambda: self.breaker.state, service=name)
+
+    def _backoff(self, attempt: int) -> float:
+        return random.uniform(0, min(self.backoff_max, self.backoff_base * 2 ** attempt))
+
+    def _may_retry(self, exc: BaseException, attempt: int) -> bool:
+        if not is_transient(exc) or attempt + 1 >= self.max_attempts:
+            return False
+        if not self.budget.withdraw():
+            external_call_retries.inc(service=self.name, kind="budget_exhausted")
+            return False
+        external_call_retries.inc(service=self.name, kind="retry")
+        return True
+
+    def _invoke(self, operation: str, fn: Callable, args: tuple, kwargs: dict, verdict: Optional[_Verdict] = None):
+        probe = self.breaker.before_call()
+        try:
+            with track_external_call(self.name, operation):
+                result = fn(*args, **kwargs)
+        except Exception as e:
+            if verdict is None or verdict.claim():
+                if is_transient(e):
+                    self.breaker.record_failure()
+                else:
+                    # The service answered (e.g. a 400): it is up, whatever was wrong with the request
+                    self.breaker.record_success()
+            raise
+        finally:
+            if probe:
+                self.breaker.release_probe()
+        if verdict is None or verdict.claim():
+            self.breaker.record_success()
+        return result
+
+    def call_sync(self, operation: str, fn: Callable, *args, **kwargs):
+        """Calls fn with retries and the circuit breaker, in the calling thread"""
+        self.budget.deposit()
+        attempt = 0
+        while True:
+            try:
+                return self._invoke(operation, fn, args, kwargs)
+            except CircuitOpenError:
+                raise
+            except Exception as e:
+                if not self._may_retry(e, attempt):
+                    raise
+                logger.warning(f"{self.name}.{operation} failed ({e}), retrying")
+                time.sleep(self._backoff(attempt))
+                attempt += 1
+
+    async def _timed_invoke(self, operation: str, fn: Callable, args, kwargs, timeout: float):
+        """
+        _invoke in a thread, bounded by timeout. Blocking SDK calls can't be interrupted, so a
+        timed-out thread finishes in the background; the timeout is its one breaker failure,
+        and whatever the thread ends with later is not counted again.
+        """
+        verdict = _Verdict()
+        try:
+            return await asyncio.wait_for(
+                asyncio.to_thread(self._invoke, operation, fn, args, kwargs, verdict), timeout)
+        except asyncio.TimeoutError:
+            if verdict.claim():
+                self.breaker.record_failure()
+            raise
+
+    async def _attempt(self, operation: str, fn: Callable, args, kwargs, hedge_after: Optional[float],
+                       timeout: float):
+        # A losing hedge's thread also finishes in the background
+        first = asyncio.ensure_future(self._timed_invoke(operation, fn, args, kwargs, timeout))
+        if hedge_after is None:
+            return await first
+
+        done, _ = await asyncio.wait({first}, timeout=hedge_after)
+        if done or not self.budget.withdraw():
+            return await first
+        external_call_retries.inc(service=self.name, kind="hedge")
+        second = asyncio.ensure_future(self._timed_invoke(operation, fn, args, kwargs, timeout))
+        pending = {first, second}
+        try:
+            while pending:
+                done, pending = await asyncio.wait(pending, return_when=asyncio.FIRST_COMPLETED)
+                for task in done:
+                    if task.exception() is None:
+                        return task.result()
+            raise first.exception()
+        finally:
+            for task in pending:
+                task.cancel()
+
+    async def call(self, operation: str, fn: Callable, *args, hedge_after: Optional[float] = None,
+                   deadline: Optional[float] = None, **kwargs):
+        """
+        Calls a blocking fn off the event loop with timeout, retries, circuit breaker and optional
+        hedging. With a deadline (request paths) there is a single attempt, bounded by it.
+        """
+        self.budget.deposit()
+        attempt = 0
+        while True:
+            try:
+                return await self._attempt(operation, fn, args, kwargs, hedge_after,
+                                           min(deadline, self.timeout) if deadline else self.timeout)
+            except CircuitOpenError:
+                raise
+            except Exception as e:
+                if deadline or not self._may_retry(e, attempt):
+                    raise
+                logger.warning(f"{self.name}.{operation} failed ({type(e).__name__}: {e}), retrying")
+                await asyncio.sleep(self._backoff(attempt))
+                attempt += 1
+
+
+gemini = ServicePolicy(
+    "gemini",
+    timeout=float(os.environ.get("GEMINI_TIMEOUT_SECONDS", "120")),
+    max_attempts=int(os.environ.get("GEMINI_MAX_ATTEMPTS", "3")),
+)
+supabase = ServicePolicy(
+    "supabase",
+    timeout=float(os.environ.get("SUPABASE_TIMEOUT_SECONDS", "60")),
+    max_attempts=int(os.environ.get("SUPABASE_MAX_ATTEMPTS", "3")),
+)
@@ -0,0 +1,216 @@
+"""
+Per-tenant retention for bug reports.
+
+Reports older than the tenant's policy (RetentionPolicy, else RETENTION_DEFAULT_DAYS) are
+written to a compressed archive file (Parquet, or gzipped NDJSON without pyarrow) in the
+archive bucket, recorded in report_archives, and deleted from bug_reports in batches.
+Their videos are then deleted, moved to cold storage, or kept, per policy; posters and
+previews are always deleted as they can be regenerated.
+
+Run from cron with `python manage.py apply-retention`, or in-app by setting
+RETENTION_INTERVAL_SECONDS. Either way only one process works at a time. The in-app
+scheduler also maintains the monthly partitions of a partitioned bug_reports (partitions.py).
+"""
+
+import asyncio
+import fcntl
+import gzip
+import importlib.util
+import logging
+import os
+import tempfile
+import threading
+import time
+from contextlib import contextmanager
+from datetime import datetime, timedelta
+from typing import Optional
+
+from sqlalchemy import text
+
+import enrichment
+import labels
+import partitions
+import similarity
+from caching import bump_tenant_version
+from db import SessionLocal, engine
+from events import publish_event, REPORTS_ARCHIVED
+from export_utils import EXPORT_COLUMNS, iter_ndjson, iter_parquet
+from metrics import retention_reports
+from models import BugReport, ReportArchive, RetentionPolicy, Tenant, VideoRetention
+from video_utils import ARCHIVE_BUCKET, cold_video_location, delete_stored_media, move_to_cold_storage, store_object
+
+logger = logging.getLogger(__name__)
+
+# Applies to tenants without a policy; 0 keeps their reports forever
+RETENTION_DEFAULT_DAYS = int(os.environ.get("RETENTION_DEFAULT_DAYS", "0"))
+RETENTION_DEFAULT_VIDEO_ACTION = VideoRetention(os.environ.get("RETENTION_DEFAULT_VIDEO_ACTION", "DELETE"))
+RETENTION_BATCH_SIZE = int(os.environ.get("RETENTION_BATCH_SIZE", "500"))
+# Pause between batches so archiving never competes with ingestion for long
+RETENTION_BATCH_SLEEP = float(os.environ.get("RETENTION_BATCH_SLEEP", "0.2"))
+# In-app scheduler period; 0 disables it (use cron + manage.py instead)
+RETENTION_INTERVAL_SECONDS = int(os.environ.get("RETENTION_INTERVAL_SECONDS", "0"))
+
+ARCHIVE_COLUMNS = list(EXPORT_COLUMNS)
+_ADVISORY_LOCK_KEY = 0x7472_6170  # "trap"
+# Set on shutdown; a run in progress stops after its current batch
+_stop = threading.Event()
+
+
+def effective_policies(db, tenant_id: Optional[int] = None) -> list[tuple[int, int, VideoRetention]]:
+    """(tenant_id, retain_days, video_action) for every tenant that has a retention window"""
+    query = db.query(Tenant.id, RetentionPolicy.retain_days, RetentionPolicy.video_action) \
+        .outerjoin(RetentionPolicy, RetentionPolicy.tenant_id == Tenant.id)
+    if tenant_id is not None:
+        query = query.filter(Tenant.id == tenant_id)
+
+    policies = []
+    for tid, days, action in query.all():
+        if days is None:
+            days, action = RETENTION_DEFAULT_DAYS, RETENTION_DEFAULT_VIDEO_ACTION
+        if days > 0:
+            policies.append((tid, days, action))
+    return policies
+
+
+def _encode_archive(rows: list) -> tuple[bytes, str]:
+    if importlib.util.find_spec("pyarrow") is not None:
+        return b"".join(iter_parquet(rows, ARCHIVE_COLUMNS)), "parquet"
+    return gzip.compress(b"".join(iter_ndjson(rows, ARCHIVE_COLUMNS))), "ndjson.gz"
+
+
+def _archive_batch(db, tenant_id: int, rows: list, video_action: VideoRetention) -> bool:
+    """Archive, delete and clean up the media of one batch. Returns False if nothing could be archived."""
+    col = {name: i for i, name in enumerate(ARCHIVE_COLUMNS)}
+    video_urls = [row[col["video_url"]] for row in rows]
+    derived_urls = [row[i] for row in rows for i in (col["thumbnail_url"], col["preview_url"])]
+
+    if video_action == VideoRetention.COLD_STORAGE:
+        # The archive records where each video ends up
+        rows = [
+            tuple(cold_video_location(v) if i == col["video_url"] and v else v for i, v in enumerate(row))
+            for row in rows
+        ]
+
+    data, fmt = _encode_archive(rows)
+    ids = [row[col["id"]] for row in rows]
+    dates = [row[col["created_at"]] for row in rows if row[col["created_at"]]]
+    location = store_object(ARCHIVE_BUCKET, f"tenant-{tenant_id}-reports-{ids[0]}-{ids[-1]}.{fmt}", data,
+                            "application/vnd.apache.parquet" if fmt == "parquet" else "application/gzip")
+    if not location:
+        return False
+
+    db.add(ReportArchive(
+        tenant_id=tenant_id, location=location, format=fmt, report_count=len(rows),
+        first_report_id=ids[0], last_report_id=ids[-1],
+        oldest_created_at=min(dates, default=None), newest_created_at=max(dates, default=None),
+    ))
+    # tenant_id and the created_at range let a partitioned bug_reports prune to the partitions involved
+    db.query(BugReport).filter(
+        BugReport.tenant_id == tenant_id, BugReport.id.in_(ids),
+        BugReport.created_at.between(min(dates), max(dates)),
+    ).delete(synchronize_session=False)
+    similarity.forget_reports(db, ids)
+    labels.forget_reports(db, ids)
+    enrichment.forget_reports(db, ids)
+    bump_tenant_version(db, tenant_id)
+    db.commit()
+    retention_reports.inc(len(ids), action="archived")
+    publish_event(REPORTS_ARCHIVED, tenant_id, count=len(ids), archive=location)
+
+    # Media goes only once the rows are gone: a failure here orphans a file, never a report
+    delete_stored_media(derived_urls)
+    if video_action == VideoRetention.DELETE:
+        retention_reports.inc(delete_stored_media(video_urls), action="video_deleted")
+    elif video_action == VideoRetention.COLD_STORAGE:
+        moved = sum(1 for url in video_urls if url and move_to_cold_storage(url))
+        retention_reports.inc(moved, action="video_cold")
+    return True
+
+
+def apply_retention(now: Optional[datetime] = None, tenant_id: Optional[int] = None, dry_run: bool = False,
+                    batch_size: int = RETENTION_BATCH_SIZE, sleep: float = RETENTION_BATCH_SLEEP) -> dict:
+    """
+    Applies every tenant's retention policy. Returns counts per tenant:
+    {tenant_id: reports archived (or, with dry_run, reports that would be)}.
+    """
+    now = now or datetime.utcnow()
+    db = SessionLocal()
+    results = {}
+    try:
+        for tid, days, video_action in effective_policies(db, tenant_id):
+            cutoff = now - timedelta(days=days)
+            expired = db.query(BugReport).filter(BugReport.tenant_id == tid, BugReport.created_at < cutoff)
+            if dry_run:
+                results[tid] = expired.count()
+                continue
+
+            archived = 0
+            while not _stop.is_set():
+                rows = expired.with_entities(*EXPORT_COLUMNS.values()).order_by(BugReport.id).limit(batch_size).all()
+                if not rows:
+                    break
+                if not _archive_batch(db, tid, rows, video_action):
+                    logger.error(f"Retention: archiving failed for tenant {tid}, its reports are kept")
+                    break
+                archived += len(rows)
+                if sleep:
+                    time.sleep(sleep)
+            if archived:
+                logger.info(f"Retention: archived {archived} reports of tenant {tid} older than {days} days")
+            results[tid] = archived
+    finally:
+        db.close()
+    return results
+
+
+@contextmanager
+def exclusive_run():
+    """Yields True if this process may run retention now: Postgres advisory lock, or a lock file for SQLite"""
+    if engine.dialect.name == "postgresql":
+        with engine.connect() as conn:
+            acquired = conn.execute(text("SELECT pg_try_advisory_lock(:key)"), {"key": _ADVISORY_LOCK_KEY}).scalar()
+            try:
+                yield bool(acquired)
+            finally:
+                if acquired:
+                    conn.execute(text("SELECT pg_advisory_unlock(:key)"), {"key": _ADVISORY_LOCK_KEY})
+        return
+
+    with open(os.path.join(tempfile.gettempdir(), "trapalert-retention.lock"), "w") as lock_file:
+        try:
+            fcntl.flock(lock_file, fcntl.LOCK_EX | fcntl.LOCK_NB)
+        except BlockingIOError:
+            acquired = False
+        else:
+            acquired = True
+        try:
+            yield acquired
+        finally:
+            if acquired:
+                fcntl.flock(lock_file, fcntl.LOCK_UN)
+
+
+def run_once(maintain_partitions: bool = False, **kwargs) -> Optional[dict]:
+    with exclusive_run() as acquired:
+        if not acquired:
+            logger.info("Retention: another process is already running it, skipping")
+            return None
+        results = apply_retention(**kwargs)
+        if maintain_partitions and not _stop.is_set():
+            # After retention, so months it emptied can be dropped right away
+            partitions.maintain()
+        return results
+
+
+async def run_scheduler(interval: int = RETENTION_INTERVAL_SECONDS) -> None:
+    """Background loop started by the app lifespan; every worker runs it, the lock picks one"""
+    _stop.clear()
+    try:
+        while True:
+            try:
+                await asyncio.to_thread(run_once, maintain_partitions=True)
+            except Exception as e:
+                logger.error(f"Retention run failed: {e}", exc_info=True)
+            await asyncio.sleep(interval)
+    finally:
+        _stop.set()
@@ -26,7 +26,7 @@ async def login(credentials: UserLogin, db: Session = Depends(get_db)):
     return TokenResponse(
         access_token=access_token,
         token_type="bearer",
-        user=UserResponse.from_orm(user)
+        user=UserResponse.model_validate(user)
     )
 
 @router.get("/me", response_model=UserResponse)
@@ -34,7 +34,7 @@ async def get_me(current_user: User = Depends(get_current_user)):
     """
     Get current user information from JWT token
     """
-    return UserResponse.from_orm(current_user)
+    return UserResponse.model_validate(current_user)
 
 @router.post("/logout")
 async def logout():
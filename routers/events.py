@@ -0,0 +1,99 @@
+import asyncio
+import json
+from fastapi import APIRouter, Depends, HTTPException, Query, Request, WebSocket, WebSocketDisconnect
+from fastapi.responses import StreamingResponse
+from sqlalchemy.orm import Session
+from db import get_db, SessionLocal
+from models import User, UserRole
+from auth import EVENTS_SCOPE, create_scoped_token, get_current_user, get_user_from_scoped_token, require_user_or_scoped_token
+import events
+
+router = APIRouter(prefix="/api/events", tags=["Events"])
+
+# Comment lines keep proxies and load balancers from closing idle streams
+KEEPALIVE_SECONDS = 15
+
+def _subscription_tenant(user: User):
+    """Super admins receive every tenant's events, everyone else only their own"""
+    return None if user.role == UserRole.SUPER_ADMIN else user.tenant_id
+
+@router.post("/token")
+async def create_events_token(current_user: User = Depends(get_current_user)):
+    """
+    Short-lived token for ?token= on the stream and WebSocket URLs, which EventSource and
+    browsers' WebSocket cannot authenticate with headers. It is only checked on connect.
+    """
+    token, expires_in = create_scoped_token(current_user.id, EVENTS_SCOPE)
+    return {"token": token, "expires_in": expires_in}
+
+@router.get("/stream")
+async def stream_events(
+    request: Request,
+    current_user: User = Depends(require_user_or_scoped_token(EVENTS_SCOPE)),
+    db: Session = Depends(get_db)
+):
+    """
+    Server-Sent Events feed of report events for the current user's tenant.
+    Replaces polling the list endpoint: one long-lived connection per viewer.
+    Accepts a ?token= from /token because EventSource cannot set headers.
+    """
+    tenant_id = _subscription_tenant(current_user)
+    # Don't pin a pooled DB connection for the lifetime of the stream
+    db.close()
+
+    subscriber = events.subscribe(tenant_id)
+
+    async def event_source():
+        try:
+            yield "retry: 3000\n\n"
+            while True:
+                if await request.is_disconnected():
+                    break
+                try:
+                    event = await asyncio.wait_for(subscriber.queue.get(), timeout=KEEPALIVE_SECONDS)
+                except asyncio.TimeoutError:
+                    yield ": keepalive\n\n"
+                    continue
+                yield f"event: {event['type']}\ndata: {json.dumps(event)}\n\n"
+                if event["type"] == events.EVICTED:
+                    break
+        finally:
+            events.unsubscribe(subscriber)
+
+    return StreamingResponse(
+        event_source(),
+        media_type="text/event-stream",
+        headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"},
+    )
+
+@router.websocket("/ws")
+async def events_websocket(websocket: WebSocket, token: str = Query(...)):
+    """WebSocket variant of the event feed. Authenticates with a ?token= from /token."""
+    db = SessionLocal()
+    try:
+        user = get_user_from_scoped_token(token, EVENTS_SCOPE, db)
+    except HTTPException:
+        await websocket.close(code=1008)
+        return
+    finally:
+        db.close()
+
+    # Subscribed before accepting, so no event is missed between the two
+    subscriber = events.subscribe(_subscription_tenant(user))
+    try:
+        await websocket.accept()
+        while True:
+            try:
+                event = await asyncio.wait_for(subscriber.queue.get(), timeout=KEEPALIVE_SECONDS)
+            except asyncio.TimeoutError:
+                # Also surfaces disconnects, since send fails on a closed socket
+                await websocket.send_json({"type": "keepalive"})
+                continue
+            await websocket.send_json(event)
+            if event["type"] == events.EVICTED:
+                await websocket.close(code=1013)
+                break
+    except WebSocketDisconnect:
+        pass
+    finally:
+        events.unsubscribe(subscriber)
@@ -5,6 +5,7 @@ from db import get_db
 from models import User, Integration, UserRole
 from schemas import IntegrationCreate, IntegrationResponse, IntegrationUpdate
 from auth import get_current_user
+from tenant_scope import TenantScope
 
 router = APIRouter(prefix="/api/integrations", tags=["Integrations"])
 
@@ -19,12 +20,7 @@ async def list_integrations(
     if current_user.role == UserRole.CLIENT_USER:
         raise HTTPException(status_code=403, detail="Insufficient permissions")
     
-    if current_user.role == UserRole.SUPER_ADMIN:
-        integrations = db.query(Integration).all()
-    else:
-        integrations = db.query(Integration).filter(Integration.tenant_id == current_user.tenant_id).all()
-    
-    return [IntegrationResponse.from_orm(i) for i in integrations]
+    return TenantScope(db, Integration, current_user).query().all()
 
 @router.post("", response_model=IntegrationResponse)
 async def create_integration(
@@ -52,7 +48,7 @@ async def create_integration(
     db.commit()
     db.refresh(new_integration)
     
-    return IntegrationResponse.from_orm(new_integration)
+    return IntegrationResponse.model_validate(new_integration)
 
 @router.put("/{integration_id}", response_model=IntegrationResponse)
 async def update_integration(
@@ -65,24 +61,11 @@ async def update_integration(
     if current_user.role == UserRole.CLIENT_USER:
         raise HTTPException(status_code=403, detail="Insufficient permissions")
     
-    integration = db.query(Integration).filter(Integration.id == integration_id).first()
-    if not integration:
-        raise HTTPException(status_code=404, detail="Integration not found")
-    
     # Client admins can only update integrations in their tenant
-    if current_user.role == UserRole.CLIENT_ADMIN:
-        if integration.tenant_id != current_user.tenant_id:
-            raise HTTPException(status_code=403, detail="Access denied")
-    
-    if update.config_json is not None:
-        integration.config_json = update.config_json
-    if update.enabled is not None:
-        integration.enabled = update.enabled
-    
+    integration = TenantScope(db, Integration, current_user).update(integration_id, update.model_dump(exclude_none=True))
     db.commit()
-    db.refresh(integration)
     
-    return IntegrationResponse.from_orm(integration)
+    return IntegrationResponse.model_validate(integration)
 
 @router.delete("/{integration_id}")
 async def delete_integration(
@@ -94,16 +77,8 @@ async def delete_integration(
     if current_user.role == UserRole.CLIENT_USER:
         raise HTTPException(status_code=403, detail="Insufficient permissions")
     
-    integration = db.query(Integration).filter(Integration.id == integration_id).first()
-    if not integration:
-        raise HTTPException(status_code=404, detail="Integration not found")
-    
     # Client admins can only delete integrations in their tenant
-    if current_user.role == UserRole.CLIENT_ADMIN:
-        if integration.tenant_id != current_user.tenant_id:
-            raise HTTPException(status_code=403, detail="Access denied")
-    
-    db.delete(integration)
+    TenantScope(db, Integration, current_user).delete(integration_id)
     db.commit()
     
     return {"message": "Integration deleted successfully"}
@@ -118,14 +93,7 @@ async def test_integration(
     if current_user.role == UserRole.CLIENT_USER:
         raise HTTPException(status_code=403, detail="Insufficient permissions")
     
-    integration = db.query(Integration).filter(Integration.id == integration_id).first()
-    if not integration:
-        raise HTTPException(status_code=404, detail="Integration not found")
-    
-    # Check permissions
-    if current_user.role == UserRole.CLIENT_ADMIN:
-        if integration.tenant_id != current_user.tenant_id:
-            raise HTTPException(status_code=403, detail="Access denied")
+    integration = TenantScope(db, Integration, current_user).get(integration_id)
     
     # TODO: Implement actual integration testing logic
     # For now, just return success
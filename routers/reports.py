@@ -1,22 +1,120 @@
-from fastapi import APIRouter, Depends, HTTPException, Query
+import asyncio
+import os
+from fastapi import APIRouter, BackgroundTasks, Depends, HTTPException, Query, Request, Response
+from fastapi.responses import FileResponse, RedirectResponse, StreamingResponse
 from pydantic import BaseModel
 from sqlalchemy.orm import Session
 from sqlalchemy import and_, or_, func
 from typing import Optional, List
-from datetime import datetime, timedelta
-from db import get_db
+from datetime import datetime, timedelta, timezone
+from db import get_db, get_read_db
 from models import User, BugReport, Tenant, UserRole, ReportStatus
-from schemas import BugReportResponse, BugReportListResponse, BugReportUpdate, DashboardStats
-from auth import get_current_user, require_role
+from schemas import (
+    BugReportResponse, BugReportListResponse, BugReportUpdate, DashboardStats, FacetInterval,
+    MediaTokenRequest, MediaTokenResponse, ReportFacet, SimilarReport,
+)
+from auth import MEDIA_SCOPE, create_scoped_token, get_current_user, require_role, require_user_or_scoped_token
+from caching import conditional_get, is_not_modified, bump_tenant_version, route_fresh_reads
+from events import publish_event, REPORT_STATUS_CHANGED, REPORT_UPDATED, REPORT_DELETED
+import enrichment
+import labels
+import similarity
+from facets import report_counts
+from serialization import json_response, project
+from tenant_scope import TenantScope
+from export_utils import (
+    ExportFormat, EXPORT_ENCODERS, EXPORT_MEDIA_TYPES,
+    resolve_export_columns, ensure_format_supported, stream_export_rows,
+)
+from video_utils import (
+    SIGNED_URL_TTL_SECONDS, is_local_video, video_object_key,
+    local_video_path, create_signed_video_url, delete_stored_media,
+)
 
 router = APIRouter(prefix="/api/reports", tags=["Reports"])
 
+# <video> and <img> cannot send headers: media endpoints also take a token minted by /media-tokens
+get_media_user = require_user_or_scoped_token(MEDIA_SCOPE, resource_param="report_id")
+
+def _filtered_reports_query(
+    db: Session,
+    current_user: User,
+    status: Optional[ReportStatus] = None,
+    tenant_id: Optional[int] = None,
+    search: Optional[str] = None,
+    date_from: Optional[datetime] = None,
+    date_to: Optional[datetime] = None,
+    label: Optional[List[str]] = None,
+):
+    """
+    Build the BugReport query shared by the list and export endpoints,
+    applying tenant isolation and the optional filters.
+    Several labels match reports carrying all of them.
+    """
+    # Base query
+    query = db.query(BugReport)
+
+    # Apply tenant filtering based on user role
+    if current_user.role != UserRole.SUPER_ADMIN:
+        # Client users can only see their tenant's reports
+        query = query.filter(BugReport.tenant_id == current_user.tenant_id)
+    elif tenant_id is not None:
+        # Super admin filtering by specific tenant
+        query = query.filter(BugReport.tenant_id == tenant_id)
+
+    # Apply filters
+    if status:
+        query = query.filter(BugReport.status == status)
+
+    if search:
+        query = query.filter(
+            or_(
+                BugReport.description.ilike(f"%{search}%"),
+                BugReport.metadata_json.ilike(f"%{search}%")
+            )
+        )
+
+    if date_from:
+        query = query.filter(BugReport.created_at >= _utc_naive(date_from))
+
+    if date_to:
+        query = query.filter(BugReport.created_at <= _utc_naive(date_to))
+
+    # Index lookups on report_labels, scoped to the tenant's own label dictionary
+    label_tenant = current_user.tenant_id if current_user.role != UserRole.SUPER_ADMIN else tenant_id
+    for name in label or []:
+        query = query.filter(BugReport.id.in_(labels.reports_with_label(name, label_tenant)))
+
+    return query
+
+def _utc_naive(value: Optional[datetime]) -> Optional[datetime]:
+    """
+    created_at is stored as naive UTC. Comparing it to a timestamptz gives wrong results
+    off UTC and keeps Postgres from pruning partitions when planning.
+    """
+    if value is not None and value.tzinfo is not None:
+        return value.astimezone(timezone.utc).replace(tzinfo=None)
+    return value
+
+def _reports(db: Session, current_user: User) -> TenantScope:
+    """Reports the user may access: their tenant's, or all for super admins"""
+    return TenantScope(db, BugReport, current_user, "Report not found")
+
 @router.get("/stats", response_model=DashboardStats)
 async def get_dashboard_stats(
+    request: Request,
+    response: Response,
     current_user: User = Depends(get_current_user),
-    db: Session = Depends(get_db)
+    db: Session = Depends(get_read_db)
 ):
     """Get dashboard statistics"""
+    # "Resolved this week" moves with the clock, so the ETag also rolls over every hour
+    not_modified = conditional_get(
+        request, response, db, current_user, extra=datetime.utcnow().strftime("%Y%m%d%H")
+    )
+    if not_modified:
+        return not_modified
+
     # Build query based on user role
     if current_user.role == UserRole.SUPER_ADMIN:
         reports_query = db.query(BugReport)
@@ -53,6 +151,8 @@ async def get_dashboard_stats(
 
 @router.get("", response_model=BugReportListResponse)
 async def list_reports(
+    request: Request,
+    response: Response,
     page: int = Query(1, ge=1),
     page_size: int = Query(10, ge=1, le=100),
     status: Optional[ReportStatus] = None,
@@ -60,73 +160,143 @@ async def list_reports(
     search: Optional[str] = None,
     date_from: Optional[datetime] = None,
     date_to: Optional[datetime] = None,
+    label: Optional[List[str]] = Query(None, description="Repeat to require several labels"),
+    facets: List[ReportFacet] = Query([], description="Counts to return for the whole filtered set"),
+    facet_interval: FacetInterval = FacetInterval.DAY,
     current_user: User = Depends(get_current_user),
-    db: Session = Depends(get_db)
+    db: Session = Depends(get_read_db)
 ):
     """
     List bug reports with filtering and pagination
     - Super admins can see all reports and filter by tenant
     - Client users can only see their own tenant's reports
+    - facets=status|label|date adds report counts per status, label or created_at bucket
+      (facet_interval) for the current filter
     """
-    # Base query
-    query = db.query(BugReport)
-    
-    # Apply tenant filtering based on user role
-    if current_user.role != UserRole.SUPER_ADMIN:
-        # Client users can only see their tenant's reports
-        query = query.filter(BugReport.tenant_id == current_user.tenant_id)
-    elif tenant_id is not None:
-        # Super admin filtering by specific tenant
-        query = query.filter(BugReport.tenant_id == tenant_id)
-    
-    # Apply filters
-    if status:
-        query = query.filter(BugReport.status == status)
-    
-    if search:
-        query = query.filter(
-            or_(
-                BugReport.description.ilike(f"%{search}%"),
-                BugReport.metadata_json.ilike(f"%{search}%")
-            )
-        )
-    
-    if date_from:
-        query = query.filter(BugReport.created_at >= date_from)
-    
-    if date_to:
-        query = query.filter(BugReport.created_at <= date_to)
+    not_modified = conditional_get(request, response, db, current_user, tenant_id)
+    if not_modified:
+        return not_modified
+
+    query = _filtered_reports_query(
+        db, current_user, status, tenant_id, search, date_from, date_to, label
+    )
     
-    # Get total count
-    total = query.count()
+    # Total and facets are cached until the tenant's data changes, so paging doesn't recount
+    counts = report_counts(db, current_user, query, filters={
+        "status": status, "tenant_id": tenant_id, "search": search,
+        "date_from": date_from, "date_to": date_to, "label": label,
+    }, facets=facets, interval=facet_interval)
     
     # Apply pagination
-    reports = query.order_by(BugReport.created_at.desc()).offset((page - 1) * page_size).limit(page_size).all()
+    # Rows come straight from the database, so they are sent without re-validation
+    reports = project(
+        query.order_by(BugReport.created_at.desc()).offset((page - 1) * page_size).limit(page_size),
+        BugReportResponse, BugReport,
+    )
     
-    return BugReportListResponse(
-        total=total,
-        page=page,
-        page_size=page_size,
-        reports=[BugReportResponse.from_orm(r) for r in reports]
+    return json_response({
+        "total": counts["total"],
+        "page": page,
+        "page_size": page_size,
+        "reports": reports,
+        "facets": counts["facets"] if facets else None,
+    }, response)
+
+@router.get("/export")
+def export_reports(
+    format: ExportFormat = ExportFormat.NDJSON,
+    columns: Optional[str] = Query(None, description="Comma-separated column names"),
+    include_dom: bool = False,
+    status: Optional[ReportStatus] = None,
+    tenant_id: Optional[int] = None,
+    search: Optional[str] = None,
+    date_from: Optional[datetime] = None,
+    date_to: Optional[datetime] = None,
+    label: Optional[List[str]] = Query(None),
+    current_user: User = Depends(get_current_user),
+    db: Session = Depends(get_read_db)
+):
+    """
+    Stream every report matching the filters as NDJSON, CSV or Parquet.
+    Rows are read through a server-side cursor and encoded batch by batch,
+    so memory use does not grow with the size of the export.
+    """
+    try:
+        selected = resolve_export_columns(columns, include_dom)
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+
+    try:
+        ensure_format_supported(format)
+    except RuntimeError as e:
+        raise HTTPException(status_code=501, detail=str(e))
+
+    route_fresh_reads(db, current_user, tenant_id)
+    query = _filtered_reports_query(
+        db, current_user, status, tenant_id, search, date_from, date_to, label
+    )
+    rows = stream_export_rows(query, selected)
+
+    filename = f"reports-{datetime.utcnow().strftime('%Y%m%dT%H%M%S')}.{format.value}"
+    return StreamingResponse(
+        EXPORT_ENCODERS[format](rows, selected),
+        media_type=EXPORT_MEDIA_TYPES[format],
+        headers={"Content-Disposition": f'attachment; filename="{filename}"'},
     )
 
+@router.post("/media-tokens", response_model=MediaTokenResponse)
+async def create_media_tokens(
+    body: MediaTokenRequest,
+    current_user: User = Depends(get_current_user),
+    db: Session = Depends(get_read_db)
+):
+    """
+    Short-lived tokens for the media URLs of the given reports, each valid for that report
+    only, so the session token never appears in a URL. Reports outside the caller's scope
+    are left out.
+    """
+    ids = _reports(db, current_user).query(BugReport.id).filter(BugReport.id.in_(body.report_ids)).all()
+    tokens, expires_in = {}, 0
+    for (report_id,) in ids:
+        tokens[report_id], expires_in = create_scoped_token(current_user.id, MEDIA_SCOPE, report_id)
+    return MediaTokenResponse(tokens=tokens, expires_in=expires_in)
+
 @router.get("/{report_id}", response_model=BugReportResponse)
 async def get_report(
     report_id: int,
+    request: Request,
+    response: Response,
     current_user: User = Depends(get_current_user),
-    db: Session = Depends(get_db)
+    db: Session = Depends(get_read_db)
 ):
     """Get a single bug report by ID"""
-    report = db.query(BugReport).filter(BugReport.id == report_id).first()
-    
-    if not report:
-        raise HTTPException(status_code=404, detail="Report not found")
-    
-    # Check permissions: client users can only see their tenant's reports
-    if current_user.role != UserRole.SUPER_ADMIN and report.tenant_id != current_user.tenant_id:
-        raise HTTPException(status_code=403, detail="Access denied")
+    not_modified = conditional_get(request, response, db, current_user)
+    if not_modified:
+        return not_modified
+
+    # Client users can only see their tenant's reports
+    report = _reports(db, current_user).get(report_id)
     
-    return BugReportResponse.from_orm(report)
+    return BugReportResponse.model_validate(report)
+
+@router.get("/{report_id}/similar", response_model=List[SimilarReport])
+async def get_similar_reports(
+    report_id: int,
+    request: Request,
+    response: Response,
+    current_user: User = Depends(get_current_user),
+    db: Session = Depends(get_read_db)
+):
+    """Likely duplicates of a report, found when it (or the duplicate) was ingested. Best match first."""
+    not_modified = conditional_get(request, response, db, current_user)
+    if not_modified:
+        return not_modified
+
+    report = _reports(db, current_user).get(report_id)
+    return [
+        SimilarReport(score=round(score, 3), report=BugReportResponse.model_validate(similar))
+        for similar, score in similarity.similar_reports(db, report)
+    ]
 
 @router.put("/{report_id}/status", response_model=BugReportResponse)
 async def update_report_status(
@@ -136,71 +306,123 @@ async def update_report_status(
     db: Session = Depends(get_db)
 ):
     """Update a bug report's status"""
-    report = db.query(BugReport).filter(BugReport.id == report_id).first()
-    
-    if not report:
-        raise HTTPException(status_code=404, detail="Report not found")
-    
-    # Check permissions
-    if current_user.role != UserRole.SUPER_ADMIN and report.tenant_id != current_user.tenant_id:
-        raise HTTPException(status_code=403, detail="Access denied")
-    
-    # Update fields
-    if update.status is not None:
-        report.status = update.status
-    if update.synced_to_integration is not None:
-        report.synced_to_integration = update.synced_to_integration
-    if update.external_ticket_id is not None:
-        report.external_ticket_id = update.external_ticket_id
+    values = update.model_dump(exclude_none=True)
+    # One scoped UPDATE ... RETURNING; the report is not loaded first
+    report = _reports(db, current_user).update(report_id, values)
+    if not values:
+        # Nothing changed: cached responses stay valid
+        return BugReportResponse.model_validate(report)
     
+    bump_tenant_version(db, report.tenant_id)
     db.commit()
-    db.refresh(report)
+    if "status" in values:
+        publish_event(REPORT_STATUS_CHANGED, report.tenant_id, report.id, status=report.status.value)
+    else:
+        publish_event(REPORT_UPDATED, report.tenant_id, report.id)
     
-    return BugReportResponse.from_orm(report)
+    return BugReportResponse.model_validate(report)
 
 
 @router.get("/{report_id}/video")
 async def get_report_video(
     report_id: int,
-    current_user: User = Depends(get_current_user),
+    request: Request,
+    current_user: User = Depends(get_media_user),
     db: Session = Depends(get_db)
 ):
     """
-    Download the compressed video for a bug report.
+    Stream or redirect to the video for a bug report.
     Enforces role-based access control and tenant isolation.
     """
-    report = db.query(BugReport).filter(BugReport.id == report_id).first()
-    
-    if not report:
-        raise HTTPException(status_code=404, detail="Report not found")
-        
-    # Check permissions
-    if current_user.role != UserRole.SUPER_ADMIN:
-        if report.tenant_id != current_user.tenant_id:
-            raise HTTPException(status_code=403, detail="Access denied")
-            
-    # Video is now accessed via video_url in the report object
-    return None
+    report = _reports(db, current_user).get(report_id)
+    return await _serve_stored_media(request, report.video_url, "video/webm", f"report-{report.id}.webm")
+
+@router.get("/{report_id}/poster")
+async def get_report_poster(
+    report_id: int,
+    request: Request,
+    current_user: User = Depends(get_media_user),
+    db: Session = Depends(get_db)
+):
+    """Poster frame (JPEG) for list views. Same delivery rules as the video endpoint."""
+    report = _reports(db, current_user).get(report_id)
+    return await _serve_stored_media(request, report.thumbnail_url, "image/jpeg", f"report-{report.id}.jpg")
+
+@router.get("/{report_id}/preview")
+async def get_report_preview(
+    report_id: int,
+    request: Request,
+    current_user: User = Depends(get_media_user),
+    db: Session = Depends(get_db)
+):
+    """Animated preview strip (WebP) for list views. Same delivery rules as the video endpoint."""
+    report = _reports(db, current_user).get(report_id)
+    return await _serve_stored_media(request, report.preview_url, "image/webp", f"report-{report.id}.webp")
+
+async def _serve_stored_media(request: Request, media_url: Optional[str], media_type: str, filename: str):
+    """
+    Deliver an object from video storage.
+    - Object storage: 307 redirect to a short-lived signed URL
+    - Local storage: file response with Range, ETag and conditional GET support
+    """
+    object_key = video_object_key(media_url) if media_url else None
+    if not object_key:
+        raise HTTPException(status_code=404, detail="Media not available for this report")
+
+    if not is_local_video(media_url):
+        # Signing is a blocking storage call (with retries and backoff), so it runs off the event loop
+        signed_url = await asyncio.to_thread(create_signed_video_url, object_key)
+        if not signed_url:
+            raise HTTPException(status_code=502, detail="Could not sign media URL")
+        # The signed URL is only valid for SIGNED_URL_TTL_SECONDS, so the redirect must not outlive it
+        return RedirectResponse(
+            signed_url,
+            status_code=307,
+            headers={"Cache-Control": f"private, max-age={max(SIGNED_URL_TTL_SECONDS - 30, 0)}"},
+        )
+
+    path = local_video_path(object_key)
+    try:
+        stat_result = os.stat(path)
+    except FileNotFoundError:
+        raise HTTPException(status_code=404, detail="Media file not found")
+
+    # Stored objects are never rewritten (names are uuids), so they can be cached for a long time
+    response = FileResponse(
+        path,
+        media_type=media_type,
+        stat_result=stat_result,
+        content_disposition_type="inline",
+        filename=filename,
+        headers={"Cache-Control": "private, max-age=86400, immutable"},
+    )
+    if is_not_modified(request.headers, response.headers):
+        return Response(status_code=304, headers={
+            k: response.headers[k] for k in ("etag", "last-modified", "cache-control")
+        })
+    return response
 
 @router.delete("/{report_id}", status_code=204)
 async def delete_report(
     report_id: int,
+    background_tasks: BackgroundTasks,
     current_user: User = Depends(get_current_user),
     db: Session = Depends(get_db)
 ):
-    """Delete a bug report permanently"""
-    report = db.query(BugReport).filter(BugReport.id == report_id).first()
-    
-    if not report:
-        raise HTTPException(status_code=404, detail="Report not found")
-        
-    # Permission check
-    if current_user.role != UserRole.SUPER_ADMIN:
-        if report.tenant_id != current_user.tenant_id:
-            raise HTTPException(status_code=403, detail="Access denied")
+    """Delete a bug report permanently, along with its stored video, poster and preview"""
+    deleted = _reports(db, current_user).delete(report_id, returning=(
+        BugReport.tenant_id, BugReport.video_url, BugReport.thumbnail_url, BugReport.preview_url,
+    ))
             
-    db.delete(report)
+    media_urls = [deleted.video_url, deleted.thumbnail_url, deleted.preview_url]
+    similarity.forget_reports(db, [report_id])
+    labels.forget_reports(db, [report_id])
+    enrichment.forget_reports(db, [report_id])
+    bump_tenant_version(db, deleted.tenant_id)
     db.commit()
+    publish_event(REPORT_DELETED, deleted.tenant_id, report_id)
+    # Only after the commit, so a failed delete never leaves a report pointing at a missing video
+    background_tasks.add_task(delete_stored_media, media_urls)
     return None
 
 class ReportUpdate(BaseModel):
@@ -215,22 +437,19 @@ async def update_report_details(
     db: Session = Depends(get_db)
 ):
     """Update report description and labels"""
-    report = db.query(BugReport).filter(BugReport.id == report_id).first()
-    
-    if not report:
-        raise HTTPException(status_code=404, detail="Report not found")
-        
-    # Permission check
-    if current_user.role != UserRole.SUPER_ADMIN:
-        if report.tenant_id != current_user.tenant_id:
-            raise HTTPException(status_code=403, detail="Access denied")
-            
+    values = {}
     if update_data.description is not None:
-        report.description = update_data.description
+        values["description"] = update_data.description
+    if update_data.label is not None:
+        values["label"] = labels.normalize_labels(update_data.label)
+    report = _reports(db, current_user).update(report_id, values)
+    if not values:
+        return BugReportResponse.model_validate(report)
         
     if update_data.label is not None:
-        report.label = update_data.label
+        labels.set_report_labels(db, report, values["label"])
         
+    bump_tenant_version(db, report.tenant_id)
     db.commit()
-    db.refresh(report)
-    return BugReportResponse.from_orm(report)
+    publish_event(REPORT_UPDATED, report.tenant_id, report.id)
+    return BugReportResponse.model_validate(report)
@@ -1,22 +1,26 @@
 from fastapi import APIRouter, Depends, HTTPException
 from sqlalchemy.orm import Session
 from typing import List
-from db import get_db
-from models import User, Tenant, UserRole
-from schemas import TenantCreate, TenantResponse, TenantUpdate
+from db import get_db, get_read_db
+from models import User, Tenant, UserRole, RetentionPolicy
+from schemas import TenantCreate, TenantResponse, TenantUpdate, RetentionPolicyUpdate, RetentionPolicyResponse
 from auth import require_role
+from caching import bump_tenant_version, route_fresh_reads
+from retention import RETENTION_DEFAULT_DAYS, RETENTION_DEFAULT_VIDEO_ACTION
 import secrets
+from datetime import datetime
 
 router = APIRouter(prefix="/api/tenants", tags=["Tenants"])
 
 @router.get("", response_model=List[TenantResponse])
 async def list_tenants(
-    _: User = Depends(require_role(UserRole.SUPER_ADMIN)),
-    db: Session = Depends(get_db)
+    current_user: User = Depends(require_role(UserRole.SUPER_ADMIN)),
+    db: Session = Depends(get_read_db)
 ):
     """List all tenants (Super Admin only)"""
+    route_fresh_reads(db, current_user)
     tenants = db.query(Tenant).all()
-    return [TenantResponse.from_orm(t) for t in tenants]
+    return tenants
 
 @router.post("", response_model=TenantResponse)
 async def create_tenant(
@@ -28,14 +32,17 @@ async def create_tenant(
     new_tenant = Tenant(
         name=tenant_data.name,
         company_name=tenant_data.company_name,
+        tier=tenant_data.tier,
         api_key=secrets.token_urlsafe(32)
     )
     
     db.add(new_tenant)
+    db.flush()
+    bump_tenant_version(db, new_tenant.id)
     db.commit()
     db.refresh(new_tenant)
     
-    return TenantResponse.from_orm(new_tenant)
+    return TenantResponse.model_validate(new_tenant)
 
 @router.get("/{tenant_id}", response_model=TenantResponse)
 async def get_tenant(
@@ -47,7 +54,7 @@ async def get_tenant(
     tenant = db.query(Tenant).filter(Tenant.id == tenant_id).first()
     if not tenant:
         raise HTTPException(status_code=404, detail="Tenant not found")
-    return TenantResponse.from_orm(tenant)
+    return TenantResponse.model_validate(tenant)
 
 @router.put("/{tenant_id}", response_model=TenantResponse)
 async def update_tenant(
@@ -67,11 +74,14 @@ async def update_tenant(
         tenant.company_name = update.company_name
     if update.is_active is not None:
         tenant.is_active = update.is_active
+    if update.tier is not None:
+        tenant.tier = update.tier
     
+    bump_tenant_version(db, tenant.id)
     db.commit()
     db.refresh(tenant)
     
-    return TenantResponse.from_orm(tenant)
+    return TenantResponse.model_validate(tenant)
 
 @router.delete("/{tenant_id}")
 async def delete_tenant(
@@ -85,6 +95,7 @@ async def delete_tenant(
         raise HTTPException(status_code=404, detail="Tenant not found")
     
     tenant.is_active = False
+    bump_tenant_version(db, tenant.id)
     db.commit()
     
     return {"message": "Tenant deactivated successfully"}
@@ -101,7 +112,60 @@ async def regenerate_api_key(
         raise HTTPException(status_code=404, detail="Tenant not found")
     
     tenant.api_key = secrets.token_urlsafe(32)
+    # The key is part of the cached tenant responses
+    bump_tenant_version(db, tenant.id)
     db.commit()
     db.refresh(tenant)
     
-    return TenantResponse.from_orm(tenant)
+    return TenantResponse.model_validate(tenant)
+
+@router.get("/{tenant_id}/retention", response_model=RetentionPolicyResponse)
+async def get_retention_policy(
+    tenant_id: int,
+    _: User = Depends(require_role(UserRole.SUPER_ADMIN)),
+    db: Session = Depends(get_db)
+):
+    """Get the tenant's report retention policy (Super Admin only)"""
+    if not db.query(Tenant.id).filter(Tenant.id == tenant_id).first():
+        raise HTTPException(status_code=404, detail="Tenant not found")
+    return _retention_policy_response(db, tenant_id)
+
+def _retention_policy_response(db: Session, tenant_id: int) -> RetentionPolicyResponse:
+    policy = db.query(RetentionPolicy).filter(RetentionPolicy.tenant_id == tenant_id).first()
+    if not policy:
+        return RetentionPolicyResponse(
+            tenant_id=tenant_id, retain_days=RETENTION_DEFAULT_DAYS or None,
+            video_action=RETENTION_DEFAULT_VIDEO_ACTION, is_default=True
+        )
+    return RetentionPolicyResponse(
+        tenant_id=tenant_id, retain_days=policy.retain_days, video_action=policy.video_action, is_default=False
+    )
+
+@router.put("/{tenant_id}/retention", response_model=RetentionPolicyResponse)
+async def update_retention_policy(
+    tenant_id: int,
+    update: RetentionPolicyUpdate,
+    _: User = Depends(require_role(UserRole.SUPER_ADMIN)),
+    db: Session = Depends(get_db)
+):
+    """
+    Set how many days reports are kept before being archived and what happens to their videos.
+    retain_days null removes the policy (Super Admin only).
+    """
+    if not db.query(Tenant.id).filter(Tenant.id == tenant_id).first():
+        raise HTTPException(status_code=404, detail="Tenant not found")
+
+    policy = db.query(RetentionPolicy).filter(RetentionPolicy.tenant_id == tenant_id).first()
+    if update.retain_days is None:
+        if policy:
+            db.delete(policy)
+    else:
+        if not policy:
+            policy = RetentionPolicy(tenant_id=tenant_id)
+            db.add(policy)
+        policy.retain_days = update.retain_days
+        policy.video_action = update.video_action
+        policy.updated_at = datetime.utcnow()
+    db.commit()
+
+    return _retention_policy_response(db, tenant_id)
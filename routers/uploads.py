@@ -0,0 +1,178 @@
+import asyncio
+import logging
+from datetime import datetime
+from fastapi import APIRouter, BackgroundTasks, Depends, Form, Header, HTTPException, Request, Response
+from sqlalchemy.orm import Session
+from db import get_db
+from models import Tenant, UploadSession, UploadStatus
+from schemas import UploadCreate, UploadSessionResponse
+from ingestion import ReportDiscarded, ingest_report
+from lifecycle import upload_slot
+import uploads
+
+logger = logging.getLogger(__name__)
+
+router = APIRouter(prefix="/uploads", tags=["Uploads"])
+
+def _upload_tenant(x_tenant_key: str = Header(...), db: Session = Depends(get_db)) -> Tenant:
+    """Resumable uploads authenticate every request with the tenant API key, like /feedback"""
+    tenant = db.query(Tenant).filter(Tenant.api_key == x_tenant_key, Tenant.is_active == True).first()
+    if not tenant:
+        logger.warning(f"Invalid tenant API key attempt: {x_tenant_key}")
+        raise HTTPException(status_code=401, detail="Invalid tenant API key")
+    return tenant
+
+def _progress_headers(upload: UploadSession) -> dict:
+    return {
+        "Upload-Offset": str(upload.received),
+        "Upload-Length": str(upload.length),
+        "Upload-Expires": upload.expires_at.strftime("%a, %d %b %Y %H:%M:%S GMT"),
+        "Cache-Control": "no-store",
+    }
+
+def _get_upload(upload_id: str, tenant: Tenant, db: Session) -> UploadSession:
+    upload = db.query(UploadSession).filter(UploadSession.id == upload_id, UploadSession.tenant_id == tenant.id).first()
+    if not upload or upload.expires_at < datetime.utcnow():
+        raise HTTPException(status_code=404, detail="Upload not found or expired")
+    return upload
+
+@router.post("", response_model=UploadSessionResponse, status_code=201)
+async def create_upload(
+    data: UploadCreate,
+    response: Response,
+    tenant: Tenant = Depends(_upload_tenant),
+    db: Session = Depends(get_db)
+):
+    """
+    Start a resumable upload of `length` bytes.
+    Send the video with PUT /uploads/{id} (Upload-Offset header), then POST /uploads/{id}/finalize.
+    """
+    if data.length > uploads.UPLOAD_MAX_BYTES:
+        raise HTTPException(status_code=413, detail=f"Uploads are limited to {uploads.UPLOAD_MAX_BYTES} bytes")
+    upload = uploads.create_session(db, tenant, data.length, data.content_type, data.filename)
+    response.headers["Location"] = f"{router.prefix}/{upload.id}"
+    response.headers.update(_progress_headers(upload))
+    return UploadSessionResponse.model_validate(upload)
+
+@router.get("/{upload_id}", response_model=UploadSessionResponse)
+async def get_upload(
+    upload_id: str,
+    response: Response,
+    tenant: Tenant = Depends(_upload_tenant),
+    db: Session = Depends(get_db)
+):
+    """Progress of an upload: resume by sending the bytes from `offset` on"""
+    upload = _get_upload(upload_id, tenant, db)
+    response.headers.update(_progress_headers(upload))
+    return UploadSessionResponse.model_validate(upload)
+
+@router.head("/{upload_id}")
+async def head_upload(
+    upload_id: str,
+    tenant: Tenant = Depends(_upload_tenant),
+    db: Session = Depends(get_db)
+):
+    """Progress in headers only (Upload-Offset, Upload-Length), as tus clients expect"""
+    upload = _get_upload(upload_id, tenant, db)
+    return Response(status_code=204, headers=_progress_headers(upload))
+
+@router.put("/{upload_id}", status_code=204, dependencies=[Depends(upload_slot)])
+async def upload_chunk(
+    upload_id: str,
+    request: Request,
+    upload_offset: int = Header(..., ge=0),
+    tenant: Tenant = Depends(_upload_tenant),
+    db: Session = Depends(get_db)
+):
+    """
+    Append the request body at Upload-Offset, which must equal the upload's current offset.
+    Responds with the new Upload-Offset; after a dropped connection, ask GET/HEAD for it.
+    """
+    upload = _get_upload(upload_id, tenant, db)
+    with uploads.chunk_lock(upload_id) as spool:
+        # Checked under the lock, so only a chunk at the current offset ever reaches the spool
+        db.refresh(upload)
+        if upload.status != UploadStatus.UPLOADING:
+            raise HTTPException(status_code=409, detail="Upload is already finalised")
+        if spool is None:
+            raise HTTPException(status_code=409, detail="Another chunk of this upload is being received",
+                                headers=_progress_headers(upload))
+        if upload_offset != upload.received:
+            raise HTTPException(status_code=409, detail="Upload-Offset does not match the upload's offset",
+                                headers=_progress_headers(upload))
+        remaining = upload.length - upload.received
+        # Don't pin a pooled DB connection while a slow client sends its chunk
+        db.commit()
+
+        written, overflow = await uploads.write_chunk(spool, upload_id, upload_offset, remaining, request.stream())
+        if written and not uploads.record_progress(db, upload_id, upload_offset, written):
+            raise HTTPException(status_code=409, detail="Upload was modified concurrently, check its offset")
+    db.refresh(upload)
+    if overflow:
+        raise HTTPException(status_code=413, detail="Chunk goes past the upload's length",
+                            headers=_progress_headers(upload))
+    return Response(status_code=204, headers=_progress_headers(upload))
+
+@router.post("/{upload_id}/finalize", dependencies=[Depends(upload_slot)])
+async def finalize_upload(
+    upload_id: str,
+    background_tasks: BackgroundTasks,
+    dom: str = Form(...),
+    metadata: str = Form(...),
+    description: str = Form(None),
+    struggleScore: float = Form(None),
+    tenant: Tenant = Depends(_upload_tenant),
+    db: Session = Depends(get_db)
+):
+    """
+    Turn a complete upload into a bug report, with the same form fields as /feedback minus the video.
+    Safe to retry: a finalised upload answers with its report id.
+    """
+    upload = _get_upload(upload_id, tenant, db)
+    lease = uploads.claim_finalization(db, upload_id)
+    if lease is None:
+        db.refresh(upload)
+        if upload.status == UploadStatus.COMPLETED:
+            return {"status": "success", "id": upload.report_id}
+        if upload.status == UploadStatus.FINALIZING:
+            raise HTTPException(status_code=409, detail="Upload is being finalised")
+        raise HTTPException(status_code=409, detail="Upload is incomplete", headers=_progress_headers(upload))
+
+    try:
+        video_bytes = await asyncio.to_thread(uploads.read_spool, upload_id)
+        # The upload is marked completed in the report's transaction, only while this claim holds
+        new_report = await ingest_report(
+            db, background_tasks, tenant, video_bytes, upload.content_type, upload.filename,
+            dom=dom, metadata=metadata, description=description, struggle_score=struggleScore,
+            before_commit=lambda report: uploads.mark_completed(db, upload_id, lease, report.id),
+        )
+    except ReportDiscarded:
+        # This finalisation outlived its lease and another one took over the upload
+        logger.warning(f"Upload {upload_id}: finalisation lease lost, report discarded")
+        current = db.query(UploadSession).filter(UploadSession.id == upload_id).first()
+        if current and current.status == UploadStatus.COMPLETED:
+            return {"status": "success", "id": current.report_id}
+        raise HTTPException(status_code=409, detail="Upload is being finalised")
+    except Exception as e:
+        db.rollback()
+        uploads.release_finalization(db, upload_id, lease)
+        logger.error(f"FATAL ERROR finalising upload {upload_id}: {str(e)}", exc_info=True)
+        raise HTTPException(status_code=500, detail=f"Internal Server Error: {str(e)}")
+
+    uploads.remove_spool(upload_id)
+    return {"status": "success", "id": new_report.id}
+
+@router.delete("/{upload_id}", status_code=204)
+async def delete_upload(
+    upload_id: str,
+    tenant: Tenant = Depends(_upload_tenant),
+    db: Session = Depends(get_db)
+):
+    """Abandon an upload and free its spooled bytes"""
+    upload = _get_upload(upload_id, tenant, db)
+    if upload.status == UploadStatus.FINALIZING and not uploads.finalization_lease_expired(upload):
+        raise HTTPException(status_code=409, detail="Upload is being finalised")
+    db.delete(upload)
+    db.commit()
+    uploads.remove_spool(upload_id)
+    return Response(status_code=204)
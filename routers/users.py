@@ -1,17 +1,19 @@
 from fastapi import APIRouter, Depends, HTTPException
 from sqlalchemy.orm import Session
 from typing import List
-from db import get_db
+from db import get_db, get_read_db
 from models import User, UserRole
 from schemas import UserCreate, UserResponse, UserUpdate
 from auth import hash_password, get_current_user, require_role
+from caching import bump_tenant_version, route_fresh_reads
+from tenant_scope import TenantScope
 
 router = APIRouter(prefix="/api/users", tags=["Users"])
 
 @router.get("", response_model=List[UserResponse])
 async def list_users(
     current_user: User = Depends(get_current_user),
-    db: Session = Depends(get_db)
+    db: Session = Depends(get_read_db)
 ):
     """
     List users
@@ -22,12 +24,8 @@ async def list_users(
     if current_user.role == UserRole.CLIENT_USER:
         raise HTTPException(status_code=403, detail="Insufficient permissions")
     
-    if current_user.role == UserRole.SUPER_ADMIN:
-        users = db.query(User).all()
-    else:
-        users = db.query(User).filter(User.tenant_id == current_user.tenant_id).all()
-    
-    return [UserResponse.from_orm(u) for u in users]
+    route_fresh_reads(db, current_user)
+    return TenantScope(db, User, current_user).query().all()
 
 @router.post("", response_model=UserResponse)
 async def create_user(
@@ -64,10 +62,13 @@ async def create_user(
     )
     
     db.add(new_user)
+    if new_user.tenant_id is not None:
+        # Lets replica reads of the tenant's users know they are behind
+        bump_tenant_version(db, new_user.tenant_id)
     db.commit()
     db.refresh(new_user)
     
-    return UserResponse.from_orm(new_user)
+    return UserResponse.model_validate(new_user)
 
 @router.get("/{user_id}", response_model=UserResponse)
 async def get_user(
@@ -76,19 +77,11 @@ async def get_user(
     db: Session = Depends(get_db)
 ):
     """Get user details"""
-    user = db.query(User).filter(User.id == user_id).first()
-    if not user:
-        raise HTTPException(status_code=404, detail="User not found")
+    # Client users can only see themselves, client admins their tenant's users
+    own = (User.id == current_user.id,) if current_user.role == UserRole.CLIENT_USER else ()
+    user = TenantScope(db, User, current_user).get(user_id, *own)
     
-    # Check permissions
-    if current_user.role == UserRole.CLIENT_USER:
-        if user.id != current_user.id:
-            raise HTTPException(status_code=403, detail="Access denied")
-    elif current_user.role == UserRole.CLIENT_ADMIN:
-        if user.tenant_id != current_user.tenant_id:
-            raise HTTPException(status_code=403, detail="Access denied")
-    
-    return UserResponse.from_orm(user)
+    return UserResponse.model_validate(user)
 
 @router.put("/{user_id}", response_model=UserResponse)
 async def update_user(
@@ -101,31 +94,22 @@ async def update_user(
     if current_user.role == UserRole.CLIENT_USER:
         raise HTTPException(status_code=403, detail="Insufficient permissions")
     
-    user = db.query(User).filter(User.id == user_id).first()
-    if not user:
-        raise HTTPException(status_code=404, detail="User not found")
+    if current_user.role == UserRole.CLIENT_ADMIN and update.role == UserRole.SUPER_ADMIN:
+        raise HTTPException(status_code=403, detail="Cannot assign super admin role")
     
-    # Client admins can only update users in their tenant
-    if current_user.role == UserRole.CLIENT_ADMIN:
-        if user.tenant_id != current_user.tenant_id:
-            raise HTTPException(status_code=403, detail="Access denied")
-        if update.role == UserRole.SUPER_ADMIN:
-            raise HTTPException(status_code=403, detail="Cannot assign super admin role")
-    
-    # Update fields
-    if update.email is not None:
-        user.email = update.email
-    if update.role is not None:
-        user.role = update.role
+    # Client admins can only update users in their tenant: one scoped UPDATE ... RETURNING
+    users = TenantScope(db, User, current_user)
+    tenant_ids = set()
     if update.tenant_id is not None:
-        user.tenant_id = update.tenant_id
-    if update.is_active is not None:
-        user.is_active = update.is_active
+        # Moving a user between tenants also invalidates the tenant they leave
+        tenant_ids.add(users.query(User.tenant_id).filter(User.id == user_id).scalar())
+    user = users.update(user_id, update.model_dump(exclude_none=True))
     
+    for tenant_id in (tenant_ids | {user.tenant_id}) - {None}:
+        bump_tenant_version(db, tenant_id)
     db.commit()
-    db.refresh(user)
     
-    return UserResponse.from_orm(user)
+    return UserResponse.model_validate(user)
 
 @router.delete("/{user_id}")
 async def delete_user(
@@ -137,16 +121,10 @@ async def delete_user(
     if current_user.role == UserRole.CLIENT_USER:
         raise HTTPException(status_code=403, detail="Insufficient permissions")
     
-    user = db.query(User).filter(User.id == user_id).first()
-    if not user:
-        raise HTTPException(status_code=404, detail="User not found")
-    
     # Client admins can only delete users in their tenant
-    if current_user.role == UserRole.CLIENT_ADMIN:
-        if user.tenant_id != current_user.tenant_id:
-            raise HTTPException(status_code=403, detail="Access denied")
-    
-    user.is_active = False
+    user = TenantScope(db, User, current_user).update(user_id, {"is_active": False})
+    if user.tenant_id is not None:
+        bump_tenant_version(db, user.tenant_id)
     db.commit()
     
     return {"message": "User deactivated successfully"}
@@ -1,7 +1,8 @@
+import enum
 from pydantic import BaseModel, EmailStr, Field
-from typing import Optional, List
+from typing import Optional, List, Dict
 from datetime import datetime
-from models import UserRole, ReportStatus, IntegrationType
+from models import UserRole, ReportStatus, IntegrationType, VideoRetention, UploadStatus, TenantTier
 
 # ============ User Schemas ============
 class UserBase(BaseModel):
@@ -39,6 +40,7 @@ class TokenResponse(BaseModel):
 class TenantBase(BaseModel):
     name: str
     company_name: Optional[str] = None
+    tier: TenantTier = TenantTier.FREE
 
 class TenantCreate(TenantBase):
     pass
@@ -47,6 +49,7 @@ class TenantUpdate(BaseModel):
     name: Optional[str] = None
     company_name: Optional[str] = None
     is_active: Optional[bool] = None
+    tier: Optional[TenantTier] = None
 
 class TenantResponse(TenantBase):
     id: int
@@ -57,6 +60,16 @@ class TenantResponse(TenantBase):
     class Config:
         from_attributes = True
 
+class RetentionPolicyUpdate(BaseModel):
+    retain_days: Optional[int] = Field(None, ge=1)  # None removes the policy (platform default applies)
+    video_action: VideoRetention = VideoRetention.DELETE
+
+class RetentionPolicyResponse(BaseModel):
+    tenant_id: int
+    retain_days: Optional[int] = None
+    video_action: VideoRetention
+    is_default: bool
+
 # ============ Integration Schemas ============
 class IntegrationBase(BaseModel):
     integration_type: IntegrationType
@@ -101,16 +114,44 @@ class BugReportResponse(BugReportBase):
     synced_to_integration: bool
     external_ticket_id: Optional[str]
     video_url: Optional[str] = None
+    thumbnail_url: Optional[str] = None
+    preview_url: Optional[str] = None
     created_at: datetime
 
     class Config:
         from_attributes = True
 
+class ReportFacet(str, enum.Enum):
+    STATUS = "status"
+    LABEL = "label"
+    DATE = "date"
+
+class FacetInterval(str, enum.Enum):
+    """Bucket size of the date facet; buckets are keyed by their first day (UTC)"""
+    DAY = "day"
+    WEEK = "week"
+    MONTH = "month"
+
 class BugReportListResponse(BaseModel):
     total: int
     page: int
     page_size: int
     reports: List[BugReportResponse]
+    # Requested with ?facets=...: {facet: {value: report count}} over the whole filtered set
+    facets: Optional[Dict[str, Dict[str, int]]] = None
+
+class SimilarReport(BaseModel):
+    """A likely duplicate; score in [0, 1] blends transcript/label and DOM structure similarity"""
+    score: float
+    report: BugReportResponse
+
+class MediaTokenRequest(BaseModel):
+    report_ids: List[int] = Field(..., min_length=1, max_length=100)
+
+class MediaTokenResponse(BaseModel):
+    """Per report id, a token for ?token= on its video, poster and preview URLs"""
+    tokens: Dict[int, str]
+    expires_in: int
 
 # ============ Analytics Schemas ============
 class DashboardStats(BaseModel):
@@ -118,3 +159,20 @@ class DashboardStats(BaseModel):
     active_tenants: int
     resolved_this_week: int
     avg_struggle_score: float
+
+# ============ Upload Schemas ============
+class UploadCreate(BaseModel):
+    length: int = Field(..., gt=0)  # Total size of the video in bytes
+    content_type: Optional[str] = "video/webm"
+    filename: Optional[str] = None
+
+class UploadSessionResponse(BaseModel):
+    id: str
+    offset: int = Field(validation_alias="received")
+    length: int
+    status: UploadStatus
+    report_id: Optional[int] = None
+    expires_at: datetime
+
+    class Config:
+        from_attributes = True
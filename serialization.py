@@ -0,0 +1,74 @@
+"""
+Fast JSON responses.
+
+For a route with a response_model FastAPI validates what the endpoint returns, serialises
+it back to Python (mode="json") and encodes that with the stdlib json module. For report
+lists carrying large DOM snapshots this is most of the request's CPU. So:
+
+- FastJSONResponse, the app's default response class, encodes with orjson when installed;
+- project() reads a schema's fields straight from the query as dicts, without loading ORM
+  objects or validating them;
+- json_response() sends such content as-is. Only use it for content built from trusted
+  database rows; keep response_model on the route, it still documents the OpenAPI schema.
+"""
+
+from typing import Optional
+
+from fastapi import Response
+from fastapi.encoders import jsonable_encoder
+from fastapi.responses import JSONResponse
+from pydantic import BaseModel
+from sqlalchemy.orm import Query
+
+try:
+    import orjson
+except ImportError:  # stdlib json, as before
+    orjson = None
+
+
+class FastJSONResponse(JSONResponse):
+    def render(self, content) -> bytes:
+        if orjson is None:
+            return super().render(content)
+        return orjson.dumps(content, option=orjson.OPT_NON_STR_KEYS)
+
+
+def json_response(content, response: Optional[Response] = None, status_code: int = 200) -> FastJSONResponse:
+    """
+    Content sent without response_model validation. Headers (ETag, Cache-Control...) set on the
+    endpoint's `response` parameter are carried over, as FastAPI does for returned values.
+    """
+    if orjson is None:
+        content = jsonable_encoder(content)
+    result = FastJSONResponse(content, status_code=status_code)
+    if response is not None:
+        if response.status_code:
+            result.status_code = response.status_code
+        result.headers.raw.extend(header for header in response.headers.raw if header[0] != b"content-length")
+    return result
+
+
+def _defaults(schema: type[BaseModel]) -> dict:
+    return {
+        name: field.default for name, field in schema.model_fields.items()
+        if not field.is_required() and field.default is not None
+    }
+
+
+def project(query: Query, schema: type[BaseModel], model) -> list[dict]:
+    """
+    Rows of `query` as dicts holding exactly the fields of `schema`, read from the same-named
+    columns of `model`. NULLs in fields with a non-null default get the default, as
+    model_validate would.
+    """
+    names = list(schema.model_fields)
+    defaults = _defaults(schema)
+    rows = query.with_entities(*(getattr(model, name) for name in names)).all()
+    items = []
+    for row in rows:
+        item = dict(zip(names, row))
+        for name, default in defaults.items():
+            if item[name] is None:
+                item[name] = default
+        items.append(item)
+    return items
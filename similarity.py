@@ -0,0 +1,288 @@
+"""
+Duplicate detection for bug reports.
+
+Every report gets a compact signature (report_signatures):
+- a 64-value MinHash of its transcript (or description) word shingles plus its labels,
+  estimating the Jaccard similarity of two reports' text;
+- a 64-bit SimHash of its DOM snapshot's tag structure (text and attributes ignored),
+  whose Hamming distance tracks how alike two pages are.
+
+Signatures are indexed per tenant with locality-sensitive hashing (report_lsh_buckets):
+the MinHash is cut into 16 bands of 4 values and the SimHash into 4 chunks of 16 bits,
+each stored as a (band, bucket) row. A new report is only compared to reports sharing at
+least one bucket, so linking stays sublinear in the tenant's report count. Matches scoring
+SIMILARITY_THRESHOLD or more are stored in report_links and served by
+GET /api/reports/{id}/similar.
+
+New reports are indexed right after ingestion; `python manage.py index-similarity`
+indexes existing ones.
+"""
+
+import hashlib
+import logging
+import os
+import random
+import re
+import struct
+from collections import Counter
+from html.parser import HTMLParser
+from typing import Iterable, Optional
+
+from sqlalchemy import func, tuple_
+
+from caching import bump_tenant_version
+from db import SessionLocal
+from events import publish_event, REPORT_DUPLICATES_FOUND
+from models import BugReport, ReportLink, ReportLshBucket, ReportSignature
+
+logger = logging.getLogger(__name__)
+
+SIMILARITY_THRESHOLD = float(os.environ.get("SIMILARITY_THRESHOLD", "0.6"))
+SIMILARITY_MAX_LINKS = int(os.environ.get("SIMILARITY_MAX_LINKS", "10"))
+# Upper bound on reports compared per new report, best bucket overlap first
+SIMILARITY_MAX_CANDIDATES = int(os.environ.get("SIMILARITY_MAX_CANDIDATES", "200"))
+# Share of the score given to text when both text and DOM signatures exist
+SIMILARITY_TEXT_WEIGHT = float(os.environ.get("SIMILARITY_TEXT_WEIGHT", "0.7"))
+SIMILARITY_DOM_MAX_BYTES = int(os.environ.get("SIMILARITY_DOM_MAX_BYTES", str(1024 * 1024)))
+
+# Changing any of these invalidates stored signatures: re-run index-similarity with --rebuild
+NUM_PERM = 64
+BANDS, ROWS = 16, 4  # Text pairs above ~(1/16)^(1/4) = 0.5 Jaccard usually share a band
+DOM_CHUNKS = 4  # SimHashes within 3 bits always share a chunk
+SHINGLE_WORDS = 3
+DOM_PATH_DEPTH = 4
+
+_PRIME = (1 << 61) - 1
+_rng = random.Random(0x7472_6170)
+_PERMUTATIONS = [(_rng.randrange(1, _PRIME), _rng.randrange(0, _PRIME)) for _ in range(NUM_PERM)]
+_WORD = re.compile(r"\w+")
+_VOID_TAGS = frozenset("area base br col embed hr img input link meta param source track wbr".split())
+
+
+def _hash64(token: str) -> int:
+    return int.from_bytes(hashlib.blake2b(token.encode(), digest_size=8).digest(), "big")
+
+
+def _signed64(value: int) -> int:
+    """BIGINT columns are signed"""
+    return value - (1 << 64) if value >= 1 << 63 else value
+
+
+def text_tokens(text: Optional[str], labels: Iterable[str] = ()) -> set[str]:
+    """Word shingles of the text plus one token per label"""
+    words = _WORD.findall((text or "").lower())
+    if len(words) < SHINGLE_WORDS:
+        tokens = set(words)
+    else:
+        tokens = {" ".join(words[i:i + SHINGLE_WORDS]) for i in range(len(words) - SHINGLE_WORDS + 1)}
+    tokens.update(f"label:{label.strip().lower()}" for label in labels if label and label.strip())
+    return tokens
+
+
+def minhash(tokens: set[str]) -> Optional[list[int]]:
+    if not tokens:
+        return None
+    hashes = [_hash64(token) for token in tokens]
+    return [min((a * h + b) % _PRIME for h in hashes) & 0xFFFFFFFF for a, b in _PERMUTATIONS]
+
+
+class _StructureParser(HTMLParser):
+    """Counts each element's tag path (its tag and nearest ancestors); text and attributes are ignored"""
+
+    def __init__(self):
+        super().__init__(convert_charrefs=False)
+        self.stack: list[str] = []
+        self.paths: Counter = Counter()
+
+    def handle_starttag(self, tag, attrs):
+        self.paths[">".join(self.stack[-(DOM_PATH_DEPTH - 1):] + [tag])] += 1
+        if tag not in _VOID_TAGS:
+            self.stack.append(tag)
+
+    def handle_endtag(self, tag):
+        if tag in self.stack:
+            while self.stack.pop() != tag:
+                pass
+
+
+def dom_structure_hash(dom: Optional[str]) -> Optional[int]:
+    """SimHash of the snapshot's tag paths; None if it holds no markup"""
+    if not dom:
+        return None
+    parser = _StructureParser()
+    try:
+        parser.feed(dom[:SIMILARITY_DOM_MAX_BYTES])
+        parser.close()
+    except Exception as e:
+        logger.warning(f"Could not parse DOM snapshot: {e}")
+    if not parser.paths:
+        return None
+
+    weights = [0] * 64
+    for path, count in parser.paths.items():
+        h = _hash64(path)
+        for bit in range(64):
+            weights[bit] += count if h >> bit & 1 else -count
+    return sum(1 << bit for bit in range(64) if weights[bit] > 0)
+
+
+def _pack(values: Optional[list[int]]) -> Optional[bytes]:
+    return struct.pack(f"<{NUM_PERM}I", *values) if values else None
+
+
+def _unpack(data: Optional[bytes]) -> Optional[tuple[int, ...]]:
+    return struct.unpack(f"<{NUM_PERM}I", data) if data else None
+
+
+def _buckets(signature: Optional[list[int]], dom_hash: Optional[int]) -> list[tuple[int, int]]:
+    """(band, bucket) pairs for the LSH index; DOM chunks use bands BANDS..BANDS + DOM_CHUNKS - 1"""
+    buckets = []
+    if signature:
+        for band in range(BANDS):
+            rows = struct.pack(f"<{ROWS}I", *signature[band * ROWS:(band + 1) * ROWS])
+            buckets.append((band, _signed64(int.from_bytes(hashlib.blake2b(rows, digest_size=8).digest(), "big"))))
+    if dom_hash is not None:
+        for chunk in range(DOM_CHUNKS):
+            buckets.append((BANDS + chunk, dom_hash >> (16 * chunk) & 0xFFFF))
+    return buckets
+
+
+def score(text_a, dom_a: Optional[int], text_b, dom_b: Optional[int]) -> float:
+    """Weighted similarity in [0, 1] over the signature parts both reports have"""
+    parts = []
+    if text_a and text_b:
+        parts.append((SIMILARITY_TEXT_WEIGHT, sum(x == y for x, y in zip(text_a, text_b)) / NUM_PERM))
+    if dom_a is not None and dom_b is not None:
+        distance = bin((dom_a ^ dom_b) & 0xFFFFFFFFFFFFFFFF).count("1")
+        parts.append((1 - SIMILARITY_TEXT_WEIGHT, 1 - distance / 64))
+    if not parts:
+        return 0.0
+    return sum(weight * value for weight, value in parts) / sum(weight for weight, _ in parts)
+
+
+def _find_similar(db, report_id: int, tenant_id: int, signature, dom_hash, buckets) -> list[tuple[int, float]]:
+    """(report_id, score) of the tenant's indexed reports above the threshold, best first"""
+    if not buckets:
+        return []
+    shared = func.count().label("shared")
+    candidates = [
+        row.report_id for row in db.query(ReportLshBucket.report_id, shared)
+        .filter(
+            ReportLshBucket.tenant_id == tenant_id,
+            tuple_(ReportLshBucket.band, ReportLshBucket.bucket).in_(buckets),
+            ReportLshBucket.report_id != report_id,
+        )
+        .group_by(ReportLshBucket.report_id)
+        .order_by(shared.desc())
+        .limit(SIMILARITY_MAX_CANDIDATES)
+    ]
+    if not candidates:
+        return []
+
+    matches = []
+    for other in db.query(ReportSignature).filter(ReportSignature.report_id.in_(candidates)):
+        other_dom = other.dom_hash & 0xFFFFFFFFFFFFFFFF if other.dom_hash is not None else None
+        value = score(signature, dom_hash, _unpack(other.minhash), other_dom)
+        if value >= SIMILARITY_THRESHOLD:
+            matches.append((other.report_id, value))
+    matches.sort(key=lambda match: match[1], reverse=True)
+    return matches[:SIMILARITY_MAX_LINKS]
+
+
+def _index(db, report: BugReport, text: Optional[str]) -> list[tuple[int, float]]:
+    """Stores the report's signature and buckets, links it to its likely duplicates; caller commits"""
+    signature = minhash(text_tokens(text if text is not None else report.description, report.label or []))
+    dom_hash = dom_structure_hash(report.dom_snapshot)
+    buckets = _buckets(signature, dom_hash)
+
+    matches = _find_similar(db, report.id, report.tenant_id, signature, dom_hash, buckets)
+    db.add(ReportSignature(
+        report_id=report.id, tenant_id=report.tenant_id, minhash=_pack(signature),
+        dom_hash=_signed64(dom_hash) if dom_hash is not None else None,
+    ))
+    db.add_all(ReportLshBucket(tenant_id=report.tenant_id, band=band, bucket=bucket, report_id=report.id)
+               for band, bucket in buckets)
+    db.add_all(ReportLink(report_id=report.id, similar_report_id=other_id, tenant_id=report.tenant_id, score=value)
+               for other_id, value in matches)
+    return matches
+
+
+def index_report(report_id: int, text: Optional[str] = None) -> None:
+    """
+    Background task run after ingestion. text is the transcript when available,
+    else the report's description is used.
+    """
+    db = SessionLocal()
+    try:
+        report = db.query(BugReport).filter(BugReport.id == report_id).first()
+        if not report or db.get(ReportSignature, report_id):
+            return
+        matches = _index(db, report, text)
+        if matches:
+            bump_tenant_version(db, report.tenant_id)
+        db.commit()
+        if matches:
+            logger.info(f"Report {report_id} looks like {len(matches)} earlier reports: {[m[0] for m in matches]}")
+            publish_event(REPORT_DUPLICATES_FOUND, report.tenant_id, report_id,
+                          similar=[{"report_id": other_id, "score": round(value, 3)} for other_id, value in matches])
+    except Exception as e:
+        db.rollback()
+        logger.error(f"Similarity indexing failed for report {report_id}: {e}", exc_info=True)
+    finally:
+        db.close()
+
+
+def index_existing(tenant_id: Optional[int] = None, batch_size: int = 200, rebuild: bool = False) -> int:
+    """Indexes reports that have no signature yet, oldest first; returns how many were indexed"""
+    db = SessionLocal()
+    indexed = 0
+    try:
+        if rebuild:
+            for model in (ReportLink, ReportLshBucket, ReportSignature):
+                query = db.query(model)
+                if tenant_id is not None:
+                    query = query.filter(model.tenant_id == tenant_id)
+                query.delete(synchronize_session=False)
+            db.commit()
+
+        last_id = 0
+        while True:
+            query = db.query(BugReport).outerjoin(ReportSignature, ReportSignature.report_id == BugReport.id) \
+                .filter(ReportSignature.report_id.is_(None), BugReport.id > last_id)
+            if tenant_id is not None:
+                query = query.filter(BugReport.tenant_id == tenant_id)
+            batch = query.order_by(BugReport.id).limit(batch_size).all()
+            if not batch:
+                break
+            for report in batch:
+                _index(db, report, None)
+                # Later reports of the batch must see this one as a candidate
+                db.flush()
+            for tid in {report.tenant_id for report in batch}:
+                bump_tenant_version(db, tid)
+            db.commit()
+            indexed += len(batch)
+            last_id = batch[-1].id
+            logger.info(f"Similarity: indexed {indexed} reports")
+    finally:
+        db.close()
+    return indexed
+
+
+def similar_reports(db, report: BugReport) -> list[tuple[BugReport, float]]:
+    """Reports linked to this one in either direction, best score first"""
+    newer = db.query(BugReport, ReportLink.score).join(ReportLink, ReportLink.report_id == BugReport.id) \
+        .filter(ReportLink.similar_report_id == report.id, BugReport.tenant_id == report.tenant_id)
+    older = db.query(BugReport, ReportLink.score).join(ReportLink, ReportLink.similar_report_id == BugReport.id) \
+        .filter(ReportLink.report_id == report.id, BugReport.tenant_id == report.tenant_id)
+    return sorted(newer.all() + older.all(), key=lambda pair: pair[1], reverse=True)
+
+
+def forget_reports(db, report_ids: list[int]) -> None:
+    """Removes the similarity data of deleted reports, inside the caller's transaction"""
+    if not report_ids:
+        return
+    db.query(ReportLink).filter(ReportLink.report_id.in_(report_ids)).delete(synchronize_session=False)
+    db.query(ReportLink).filter(ReportLink.similar_report_id.in_(report_ids)).delete(synchronize_session=False)
+    db.query(ReportLshBucket).filter(ReportLshBucket.report_id.in_(report_ids)).delete(synchronize_session=False)
+    db.query(ReportSignature).filter(ReportSignature.report_id.in_(report_ids)).delete(synchronize_session=False)
@@ -8,6 +8,13 @@ BLUE='\033[0;34m'
 RED='\033[0;31m'
 NC='\033[0m'
 
+# Usage: ./start_app.sh [--prod]
+#   --prod  run the backend with gunicorn worker processes instead of the auto-reloading dev server
+MODE="dev"
+if [ "$1" == "--prod" ]; then
+    MODE="prod"
+fi
+
 echo -e "${BLUE}=== Starting TrapAlert System ===${NC}"
 
 # Function to check if a port is in use
@@ -24,15 +31,17 @@ check_port() {
 # Cleanup function
 cleanup() {
     echo -e "\n${BLUE}Shutting down services...${NC}"
-    pkill -P $$ 
+    # SIGTERM lets the backend drain in-flight uploads before exiting
+    pkill -TERM -P $$
+    wait
     exit
 }
 
-# Trap SIGINT (Ctrl+C)
-trap cleanup SIGINT
+# Trap SIGINT (Ctrl+C) and SIGTERM
+trap cleanup SIGINT SIGTERM
 
 # 1. Start Backend
-echo -e "\n${GREEN}[1/2] Starting Backend Server (Port 8000)...${NC}"
+echo -e "\n${GREEN}[1/2] Starting Backend Server (Port 8000, $MODE mode)...${NC}"
 check_port 8000
 if [ $? -eq 0 ]; then
     echo "Killing existing process on port 8000..."
@@ -40,7 +49,13 @@ if [ $? -eq 0 ]; then
 fi
 
 source .venv/bin/activate
-uvicorn main:app --reload --port 8000 > backend.log 2>&1 &
+# Schema changes are an explicit step, the app no longer touches the schema on import
+python manage.py migrate >> backend.log 2>&1
+if [ "$MODE" == "prod" ]; then
+    gunicorn -c gunicorn.conf.py main:app > backend.log 2>&1 &
+else
+    uvicorn main:app --reload --port 8000 > backend.log 2>&1 &
+fi
 BACKEND_PID=$!
 echo "Backend running (PID: $BACKEND_PID). Logs: backend.log"
 
@@ -0,0 +1,71 @@
+"""
+Tenant-scoped data access for the CRUD routers.
+
+TenantScope puts the caller's tenant predicate into every statement it issues, so a
+lookup, update or delete by id is one round trip: SELECT ... WHERE id = :id AND tenant_id = :t,
+or UPDATE/DELETE with the same WHERE clause and RETURNING, without loading the row first.
+With tenant buckets, a partitioned bug_reports only probes the tenant's bucket of each month.
+Only a miss costs a second, column-only query, to answer 403 (the row belongs to another
+tenant) rather than 404, as the routers always have. Super admins are not scoped.
+"""
+
+from typing import Any, Optional
+
+from fastapi import HTTPException
+from sqlalchemy import delete, update
+from sqlalchemy.orm import Query, Session
+
+from models import User, UserRole
+
+
+class TenantScope:
+    def __init__(self, db: Session, model, current_user: User, not_found: Optional[str] = None):
+        self.db = db
+        self.model = model
+        self.user = current_user
+        self.not_found = not_found or f"{model.__name__} not found"
+
+    def _criteria(self, id: Optional[int] = None, extra: tuple = ()) -> list:
+        criteria = [] if id is None else [self.model.id == id]
+        if self.user.role != UserRole.SUPER_ADMIN:
+            criteria.append(self.model.tenant_id == self.user.tenant_id)
+        return criteria + list(extra)
+
+    def _miss(self, id: int) -> HTTPException:
+        """404 if the row does not exist, 403 if it is outside the caller's scope"""
+        if self.user.role != UserRole.SUPER_ADMIN and self.db.query(self.model.id).filter(self.model.id == id).first():
+            return HTTPException(status_code=403, detail="Access denied")
+        return HTTPException(status_code=404, detail=self.not_found)
+
+    def query(self, *entities) -> Query:
+        """db.query() limited to the caller's tenant"""
+        return self.db.query(*(entities or (self.model,))).filter(*self._criteria())
+
+    def get(self, id: int, *criteria) -> Any:
+        """The row with this id, in one scoped SELECT; extra criteria narrow the scope further"""
+        obj = self.db.query(self.model).filter(*self._criteria(id, criteria)).first()
+        if obj is None:
+            raise self._miss(id)
+        return obj
+
+    def update(self, id: int, values: dict, *criteria) -> Any:
+        """UPDATE ... WHERE id AND tenant RETURNING the row, in the caller's transaction"""
+        if not values:
+            return self.get(id, *criteria)
+        statement = update(self.model).where(*self._criteria(id, criteria)).values(**values) \
+            .returning(self.model) \
+            .execution_options(synchronize_session=False, populate_existing=True)
+        obj = self.db.execute(statement).scalars().first()
+        if obj is None:
+            raise self._miss(id)
+        return obj
+
+    def delete(self, id: int, *criteria, returning: tuple = ()) -> Any:
+        """DELETE ... WHERE id AND tenant RETURNING the given columns (default: id), in the caller's transaction"""
+        statement = delete(self.model).where(*self._criteria(id, criteria)) \
+            .returning(*(returning or (self.model.id,))) \
+            .execution_options(synchronize_session=False)
+        row = self.db.execute(statement).first()
+        if row is None:
+            raise self._miss(id)
+        return row
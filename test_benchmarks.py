@@ -0,0 +1,59 @@
+import copy
+
+import pytest
+
+from benchmarks.load_test import compare, percentile
+
+BASELINE = {
+    "throughput_rps": 200.0,
+    "operations": {
+        "list": {"count": 1000, "p95_ms": 40.0, "p99_ms": 80.0},
+        "login": {"count": 50, "p95_ms": 1.0, "p99_ms": 1.5},
+    },
+}
+
+
+def results(throughput=200.0, **operations):
+    current = copy.deepcopy(BASELINE)
+    current["throughput_rps"] = throughput
+    for name, metrics in operations.items():
+        current["operations"].setdefault(name, {"count": 10, "p95_ms": 0.0, "p99_ms": 0.0}).update(metrics)
+    return current
+
+
+def test_same_results_pass():
+    assert compare(results(), BASELINE, 0.2) == []
+
+
+@pytest.mark.parametrize("throughput, regressed", [(200.0, False), (160.0, False), (159.9, True), (400.0, False)])
+def test_throughput_tolerance(throughput, regressed):
+    regressions = compare(results(throughput), BASELINE, 0.2)
+    assert regressions == ([f"throughput {throughput} < baseline 200.0"] if regressed else [])
+
+
+def test_latency_tolerance():
+    assert compare(results(list={"p95_ms": 48.0, "p99_ms": 96.0}), BASELINE, 0.2) == []
+    assert compare(results(list={"p95_ms": 48.1, "p99_ms": 120.0}), BASELINE, 0.2) == [
+        "list p95_ms 48.1 > baseline 40.0",
+        "list p99_ms 120.0 > baseline 80.0",
+    ]
+    assert compare(results(list={"p99_ms": 120.0}), BASELINE, 0.5) == []
+
+
+def test_small_absolute_differences_are_noise():
+    # Tripled, but only 2ms slower
+    assert compare(results(login={"p95_ms": 3.0, "p99_ms": 3.5}), BASELINE, 0.2) == []
+    assert compare(results(login={"p95_ms": 3.1}), BASELINE, 0.2) == ["login p95_ms 3.1 > baseline 1.0"]
+
+
+def test_operations_without_a_baseline_or_samples_are_skipped():
+    assert compare(results(search={"p95_ms": 500.0, "p99_ms": 900.0}), BASELINE, 0.2) == []
+    assert compare(results(list={"count": 0, "p95_ms": 500.0}), BASELINE, 0.2) == []
+
+
+def test_percentile():
+    values = [float(i) for i in range(1, 101)]
+    assert percentile(values, 50) == 50.0
+    assert percentile(values, 99) == 99.0
+    assert percentile([7.0], 95) == 7.0
+    assert percentile([], 95) == 0.0
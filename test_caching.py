@@ -0,0 +1,56 @@
+import pytest
+
+from caching import bump_tenant_version
+from conftest import auth_headers
+from models import BugReport
+
+
+@pytest.fixture
+def report(db, tenant):
+    report = BugReport(tenant_id=tenant.id, description="Checkout freezes", label=["checkout"],
+                       metadata_json="{}", dom_snapshot="<html></html>")
+    db.add(report)
+    bump_tenant_version(db, tenant.id)
+    db.commit()
+    return report
+
+
+def test_list_revalidates_with_etag(client, admin, report):
+    headers = auth_headers(admin)
+    response = client.get("/api/reports", headers=headers)
+    assert response.status_code == 200
+    etag = response.headers["etag"]
+    assert response.headers["cache-control"] == "private, no-cache"
+
+    response = client.get("/api/reports", headers={**headers, "If-None-Match": etag})
+    assert response.status_code == 304
+    assert response.content == b""
+    assert response.headers["etag"] == etag
+
+    # Another page is another representation
+    response = client.get("/api/reports?page=2", headers={**headers, "If-None-Match": etag})
+    assert response.status_code == 200
+
+
+def test_change_invalidates_etag(client, admin, report):
+    headers = auth_headers(admin)
+    etag = client.get(f"/api/reports/{report.id}", headers=headers).headers["etag"]
+
+    response = client.put(f"/api/reports/{report.id}/status", json={"status": "RESOLVED"}, headers=headers)
+    assert response.status_code == 200
+
+    response = client.get(f"/api/reports/{report.id}", headers={**headers, "If-None-Match": etag})
+    assert response.status_code == 200
+    assert response.json()["status"] == "RESOLVED"
+    assert response.headers["etag"] != etag
+
+
+def test_other_tenants_changes_keep_etag(db, client, admin, other_tenant, report):
+    headers = auth_headers(admin)
+    etag = client.get("/api/reports", headers=headers).headers["etag"]
+
+    db.add(BugReport(tenant_id=other_tenant.id, description="Elsewhere", metadata_json="{}", dom_snapshot=""))
+    bump_tenant_version(db, other_tenant.id)
+    db.commit()
+
+    assert client.get("/api/reports", headers={**headers, "If-None-Match": etag}).status_code == 304
@@ -0,0 +1,164 @@
+import gzip
+
+import pytest
+from fastapi.testclient import TestClient
+from starlette.applications import Starlette
+from starlette.requests import Request
+from starlette.responses import JSONResponse, PlainTextResponse, Response, StreamingResponse
+from starlette.routing import Route
+
+import http_compression
+from http_compression import CompressionMiddleware, DecompressedTooLarge, negotiate
+
+from http_compression import brotli, zstandard
+
+BIG = {"reports": [{"id": i, "description": "The save button does nothing"} for i in range(200)]}
+
+
+async def big(request):
+    return JSONResponse(BIG)
+
+
+async def small(request):
+    return JSONResponse({"ok": True})
+
+
+async def video(request):
+    return Response(b"\x1a\x45\xdf\xa3" * 1000, media_type="video/webm")
+
+
+async def stream(request):
+    async def lines():
+        for i in range(3):
+            yield f'{{"line": {i}, "padding": "{"x" * 500}"}}\n'
+    return StreamingResponse(lines(), media_type="application/x-ndjson")
+
+
+async def feedback(request: Request):
+    body = await request.body()
+    return PlainTextResponse(f"{len(body)} {body[:5].decode(errors='replace')}")
+
+
+@pytest.fixture
+def app_client():
+    app = Starlette(routes=[
+        Route("/big", big), Route("/small", small), Route("/video", video), Route("/stream", stream),
+        Route("/feedback", feedback, methods=["POST"]), Route("/echo", feedback, methods=["POST"]),
+    ])
+    return TestClient(CompressionMiddleware(app, minimum_size=1024))
+
+
+@pytest.mark.parametrize("header, expected", [
+    ("gzip", "gzip"),
+    ("gzip;q=0.5, br;q=0.8", "br" if brotli else "gzip"),
+    ("br;q=0, gzip;q=0.1", "gzip"),
+    ("gzip;q=0", None),
+    ("identity", None),
+    ("", None),
+    ("*", next(iter(http_compression.ENCODERS))),
+    ("*;q=0.5, gzip;q=1", "gzip"),
+    ("GZIP;q=bogus, deflate", None),
+])
+def test_negotiate(header, expected):
+    assert negotiate(header) == expected
+
+
+def test_negotiate_prefers_zstd_on_ties():
+    if zstandard is None:
+        pytest.skip("zstandard not installed")
+    assert negotiate("gzip, br, zstd") == "zstd"
+
+
+def test_large_json_is_compressed(app_client):
+    response = app_client.get("/big", headers={"Accept-Encoding": "gzip"})
+    assert response.headers["content-encoding"] == "gzip"
+    assert response.headers["vary"] == "Accept-Encoding"
+    assert int(response.headers["content-length"]) < len(response.content)
+    assert response.json() == BIG
+
+
+def test_small_and_binary_bodies_pass_through(app_client):
+    response = app_client.get("/small", headers={"Accept-Encoding": "gzip"})
+    assert "content-encoding" not in response.headers
+    assert response.headers["vary"] == "Accept-Encoding"
+    assert response.json() == {"ok": True}
+
+    response = app_client.get("/video", headers={"Accept-Encoding": "gzip"})
+    assert "content-encoding" not in response.headers and "vary" not in response.headers
+
+    response = app_client.get("/big", headers={"Accept-Encoding": "identity"})
+    assert "content-encoding" not in response.headers
+
+
+def test_streamed_body_is_compressed_incrementally(app_client):
+    with app_client.stream("GET", "/stream", headers={"Accept-Encoding": "gzip"}) as response:
+        assert response.headers["content-encoding"] == "gzip"
+        assert "content-length" not in response.headers
+        raw = b"".join(response.iter_raw())
+    lines = gzip.decompress(raw).decode().splitlines()
+    assert [line[:10] for line in lines] == ['{"line": 0', '{"line": 1', '{"line": 2']
+
+
+def test_gzip_request_body_is_decompressed(app_client):
+    body = b"hello " * 1000
+    response = app_client.post("/feedback", content=gzip.compress(body), headers={"Content-Encoding": "gzip"})
+    assert response.text == f"{len(body)} hello"
+
+
+BOMB_SIZE = 10 * 1024 * 1024
+
+
+def bombs():
+    zeros = b"\0" * BOMB_SIZE
+    yield "gzip", gzip.compress(zeros)
+    if brotli:
+        yield "br", brotli.compress(zeros)
+    if zstandard:
+        yield "zstd", zstandard.ZstdCompressor().compress(zeros)
+
+
+@pytest.mark.parametrize("encoding, bomb", list(bombs()))
+def test_decompression_bomb_is_refused(app_client, monkeypatch, encoding, bomb):
+    monkeypatch.setattr(http_compression, "DECOMPRESSED_REQUEST_MAX_BYTES", 1024 * 1024)
+    response = app_client.post("/feedback", content=bomb, headers={"Content-Encoding": encoding})
+    assert response.status_code == 413
+
+    # Just under the limit is fine
+    monkeypatch.setattr(http_compression, "DECOMPRESSED_REQUEST_MAX_BYTES", BOMB_SIZE)
+    response = app_client.post("/feedback", content=bomb, headers={"Content-Encoding": encoding})
+    assert response.status_code == 200 and response.text.startswith(f"{BOMB_SIZE} ")
+
+
+@pytest.mark.parametrize("encoding", list(http_compression.DECODERS))
+def test_decoders_stop_at_the_limit(encoding):
+    bomb = dict(bombs()).get(encoding.removeprefix("x-"))
+    decoder = http_compression.DECODERS[encoding]()
+    with pytest.raises(DecompressedTooLarge):
+        decoder.decompress(bomb, 64 * 1024)
+
+
+def test_bad_encodings(app_client):
+    response = app_client.post("/feedback", content=b"abc", headers={"Content-Encoding": "compress"})
+    assert response.status_code == 415
+    assert "gzip" in response.headers["accept-encoding"]
+
+    response = app_client.post("/feedback", content=b"not gzip at all", headers={"Content-Encoding": "gzip"})
+    assert response.status_code == 400
+
+    truncated = gzip.compress(b"hello " * 1000)[:-8]
+    response = app_client.post("/feedback", content=truncated, headers={"Content-Encoding": "gzip"})
+    assert response.status_code == 400
+
+
+def test_other_paths_keep_the_encoded_body(app_client):
+    body = gzip.compress(b"hello " * 1000)
+    response = app_client.post("/echo", content=body, headers={"Content-Encoding": "gzip"})
+    assert response.text.startswith(f"{len(body)} ")
+    assert app_client.post("/echo", content=b"x", headers={"Content-Encoding": "compress"}).status_code == 200
+
+
+def test_feedback_route_refuses_bombs(client, tenant, monkeypatch):
+    monkeypatch.setattr(http_compression, "DECOMPRESSED_REQUEST_MAX_BYTES", 1024 * 1024)
+    response = client.post("/feedback", content=gzip.compress(b"\0" * BOMB_SIZE),
+                           headers={"Content-Encoding": "gzip", "Content-Type": "multipart/form-data; boundary=x"})
+    assert response.status_code == 413
@@ -0,0 +1,206 @@
+import asyncio
+from datetime import datetime, timedelta
+
+import pytest
+
+import enrichment
+import similarity
+import transcriber
+from enrichment import REASON_LABELS, REASON_TRANSCRIPT, TRANSCRIPT_PENDING
+from db import SessionLocal
+from models import BugReport, EnrichmentJob, TenantTier
+from video_utils import upload_video
+
+
+class FakeEngine:
+    def __init__(self):
+        self.calls = []
+        self.error = None
+        self.leave_out = set()
+
+    def _called(self, *call):
+        self.calls.append(call)
+        if self.error:
+            raise self.error
+
+    async def transcribe_bytes(self, video_bytes, content_type, filename, deadline=None):
+        self._called("transcribe", len(video_bytes))
+        return "The save button does nothing"
+
+    async def generate_labels(self, description, deadline=None):
+        self._called("labels", description)
+        return "ui, save"
+
+    async def generate_labels_batch(self, descriptions):
+        self._called("batch", sorted(descriptions))
+        return {report_id: "crash" for report_id in descriptions if report_id not in self.leave_out}
+
+
+@pytest.fixture
+def engine(monkeypatch):
+    engine = FakeEngine()
+    monkeypatch.setattr(transcriber, "get_ai_engine", lambda: engine)
+    monkeypatch.setattr(transcriber, "get_transcriber", lambda: engine)
+    monkeypatch.setattr(enrichment, "publish_event", lambda *args, **kwargs: None)
+    monkeypatch.setattr(similarity, "publish_event", lambda *args, **kwargs: None)
+    return engine
+
+
+def queue(db, tenant, reason=REASON_LABELS, description="Checkout freezes", video=None, struggle_score=None):
+    report = BugReport(tenant_id=tenant.id, description=description, struggle_score=struggle_score,
+                       video_url=upload_video(video, "video/webm") if video else None,
+                       metadata_json="{}", dom_snapshot="")
+    db.add(report)
+    db.flush()
+    enrichment.enqueue(db, report, reason, error="TimeoutError")
+    db.commit()
+    return report.id
+
+
+def jobs(db):
+    db.expire_all()
+    return {job.report_id: job for job in db.query(EnrichmentJob)}
+
+
+def make_due(db):
+    db.query(EnrichmentJob).filter(EnrichmentJob.next_attempt_at.isnot(None)) \
+        .update({"next_attempt_at": datetime.utcnow() - timedelta(seconds=1)})
+    db.commit()
+
+
+def test_claim_is_a_compare_and_set(db, tenant, monkeypatch):
+    first = queue(db, tenant)
+    second = queue(db, tenant)
+    head_start = enrichment.priority.head_start
+    raced = []
+
+    def other_worker_claims_first(prio):
+        # Another worker claims between this worker's read of due jobs and its updates
+        if not raced:
+            raced.append(True)
+            with SessionLocal() as other:
+                raced.append(enrichment._claim(other, 1))
+        return head_start(prio)
+
+    monkeypatch.setattr(enrichment.priority, "head_start", other_worker_claims_first)
+    with SessionLocal() as session:
+        claimed = enrichment._claim(session, 2)
+
+    assert raced[1] == [first]
+    assert claimed == [second]
+    leases = {job.next_attempt_at for job in jobs(db).values()}
+    assert all(lease > datetime.utcnow() + timedelta(seconds=enrichment.ENRICHMENT_LEASE_SECONDS - 60)
+               for lease in leases)
+    # Leased jobs are not due again until the lease runs out
+    assert enrichment._claim(db, 10) == []
+
+
+def test_claim_prefers_urgent_reports_among_the_due(db, tenant, other_tenant):
+    other_tenant.tier = TenantTier.ENTERPRISE
+    db.commit()
+    low = [queue(db, tenant) for _ in range(3)]
+    critical = queue(db, other_tenant, struggle_score=90)
+    beyond_window = queue(db, other_tenant, struggle_score=90)
+    # Due order is next_attempt_at order; only limit * 4 of them are looked at
+    for offset, report_id in enumerate(low + [critical, beyond_window]):
+        db.get(EnrichmentJob, report_id).next_attempt_at = datetime.utcnow() - timedelta(minutes=10 - offset)
+    db.commit()
+
+    assert enrichment._claim(db, 1) == [critical]
+    assert enrichment._claim(db, 1) == [beyond_window]
+    assert enrichment._claim(db, 3) == low
+
+
+def test_transcript_job_transcribes_then_labels(db, tenant, engine):
+    report_id = queue(db, tenant, REASON_TRANSCRIPT, description=TRANSCRIPT_PENDING, video=b"\x1a\x45\xdf\xa3" * 64)
+
+    assert asyncio.run(enrichment.run_pending()) == {"enriched": 1, "failed": 0}
+    assert engine.calls == [("transcribe", 256), ("labels", "The save button does nothing")]
+    db.expire_all()
+    report = db.get(BugReport, report_id)
+    assert report.description == "The save button does nothing"
+    assert report.label == ["ui", "save"]
+    assert jobs(db) == {}
+
+
+def test_label_jobs_are_batched(db, tenant, engine):
+    ids = [queue(db, tenant, description=f"Report {i}") for i in range(3)]
+    long = queue(db, tenant, description="x" * (enrichment.ENRICHMENT_LABEL_BATCH_MAX_CHARS + 1))
+    engine.leave_out = {ids[1]}
+
+    assert asyncio.run(enrichment.run_pending()) == {"enriched": 3, "failed": 1}
+    assert engine.calls == [("batch", ids), ("labels", "x" * (enrichment.ENRICHMENT_LABEL_BATCH_MAX_CHARS + 1))]
+    db.expire_all()
+    assert [db.get(BugReport, i).label for i in ids + [long]] == [["crash"], [], ["crash"], ["ui", "save"]]
+    [left_out] = jobs(db).values()
+    assert (left_out.report_id, left_out.attempts) == (ids[1], 1)
+    assert "left out" in left_out.last_error
+
+
+def test_failed_jobs_back_off_then_park_until_retried(db, tenant, engine, monkeypatch):
+    monkeypatch.setattr(enrichment, "ENRICHMENT_MAX_ATTEMPTS", 2)
+    report_id = queue(db, tenant, description="x" * (enrichment.ENRICHMENT_LABEL_BATCH_MAX_CHARS + 1))
+    engine.error = ConnectionError("reset")
+
+    assert asyncio.run(enrichment.run_pending()) == {"enriched": 0, "failed": 1}
+    job = jobs(db)[report_id]
+    assert job.attempts == 1 and job.last_error == "ConnectionError: reset"
+    backoff = timedelta(seconds=enrichment.ENRICHMENT_BACKOFF_SECONDS)
+    assert datetime.utcnow() + backoff - timedelta(seconds=60) < job.next_attempt_at <= datetime.utcnow() + backoff
+    assert asyncio.run(enrichment.run_pending()) == {"enriched": 0, "failed": 0}
+
+    make_due(db)
+    assert asyncio.run(enrichment.run_pending())["failed"] == 1
+    job = jobs(db)[report_id]
+    assert job.attempts == 2 and job.next_attempt_at is None
+    make_due(db)
+    assert asyncio.run(enrichment.run_pending()) == {"enriched": 0, "failed": 0}
+
+    assert enrichment.retry_failed(db) == 1
+    job = jobs(db)[report_id]
+    assert job.attempts == 0 and job.next_attempt_at is not None
+    engine.error = None
+    assert asyncio.run(enrichment.run_pending()) == {"enriched": 1, "failed": 0}
+    assert jobs(db) == {}
+
+
+def test_deleted_report_only_drops_its_job(db, tenant, engine):
+    report_id = queue(db, tenant, REASON_TRANSCRIPT, description=TRANSCRIPT_PENDING, video=b"abc")
+    db.query(BugReport).filter(BugReport.id == report_id).delete()
+    db.commit()
+
+    assert asyncio.run(enrichment.run_pending()) == {"enriched": 1, "failed": 0}
+    assert engine.calls == [] and jobs(db) == {}
+
+
+def test_open_circuit_skips_the_run(db, tenant, engine, monkeypatch):
+    queue(db, tenant)
+    monkeypatch.setattr(enrichment.resilience.gemini.breaker, "state", enrichment.resilience.CircuitBreaker.OPEN)
+    monkeypatch.setattr(enrichment.resilience.gemini.breaker, "opened_at", enrichment.resilience.time.monotonic())
+    assert asyncio.run(enrichment.run_pending()) == {"enriched": 0, "failed": 0}
+    assert engine.calls == []
+
+
+@pytest.mark.parametrize("hours, now, expected", [
+    ("", datetime(2026, 3, 1, 14), datetime(2026, 3, 1, 14)),
+    ("1-6", datetime(2026, 3, 1, 3, 30), datetime(2026, 3, 1, 3, 30)),
+    ("1-6", datetime(2026, 3, 1, 0, 59), datetime(2026, 3, 1, 1)),
+    ("1-6", datetime(2026, 3, 1, 6), datetime(2026, 3, 2, 1)),
+    ("22-3", datetime(2026, 3, 1, 23), datetime(2026, 3, 1, 23)),
+    ("22-3", datetime(2026, 3, 1, 2, 59), datetime(2026, 3, 1, 2, 59)),
+    ("22-3", datetime(2026, 3, 1, 12), datetime(2026, 3, 1, 22)),
+    ("22-3", datetime(2026, 3, 1, 3), datetime(2026, 3, 1, 22)),
+])
+def test_next_offpeak(monkeypatch, hours, now, expected):
+    monkeypatch.setattr(enrichment, "ENRICHMENT_OFFPEAK_HOURS", hours)
+    assert enrichment.next_offpeak(now) == expected
+    assert enrichment.is_offpeak(now) == (expected == now)
+
+
+def test_route_model(monkeypatch):
+    monkeypatch.setattr(transcriber, "GEMINI_LONG_VIDEO_BYTES", 1000)
+    assert transcriber.route_model("labels") == transcriber.GEMINI_LABEL_MODEL
+    assert transcriber.route_model("labels", 10_000) == transcriber.GEMINI_LABEL_MODEL
+    assert transcriber.route_model("transcribe") == transcriber.GEMINI_TRANSCRIBE_MODEL
+    assert transcriber.route_model("transcribe", 1000) == transcriber.GEMINI_TRANSCRIBE_MODEL
+    assert transcriber.route_model("transcribe", 1001) == transcriber.GEMINI_LONG_VIDEO_MODEL
@@ -0,0 +1,242 @@
+import asyncio
+import json
+import sys
+import threading
+import time
+import types
+
+import pytest
+from starlette.websockets import WebSocketDisconnect
+
+import events
+import main
+from conftest import auth_headers
+from events import EVICTED, REPORT_CREATED, REPORT_UPDATED, EventHub, InProcessBroker, RedisBroker, Subscriber
+from routers import events as events_router
+
+
+def event(tenant_id, report_id=None, type=REPORT_UPDATED):
+    return {"type": type, "tenant_id": tenant_id, "report_id": report_id}
+
+
+def test_hub_filters_by_tenant():
+    hub = EventHub()
+    acme, globex, everyone = Subscriber(1), Subscriber(2), Subscriber(None)
+    hub.subscribers.update({acme, globex, everyone})
+
+    hub.dispatch(event(1, 10))
+    hub.dispatch(event(2, 20))
+
+    assert [acme.queue.get_nowait()["report_id"]] == [10] and acme.queue.empty()
+    assert [globex.queue.get_nowait()["report_id"]] == [20] and globex.queue.empty()
+    assert [everyone.queue.get_nowait()["report_id"] for _ in range(2)] == [10, 20]
+
+
+def test_slow_subscriber_is_evicted():
+    hub = EventHub()
+    slow, other = Subscriber(1, buffer_size=2), Subscriber(1)
+    hub.subscribers.update({slow, other})
+
+    for report_id in range(3):
+        hub.dispatch(event(1, report_id))
+
+    assert slow.evicted and slow not in hub.subscribers
+    assert slow.queue.get_nowait()["type"] == EVICTED and slow.queue.empty()
+    assert other.queue.qsize() == 3
+
+
+def test_in_process_broker_accepts_other_threads():
+    async def scenario():
+        hub = EventHub()
+        subscriber = hub.subscribe(1)
+        await asyncio.to_thread(InProcessBroker(hub).publish, event(1, 5))
+        return await asyncio.wait_for(subscriber.queue.get(), 1)
+
+    assert asyncio.run(scenario())["report_id"] == 5
+
+
+@pytest.fixture
+def fake_redis(monkeypatch):
+    """A `redis` module whose clients share one in-memory channel; publish takes `server.delay` seconds"""
+    server = types.SimpleNamespace(delay=0.0, published=[], listeners=[])
+
+    class Redis:
+        def __init__(self, **options):
+            self.options = options
+
+        @classmethod
+        def from_url(cls, url, **options):
+            return cls(**options)
+
+        def publish(self, channel, message):
+            time.sleep(server.delay)
+            server.published.append(channel)
+            for loop, listener in list(server.listeners):
+                loop.call_soon_threadsafe(listener.put_nowait, {"type": "message", "data": message})
+
+        def close(self):
+            pass
+
+    class PubSub:
+        async def __aenter__(self):
+            return self
+
+        async def __aexit__(self, *exc):
+            server.listeners.remove(self.registration)
+
+        async def subscribe(self, channel):
+            self.queue = asyncio.Queue()
+            self.registration = (asyncio.get_running_loop(), self.queue)
+            server.listeners.append(self.registration)
+
+        async def listen(self):
+            yield {"type": "subscribe"}
+            while True:
+                yield await self.queue.get()
+
+    class AsyncRedis(Redis):
+        def pubsub(self):
+            return PubSub()
+
+    module = types.ModuleType("redis")
+    module.Redis = Redis
+    module.asyncio = types.ModuleType("redis.asyncio")
+    module.asyncio.Redis = AsyncRedis
+    monkeypatch.setitem(sys.modules, "redis", module)
+    monkeypatch.setitem(sys.modules, "redis.asyncio", module.asyncio)
+    return server
+
+
+def test_redis_broker_fans_out_across_workers(fake_redis):
+    async def scenario():
+        worker_a, worker_b = RedisBroker(EventHub(), "redis://test"), RedisBroker(EventHub(), "redis://test")
+        worker_a.start()
+        worker_b.start()
+        acme, globex = worker_b.hub.subscribe(1), worker_b.hub.subscribe(2)
+        while len(fake_redis.listeners) < 2:
+            await asyncio.sleep(0.01)
+
+        worker_a.publish(event(1, 7))
+        received = await asyncio.wait_for(acme.queue.get(), 1)
+        worker_a.stop()
+        worker_b.stop()
+        return received, globex.queue.empty()
+
+    received, globex_empty = asyncio.run(scenario())
+    assert received["report_id"] == 7 and globex_empty
+
+
+def test_redis_publish_never_waits_on_redis(fake_redis):
+    fake_redis.delay = 0.2
+    broker = RedisBroker(EventHub(), "redis://test")
+    assert broker.client.options["socket_timeout"] == events.EVENT_BROKER_TIMEOUT_SECONDS
+
+    started = time.monotonic()
+    for report_id in range(3):
+        broker.publish(event(1, report_id))
+    assert time.monotonic() - started < 0.1
+
+    broker.stop()
+    assert len(fake_redis.published) >= 1
+
+
+def test_redis_publish_drops_events_when_behind(fake_redis, monkeypatch):
+    monkeypatch.setattr(events, "EVENT_PUBLISH_QUEUE_SIZE", 2)
+    release, published = threading.Event(), []
+    broker = RedisBroker(EventHub(), "redis://test")
+    broker.client.publish = lambda channel, message: release.wait() and published.append(message)
+
+    for report_id in range(10):
+        broker.publish(event(1, report_id))
+    release.set()
+    broker.stop()
+    # At most one event in flight plus a full queue
+    assert 1 <= len(published) <= 3
+
+
+@pytest.fixture
+def quick_keepalive(monkeypatch):
+    # Lets the server notice closed connections quickly
+    monkeypatch.setattr(events_router, "KEEPALIVE_SECONDS", 0.05)
+
+
+def events_token(client, user):
+    return client.post("/api/events/token", headers=auth_headers(user)).json()["token"]
+
+
+def test_websocket_only_sends_own_tenants_events(client, admin, other_tenant, quick_keepalive):
+    token = events_token(client, admin)
+    with client.websocket_connect(f"/api/events/ws?token={token}") as ws:
+        events.publish_event(REPORT_CREATED, other_tenant.id, 1)
+        events.publish_event(REPORT_CREATED, admin.tenant_id, 2)
+        received = ws.receive_json()
+        while received["type"] == "keepalive":
+            received = ws.receive_json()
+    assert (received["tenant_id"], received["report_id"]) == (admin.tenant_id, 2)
+
+
+def test_websocket_super_admin_sees_every_tenant(client, super_admin, tenant, other_tenant, quick_keepalive):
+    token = events_token(client, super_admin)
+    with client.websocket_connect(f"/api/events/ws?token={token}") as ws:
+        events.publish_event(REPORT_CREATED, other_tenant.id, 1)
+        events.publish_event(REPORT_CREATED, tenant.id, 2)
+        received = []
+        while len(received) < 2:
+            message = ws.receive_json()
+            if message["type"] != "keepalive":
+                received.append(message["report_id"])
+    assert received == [1, 2]
+
+
+def test_websocket_rejects_session_tokens(client, admin):
+    session_token = auth_headers(admin)["Authorization"].split()[1]
+    with pytest.raises(WebSocketDisconnect) as closed:
+        with client.websocket_connect(f"/api/events/ws?token={session_token}"):
+            pass
+    assert closed.value.code == 1008
+
+
+async def read_stream(token, publish):
+    """Runs GET /api/events/stream on the app, calls publish() once the stream is open, returns the first event sent"""
+    disconnected = asyncio.Event()
+    bodies: asyncio.Queue = asyncio.Queue()
+    requested = False
+
+    async def receive():
+        nonlocal requested
+        if not requested:
+            requested = True
+            return {"type": "http.request", "body": b"", "more_body": False}
+        await disconnected.wait()
+        return {"type": "http.disconnect"}
+
+    async def send(message):
+        if message["type"] == "http.response.body":
+            await bodies.put(message.get("body", b"").decode())
+
+    scope = {
+        "type": "http", "asgi": {"version": "3.0", "spec_version": "2.3"}, "http_version": "1.1",
+        "method": "GET", "scheme": "http", "path": "/api/events/stream", "raw_path": b"/api/events/stream",
+        "query_string": f"token={token}".encode(), "root_path": "", "headers": [(b"host", b"testserver")],
+        "client": ("testclient", 50000), "server": ("testserver", 80),
+    }
+    app = asyncio.create_task(main.app(scope, receive, send))
+    assert (await asyncio.wait_for(bodies.get(), 2)).startswith("retry:")
+    publish()
+    data = await asyncio.wait_for(bodies.get(), 2)
+    disconnected.set()
+    await asyncio.wait_for(app, 2)
+    return data
+
+
+def test_stream_only_sends_own_tenants_events(client, admin, other_tenant, quick_keepalive):
+    token = events_token(client, admin)
+
+    def publish():
+        events.publish_event(REPORT_CREATED, other_tenant.id, 1)
+        events.publish_event(REPORT_CREATED, admin.tenant_id, 2)
+
+    data = asyncio.run(read_stream(token, publish))
+    assert data.startswith(f"event: {REPORT_CREATED}\n")
+    payload = json.loads(data.split("data: ", 1)[1])
+    assert (payload["tenant_id"], payload["report_id"]) == (admin.tenant_id, 2)
@@ -0,0 +1,113 @@
+from collections import Counter
+from datetime import datetime
+
+import pytest
+
+import facets
+from caching import bump_tenant_version
+from conftest import auth_headers
+from labels import set_report_labels
+from metrics import facet_cache
+from models import BugReport, ReportStatus
+
+ROWS = [
+    # (status, labels, created_at, description)
+    (ReportStatus.NEW, ["ui", "crash"], datetime(2026, 3, 2, 9), "Checkout crashes"),
+    (ReportStatus.NEW, ["ui"], datetime(2026, 3, 2, 23), "Checkout button hidden"),
+    (ReportStatus.RESOLVED, ["crash"], datetime(2026, 3, 4), "Checkout freezes"),
+    (ReportStatus.RESOLVED, [], datetime(2026, 3, 16), "Profile avatar missing"),
+    (ReportStatus.IN_PROGRESS, ["ui"], datetime(2026, 4, 1), "Checkout totals wrong"),
+]
+
+
+@pytest.fixture
+def reports(db, tenant, other_tenant):
+    rows = []
+    for status, names, created_at, description in ROWS:
+        report = BugReport(tenant_id=tenant.id, status=status, created_at=created_at, description=description,
+                           metadata_json="{}", dom_snapshot="")
+        db.add(report)
+        set_report_labels(db, report, names)
+        rows.append(report)
+    foreign = BugReport(tenant_id=other_tenant.id, description="Checkout elsewhere", metadata_json="{}",
+                        dom_snapshot="")
+    db.add(foreign)
+    set_report_labels(db, foreign, ["ui"])
+    bump_tenant_version(db, tenant.id)
+    bump_tenant_version(db, other_tenant.id)
+    db.commit()
+    return rows
+
+
+def list_reports(client, user, **params):
+    response = client.get("/api/reports", params={"page_size": 100, **params}, headers=auth_headers(user))
+    assert response.status_code == 200
+    return response.json()
+
+
+def hits():
+    return facet_cache.collect().get((("result", "hit"),), 0)
+
+
+@pytest.mark.parametrize("params", [{}, {"search": "checkout"}, {"label": "ui"}, {"status": "NEW"},
+                                    {"date_from": "2026-03-03T00:00:00", "label": "crash"}])
+def test_facets_match_the_filtered_list(client, admin, reports, params):
+    body = list_reports(client, admin, facets=["status", "label", "date"], **params)
+    listed = body["reports"]
+    assert body["total"] == len(listed) > 0
+
+    assert body["facets"]["status"] == dict(Counter(r["status"] for r in listed))
+    assert body["facets"]["label"] == dict(Counter(name for r in listed for name in r["label"]))
+    assert body["facets"]["date"] == dict(sorted(Counter(r["created_at"][:10] for r in listed).items()))
+
+
+def test_date_buckets(client, admin, reports):
+    body = list_reports(client, admin, facets="date", facet_interval="week")
+    assert body["facets"]["date"] == {"2026-03-02": 3, "2026-03-16": 1, "2026-03-30": 1}
+    body = list_reports(client, admin, facets="date", facet_interval="month")
+    assert body["facets"]["date"] == {"2026-03-01": 4, "2026-04-01": 1}
+
+
+def test_cache_is_invalidated_by_a_version_bump(db, client, admin, tenant, reports):
+    first = list_reports(client, admin, facets="status")
+    before = hits()
+    # Paging through the same filter is served from the cache
+    assert list_reports(client, admin, facets="status", page=2)["total"] == first["total"]
+    assert hits() == before + 1
+
+    # A write that skipped the version bump is not seen: the cache is keyed on the version alone
+    db.add(BugReport(tenant_id=tenant.id, status=ReportStatus.NEW, metadata_json="{}", dom_snapshot=""))
+    db.commit()
+    assert list_reports(client, admin, facets="status")["facets"] == first["facets"]
+
+    bump_tenant_version(db, tenant.id)
+    db.commit()
+    body = list_reports(client, admin, facets="status")
+    assert hits() == before + 2
+    assert body["total"] == first["total"] + 1
+    assert body["facets"]["status"]["NEW"] == first["facets"]["status"]["NEW"] + 1
+
+
+def test_cache_key_separates_users_and_filters(client, admin, super_admin, other_tenant, reports):
+    assert list_reports(client, admin, facets="label")["facets"]["label"] == {"ui": 3, "crash": 2}
+    assert list_reports(client, super_admin, facets="label")["facets"]["label"] == {"ui": 4, "crash": 2}
+    body = list_reports(client, super_admin, facets="label", tenant_id=other_tenant.id)
+    assert body["facets"]["label"] == {"ui": 1}
+    # A client admin's tenant_id is ignored, so it can't read another tenant's cached counts
+    assert list_reports(client, admin, facets="label", tenant_id=other_tenant.id)["total"] == len(ROWS)
+
+
+def test_lru_evicts_least_recently_used():
+    cache = facets._LRUCache(2)
+    calls = []
+
+    def compute(key):
+        return lambda: calls.append(key) or {"key": key}
+
+    cache.get_or_compute("a", compute("a"))
+    cache.get_or_compute("b", compute("b"))
+    cache.get_or_compute("a", compute("a"))
+    cache.get_or_compute("c", compute("c"))
+    cache.get_or_compute("a", compute("a"))
+    cache.get_or_compute("b", compute("b"))
+    assert calls == ["a", "b", "c", "b"]
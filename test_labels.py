@@ -0,0 +1,75 @@
+import pytest
+
+from caching import bump_tenant_version
+from conftest import auth_headers
+from labels import normalize_label, normalize_labels, set_report_labels
+from models import BugReport, Label, ReportLabel
+
+
+@pytest.mark.parametrize("raw, name", [
+    ("UI", "ui"),
+    ("  ui ", "ui"),
+    ("User_Interface", "ui"),
+    ("Log-In", "login"),
+    ("sign in", "login"),
+    ("Checkout/Payment", "checkout payment"),
+    ("Crashes!", "crash"),
+    ("C#", "c#"),
+    ("ＦＯＲＭＳ", "form"),
+    ("!!!", None),
+    ("", None),
+    (None, None),
+])
+def test_normalize_label(raw, name):
+    assert normalize_label(raw) == name
+
+
+def test_normalize_labels_dedupes_in_order():
+    assert normalize_labels(["Login", "UI", "log in", None, "gui", "button"]) == ["login", "ui", "button"]
+
+
+def test_long_labels_are_truncated():
+    assert normalize_label("x" * 80) == "x" * 50
+
+
+def test_labels_are_stored_once_per_tenant(db, tenant, other_tenant):
+    first = BugReport(tenant_id=tenant.id, metadata_json="{}", dom_snapshot="")
+    second = BugReport(tenant_id=tenant.id, metadata_json="{}", dom_snapshot="")
+    elsewhere = BugReport(tenant_id=other_tenant.id, metadata_json="{}", dom_snapshot="")
+    db.add_all([first, second, elsewhere])
+    set_report_labels(db, first, ["UI", "Log in"])
+    set_report_labels(db, second, ["user interface"])
+    set_report_labels(db, elsewhere, ["ui"])
+    db.commit()
+
+    assert first.label == ["ui", "login"]
+    assert second.label == ["ui"]
+    assert sorted((label.tenant_id, label.name) for label in db.query(Label)) == sorted([
+        (tenant.id, "ui"), (tenant.id, "login"), (other_tenant.id, "ui"),
+    ])
+
+    set_report_labels(db, first, ["login"])
+    db.commit()
+    assert db.query(ReportLabel).filter(ReportLabel.report_id == first.id).count() == 1
+
+
+def test_filter_and_facets_use_canonical_names(db, client, admin, tenant):
+    headers = auth_headers(admin)
+    reports = [BugReport(tenant_id=tenant.id, metadata_json="{}", dom_snapshot="") for _ in range(3)]
+    db.add_all(reports)
+    set_report_labels(db, reports[0], ["UI", "crash"])
+    set_report_labels(db, reports[1], ["gui"])
+    bump_tenant_version(db, tenant.id)
+    db.commit()
+
+    response = client.put(f"/api/reports/{reports[2].id}", json={"label": ["User Interface", "Crashes"]},
+                          headers=headers)
+    assert response.json()["label"] == ["ui", "crash"]
+
+    response = client.get("/api/reports", params={"label": "User-Interface", "facets": "label"}, headers=headers)
+    body = response.json()
+    assert body["total"] == 3
+    assert body["facets"]["label"] == {"ui": 3, "crash": 2}
+
+    response = client.get("/api/reports", params=[("label", "ui"), ("label", "CRASH")], headers=headers)
+    assert {report["id"] for report in response.json()["reports"]} == {reports[0].id, reports[2].id}
@@ -0,0 +1,135 @@
+import time
+
+import pytest
+from jose import jwt
+
+import auth
+from auth import ALGORITHM, EVENTS_SCOPE, MEDIA_SCOPE, SECRET_KEY, create_scoped_token
+from conftest import auth_headers
+from models import BugReport
+from routers import reports as reports_router
+from video_utils import upload_video
+
+VIDEO = bytes(range(256)) * 40
+
+
+@pytest.fixture
+def report(db, tenant):
+    report = BugReport(tenant_id=tenant.id, metadata_json="{}", dom_snapshot="",
+                       video_url=upload_video(VIDEO, "video/webm"))
+    db.add(report)
+    db.commit()
+    return report
+
+
+@pytest.fixture
+def foreign_report(db, other_tenant):
+    report = BugReport(tenant_id=other_tenant.id, metadata_json="{}", dom_snapshot="",
+                       video_url=upload_video(VIDEO, "video/webm"))
+    db.add(report)
+    db.commit()
+    return report
+
+
+def media_token(client, user, *report_ids):
+    response = client.post("/api/reports/media-tokens", json={"report_ids": list(report_ids)},
+                           headers=auth_headers(user))
+    assert response.status_code == 200
+    return response.json()
+
+
+def test_range_and_conditional_requests(client, admin, report):
+    headers = auth_headers(admin)
+    response = client.get(f"/api/reports/{report.id}/video", headers=headers)
+    assert response.status_code == 200
+    assert response.content == VIDEO
+    assert response.headers["accept-ranges"] == "bytes"
+    etag = response.headers["etag"]
+
+    response = client.get(f"/api/reports/{report.id}/video", headers={**headers, "Range": "bytes=100-199"})
+    assert response.status_code == 206
+    assert response.content == VIDEO[100:200]
+    assert response.headers["content-range"] == f"bytes 100-199/{len(VIDEO)}"
+
+    response = client.get(f"/api/reports/{report.id}/video", headers={**headers, "If-None-Match": etag})
+    assert response.status_code == 304
+    assert response.headers["etag"] == etag
+
+
+def test_object_storage_redirects_to_signed_url(db, client, admin, report, monkeypatch):
+    report.video_url = "https://project.supabase.co/storage/v1/object/public/videos/clip.webm"
+    db.commit()
+    signed = []
+    monkeypatch.setattr(reports_router, "create_signed_video_url",
+                        lambda key: signed.append(key) or f"https://signed.example.com/{key}?sig=abc")
+
+    response = client.get(f"/api/reports/{report.id}/video", headers=auth_headers(admin), follow_redirects=False)
+    assert response.status_code == 307
+    assert response.headers["location"] == "https://signed.example.com/clip.webm?sig=abc"
+    assert response.headers["cache-control"].startswith("private, max-age=")
+    assert signed == ["clip.webm"]
+
+    monkeypatch.setattr(reports_router, "create_signed_video_url", lambda key: None)
+    response = client.get(f"/api/reports/{report.id}/video", headers=auth_headers(admin), follow_redirects=False)
+    assert response.status_code == 502
+
+
+def test_media_tokens_only_cover_the_callers_reports(client, admin, report, foreign_report):
+    body = media_token(client, admin, report.id, foreign_report.id, 999_999)
+    assert list(body["tokens"]) == [str(report.id)]
+    assert 0 < body["expires_in"] <= 2 * auth.SCOPED_TOKEN_EXPIRE_SECONDS
+
+    token = body["tokens"][str(report.id)]
+    response = client.get(f"/api/reports/{report.id}/video", params={"token": token})
+    assert response.status_code == 200 and response.content == VIDEO
+    assert client.get(f"/api/reports/{report.id}/poster", params={"token": token}).status_code == 404
+
+
+def test_scoped_token_is_bound_to_its_report(client, admin, report, foreign_report, db, tenant):
+    token = media_token(client, admin, report.id)["tokens"][str(report.id)]
+    other = BugReport(tenant_id=tenant.id, metadata_json="{}", dom_snapshot="", video_url=report.video_url)
+    db.add(other)
+    db.commit()
+
+    assert client.get(f"/api/reports/{other.id}/video", params={"token": token}).status_code == 401
+    assert client.get(f"/api/reports/{foreign_report.id}/video", params={"token": token}).status_code == 401
+
+
+def test_forged_token_for_another_tenants_report_is_refused(client, admin, foreign_report):
+    # Even a valid token naming that report only opens what the user's own scope allows
+    token, _ = create_scoped_token(admin.id, MEDIA_SCOPE, foreign_report.id)
+    assert client.get(f"/api/reports/{foreign_report.id}/video", params={"token": token}).status_code == 403
+
+
+def test_session_tokens_are_refused_in_urls(client, admin, report):
+    session_token = auth_headers(admin)["Authorization"].split()[1]
+    assert client.get(f"/api/reports/{report.id}/video", params={"token": session_token}).status_code == 401
+    assert client.get(f"/api/reports/{report.id}/video",
+                      params={"access_token": session_token}).status_code == 401
+
+
+def test_scoped_tokens_are_refused_as_sessions(client, admin, report):
+    token = media_token(client, admin, report.id)["tokens"][str(report.id)]
+    events_token, _ = create_scoped_token(admin.id, EVENTS_SCOPE)
+    for scoped in (token, events_token):
+        headers = {"Authorization": f"Bearer {scoped}"}
+        assert client.get(f"/api/reports/{report.id}", headers=headers).status_code == 401
+        assert client.get(f"/api/reports/{report.id}/video", headers=headers).status_code == 401
+
+    # A session token with a scope claim added is a scoped token, not a session
+    forged = jwt.encode({"sub": str(admin.id), "scope": MEDIA_SCOPE, "exp": int(time.time()) + 600},
+                        SECRET_KEY, algorithm=ALGORITHM)
+    assert client.get("/api/reports", headers={"Authorization": f"Bearer {forged}"}).status_code == 401
+    # Wrong scope for the URL
+    assert client.get(f"/api/reports/{report.id}/video", params={"token": events_token}).status_code == 401
+
+
+def test_scoped_token_expiry_is_window_aligned(monkeypatch):
+    lifetime = auth.SCOPED_TOKEN_EXPIRE_SECONDS
+    monkeypatch.setattr(auth.time, "time", lambda: 10 * lifetime + 1)
+    first, expires_in = create_scoped_token(1, MEDIA_SCOPE, 5)
+    monkeypatch.setattr(auth.time, "time", lambda: 11 * lifetime - 1)
+    second, _ = create_scoped_token(1, MEDIA_SCOPE, 5)
+
+    assert first == second
+    assert expires_in == 2 * lifetime - 1
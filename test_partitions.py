@@ -0,0 +1,118 @@
+import os
+from datetime import date, datetime
+
+import pytest
+from sqlalchemy import create_engine, text
+from sqlalchemy.orm import Session
+
+import partitions
+from db import Base
+from models import BugReport, Tenant
+
+POSTGRES_URL = os.environ.get("TEST_POSTGRES_URL")
+
+
+def test_sqlite_is_left_alone(db):
+    assert not partitions.is_supported()
+    assert partitions.maintain(detach_after_months=1) == {"created": [], "detached": [], "dropped": []}
+    with pytest.raises(RuntimeError):
+        partitions.convert_to_partitioned()
+
+
+def test_month_arithmetic():
+    assert partitions._add_months(date(2026, 11, 1), 2) == date(2027, 1, 1)
+    assert partitions._add_months(date(2026, 1, 1), -1) == date(2025, 12, 1)
+    assert partitions.partition_name(date(2026, 3, 1)) == "bug_reports_p2026_03"
+
+
+def _drop_partitioned(conn):
+    leftovers = conn.execute(text(
+        "SELECT tablename FROM pg_tables WHERE tablename LIKE 'bug\\_reports\\_%'")).scalars().all()
+    for table in leftovers:
+        conn.execute(text(f"DROP TABLE IF EXISTS {table} CASCADE"))
+    conn.execute(text(f"DROP FUNCTION IF EXISTS {partitions._SYNC_TRIGGER}() CASCADE"))
+
+
+@pytest.fixture
+def pg(monkeypatch):
+    if not POSTGRES_URL:
+        pytest.skip("TEST_POSTGRES_URL is not set")
+    pg_engine = create_engine(POSTGRES_URL)
+    with pg_engine.begin() as conn:
+        _drop_partitioned(conn)
+    Base.metadata.drop_all(pg_engine)
+    Base.metadata.create_all(pg_engine)
+    monkeypatch.setattr(partitions, "engine", pg_engine)
+    yield pg_engine
+    with pg_engine.begin() as conn:
+        _drop_partitioned(conn)
+    Base.metadata.drop_all(pg_engine)
+    pg_engine.dispose()
+
+
+def month(offset: int) -> date:
+    return partitions._add_months(datetime.utcnow().date().replace(day=1), offset)
+
+
+def add_reports(pg, *months):
+    with Session(pg) as session:
+        tenant = Tenant(name="Acme", api_key="acme-key")
+        session.add(tenant)
+        session.flush()
+        session.add_all(BugReport(tenant_id=tenant.id, metadata_json="{}", dom_snapshot="",
+                                  created_at=datetime.combine(m.replace(day=15), datetime.min.time()))
+                        for m in months)
+        session.commit()
+        return tenant.id
+
+
+def partition_names(conn) -> list[str]:
+    return [name for name, _, _ in partitions._month_partitions(conn)]
+
+
+@pytest.mark.postgres
+def test_convert_then_maintain(pg):
+    tenant_id = add_reports(pg, month(-5), month(-2), month(0), month(0))
+
+    assert partitions.convert_to_partitioned(tenant_buckets=0, months_ahead=2, batch_size=2, sleep=0)
+    assert not partitions.convert_to_partitioned(tenant_buckets=0, months_ahead=2, sleep=0)
+    with pg.connect() as conn:
+        assert partitions.is_partitioned(conn)
+        assert partition_names(conn) == [partitions.partition_name(month(m)) for m in range(-5, 3)]
+        assert conn.execute(text("SELECT COUNT(*) FROM bug_reports")).scalar() == 4
+        assert conn.execute(text(f"SELECT COUNT(*) FROM {partitions.partition_name(month(0))}")).scalar() == 2
+
+    # The id sequence moved over with the table
+    with Session(pg) as session:
+        session.add(BugReport(tenant_id=tenant_id, metadata_json="{}", dom_snapshot=""))
+        session.commit()
+        assert session.query(BugReport).count() == 5
+
+    result = partitions.maintain(months_ahead=4, detach_after_months=3)
+    assert result["created"] == [partitions.partition_name(month(3)), partitions.partition_name(month(4))]
+    # Month -5 still holds a report: detached but kept; month -4 is empty: dropped
+    assert result["detached"] == [partitions.partition_name(month(-5)), partitions.partition_name(month(-4))]
+    assert result["dropped"] == [partitions.partition_name(month(-4))]
+    with pg.connect() as conn:
+        assert partition_names(conn)[0] == partitions.partition_name(month(-3))
+        assert conn.execute(text("SELECT COUNT(*) FROM bug_reports")).scalar() == 4
+        assert conn.execute(text(f"SELECT to_regclass('{partitions.partition_name(month(-5))}')")).scalar()
+
+    assert partitions.maintain(months_ahead=4, detach_after_months=3) == {"created": [], "detached": [], "dropped": []}
+
+
+@pytest.mark.postgres
+def test_tenant_buckets(pg):
+    add_reports(pg, month(-1), month(0))
+
+    assert partitions.convert_to_partitioned(tenant_buckets=2, months_ahead=0, sleep=0)
+    with pg.connect() as conn:
+        assert partitions._primary_key_has_tenant(conn, partitions.TABLE)
+        name = partitions.partition_name(month(0))
+        buckets = conn.execute(text(
+            "SELECT c.relname FROM pg_inherits i JOIN pg_class c ON c.oid = i.inhrelid "
+            "WHERE i.inhparent = to_regclass(:name) ORDER BY c.relname"), {"name": name}).scalars().all()
+        assert buckets == [f"{name}_h0", f"{name}_h1"]
+        assert conn.execute(text("SELECT COUNT(*) FROM bug_reports")).scalar() == 2
+
+    assert partitions.ensure_future_partitions(1, tenant_buckets=2) == [partitions.partition_name(month(1))]
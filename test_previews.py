@@ -0,0 +1,115 @@
+import asyncio
+import subprocess
+
+import pytest
+
+import previews
+from caching import current_version
+from models import BugReport
+from video_utils import read_video_bytes, upload_video
+
+BROKEN = b"not a video"
+
+
+class FakeFfmpeg:
+    """Stands in for ffmpeg/ffprobe: writes the output file, or fails on BROKEN input"""
+
+    def __init__(self):
+        self.commands = []
+
+    def __call__(self, args, **kwargs):
+        self.commands.append(args)
+        src = args[args.index("-i") + 1] if "-i" in args else args[-1]
+        with open(src, "rb") as f:
+            if f.read() == BROKEN:
+                raise subprocess.CalledProcessError(1, args, stderr=b"Invalid data found when processing input")
+        if args[0] == "ffprobe":
+            return subprocess.CompletedProcess(args, 0, stdout="4.000000\n")
+        with open(args[-1], "wb") as f:
+            f.write(b"jpeg" if args[-1].endswith(".jpg") else b"webp")
+        return subprocess.CompletedProcess(args, 0)
+
+
+@pytest.fixture
+def ffmpeg(monkeypatch):
+    ffmpeg = FakeFfmpeg()
+    monkeypatch.setattr(previews.subprocess, "run", ffmpeg)
+    return ffmpeg
+
+
+@pytest.fixture
+def events(monkeypatch):
+    events = []
+    monkeypatch.setattr(previews, "publish_event", lambda *args, **kwargs: events.append((args, kwargs)))
+    return events
+
+
+def add_report(db, tenant, video=b"\x1a\x45\xdf\xa3webm", **fields):
+    report = BugReport(tenant_id=tenant.id, description="Checkout freezes", label=["checkout"], metadata_json="{}",
+                       dom_snapshot="<html></html>", video_url=upload_video(video, "video/webm") if video else None,
+                       **fields)
+    db.add(report)
+    db.commit()
+    return report
+
+
+def test_previews_are_stored_next_to_the_video(db, tenant, admin, ffmpeg, events):
+    report = add_report(db, tenant)
+    version = current_version(db, admin)
+
+    asyncio.run(previews.generate_report_previews(report.id, report.video_url, read_video_bytes(report.video_url)))
+    db.refresh(report)
+    stem = report.video_url.rsplit(".", 1)[0]
+    assert (report.thumbnail_url, report.preview_url) == (f"{stem}.jpg", f"{stem}.preview.webp")
+    assert read_video_bytes(report.thumbnail_url) == b"jpeg"
+    assert read_video_bytes(report.preview_url) == b"webp"
+    assert current_version(db, admin) != version
+    assert events == [((previews.REPORT_PROCESSING_COMPLETE, tenant.id, report.id), {"stage": "previews"})]
+    # PREVIEW_FRAMES frames spread over the probed duration
+    assert f"fps={previews.PREVIEW_FRAMES / 4:.4f},scale={previews.PREVIEW_WIDTH}:-2" in ffmpeg.commands[-1]
+    assert previews.pending_jobs() == 0
+
+
+def test_failed_ffmpeg_run_leaves_the_report_intact(db, tenant, admin, ffmpeg, events):
+    report = add_report(db, tenant, video=BROKEN)
+    version = current_version(db, admin)
+
+    asyncio.run(previews.generate_report_previews(report.id, report.video_url, BROKEN))
+    db.refresh(report)
+    assert (report.thumbnail_url, report.preview_url) == (None, None)
+    assert (report.description, report.label) == ("Checkout freezes", ["checkout"])
+    assert read_video_bytes(report.video_url) == BROKEN
+    assert current_version(db, admin) == version
+    assert events == []
+    assert previews.pending_jobs() == 0
+
+
+def test_deleted_report_is_skipped(db, tenant, ffmpeg, events):
+    report = add_report(db, tenant)
+    report_id, video_url = report.id, report.video_url
+    db.delete(report)
+    db.commit()
+
+    asyncio.run(previews.generate_report_previews(report_id, video_url, b"webm"))
+    assert events == []
+
+
+def test_backfill_previews(db, tenant, ffmpeg, events):
+    first = add_report(db, tenant)
+    broken = add_report(db, tenant, video=BROKEN)
+    done = add_report(db, tenant, thumbnail_url="/media/done.jpg")
+    no_video = add_report(db, tenant, video=None)
+    second = add_report(db, tenant)
+
+    assert previews.backfill_previews(limit=1, batch_size=2) == 1
+    db.expire_all()
+    assert first.thumbnail_url is not None and second.thumbnail_url is None
+
+    assert previews.backfill_previews(batch_size=2) == 1
+    db.expire_all()
+    assert second.preview_url.endswith(".preview.webp")
+    assert (broken.thumbnail_url, no_video.thumbnail_url) == (None, None)
+    assert done.thumbnail_url == "/media/done.jpg"
+    # Only the broken video is left to retry
+    assert previews.backfill_previews() == 0
+    assert len(events) == 2
@@ -0,0 +1,135 @@
+import asyncio
+
+import pytest
+
+import priority
+from models import TenantTier
+from priority import CRITICAL, HIGH, LOW, NORMAL, PriorityGate, classify
+
+
+class Clock:
+    def __init__(self):
+        self.now = 1000.0
+
+    def __call__(self):
+        return self.now
+
+
+@pytest.fixture
+def clock(monkeypatch):
+    clock = Clock()
+    monkeypatch.setattr(priority.time, "monotonic", clock)
+    return clock
+
+
+@pytest.mark.parametrize("score, tier, expected", [
+    (None, None, LOW),
+    (40, TenantTier.FREE, LOW),
+    (41, TenantTier.FREE, NORMAL),
+    (10, TenantTier.PRO, NORMAL),
+    (80, TenantTier.FREE, HIGH),
+    (50, TenantTier.PRO, HIGH),
+    (0, TenantTier.ENTERPRISE, HIGH),
+    (76, TenantTier.PRO, CRITICAL),
+    (50, TenantTier.ENTERPRISE, CRITICAL),
+])
+def test_classify(score, tier, expected):
+    assert classify(score, tier) == expected
+
+
+def test_head_start():
+    assert priority.head_start(LOW) == 0
+    assert priority.head_start(CRITICAL) == 3 * priority.PRIORITY_AGING_SECONDS
+
+
+async def admission_order(gate, clock, arrivals):
+    """Names in the order they got the gate, for (name, priority, seconds after the previous arrival)"""
+    order = []
+    release = asyncio.Event()
+
+    async def hold():
+        async with gate.slot(CRITICAL):
+            await release.wait()
+
+    async def work(name, prio):
+        async with gate.slot(prio):
+            order.append(name)
+
+    holder = asyncio.create_task(hold())
+    await asyncio.sleep(0)
+    tasks = []
+    for name, prio, delay in arrivals:
+        clock.now += delay
+        tasks.append(asyncio.create_task(work(name, prio)))
+        await asyncio.sleep(0)
+    assert gate.waiting == len(arrivals)
+
+    release.set()
+    await asyncio.gather(holder, *tasks)
+    assert gate.active == 0 and gate.waiting == 0
+    return order
+
+
+def test_higher_priority_overtakes(clock):
+    gate = PriorityGate("test-overtake", 1)
+    order = asyncio.run(admission_order(gate, clock, [
+        ("low", LOW, 0), ("normal", NORMAL, 1), ("critical", CRITICAL, 1), ("high", HIGH, 1), ("low2", LOW, 1),
+    ]))
+    assert order == ["critical", "high", "normal", "low", "low2"]
+
+
+def test_aged_low_priority_work_is_admitted(clock):
+    gate = PriorityGate("test-aging", 1)
+    aging = priority.PRIORITY_AGING_SECONDS
+    order = asyncio.run(admission_order(gate, clock, [
+        ("low", LOW, 0),
+        # Arrived three aging periods later: the low waiter has caught up a critical head start
+        ("critical-late", CRITICAL, 3 * aging + 1),
+        ("critical-early", CRITICAL, -2),
+    ]))
+    assert order == ["critical-early", "low", "critical-late"]
+
+
+def test_cancelled_waiter_gives_up_its_place(clock):
+    gate = PriorityGate("test-cancel", 1)
+
+    async def scenario():
+        release = asyncio.Event()
+        admitted = []
+
+        async def hold():
+            async with gate.slot(LOW):
+                await release.wait()
+
+        async def work(name, prio):
+            async with gate.slot(prio):
+                admitted.append(name)
+
+        holder = asyncio.create_task(hold())
+        await asyncio.sleep(0)
+        cancelled = asyncio.create_task(work("cancelled", CRITICAL))
+        waiter = asyncio.create_task(work("low", LOW))
+        await asyncio.sleep(0)
+        cancelled.cancel()
+        await asyncio.sleep(0)
+        assert gate.waiting == 1
+
+        release.set()
+        await asyncio.gather(holder, waiter)
+        assert cancelled.cancelled()
+        return admitted
+
+    assert asyncio.run(scenario()) == ["low"]
+    assert gate.active == 0
+
+
+def test_free_capacity_is_used_without_waiting(clock):
+    gate = PriorityGate("test-capacity", 2)
+
+    async def scenario():
+        async with gate.slot(LOW):
+            async with gate.slot(LOW):
+                assert gate.active == 2 and gate.waiting == 0
+        assert gate.active == 0
+
+    asyncio.run(scenario())
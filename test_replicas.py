@@ -0,0 +1,149 @@
+import sqlite3
+
+import pytest
+from sqlalchemy import create_engine, event, select, text, update
+
+import db as db_module
+from caching import bump_tenant_version, current_version, route_fresh_reads
+from conftest import _TMP, auth_headers
+from db import ReplicaSet, SessionLocal, engine
+from metrics import db_read_routing
+from models import BugReport, ReportStatus
+
+
+class Clock:
+    def __init__(self):
+        self.now = 1000.0
+
+    def __call__(self):
+        return self.now
+
+
+@pytest.fixture
+def clock(monkeypatch):
+    clock = Clock()
+    monkeypatch.setattr(db_module.time, "monotonic", clock)
+    return clock
+
+
+def fake_replica(name: str, lag: float = 0):
+    """A SQLite engine reporting `lag` seconds of replication lag"""
+    replica = create_engine(f"sqlite:///{_TMP}/{name}.db", connect_args={"check_same_thread": False})
+    replica.lag = lag
+
+    @event.listens_for(replica, "before_cursor_execute", retval=True)
+    def report_lag(conn, cursor, statement, parameters, context, executemany):
+        if statement == "SELECT 0":
+            statement = f"SELECT {replica.lag}"
+        return statement, parameters
+
+    return replica
+
+
+def down_replica():
+    return create_engine(f"sqlite:///{_TMP}/missing/dir/replica.db")
+
+
+def copy_primary(name: str):
+    """A replica holding what the primary holds now"""
+    replica = fake_replica(name)
+    source, target = sqlite3.connect(engine.url.database), sqlite3.connect(replica.url.database)
+    source.backup(target)
+    source.close()
+    target.close()
+    return replica
+
+
+def test_pick_skips_lagging_and_unavailable_replicas(clock):
+    healthy, other, lagging = fake_replica("healthy"), fake_replica("other"), fake_replica("lagging", lag=30)
+    replicas = ReplicaSet([healthy, lagging, down_replica(), other])
+
+    picked = [replicas.pick() for _ in range(4)]
+    assert set(picked) == {healthy, other}
+    assert picked[0] is not picked[1]
+
+    # Health is cached until the next check is due
+    lagging.lag, healthy.lag, other.lag = 0, 30, 30
+    assert replicas.pick() in (healthy, other)
+    clock.now += db_module.REPLICA_CHECK_INTERVAL_SECONDS
+    assert {replicas.pick() for _ in range(4)} == {lagging}
+
+    lagging.lag = 30
+    clock.now += db_module.REPLICA_CHECK_INTERVAL_SECONDS
+    assert replicas.pick() is None
+
+
+def test_get_read_db_falls_back_to_the_primary(db, monkeypatch, clock):
+    def routed(reason):
+        return db_read_routing.collect().get((("reason", reason), ("target", "primary")), 0)
+
+    before = routed("no_usable_replica")
+    monkeypatch.setattr(db_module, "replicas", ReplicaSet([fake_replica("behind", lag=30)]))
+    session = next(db_module.get_read_db())
+    assert not session.reads_from_replica
+    assert routed("no_usable_replica") == before + 1
+
+    replica = fake_replica("fine")
+    monkeypatch.setattr(db_module, "replicas", ReplicaSet([replica]))
+    session = next(db_module.get_read_db())
+    assert session.info["reader"] is replica
+
+
+def test_routing_session_sends_only_plain_selects_to_the_reader(db, tenant):
+    replica = fake_replica("reader")
+    session = SessionLocal()
+    session.info["reader"] = replica
+
+    assert session.get_bind(clause=select(BugReport)) is replica
+    assert session.get_bind(clause=select(BugReport).with_for_update()) is engine
+    assert session.get_bind(clause=update(BugReport).values(description="x")) is engine
+    assert session.get_bind(clause=text("SELECT 1")) is engine
+    with session.on_primary():
+        assert session.get_bind(clause=select(BugReport)) is engine
+    assert session.reads_from_replica
+
+    session.use_primary(reason="test")
+    assert not session.reads_from_replica
+    assert session.get_bind(clause=select(BugReport)) is engine
+    session.close()
+
+
+def test_route_fresh_reads_moves_a_stale_session_to_the_primary(db, tenant, admin):
+    bump_tenant_version(db, tenant.id)
+    db.commit()
+    replica = copy_primary("fresh")
+
+    session = SessionLocal()
+    session.info["reader"] = replica
+    assert route_fresh_reads(session, admin) == f"t{tenant.id}:1"
+    assert session.reads_from_replica
+
+    bump_tenant_version(db, tenant.id)
+    db.commit()
+    assert current_version(session, admin) == f"t{tenant.id}:1"
+    assert route_fresh_reads(session, admin) == f"t{tenant.id}:2"
+    assert not session.reads_from_replica
+    session.close()
+
+
+def test_reads_your_own_writes_through_a_lagging_replica(db, client, admin, tenant, monkeypatch, clock):
+    report = BugReport(tenant_id=tenant.id, description="Checkout freezes", metadata_json="{}", dom_snapshot="")
+    db.add(report)
+    bump_tenant_version(db, tenant.id)
+    db.commit()
+    replica = copy_primary("api")
+    with replica.begin() as conn:
+        conn.execute(text("UPDATE bug_reports SET description = 'served by the replica'"))
+    monkeypatch.setattr(db_module, "replicas", ReplicaSet([replica]))
+    headers = auth_headers(admin)
+
+    # Up to date: reads come from the replica
+    assert client.get(f"/api/reports/{report.id}", headers=headers).json()["description"] == "served by the replica"
+
+    # The replica has not replayed this write: reads move to the primary
+    response = client.put(f"/api/reports/{report.id}/status", json={"status": "RESOLVED"}, headers=headers)
+    assert response.status_code == 200
+    body = client.get(f"/api/reports/{report.id}", headers=headers).json()
+    assert body["status"] == ReportStatus.RESOLVED.value
+    assert body["description"] == "Checkout freezes"
+    assert client.get("/api/reports", headers=headers).json()["reports"][0]["status"] == ReportStatus.RESOLVED.value
@@ -0,0 +1,149 @@
+import asyncio
+import threading
+import time
+
+import pytest
+
+import resilience
+from resilience import CircuitBreaker, CircuitOpenError, ServicePolicy
+
+
+class Clock:
+    def __init__(self):
+        self.now = 1000.0
+
+    def __call__(self):
+        return self.now
+
+
+@pytest.fixture
+def clock(monkeypatch):
+    clock = Clock()
+    monkeypatch.setattr(resilience.time, "monotonic", clock)
+    return clock
+
+
+def open_breaker(breaker):
+    for _ in range(breaker.failure_threshold):
+        assert breaker.before_call() is False
+        breaker.record_failure()
+
+
+def test_breaker_opens_after_threshold(clock):
+    breaker = CircuitBreaker("test", failure_threshold=3, reset_timeout=30)
+    breaker.record_failure()
+    breaker.record_failure()
+    breaker.record_success()
+    assert breaker.state == CircuitBreaker.CLOSED and breaker.failures == 0
+
+    open_breaker(breaker)
+    assert breaker.state == CircuitBreaker.OPEN and breaker.is_open
+    with pytest.raises(CircuitOpenError):
+        breaker.before_call()
+
+
+def test_half_open_probe_closes_on_success(clock):
+    breaker = CircuitBreaker("test", failure_threshold=2, reset_timeout=30)
+    open_breaker(breaker)
+
+    clock.now += 30
+    assert not breaker.is_open
+    assert breaker.before_call() is True
+    assert breaker.state == CircuitBreaker.HALF_OPEN
+    # Only one probe at a time
+    with pytest.raises(CircuitOpenError):
+        breaker.before_call()
+
+    breaker.record_success()
+    assert breaker.state == CircuitBreaker.CLOSED
+    assert breaker.before_call() is False
+
+
+def test_half_open_probe_reopens_on_failure(clock):
+    breaker = CircuitBreaker("test", failure_threshold=2, reset_timeout=30)
+    open_breaker(breaker)
+
+    clock.now += 30
+    assert breaker.before_call() is True
+    breaker.record_failure()
+    assert breaker.state == CircuitBreaker.OPEN
+    with pytest.raises(CircuitOpenError):
+        breaker.before_call()
+
+    clock.now += 29
+    with pytest.raises(CircuitOpenError):
+        breaker.before_call()
+    clock.now += 1
+    assert breaker.before_call() is True
+
+
+def test_released_probe_lets_another_through(clock):
+    breaker = CircuitBreaker("test", failure_threshold=1, reset_timeout=30)
+    open_breaker(breaker)
+
+    clock.now += 30
+    assert breaker.before_call() is True
+    breaker.release_probe()
+    assert breaker.state == CircuitBreaker.HALF_OPEN
+    assert breaker.before_call() is True
+
+
+def test_policy_fails_fast_once_open(clock):
+    policy = ServicePolicy("test-policy", timeout=1, max_attempts=1)
+    policy.breaker.failure_threshold = 2
+    calls = []
+
+    def down():
+        calls.append(1)
+        raise ConnectionError("refused")
+
+    for _ in range(2):
+        with pytest.raises(ConnectionError):
+            policy.call_sync("op", down)
+    with pytest.raises(CircuitOpenError):
+        policy.call_sync("op", down)
+    assert len(calls) == 2
+
+    # A non-transient error from the probe still proves the service is up
+    clock.now += resilience.CIRCUIT_RESET_SECONDS
+
+    def bad_request():
+        raise ValueError("400")
+
+    with pytest.raises(ValueError):
+        policy.call_sync("op", bad_request)
+    assert policy.breaker.state == CircuitBreaker.CLOSED
+
+
+def test_timeout_counts_once_even_if_the_thread_fails_later():
+    policy = ServicePolicy("test-timeout", timeout=0.05, max_attempts=1)
+    finished = threading.Event()
+
+    def slow_then_down():
+        time.sleep(0.2)
+        finished.set()
+        raise ConnectionError("reset")
+
+    with pytest.raises(asyncio.TimeoutError):
+        asyncio.run(policy.call("op", slow_then_down))
+    assert policy.breaker.failures == 1
+
+    assert finished.wait(1)
+    time.sleep(0.05)
+    assert policy.breaker.failures == 1
+
+
+def test_timeout_is_not_undone_by_a_late_success():
+    policy = ServicePolicy("test-late-success", timeout=0.05, max_attempts=1)
+    finished = threading.Event()
+
+    def slow():
+        time.sleep(0.2)
+        finished.set()
+        return "ok"
+
+    with pytest.raises(asyncio.TimeoutError):
+        asyncio.run(policy.call("op", slow))
+    assert finished.wait(1)
+    time.sleep(0.05)
+    assert policy.breaker.failures == 1
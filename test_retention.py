@@ -0,0 +1,88 @@
+import gzip
+import json
+import os
+from datetime import datetime, timedelta
+
+import pytest
+
+import retention
+from labels import set_report_labels
+from models import BugReport, ReportArchive, ReportLabel, RetentionPolicy, TenantVersion, VideoRetention
+from video_utils import LOCAL_STORAGE_DIR, upload_video
+
+NOW = datetime(2026, 6, 1)
+
+
+def archived_ids(archive: ReportArchive) -> list[int]:
+    bucket_and_key = archive.location.removeprefix("local://")
+    path = os.path.join(LOCAL_STORAGE_DIR, bucket_and_key)
+    if archive.format == "parquet":
+        import pyarrow.parquet as pq
+        return pq.read_table(path).column("id").to_pylist()
+    with gzip.open(path, "rt") as f:
+        return [json.loads(line)["id"] for line in f]
+
+
+def add_report(db, tenant, age_days, video=False):
+    report = BugReport(tenant_id=tenant.id, metadata_json="{}", dom_snapshot="",
+                       created_at=NOW - timedelta(days=age_days),
+                       video_url=upload_video(b"video", "video/webm") if video else None)
+    db.add(report)
+    set_report_labels(db, report, ["ui"])
+    db.commit()
+    return report
+
+
+@pytest.fixture
+def policy(db, tenant):
+    db.add(RetentionPolicy(tenant_id=tenant.id, retain_days=30, video_action=VideoRetention.DELETE))
+    db.commit()
+
+
+def test_expired_reports_are_archived(db, tenant, other_tenant, policy):
+    old = [add_report(db, tenant, 40 + i, video=True) for i in range(3)]
+    recent = add_report(db, tenant, 5)
+    untouched = add_report(db, other_tenant, 400)
+    video_paths = [os.path.join(LOCAL_STORAGE_DIR, "videos", os.path.basename(r.video_url)) for r in old]
+    old_ids = sorted(r.id for r in old)
+    assert all(os.path.exists(path) for path in video_paths)
+
+    results = retention.apply_retention(now=NOW, batch_size=2, sleep=0)
+    assert results == {tenant.id: 3}
+
+    db.expire_all()
+    remaining = {r.id for r in db.query(BugReport)}
+    assert remaining == {recent.id, untouched.id}
+    assert db.query(ReportLabel).filter(ReportLabel.report_id.in_(old_ids)).count() == 0
+    assert not any(os.path.exists(path) for path in video_paths)
+    assert db.get(TenantVersion, tenant.id).version >= 1
+
+    archives = db.query(ReportArchive).order_by(ReportArchive.first_report_id).all()
+    assert [a.report_count for a in archives] == [2, 1]
+    assert sorted(i for a in archives for i in archived_ids(a)) == old_ids
+    assert archives[0].oldest_created_at <= archives[0].newest_created_at < NOW - timedelta(days=30)
+
+
+def test_dry_run_only_counts(db, tenant, policy):
+    add_report(db, tenant, 40)
+    add_report(db, tenant, 5)
+
+    assert retention.apply_retention(now=NOW, dry_run=True) == {tenant.id: 1}
+    assert db.query(BugReport).count() == 2
+    assert db.query(ReportArchive).count() == 0
+
+
+def test_failed_archive_keeps_reports(db, tenant, policy, monkeypatch):
+    add_report(db, tenant, 40)
+    monkeypatch.setattr(retention, "store_object", lambda *args: None)
+
+    assert retention.apply_retention(now=NOW, sleep=0) == {tenant.id: 0}
+    assert db.query(BugReport).count() == 1
+
+
+def test_default_policy(db, tenant, monkeypatch):
+    add_report(db, tenant, 40)
+    assert retention.apply_retention(now=NOW, sleep=0) == {}
+
+    monkeypatch.setattr(retention, "RETENTION_DEFAULT_DAYS", 30)
+    assert retention.apply_retention(now=NOW, sleep=0) == {tenant.id: 1}
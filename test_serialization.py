@@ -0,0 +1,75 @@
+import json
+from datetime import datetime
+
+import pytest
+from fastapi import Response
+
+import serialization
+from conftest import auth_headers
+from models import BugReport, ReportStatus
+from schemas import BugReportResponse
+from serialization import json_response, project
+
+
+@pytest.fixture
+def reports(db, tenant):
+    rows = [
+        BugReport(tenant_id=tenant.id, description='Quotes " and unicode é ✓', label=["ui", "save"],
+                  struggle_score=80.25, metadata_json='{"browser": "firefox"}', dom_snapshot="<html></html>",
+                  status=ReportStatus.RESOLVED, synced_to_integration=True, external_ticket_id="JIRA-12",
+                  video_url="/media/a.webm", thumbnail_url="/media/a.jpg", preview_url="/media/a.webp",
+                  created_at=datetime(2026, 3, 1, 12, 30, 5, 123456)),
+        # Nulls and column defaults
+        BugReport(tenant_id=tenant.id, metadata_json="{}", dom_snapshot="", created_at=datetime(2026, 3, 2)),
+        BugReport(tenant_id=tenant.id, description="", label=[], struggle_score=0.0, metadata_json="",
+                  dom_snapshot="", status=ReportStatus.IN_PROGRESS, created_at=datetime(2026, 3, 3, 0, 0, 0, 1)),
+    ]
+    db.add_all(rows)
+    db.commit()
+    return rows
+
+
+def projected(db):
+    query = db.query(BugReport).order_by(BugReport.id)
+    return json.loads(json_response(project(query, BugReportResponse, BugReport)).body)
+
+
+def validated(db):
+    return [BugReportResponse.model_validate(row).model_dump(mode="json")
+            for row in db.query(BugReport).order_by(BugReport.id)]
+
+
+def test_projection_matches_the_response_model(db, reports):
+    expected = validated(db)
+    assert expected[1]["status"] == "NEW" and expected[1]["description"] is None
+    assert projected(db) == expected
+
+
+def test_projection_matches_without_orjson(db, reports, monkeypatch):
+    monkeypatch.setattr(serialization, "orjson", None)
+    assert projected(db) == validated(db)
+
+
+def test_null_list_gets_the_schema_default(db, tenant):
+    db.add(BugReport(tenant_id=tenant.id, label=None, metadata_json="{}", dom_snapshot=""))
+    db.commit()
+    [item] = project(db.query(BugReport), BugReportResponse, BugReport)
+    assert item["label"] == []
+
+
+def test_json_response_keeps_the_endpoint_headers():
+    response = Response()
+    response.headers["ETag"] = 'W/"abc"'
+    response.status_code = 201
+    result = json_response({"ok": True}, response)
+    assert result.status_code == 201
+    assert result.headers["etag"] == 'W/"abc"'
+    assert result.headers["content-length"] == str(len(result.body))
+
+
+def test_list_items_match_the_detail_endpoint(client, admin, reports):
+    headers = auth_headers(admin)
+    listed = client.get("/api/reports", headers=headers).json()["reports"]
+    details = [client.get(f"/api/reports/{item['id']}", headers=headers).json() for item in listed]
+    assert listed == details
+    assert [item["id"] for item in listed] == [reports[2].id, reports[1].id, reports[0].id]
@@ -0,0 +1,109 @@
+import pytest
+
+import similarity
+from conftest import auth_headers
+from models import BugReport, ReportLink, ReportLshBucket, ReportSignature
+
+CHECKOUT = ("When I click the pay now button on the checkout page nothing happens and the spinner "
+            "keeps going forever, I tried twice with a saved card")
+CHECKOUT_AGAIN = ("When I click the pay now button on the checkout page nothing happens and the spinner "
+                  "keeps going forever, I tried three times with a new card")
+UNRELATED = "The avatar upload in profile settings rejects png files larger than two megabytes"
+DOM = "<html><body><main><form><input><button>Pay now</button></form></main></body></html>"
+OTHER_DOM = "<html><body><nav><ul><li><a>Home</a></li></ul></nav><table><tr><td>1</td></tr></table></body></html>"
+
+
+@pytest.fixture(autouse=True)
+def no_events(monkeypatch):
+    monkeypatch.setattr(similarity, "publish_event", lambda *args, **kwargs: None)
+
+
+def add_report(db, tenant, text, dom=DOM, label=("checkout",)):
+    report = BugReport(tenant_id=tenant.id, description=text, label=list(label), metadata_json="{}", dom_snapshot=dom)
+    db.add(report)
+    db.commit()
+    similarity.index_report(report.id)
+    return report
+
+
+def test_score_parts():
+    tokens = similarity.text_tokens(CHECKOUT, ["checkout"])
+    signature = similarity.minhash(tokens)
+    dom = similarity.dom_structure_hash(DOM)
+    assert similarity.score(signature, dom, signature, dom) == 1.0
+    assert similarity.dom_structure_hash("<b>Pay</b> later") == similarity.dom_structure_hash("<b>Cancel</b>")
+    assert similarity.dom_structure_hash("just text") is None
+    assert similarity.score(None, None, signature, dom) == 0.0
+    unrelated = similarity.minhash(similarity.text_tokens(UNRELATED))
+    assert similarity.score(signature, None, unrelated, None) < 0.2
+
+
+def test_near_duplicates_are_linked(db, client, admin, tenant):
+    first = add_report(db, tenant, CHECKOUT)
+    unrelated = add_report(db, tenant, UNRELATED, dom=OTHER_DOM, label=("profile",))
+    second = add_report(db, tenant, CHECKOUT_AGAIN)
+
+    [link] = db.query(ReportLink).all()
+    assert (link.report_id, link.similar_report_id) == (second.id, first.id)
+    assert link.score >= similarity.SIMILARITY_THRESHOLD
+    assert db.query(ReportLshBucket).filter(ReportLshBucket.report_id == second.id).count() == \
+        similarity.BANDS + similarity.DOM_CHUNKS
+
+    headers = auth_headers(admin)
+    # Links are served in both directions
+    for report, other in ((first, second), (second, first)):
+        similar = client.get(f"/api/reports/{report.id}/similar", headers=headers).json()
+        assert [s["report"]["id"] for s in similar] == [other.id]
+        assert similar[0]["score"] == round(link.score, 3)
+    assert client.get(f"/api/reports/{unrelated.id}/similar", headers=headers).json() == []
+
+
+def test_other_tenants_never_match(db, client, admin, tenant, other_tenant):
+    theirs = add_report(db, other_tenant, CHECKOUT)
+    ours = add_report(db, tenant, CHECKOUT)
+
+    assert db.query(ReportLink).count() == 0
+    assert client.get(f"/api/reports/{ours.id}/similar", headers=auth_headers(admin)).json() == []
+    assert client.get(f"/api/reports/{theirs.id}/similar", headers=auth_headers(admin)).status_code == 403
+
+
+def test_indexing_is_idempotent(db, tenant):
+    report = add_report(db, tenant, CHECKOUT)
+    similarity.index_report(report.id)
+    assert db.query(ReportSignature).count() == 1
+
+
+def test_forget_reports_removes_buckets_and_links(db, client, admin, tenant):
+    first = add_report(db, tenant, CHECKOUT)
+    second = add_report(db, tenant, CHECKOUT_AGAIN)
+    third = add_report(db, tenant, CHECKOUT + " again")
+    assert db.query(ReportLink).count() == 3
+    first_id, others = first.id, [second.id, third.id]
+
+    assert client.delete(f"/api/reports/{first_id}", headers=auth_headers(admin)).status_code == 204
+    db.expire_all()
+    assert db.query(ReportLink).filter(
+        (ReportLink.report_id == first_id) | (ReportLink.similar_report_id == first_id)).count() == 0
+    assert db.query(ReportLshBucket).filter(ReportLshBucket.report_id == first_id).count() == 0
+    assert db.get(ReportSignature, first_id) is None
+    # The surviving pair is still linked
+    assert db.query(ReportLink).count() == 1
+
+    similarity.forget_reports(db, others)
+    db.commit()
+    assert db.query(ReportLink).count() == 0
+    assert db.query(ReportLshBucket).count() == 0
+    assert db.query(ReportSignature).count() == 0
+
+
+def test_index_existing_links_older_reports(db, tenant):
+    for text in (CHECKOUT, CHECKOUT_AGAIN, UNRELATED):
+        db.add(BugReport(tenant_id=tenant.id, description=text, label=["checkout"], metadata_json="{}",
+                         dom_snapshot=DOM))
+    db.commit()
+
+    assert similarity.index_existing() == 3
+    assert db.query(ReportLink).count() == 1
+    assert similarity.index_existing() == 0
+    assert similarity.index_existing(rebuild=True) == 3
+    assert db.query(ReportLink).count() == 1
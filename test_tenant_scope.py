@@ -0,0 +1,107 @@
+import pytest
+
+from auth import hash_password
+from conftest import auth_headers
+from events import REPORT_STATUS_CHANGED, REPORT_UPDATED
+from models import BugReport, Integration, IntegrationType, ReportStatus, TenantVersion, User, UserRole
+from routers import reports as reports_router
+
+
+@pytest.fixture
+def foreign(db, other_tenant):
+    """One report, user and integration belonging to the other tenant"""
+    report = BugReport(tenant_id=other_tenant.id, metadata_json="{}", dom_snapshot="")
+    user = User(email="dev@globex.example.com", password_hash=hash_password("password1"),
+                role=UserRole.CLIENT_USER, tenant_id=other_tenant.id)
+    integration = Integration(tenant_id=other_tenant.id, integration_type=IntegrationType.JIRA, config_json={})
+    db.add_all([report, user, integration])
+    db.commit()
+    return {"reports": report.id, "users": user.id, "integrations": integration.id}
+
+
+REQUESTS = [
+    ("get", "/api/reports/{id}", None),
+    ("put", "/api/reports/{id}/status", {"status": "RESOLVED"}),
+    ("put", "/api/reports/{id}", {"description": "Hijacked"}),
+    ("delete", "/api/reports/{id}", None),
+    ("get", "/api/users/{id}", None),
+    ("put", "/api/users/{id}", {"is_active": False}),
+    ("delete", "/api/users/{id}", None),
+    ("put", "/api/integrations/{id}", {"enabled": False}),
+    ("delete", "/api/integrations/{id}", None),
+    ("post", "/api/integrations/{id}/test", None),
+]
+
+
+def call(client, method, path, body, headers):
+    return client.request(method, path, json=body, headers=headers)
+
+
+@pytest.mark.parametrize("method, path, body", REQUESTS)
+def test_other_tenants_rows_are_forbidden(db, client, admin, foreign, method, path, body):
+    kind = path.split("/")[2]
+    response = call(client, method, path.format(id=foreign[kind]), body, auth_headers(admin))
+    assert response.status_code == 403
+
+    # Nothing was changed or deleted
+    db.expire_all()
+    model = {"reports": BugReport, "users": User, "integrations": Integration}[kind]
+    row = db.get(model, foreign[kind])
+    assert row is not None
+    assert getattr(row, "status", ReportStatus.NEW) == ReportStatus.NEW
+    assert getattr(row, "is_active", True) and getattr(row, "enabled", True)
+    assert getattr(row, "description", None) is None
+
+
+@pytest.mark.parametrize("method, path, body", REQUESTS)
+def test_missing_rows_are_not_found(client, admin, foreign, method, path, body):
+    response = call(client, method, path.format(id=999_999), body, auth_headers(admin))
+    assert response.status_code == 404
+
+
+def test_lists_are_scoped(client, admin, foreign):
+    headers = auth_headers(admin)
+    assert client.get("/api/reports", headers=headers).json()["total"] == 0
+    assert [u["id"] for u in client.get("/api/users", headers=headers).json()] == [admin.id]
+    assert client.get("/api/integrations", headers=headers).json() == []
+
+
+def test_super_admin_is_not_scoped(db, client, super_admin, foreign):
+    headers = auth_headers(super_admin)
+    assert client.get(f"/api/reports/{foreign['reports']}", headers=headers).status_code == 200
+    assert client.put(f"/api/integrations/{foreign['integrations']}", json={"enabled": False},
+                      headers=headers).json()["enabled"] is False
+    assert client.delete(f"/api/reports/{foreign['reports']}", headers=headers).status_code == 204
+    assert db.get(BugReport, foreign["reports"]) is None
+
+
+def test_client_user_sees_only_themselves(db, client, tenant, admin):
+    user = User(email="dev@acme.example.com", password_hash=hash_password("password1"),
+                role=UserRole.CLIENT_USER, tenant_id=tenant.id)
+    db.add(user)
+    db.commit()
+    headers = auth_headers(user)
+    assert client.get(f"/api/users/{user.id}", headers=headers).status_code == 200
+    assert client.get(f"/api/users/{admin.id}", headers=headers).status_code == 403
+
+
+def test_empty_updates_change_nothing(db, client, admin, tenant, monkeypatch):
+    report = BugReport(tenant_id=tenant.id, metadata_json="{}", dom_snapshot="")
+    db.add(report)
+    db.commit()
+    published = []
+    monkeypatch.setattr(reports_router, "publish_event", lambda *args, **kwargs: published.append(args[0]))
+    headers = auth_headers(admin)
+    etag = client.get(f"/api/reports/{report.id}", headers=headers).headers["etag"]
+
+    assert client.put(f"/api/reports/{report.id}/status", json={}, headers=headers).status_code == 200
+    assert client.put(f"/api/reports/{report.id}", json={}, headers=headers).status_code == 200
+    assert published == []
+    assert db.get(TenantVersion, tenant.id) is None
+    assert client.get(f"/api/reports/{report.id}", headers={**headers, "If-None-Match": etag}).status_code == 304
+    # Still scoped
+    assert client.put("/api/reports/999999/status", json={}, headers=headers).status_code == 404
+
+    client.put(f"/api/reports/{report.id}/status", json={"synced_to_integration": True}, headers=headers)
+    client.put(f"/api/reports/{report.id}/status", json={"status": "RESOLVED"}, headers=headers)
+    assert published == [REPORT_UPDATED, REPORT_STATUS_CHANGED]
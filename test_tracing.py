@@ -0,0 +1,78 @@
+import pytest
+
+import ingestion
+import previews
+import tracing
+from tracing import traced
+
+
+class FakeEngine:
+    @traced("AiEngine.transcribe_bytes")
+    async def transcribe_bytes(self, video_bytes, content_type, filename, deadline=None):
+        return "The save button does nothing"
+
+    @traced("AiEngine.generate_labels")
+    async def generate_labels(self, description, deadline=None):
+        return "ui, save button"
+
+
+@traced("previews.generate")
+async def fake_previews(report_id, video_url, video_bytes, prio="normal"):
+    pass
+
+
+@pytest.fixture
+def sampled(monkeypatch):
+    monkeypatch.setattr(tracing, "TRACE_SAMPLE_RATE", 1.0)
+    monkeypatch.setattr(ingestion, "get_ai_engine", FakeEngine)
+    monkeypatch.setattr(ingestion, "get_transcriber", FakeEngine)
+    monkeypatch.setattr(previews, "generate_report_previews", fake_previews)
+    tracing.exporter.clear()
+    yield tracing.exporter
+    tracing.exporter.clear()
+
+
+def post_feedback(client, headers=None):
+    return client.post(
+        "/feedback",
+        files={"video": ("bug.webm", b"\x1a\x45\xdf\xa3" * 64, "video/webm")},
+        data={"dom": "<html><body><button>Save</button></body></html>", "metadata": "{}", "tenantId": "acme-key"},
+        headers=headers,
+    )
+
+
+def test_feedback_span_tree(client, tenant, sampled):
+    response = post_feedback(client)
+    assert response.status_code == 200
+
+    [root] = sampled.by_name("POST /feedback")
+    assert root.parent_id is None
+    assert root.attributes["http.status_code"] == 200
+    assert response.headers["traceparent"] == f"00-{root.trace_id}-{root.span_id}-01"
+
+    spans = sampled.spans
+    assert {s.trace_id for s in spans} == {root.trace_id}
+    children = {s.name for s in spans if s.parent_id == root.span_id}
+    assert {"AiEngine.transcribe_bytes", "AiEngine.generate_labels", "db.query"} <= children
+    # Background work after the response stays in the trace, but outside the request's span
+    [preview] = sampled.by_name("previews.generate")
+    assert preview.parent_id == root.span_id
+    assert preview.start >= root.end
+
+
+def test_incoming_trace_is_continued(client, tenant, sampled):
+    trace_id, parent_id = "4bf92f3577b34da6a3ce929d0e0e4736", "00f067aa0ba902b7"
+    post_feedback(client, headers={"traceparent": f"00-{trace_id}-{parent_id}-01"})
+
+    [root] = sampled.by_name("POST /feedback")
+    assert (root.trace_id, root.parent_id) == (trace_id, parent_id)
+
+
+def test_incoming_sampled_flag_ignored_when_sampling_is_off(client, tenant, sampled, monkeypatch):
+    monkeypatch.setattr(tracing, "TRACE_SAMPLE_RATE", 0.0)
+    post_feedback(client, headers={"traceparent": "00-4bf92f3577b34da6a3ce929d0e0e4736-00f067aa0ba902b7-01"})
+    assert sampled.spans == []
+
+    monkeypatch.setattr(tracing, "TRACE_TRUST_INCOMING_SAMPLED", True)
+    post_feedback(client, headers={"traceparent": "00-4bf92f3577b34da6a3ce929d0e0e4736-00f067aa0ba902b7-01"})
+    assert sampled.by_name("POST /feedback")
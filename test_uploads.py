@@ -0,0 +1,184 @@
+import asyncio
+import os
+from datetime import datetime, timedelta
+
+import httpx
+import pytest
+
+import ingestion
+import main
+import previews
+import uploads
+from db import SessionLocal
+from models import BugReport, UploadSession, UploadStatus
+from video_utils import LOCAL_STORAGE_DIR
+
+VIDEO = b"\x1a\x45\xdf\xa3" * 256
+KEY = {"X-Tenant-Key": "acme-key"}
+FORM = {"dom": "<html><body></body></html>", "metadata": "{}", "description": "Checkout freezes"}
+
+
+class FakeEngine:
+    async def transcribe_bytes(self, video_bytes, content_type, filename, deadline=None):
+        return ""
+
+    async def generate_labels(self, description, deadline=None):
+        return "checkout"
+
+
+async def no_previews(report_id, video_url, video_bytes, prio="normal"):
+    pass
+
+
+@pytest.fixture(autouse=True)
+def offline(monkeypatch):
+    monkeypatch.setattr(ingestion, "get_ai_engine", FakeEngine)
+    monkeypatch.setattr(ingestion, "get_transcriber", FakeEngine)
+    monkeypatch.setattr(previews, "generate_report_previews", no_previews)
+
+
+def create(client, length=len(VIDEO)):
+    response = client.post("/uploads", json={"length": length, "content_type": "video/webm"}, headers=KEY)
+    assert response.status_code == 201
+    return response.json()["id"]
+
+
+def put(client, upload_id, offset, body):
+    return client.put(f"/uploads/{upload_id}", content=body, headers={**KEY, "Upload-Offset": str(offset)})
+
+
+def test_chunks_must_continue_at_the_offset(client, tenant):
+    upload_id = create(client)
+
+    response = put(client, upload_id, 0, VIDEO[:400])
+    assert response.status_code == 204
+    assert response.headers["Upload-Offset"] == "400"
+
+    response = put(client, upload_id, 0, VIDEO[:400])
+    assert response.status_code == 409
+    assert response.headers["Upload-Offset"] == "400"
+
+    response = put(client, upload_id, 400, VIDEO[400:] + b"extra")
+    assert response.status_code == 413
+    assert response.headers["Upload-Offset"] == str(len(VIDEO))
+    assert client.head(f"/uploads/{upload_id}", headers=KEY).headers["Upload-Offset"] == str(len(VIDEO))
+
+
+def test_progress_is_compare_and_set(db, client, tenant):
+    upload_id = create(client)
+    assert uploads.record_progress(db, upload_id, 0, 100)
+    # A second writer that read the same offset loses
+    assert not uploads.record_progress(db, upload_id, 0, 100)
+    assert db.get(UploadSession, upload_id).received == 100
+
+
+def test_finalize_is_idempotent(db, client, tenant):
+    upload_id = create(client)
+    assert client.post(f"/uploads/{upload_id}/finalize", data=FORM, headers=KEY).status_code == 409
+
+    put(client, upload_id, 0, VIDEO)
+    response = client.post(f"/uploads/{upload_id}/finalize", data=FORM, headers=KEY)
+    assert response.status_code == 200
+    report_id = response.json()["id"]
+
+    retry = client.post(f"/uploads/{upload_id}/finalize", data=FORM, headers=KEY)
+    assert retry.json() == {"status": "success", "id": report_id}
+    assert db.query(BugReport).count() == 1
+    assert put(client, upload_id, len(VIDEO), b"x").status_code == 409
+
+
+def test_stale_finalization_is_reclaimed(db, client, tenant):
+    upload_id = create(client)
+    put(client, upload_id, 0, VIDEO)
+    # A worker claimed the session and died
+    assert uploads.claim_finalization(db, upload_id)
+
+    response = client.post(f"/uploads/{upload_id}/finalize", data=FORM, headers=KEY)
+    assert response.status_code == 409
+    assert client.delete(f"/uploads/{upload_id}", headers=KEY).status_code == 409
+
+    db.expire_all()
+    upload = db.get(UploadSession, upload_id)
+    lease_end = datetime.utcnow() + timedelta(seconds=uploads.UPLOAD_FINALIZE_LEASE_SECONDS + 1)
+    assert not uploads.finalization_lease_expired(upload)
+    assert uploads.finalization_lease_expired(upload, now=lease_end)
+    # Let the lease run out
+    upload.expires_at -= timedelta(seconds=uploads.UPLOAD_FINALIZE_LEASE_SECONDS + 1)
+    db.commit()
+
+    response = client.post(f"/uploads/{upload_id}/finalize", data=FORM, headers=KEY)
+    assert response.status_code == 200
+    db.expire_all()
+    upload = db.get(UploadSession, upload_id)
+    assert upload.status == UploadStatus.COMPLETED and upload.report_id == response.json()["id"]
+
+
+def test_concurrent_chunk_is_refused_before_writing(client, tenant):
+    upload_id = create(client)
+    with uploads.chunk_lock(upload_id) as spool:
+        assert spool is not None
+        response = put(client, upload_id, 0, b"\xff" * 100)
+        assert response.status_code == 409
+        assert response.headers["Upload-Offset"] == "0"
+    assert uploads.read_spool(upload_id) == b""
+
+    assert put(client, upload_id, 0, VIDEO[:100]).status_code == 204
+    assert uploads.read_spool(upload_id) == VIDEO[:100]
+
+
+def test_overlapping_finalizations_save_one_report(db, client, tenant, monkeypatch):
+    upload_id = create(client)
+    put(client, upload_id, 0, VIDEO)
+    stalled, resume = asyncio.Event(), asyncio.Event()
+
+    class SlowEngine(FakeEngine):
+        async def transcribe_bytes(self, *args, **kwargs):
+            if not stalled.is_set():
+                stalled.set()
+                await resume.wait()
+            return ""
+
+    monkeypatch.setattr(ingestion, "get_transcriber", SlowEngine)
+    video_dir = os.path.join(LOCAL_STORAGE_DIR, "videos")
+    videos_before = set(os.listdir(video_dir)) if os.path.isdir(video_dir) else set()
+
+    async def overlap():
+        transport = httpx.ASGITransport(app=main.app)
+        async with httpx.AsyncClient(transport=transport, base_url="http://testserver") as http:
+            first = asyncio.create_task(http.post(f"/uploads/{upload_id}/finalize", data=FORM, headers=KEY))
+            await stalled.wait()
+            # The first finaliser is still working when its lease runs out
+            with SessionLocal() as other:
+                upload = other.get(UploadSession, upload_id)
+                upload.expires_at -= timedelta(seconds=uploads.UPLOAD_FINALIZE_LEASE_SECONDS + 1)
+                other.commit()
+            second = await http.post(f"/uploads/{upload_id}/finalize", data=FORM, headers=KEY)
+            resume.set()
+            return await first, second
+
+    first, second = asyncio.run(overlap())
+    assert second.status_code == 200
+    assert first.status_code == 200
+    assert first.json()["id"] == second.json()["id"]
+
+    db.expire_all()
+    assert db.query(BugReport).count() == 1
+    upload = db.get(UploadSession, upload_id)
+    assert upload.status == UploadStatus.COMPLETED and upload.report_id == second.json()["id"]
+    # The discarded report's video is deleted too
+    assert set(os.listdir(video_dir)) - videos_before == {
+        os.path.basename(db.get(BugReport, upload.report_id).video_url)}
+
+
+def test_lost_claim_cannot_complete(db, client, tenant):
+    upload_id = create(client)
+    put(client, upload_id, 0, VIDEO)
+    lease = uploads.claim_finalization(db, upload_id)
+
+    assert not uploads.mark_completed(db, upload_id, lease - timedelta(seconds=1), 1)
+    uploads.release_finalization(db, upload_id, lease - timedelta(seconds=1))
+    db.expire_all()
+    assert db.get(UploadSession, upload_id).status == UploadStatus.FINALIZING
+
+    assert uploads.mark_completed(db, upload_id, lease, 1)
+    db.commit()
@@ -0,0 +1,294 @@
+"""
+Lightweight distributed tracing with OpenTelemetry-style spans.
+
+- One root span per HTTP request (TracingMiddleware), continuing an incoming W3C
+  `traceparent` header when present, and echoing it on the response.
+- Child spans around external calls (@traced) and every SQL statement (instrument_engine).
+- Context lives in a contextvar; use bind_context() when handing work to a thread pool
+  so background workers stay attached to the trace.
+
+Sampling is decided once per trace by TRACE_SAMPLE_RATE (0.0 - 1.0, default 0 = off).
+When a trace is not sampled, every tracing call is a contextvar read and a no-op.
+An incoming traceparent's sampled flag is followed only when sampling is on, or when
+TRACE_TRUST_INCOMING_SAMPLED is set because callers are trusted (e.g. behind a gateway
+that strips the header from public traffic); otherwise any client could force tracing.
+
+Exporters: TRACE_EXPORTER=log (default, one log line per span) or memory (InMemoryExporter,
+for tests: tracing.exporter.spans).
+"""
+
+import contextvars
+import functools
+import inspect
+import logging
+import os
+import random
+import time
+from contextlib import contextmanager
+from typing import List, Optional
+
+from sqlalchemy import event
+
+logger = logging.getLogger(__name__)
+
+TRACE_SAMPLE_RATE = float(os.environ.get("TRACE_SAMPLE_RATE", "0"))
+TRACE_EXPORTER = os.environ.get("TRACE_EXPORTER", "log")
+TRACE_TRUST_INCOMING_SAMPLED = os.environ.get("TRACE_TRUST_INCOMING_SAMPLED", "false").lower() == "true"
+
+
+class Span:
+    __slots__ = ("trace_id", "span_id", "parent_id", "name", "attributes", "start", "end", "status", "error")
+
+    def __init__(self, name: str, trace_id: str, parent_id: Optional[str] = None, attributes: Optional[dict] = None):
+        self.trace_id = trace_id
+        self.span_id = f"{random.getrandbits(64):016x}"
+        self.parent_id = parent_id
+        self.name = name
+        self.attributes = dict(attributes or {})
+        self.start = time.time()
+        self.end: Optional[float] = None
+        self.status = "OK"
+        self.error: Optional[str] = None
+
+    @property
+    def duration_ms(self) -> float:
+        return ((self.end or time.time()) - self.start) * 1000
+
+    def set_attribute(self, key: str, value) -> None:
+        self.attributes[key] = value
+
+    def record_exception(self, exc: BaseException) -> None:
+        self.status = "ERROR"
+        self.error = f"{type(exc).__name__}: {exc}"
+
+    def finish(self) -> None:
+        """Ends and exports the span; later calls do nothing"""
+        if self.end is None:
+            self.end = time.time()
+            exporter.export(self)
+
+    def to_dict(self) -> dict:
+        return {
+            "trace_id": self.trace_id,
+            "span_id": self.span_id,
+            "parent_id": self.parent_id,
+            "name": self.name,
+            "start": self.start,
+            "duration_ms": round(self.duration_ms, 3),
+            "status": self.status,
+            "error": self.error,
+            "attributes": self.attributes,
+        }
+
+
+class _NoopSpan:
+    """Returned when the trace is not sampled; swallows everything"""
+
+    def set_attribute(self, key, value):
+        pass
+
+    def record_exception(self, exc):
+        pass
+
+
+NOOP_SPAN = _NoopSpan()
+
+
+class LoggingExporter:
+    def export(self, span: Span) -> None:
+        logger.info(f"span {span.name} trace={span.trace_id} span={span.span_id} "
+                    f"parent={span.parent_id} {span.duration_ms:.1f}ms {span.status} {span.attributes}")
+
+
+class InMemoryExporter:
+    """Keeps finished spans in a list; meant for tests"""
+
+    def __init__(self):
+        self.spans: List[Span] = []
+
+    def export(self, span: Span) -> None:
+        self.spans.append(span)
+
+    def clear(self) -> None:
+        self.spans.clear()
+
+    def by_name(self, name: str) -> List[Span]:
+        return [s for s in self.spans if s.name == name]
+
+
+exporter = InMemoryExporter() if TRACE_EXPORTER == "memory" else LoggingExporter()
+
+_current_span: contextvars.ContextVar = contextvars.ContextVar("trapalert_current_span", default=None)
+
+
+def current_span():
+    span = _current_span.get()
+    return span if span is not None else NOOP_SPAN
+
+
+def _should_sample() -> bool:
+    return TRACE_SAMPLE_RATE > 0 and random.random() < TRACE_SAMPLE_RATE
+
+
+@contextmanager
+def start_span(name: str, root: bool = False, trace_id: Optional[str] = None,
+               parent_id: Optional[str] = None, sampled: Optional[bool] = None, **attributes):
+    """
+    Open a span as a child of the current one.
+    With root=True a new trace is started (or an incoming one continued via trace_id/parent_id)
+    and the sampling decision is made; otherwise nothing is recorded unless the current trace is sampled.
+    """
+    parent = _current_span.get()
+    if root:
+        if sampled is None:
+            sampled = _should_sample()
+        if not sampled:
+            yield NOOP_SPAN
+            return
+        span = Span(name, trace_id or f"{random.getrandbits(128):032x}", parent_id, attributes)
+    else:
+        if not isinstance(parent, Span):
+            yield NOOP_SPAN
+            return
+        span = Span(name, parent.trace_id, parent.span_id, attributes)
+
+    token = _current_span.set(span)
+    try:
+        yield span
+    except BaseException as e:
+        if span.end is None:
+            span.record_exception(e)
+        raise
+    finally:
+        _current_span.reset(token)
+        span.finish()
+
+
+def traced(name: Optional[str] = None):
+    """Decorator wrapping a sync or async function in a child span"""
+
+    def decorator(fn):
+        span_name = name or fn.__qualname__
+
+        if inspect.iscoroutinefunction(fn):
+            @functools.wraps(fn)
+            async def async_wrapper(*args, **kwargs):
+                if not isinstance(_current_span.get(), Span):
+                    return await fn(*args, **kwargs)
+                with start_span(span_name):
+                    return await fn(*args, **kwargs)
+            return async_wrapper
+
+        @functools.wraps(fn)
+        def wrapper(*args, **kwargs):
+            if not isinstance(_current_span.get(), Span):
+                return fn(*args, **kwargs)
+            with start_span(span_name):
+                return fn(*args, **kwargs)
+        return wrapper
+
+    return decorator
+
+
+def bind_context(fn, *args, **kwargs):
+    """
+    Bind fn to the current trace context for execution on another thread.
+    loop.run_in_executor does not propagate contextvars on its own.
+    """
+    ctx = contextvars.copy_context()
+    return functools.partial(ctx.run, fn, *args, **kwargs)
+
+
+def instrument_engine(engine) -> None:
+    """Record a child span for every SQL statement executed inside a sampled trace"""
+
+    @event.listens_for(engine, "before_cursor_execute")
+    def _before(conn, cursor, statement, parameters, context, executemany):
+        parent = _current_span.get()
+        if isinstance(parent, Span):
+            span = Span("db.query", parent.trace_id, parent.span_id,
+                        {"db.system": engine.dialect.name, "db.statement": statement[:500]})
+            context._trace_span = span
+
+    @event.listens_for(engine, "after_cursor_execute")
+    def _after(conn, cursor, statement, parameters, context, executemany):
+        span = getattr(context, "_trace_span", None)
+        if span is not None:
+            span.end = time.time()
+            exporter.export(span)
+            context._trace_span = None
+
+    @event.listens_for(engine, "handle_error")
+    def _error(exception_context):
+        context = exception_context.execution_context
+        span = getattr(context, "_trace_span", None) if context is not None else None
+        if span is not None:
+            span.record_exception(exception_context.original_exception)
+            span.end = time.time()
+            exporter.export(span)
+            context._trace_span = None
+
+
+def _parse_traceparent(value: str):
+    """W3C traceparent: version-traceid-parentid-flags"""
+    try:
+        version, trace_id, parent_id, flags = value.strip().split("-")
+        if len(trace_id) == 32 and len(parent_id) == 16:
+            return trace_id, parent_id, bool(int(flags, 16) & 1)
+    except ValueError:
+        pass
+    return None
+
+
+class TracingMiddleware:
+    """
+    ASGI middleware opening the root span of each HTTP request. The span ends when the
+    last body chunk is sent; background tasks run afterwards still record their spans
+    as its children. An event stream's span ends once its headers are sent.
+    """
+
+    def __init__(self, app):
+        self.app = app
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http":
+            return await self.app(scope, receive, send)
+
+        incoming = None
+        for key, value in scope.get("headers", []):
+            if key == b"traceparent":
+                incoming = _parse_traceparent(value.decode("latin-1"))
+                break
+        trace_id, parent_id, sampled = incoming if incoming else (None, None, None)
+        if TRACE_SAMPLE_RATE <= 0 and not TRACE_TRUST_INCOMING_SAMPLED:
+            sampled = None  # Sampling is off: an untrusted caller cannot turn it on
+
+        with start_span(f"{scope['method']} {scope['path']}", root=True, trace_id=trace_id,
+                        parent_id=parent_id, sampled=sampled,
+                        **{"http.method": scope["method"], "http.target": scope["path"]}) as span:
+            if not isinstance(span, Span):
+                return await self.app(scope, receive, send)
+
+            def finish():
+                route = scope.get("route")
+                if route is not None:
+                    span.name = f"{scope['method']} {route.path}"
+                span.finish()
+
+            async def send_wrapper(message):
+                if message["type"] == "http.response.start":
+                    span.set_attribute("http.status_code", message["status"])
+                    headers = list(message.get("headers", []))
+                    headers.append((b"traceparent", f"00-{span.trace_id}-{span.span_id}-01".encode()))
+                    message = {**message, "headers": headers}
+                    streaming = any(k == b"content-type" and v.startswith(b"text/event-stream") for k, v in headers)
+                    await send(message)
+                    if streaming:
+                        finish()
+                    return
+                await send(message)
+                if message["type"] == "http.response.body" and not message.get("more_body"):
+                    finish()
+
+            await self.app(scope, receive, send_wrapper)
+            finish()
@@ -1,65 +1,195 @@
 import os
+import json
 import logging
-from fastapi import UploadFile
-from google import genai
-from google.genai import types
-from dotenv import load_dotenv
+from typing import Protocol
+import resilience
+from metrics import ai_reports
+from tracing import traced
 
-# Set up logging
+# The google-genai SDK takes ~0.5s to import, so it is only loaded when the first AiEngine is created
 logger = logging.getLogger(__name__)
-logging.basicConfig(level=logging.INFO)
-load_dotenv()
+
+# Start a second label request when the first hasn't answered after this long; 0 disables hedging
+GEMINI_LABEL_HEDGE_SECONDS = float(os.environ.get("GEMINI_LABEL_HEDGE_SECONDS", "0"))
+
+# "gemini" sends recordings to AiEngine; "local" transcribes them on this host (local_transcriber.py)
+TRANSCRIBER_BACKEND = os.environ.get("TRANSCRIBER_BACKEND", "gemini").lower()
+
+# Model routing: labels are short text prompts and go to a cheaper model; recordings larger
+# than GEMINI_LONG_VIDEO_BYTES go to a longer-context one. Size stands in for length because
+# MediaRecorder webm rarely records its duration.
+GEMINI_TRANSCRIBE_MODEL = os.environ.get("GEMINI_TRANSCRIBE_MODEL", "gemini-2.5-flash")
+GEMINI_LONG_VIDEO_MODEL = os.environ.get("GEMINI_LONG_VIDEO_MODEL", "gemini-2.5-pro")
+GEMINI_LONG_VIDEO_BYTES = int(os.environ.get("GEMINI_LONG_VIDEO_BYTES", str(15 * 1024 * 1024)))
+GEMINI_LABEL_MODEL = os.environ.get("GEMINI_LABEL_MODEL", "gemini-2.5-flash-lite")
+# Only the audio is transcribed, so frames are sent at low resolution (~4x fewer tokens per frame)
+GEMINI_VIDEO_RESOLUTION = os.environ.get("GEMINI_VIDEO_RESOLUTION", "low")
+
+LABEL_INSTRUCTION = ("You are a product manager analyzing a bug report. "
+                     "Extract a list of specific, relevant labels (e.g., 'ui', 'contrast', 'button', 'login'). "
+                     "Return ONLY a comma-separated list of strings. No markdown, no json.")
+BATCH_LABEL_INSTRUCTION = ("You are a product manager analyzing bug reports. The input is a JSON list of "
+                           "reports with an id and a text. For each report, extract specific, relevant "
+                           "labels (e.g., 'ui', 'contrast', 'button', 'login'). Answer with a JSON list "
+                           "holding one object per report: its id and its labels as one comma-separated string.")
+
+def route_model(operation: str, video_size: int | None = None) -> str:
+    """The Gemini model for an operation ("labels" or "transcribe")"""
+    if operation == "labels":
+        return GEMINI_LABEL_MODEL
+    if video_size is not None and video_size > GEMINI_LONG_VIDEO_BYTES:
+        return GEMINI_LONG_VIDEO_MODEL
+    return GEMINI_TRANSCRIBE_MODEL
+
+class Transcriber(Protocol):
+    async def transcribe_bytes(self, video_bytes: bytes, content_type: str, filename: str,
+                               deadline: float | None = None) -> str:
+        """
+        The recording's speech as text ("" if there is none); raises when transcription fails.
+        A deadline (request paths) bounds the whole call, with no retries.
+        """
+        ...
 
 class AiEngine:
+    """
+    Gemini calls go through resilience.gemini (timeouts, retries, circuit breaker) and raise
+    when they finally fail, so callers can queue the report for enrichment instead of storing
+    a placeholder for good.
+    """
+
     def __init__(self):
+        from google import genai
+        from google.genai import types
+
         self.api_key = os.environ.get("GEMINI_API_KEY")
         if not self.api_key:
             logger.error("GEMINI_API_KEY not found in environment variables")
         
-        self.client = genai.Client(api_key=self.api_key)
-        self.model_name = "gemini-2.5-flash"
+        # The client's own timeout also bounds calls the resilience layer has stopped waiting for
+        self.client = genai.Client(
+            api_key=self.api_key,
+            http_options=types.HttpOptions(timeout=int(resilience.gemini.timeout * 1000)),
+        )
 
-    def generate_labels(self, description: str) -> str:
+    @traced("AiEngine.generate_labels")
+    async def generate_labels(self, description: str, deadline: float | None = None) -> str:
         """
         Generates a comma-separated list of labels based on the bug report description.
+        With a deadline, one attempt bounded by it (see resilience.ServicePolicy.call).
         """
-        try:
-            response = self.client.models.generate_content(
-                model=self.model_name,
-                config=types.GenerateContentConfig(
-                    system_instruction="You are a product manager analyzing a bug report. "
-                                       "Extract a list of specific, relevant labels (e.g., 'ui', 'contrast', 'button', 'login'). "
-                                       "Return ONLY a comma-separated list of strings. No markdown, no json."
-                ),
-                contents=description
-            )
-            return response.text if response.text else "bug, issue"
-        except Exception as e:
-            logger.error(f"Error generating labels: {e}")
-            return "bug, issue"
-
-    async def transcribe_bytes(self, video_bytes: bytes, content_type: str, filename: str) -> str:
+        from google.genai import types
+
+        model = route_model("labels")
+        response = await resilience.gemini.call(
+            "generate_labels",
+            self.client.models.generate_content,
+            model=model,
+            config=types.GenerateContentConfig(system_instruction=LABEL_INSTRUCTION),
+            contents=description,
+            hedge_after=GEMINI_LABEL_HEDGE_SECONDS or None,
+            deadline=deadline,
+        )
+        ai_reports.inc(operation="labels", model=model, batched="false")
+        return response.text if response.text else "bug, issue"
+
+    @traced("AiEngine.generate_labels_batch")
+    async def generate_labels_batch(self, descriptions: dict[int, str]) -> dict[int, str]:
         """
-        Transcribes video bytes using Gemini 1.5 Flash multimodal capabilities.
+        Labels several reports with one request, keyed by report id. Reports missing from
+        the answer are missing from the result, so the caller can retry them.
         """
+        from google.genai import types
+
+        model = route_model("labels")
+        response = await resilience.gemini.call(
+            "generate_labels_batch",
+            self.client.models.generate_content,
+            model=model,
+            config=types.GenerateContentConfig(
+                system_instruction=BATCH_LABEL_INSTRUCTION,
+                response_mime_type="application/json",
+                response_schema=types.Schema(
+                    type=types.Type.ARRAY,
+                    items=types.Schema(
+                        type=types.Type.OBJECT,
+                        properties={"id": types.Schema(type=types.Type.INTEGER),
+                                    "labels": types.Schema(type=types.Type.STRING)},
+                        required=["id", "labels"],
+                    ),
+                ),
+            ),
+            contents=json.dumps([{"id": i, "text": text} for i, text in descriptions.items()]),
+        )
+        ai_reports.inc(len(descriptions), operation="labels", model=model, batched="true")
         try:
-            logger.info(f"--- Starting transcription for {filename} using Gemini ---")
-            
-            # Create a Part object with the video data
-            prompt = "Transcribe the audio in this video exactly."
-            
-            response = self.client.models.generate_content(
-                model=self.model_name,
-                contents=[
-                    types.Part.from_bytes(data=video_bytes, mime_type=content_type),
-                    prompt
-                ]
-            )
-            
-            transcript = response.text
-            logger.info("Transcription complete")
-            return transcript
-
-        except Exception as e:
-            logger.error(f"Transcription failed: {e}", exc_info=True)
-            return "Transcription failed. Please check the video."
+            answers = json.loads(response.text or "[]")
+        except ValueError:
+            logger.warning("Batched label answer was not valid JSON")
+            return {}
+        return {
+            a["id"]: a["labels"] for a in answers
+            if isinstance(a, dict) and a.get("id") in descriptions and isinstance(a.get("labels"), str) and a["labels"].strip()
+        }
+
+    @traced("AiEngine.transcribe_bytes")
+    async def transcribe_bytes(self, video_bytes: bytes, content_type: str, filename: str,
+                               deadline: float | None = None) -> str:
+        """
+        Transcribes video bytes using Gemini multimodal capabilities.
+        With a deadline, one attempt bounded by it (see resilience.ServicePolicy.call).
+        """
+        from google.genai import types
+
+        logger.info(f"--- Starting transcription for {filename} using Gemini ---")
+        
+        # Create a Part object with the video data
+        prompt = "Transcribe the audio in this video exactly."
+        model = route_model("transcribe", len(video_bytes))
+        config = None
+        if GEMINI_VIDEO_RESOLUTION:
+            config = types.GenerateContentConfig(
+                media_resolution=f"MEDIA_RESOLUTION_{GEMINI_VIDEO_RESOLUTION.upper()}")
+
+        response = await resilience.gemini.call(
+            "transcribe",
+            self.client.models.generate_content,
+            model=model,
+            config=config,
+            contents=[
+                types.Part.from_bytes(data=video_bytes, mime_type=content_type),
+                prompt
+            ],
+            deadline=deadline,
+        )
+        ai_reports.inc(operation="transcribe", model=model, batched="false")
+        logger.info(f"Transcription complete ({model})")
+        return response.text or ""  # Recordings without speech
+
+
+# One engine (and one Gemini client with its connection pool) per worker process
+_engine: AiEngine | None = None
+
+def get_ai_engine() -> AiEngine:
+    """Returns the shared AiEngine, created on first use"""
+    global _engine
+    if _engine is None:
+        _engine = AiEngine()
+    return _engine
+
+def get_transcriber() -> Transcriber:
+    """The configured transcription backend (TRANSCRIBER_BACKEND)"""
+    if TRANSCRIBER_BACKEND == "local":
+        from local_transcriber import get_local_transcriber
+        return get_local_transcriber()
+    return get_ai_engine()
+
+def close_ai_engine() -> None:
+    global _engine
+    if _engine is not None:
+        close = getattr(_engine.client, "close", None)
+        if callable(close):
+            try:
+                close()
+            except Exception as e:
+                logger.warning(f"Failed to close Gemini client: {e}")
+        _engine = None
@@ -0,0 +1,218 @@
+"""
+Resumable SDK uploads (routers/uploads.py).
+
+A session is created with the video's total size, then filled with PUT chunks at
+increasing offsets; a chunk cut short by a dropped connection still counts up to the last
+byte received, and the SDK resumes from the offset the server reports. Bytes are spooled
+to UPLOAD_SPOOL_DIR and handed to the storage backend once, when the session is finalised
+into a report. With several hosts, the spool must be shared (or uploads routed stickily).
+
+Each PUT holds an exclusive lock on the spool file (chunk_lock) and checks the offset under
+it, so two chunks sent at the same offset never both write: the second is refused before
+reading its body. The lock is released by the OS if the worker dies.
+
+Finalisation is claimed with a compare-and-set to FINALIZING, which holds a lease of
+UPLOAD_FINALIZE_LEASE_SECONDS: the claim pushes expires_at to the lease end plus
+UPLOAD_EXPIRY_SECONDS, and once the lease is over a retried finalisation may claim the
+session again, so a worker dying mid-finalisation does not leave it stuck. The claimed
+expires_at is the claim's token: mark_completed only succeeds while the session still holds
+it, in the report's own transaction, so a slow finaliser that lost its lease saves nothing.
+
+Sessions not finalised within UPLOAD_EXPIRY_SECONDS of their last chunk are deleted with
+their spool file by collect_expired(), run every UPLOAD_GC_INTERVAL_SECONDS by each worker
+or with `python manage.py gc-uploads`.
+"""
+
+import asyncio
+import fcntl
+import logging
+import os
+import secrets
+import tempfile
+from contextlib import contextmanager
+from datetime import datetime, timedelta
+from typing import AsyncIterator, BinaryIO, Optional
+
+from sqlalchemy.orm import Session
+from starlette.requests import ClientDisconnect
+
+from db import SessionLocal
+from metrics import upload_bytes
+from models import Tenant, UploadSession, UploadStatus
+
+logger = logging.getLogger(__name__)
+
+UPLOAD_SPOOL_DIR = os.environ.get("UPLOAD_SPOOL_DIR", os.path.join(tempfile.gettempdir(), "trapalert-uploads"))
+UPLOAD_MAX_BYTES = int(os.environ.get("UPLOAD_MAX_BYTES", str(512 * 1024 * 1024)))
+UPLOAD_EXPIRY_SECONDS = int(os.environ.get("UPLOAD_EXPIRY_SECONDS", str(24 * 3600)))
+UPLOAD_GC_INTERVAL_SECONDS = int(os.environ.get("UPLOAD_GC_INTERVAL_SECONDS", "3600"))
+# Longest a finalisation (storage upload, transcription, labels) may hold its session
+UPLOAD_FINALIZE_LEASE_SECONDS = int(os.environ.get("UPLOAD_FINALIZE_LEASE_SECONDS", "600"))
+
+
+def spool_path(upload_id: str) -> str:
+    return os.path.join(UPLOAD_SPOOL_DIR, f"{upload_id}.part")
+
+
+def _expiry(now: Optional[datetime] = None) -> datetime:
+    return (now or datetime.utcnow()) + timedelta(seconds=UPLOAD_EXPIRY_SECONDS)
+
+
+def create_session(db: Session, tenant: Tenant, length: int, content_type: Optional[str],
+                   filename: Optional[str]) -> UploadSession:
+    upload = UploadSession(
+        id=secrets.token_urlsafe(24), tenant_id=tenant.id, length=length, received=0,
+        content_type=content_type, filename=filename, status=UploadStatus.UPLOADING, expires_at=_expiry(),
+    )
+    os.makedirs(UPLOAD_SPOOL_DIR, exist_ok=True)
+    open(spool_path(upload.id), "xb").close()
+    db.add(upload)
+    db.commit()
+    return upload
+
+
+@contextmanager
+def chunk_lock(upload_id: str):
+    """
+    Yields the upload's spool file, opened and locked for one PUT, or None if another
+    request is writing to it or the spool is gone (the upload was finalised)
+    """
+    try:
+        spool = open(spool_path(upload_id), "r+b")
+    except FileNotFoundError:
+        yield None
+        return
+    with spool:
+        try:
+            fcntl.flock(spool, fcntl.LOCK_EX | fcntl.LOCK_NB)
+        except BlockingIOError:
+            yield None
+            return
+        try:
+            yield spool
+        finally:
+            fcntl.flock(spool, fcntl.LOCK_UN)
+
+
+async def write_chunk(spool: BinaryIO, upload_id: str, offset: int, max_bytes: int,
+                      stream: AsyncIterator[bytes]) -> tuple[int, bool]:
+    """
+    Writes a request body into the spool file (from chunk_lock) at `offset`, at most `max_bytes` of it.
+    Returns (bytes written, whether the body was longer than max_bytes). A body cut short by
+    the client still returns what arrived, so the upload resumes from there.
+    """
+    written, overflow = 0, False
+    spool.seek(offset)
+    try:
+        async for chunk in stream:
+            if written + len(chunk) > max_bytes:
+                chunk, overflow = chunk[:max_bytes - written], True
+            await asyncio.to_thread(spool.write, chunk)
+            written += len(chunk)
+            if overflow:
+                break
+    except ClientDisconnect:
+        logger.info(f"Upload {upload_id}: client disconnected after {written} bytes of a chunk")
+    await asyncio.to_thread(spool.flush)
+    upload_bytes.inc(written)
+    return written, overflow
+
+
+def record_progress(db: Session, upload_id: str, offset: int, written: int) -> bool:
+    """Moves the session's offset past a written chunk; False if another request moved it first"""
+    updated = db.query(UploadSession).filter(
+        UploadSession.id == upload_id,
+        UploadSession.received == offset,
+        UploadSession.status == UploadStatus.UPLOADING,
+    ).update({"received": offset + written, "expires_at": _expiry()}, synchronize_session=False)
+    db.commit()
+    return updated == 1
+
+
+def claim_finalization(db: Session, upload_id: str) -> Optional[datetime]:
+    """
+    Moves a complete session to FINALIZING under a fresh lease. Returns the claim's expires_at,
+    which mark_completed and release_finalization check, or None if the session is incomplete,
+    completed, or another finalisation holds an unexpired lease
+    """
+    now = datetime.utcnow()
+    lease = _expiry(now + timedelta(seconds=UPLOAD_FINALIZE_LEASE_SECONDS))
+    updated = db.query(UploadSession).filter(
+        UploadSession.id == upload_id,
+        UploadSession.received == UploadSession.length,
+        (UploadSession.status == UploadStatus.UPLOADING)
+        | ((UploadSession.status == UploadStatus.FINALIZING) & (UploadSession.expires_at <= _expiry(now))),
+    ).update({"status": UploadStatus.FINALIZING, "expires_at": lease}, synchronize_session=False)
+    db.commit()
+    return lease if updated == 1 else None
+
+
+def finalization_lease_expired(upload: UploadSession, now: Optional[datetime] = None) -> bool:
+    """Whether a FINALIZING session's worker is presumed gone"""
+    return upload.expires_at <= _expiry(now)
+
+
+def _claimed(upload_id: str, lease: datetime) -> tuple:
+    return (UploadSession.id == upload_id, UploadSession.status == UploadStatus.FINALIZING,
+            UploadSession.expires_at == lease)
+
+
+def release_finalization(db: Session, upload_id: str, lease: datetime) -> None:
+    """Back to UPLOADING after a failed finalisation, so the SDK may retry it, unless the claim was lost"""
+    db.query(UploadSession).filter(*_claimed(upload_id, lease)) \
+        .update({"status": UploadStatus.UPLOADING, "expires_at": _expiry()}, synchronize_session=False)
+    db.commit()
+
+
+def mark_completed(db: Session, upload_id: str, lease: datetime, report_id: int) -> bool:
+    """
+    Records the report made from an upload, in the caller's transaction; False if the claim
+    was lost (lease expired and re-claimed, or session deleted). The session is kept until
+    expiry to answer retried finalisations.
+    """
+    updated = db.query(UploadSession).filter(*_claimed(upload_id, lease)).update({
+        "status": UploadStatus.COMPLETED, "report_id": report_id, "expires_at": _expiry(),
+    }, synchronize_session=False)
+    return updated == 1
+
+
+def read_spool(upload_id: str) -> bytes:
+    with open(spool_path(upload_id), "rb") as spool:
+        return spool.read()
+
+
+def remove_spool(upload_id: str) -> None:
+    try:
+        os.remove(spool_path(upload_id))
+    except FileNotFoundError:
+        pass
+
+
+def collect_expired(now: Optional[datetime] = None, batch_size: int = 500) -> int:
+    """Deletes expired sessions and their spool files; returns how many were removed"""
+    now = now or datetime.utcnow()
+    removed = 0
+    with SessionLocal() as db:
+        while True:
+            ids = [row.id for row in db.query(UploadSession.id)
+                   .filter(UploadSession.expires_at < now).limit(batch_size).all()]
+            if not ids:
+                break
+            for upload_id in ids:
+                remove_spool(upload_id)
+            db.query(UploadSession).filter(UploadSession.id.in_(ids)).delete(synchronize_session=False)
+            db.commit()
+            removed += len(ids)
+    if removed:
+        logger.info(f"Uploads: removed {removed} expired upload sessions")
+    return removed
+
+
+async def run_gc(interval: int = UPLOAD_GC_INTERVAL_SECONDS) -> None:
+    """Background loop started by the app lifespan; deletions are idempotent, so every worker may run it"""
+    while True:
+        await asyncio.sleep(interval)
+        try:
+            await asyncio.to_thread(collect_expired)
+        except Exception as e:
+            logger.error(f"Upload garbage collection failed: {e}", exc_info=True)
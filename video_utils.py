@@ -1,7 +1,12 @@
 import os
 import uuid
 import logging
-from supabase import create_client, Client
+from typing import TYPE_CHECKING
+import resilience
+from tracing import traced
+
+if TYPE_CHECKING:
+    from supabase import Client
 
 logger = logging.getLogger(__name__)
 
@@ -9,40 +14,109 @@ logger = logging.getLogger(__name__)
 url: str = os.environ.get("SUPABASE_URL", "")
 key: str = os.environ.get("SUPABASE_KEY", "")
 
-supabase: Client = None
+# "supabase" (default) stores videos in Supabase Storage, "local" writes them under LOCAL_STORAGE_DIR
+STORAGE_BACKEND = os.environ.get("STORAGE_BACKEND", "supabase").lower()
+LOCAL_STORAGE_DIR = os.environ.get("LOCAL_STORAGE_DIR", "./media")
+VIDEO_BUCKET = "videos"
+# Retention: archived report rows, and videos kept past the hot retention window
+ARCHIVE_BUCKET = os.environ.get("ARCHIVE_BUCKET", "archive")
+COLD_VIDEO_BUCKET = os.environ.get("COLD_VIDEO_BUCKET", "videos-cold")
+# Lifetime of signed redirect URLs handed out by GET /api/reports/{id}/video
+SIGNED_URL_TTL_SECONDS = int(os.environ.get("SIGNED_URL_TTL_SECONDS", "300"))
+
+LOCAL_URL_PREFIX = f"local://{VIDEO_BUCKET}/"
+
+# Created on first use, not at import: the SDK alone takes ~0.2s to import
+supabase: "Client" = None
+
+def get_supabase() -> "Client | None":
+    """Returns the shared Supabase client, creating it if it is configured and not created yet"""
+    global supabase
+    if supabase is None and url and key:
+        try:
+            from supabase import create_client
 
-if url and key:
+            supabase = create_client(url, key)
+        except Exception as e:
+            logger.error(f"Failed to initialize Supabase client: {e}")
+    return supabase
+
+def init_storage() -> None:
+    """Prepare the configured storage backend; called from the app lifespan"""
+    if STORAGE_BACKEND == "local":
+        os.makedirs(os.path.join(LOCAL_STORAGE_DIR, VIDEO_BUCKET), exist_ok=True)
+    elif not (url and key):
+        logger.warning("Supabase storage selected but SUPABASE_URL / SUPABASE_KEY are not set")
+
+def close_storage() -> None:
+    """Drop the storage client so its HTTP connections are released"""
+    global supabase
+    supabase = None
+
+def upload_video(video_bytes: bytes, content_type: str = "video/webm", file_name: str | None = None) -> str | None:
+    """
+    Stores video bytes (or derived media such as thumbnails) with the configured storage backend.
+    Returns the URL to persist on the report, or None on failure.
+    """
+    if STORAGE_BACKEND == "local":
+        return save_video_locally(video_bytes, content_type, file_name)
+    return upload_video_to_supabase(video_bytes, content_type, file_name)
+
+@traced("save_video_locally")
+def save_video_locally(video_bytes: bytes, content_type: str = "video/webm", file_name: str | None = None) -> str | None:
+    """
+    Writes video bytes under LOCAL_STORAGE_DIR/videos.
+    Returns a local:// URL that is served through the report video endpoint.
+    """
     try:
-        supabase = create_client(url, key)
+        file_name = file_name or f"{uuid.uuid4()}.webm"
+        directory = os.path.join(LOCAL_STORAGE_DIR, VIDEO_BUCKET)
+        os.makedirs(directory, exist_ok=True)
+
+        # Write to a temp name first so a half-written file is never served
+        path = os.path.join(directory, file_name)
+        tmp_path = f"{path}.part"
+        with open(tmp_path, "wb") as f:
+            f.write(video_bytes)
+        os.replace(tmp_path, path)
+
+        logger.info(f"Video stored locally: {path} ({len(video_bytes)} bytes)")
+        return f"{LOCAL_URL_PREFIX}{file_name}"
+
     except Exception as e:
-        logger.error(f"Failed to initialize Supabase client: {e}")
+        logger.error(f"Failed to store video locally: {e}", exc_info=True)
+        return None
 
-def upload_video_to_supabase(video_bytes: bytes, content_type: str = "video/webm") -> str | None:
+@traced("upload_video_to_supabase")
+def upload_video_to_supabase(video_bytes: bytes, content_type: str = "video/webm", file_name: str | None = None) -> str | None:
     """
     Uploads video bytes to Supabase Storage 'videos' bucket.
     Returns the public URL of the uploaded video.
     """
-    if not supabase:
+    client = get_supabase()
+    if not client:
         logger.error("Supabase client not initialized. Check SUPABASE_URL and SUPABASE_KEY env vars.")
         return None
 
     try:
-        file_name = f"{uuid.uuid4()}.webm"
-        bucket_name = "videos"
+        file_name = file_name or f"{uuid.uuid4()}.webm"
+        bucket_name = VIDEO_BUCKET
         
         logger.info(f"Uploading video: {file_name} ({len(video_bytes)} bytes)")
 
-        # Upload file
-        response = supabase.storage.from_(bucket_name).upload(
+        # Upload file; upsert makes a retry after a lost response idempotent
+        response = resilience.supabase.call_sync(
+            "upload",
+            client.storage.from_(bucket_name).upload,
             file=video_bytes,
             path=file_name,
-            file_options={"content-type": content_type}
+            file_options={"content-type": content_type, "upsert": "true"}
         )
         
         logger.info(f"Upload response: {response}")
 
         # Get public URL
-        public_url_response = supabase.storage.from_(bucket_name).get_public_url(file_name)
+        public_url_response = client.storage.from_(bucket_name).get_public_url(file_name)
         
         # Check if the public URL is wrapped in a response object or is a string
         if hasattr(public_url_response, 'publicURL'):
@@ -56,3 +130,170 @@ def upload_video_to_supabase(video_bytes: bytes, content_type: str = "video/webm
     except Exception as e:
         logger.error(f"Failed to upload video to Supabase: {e}", exc_info=True)
         return None
+
+def is_local_video(video_url: str) -> bool:
+    return video_url.startswith(LOCAL_URL_PREFIX)
+
+def video_object_key(video_url: str) -> str | None:
+    """
+    Extracts the object name inside the videos bucket from a stored video_url.
+    Works for both local:// URLs and Supabase public URLs (.../object/public/videos/<name>).
+    """
+    if is_local_video(video_url):
+        name = video_url[len(LOCAL_URL_PREFIX):]
+    else:
+        marker = f"/{VIDEO_BUCKET}/"
+        if marker not in video_url:
+            return None
+        name = video_url.split(marker, 1)[1].split("?", 1)[0]
+
+    # Object names are flat uuid-based file names; reject anything that could escape the bucket
+    if not name or "/" in name or "\\" in name or name.startswith("."):
+        return None
+    return name
+
+def local_video_path(object_key: str) -> str:
+    """Absolute path of a locally stored video object"""
+    return os.path.abspath(os.path.join(LOCAL_STORAGE_DIR, VIDEO_BUCKET, object_key))
+
+@traced("create_signed_video_url")
+def create_signed_video_url(object_key: str, expires_in: int = SIGNED_URL_TTL_SECONDS) -> str | None:
+    """
+    Creates a short-lived signed URL for a video in Supabase Storage.
+    Returns None if the client is unavailable or signing fails.
+    """
+    client = get_supabase()
+    if not client:
+        logger.error("Supabase client not initialized. Check SUPABASE_URL and SUPABASE_KEY env vars.")
+        return None
+
+    try:
+        response = resilience.supabase.call_sync(
+            "sign_url", client.storage.from_(VIDEO_BUCKET).create_signed_url, object_key, expires_in)
+        # Depending on the client version the key is 'signedURL' or 'signedUrl'
+        return response.get("signedURL") or response.get("signedUrl")
+    except Exception as e:
+        logger.error(f"Failed to sign video URL for {object_key}: {e}", exc_info=True)
+        return None
+
+@traced("read_video_bytes")
+def read_video_bytes(video_url: str) -> bytes | None:
+    """
+    Loads a stored video back into memory, from local storage or its public URL.
+    Used by offline jobs such as the preview backfill.
+    """
+    object_key = video_object_key(video_url)
+    if not object_key:
+        return None
+
+    try:
+        if is_local_video(video_url):
+            with open(local_video_path(object_key), "rb") as f:
+                return f.read()
+        client = get_supabase()
+        if not client:
+            logger.error("Supabase client not initialized. Check SUPABASE_URL and SUPABASE_KEY env vars.")
+            return None
+        return resilience.supabase.call_sync("download", client.storage.from_(VIDEO_BUCKET).download, object_key)
+    except Exception as e:
+        logger.error(f"Failed to read video {object_key}: {e}", exc_info=True)
+        return None
+
+def _local_object_path(bucket: str, object_key: str) -> str:
+    return os.path.abspath(os.path.join(LOCAL_STORAGE_DIR, bucket, object_key))
+
+@traced("store_object")
+def store_object(bucket: str, object_key: str, data: bytes, content_type: str) -> str | None:
+    """
+    Stores a private object (archives, cold videos) in the given bucket.
+    Returns a local://<bucket>/<key> or supabase://<bucket>/<key> location, or None on failure.
+    """
+    try:
+        if STORAGE_BACKEND == "local":
+            path = _local_object_path(bucket, object_key)
+            os.makedirs(os.path.dirname(path), exist_ok=True)
+            with open(f"{path}.part", "wb") as f:
+                f.write(data)
+            os.replace(f"{path}.part", path)
+            return f"local://{bucket}/{object_key}"
+
+        client = get_supabase()
+        if not client:
+            logger.error("Supabase client not initialized. Check SUPABASE_URL and SUPABASE_KEY env vars.")
+            return None
+        resilience.supabase.call_sync(
+            "upload", client.storage.from_(bucket).upload,
+            file=data, path=object_key, file_options={"content-type": content_type, "upsert": "true"}
+        )
+        return f"supabase://{bucket}/{object_key}"
+    except Exception as e:
+        logger.error(f"Failed to store {bucket}/{object_key}: {e}", exc_info=True)
+        return None
+
+def cold_video_location(video_url: str) -> str | None:
+    """Where move_to_cold_storage() puts a video, known before the move happens"""
+    object_key = video_object_key(video_url)
+    if not object_key:
+        return None
+    scheme = "local" if is_local_video(video_url) else "supabase"
+    return f"{scheme}://{COLD_VIDEO_BUCKET}/{object_key}"
+
+@traced("move_to_cold_storage")
+def move_to_cold_storage(video_url: str) -> bool:
+    """Moves a video out of the hot videos bucket into COLD_VIDEO_BUCKET"""
+    object_key = video_object_key(video_url)
+    if not object_key:
+        return False
+
+    if is_local_video(video_url):
+        try:
+            target = _local_object_path(COLD_VIDEO_BUCKET, object_key)
+            os.makedirs(os.path.dirname(target), exist_ok=True)
+            os.replace(local_video_path(object_key), target)
+            return True
+        except FileNotFoundError:
+            return False
+        except Exception as e:
+            logger.error(f"Failed to move {object_key} to cold storage: {e}", exc_info=True)
+            return False
+
+    # Storage buckets can't move objects across buckets: copy, then remove the original
+    data = read_video_bytes(video_url)
+    if data is None or not store_object(COLD_VIDEO_BUCKET, object_key, data, "video/webm"):
+        return False
+    delete_stored_media([video_url])
+    return True
+
+@traced("delete_stored_media")
+def delete_stored_media(urls: list[str | None]) -> int:
+    """
+    Deletes videos and derived media (poster, preview) from the videos bucket. Best effort:
+    failures are logged, never raised. Returns the number of objects deleted.
+    """
+    local_keys, remote_keys = [], []
+    for url in urls:
+        object_key = video_object_key(url) if url else None
+        if object_key:
+            (local_keys if is_local_video(url) else remote_keys).append(object_key)
+
+    deleted = 0
+    for object_key in local_keys:
+        try:
+            os.remove(local_video_path(object_key))
+            deleted += 1
+        except FileNotFoundError:
+            pass
+        except Exception as e:
+            logger.error(f"Failed to delete local media {object_key}: {e}")
+
+    if remote_keys:
+        client = get_supabase()
+        if not client:
+            logger.error(f"Supabase client not initialized; {len(remote_keys)} media objects not deleted")
+            return deleted
+        try:
+            resilience.supabase.call_sync("remove", client.storage.from_(VIDEO_BUCKET).remove, remote_keys)
+            deleted += len(remote_keys)
+        except Exception as e:
+            logger.error(f"Failed to delete media {remote_keys}: {e}", exc_info=True)
+    return deleted